@@ -40,12 +40,51 @@ from .util.modules import toposort, isBase
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
+from .status_store import StatusStore
 # try to import RemoteObjectManager. Might fail if rpyc is not installed.
 try:
     from .remote import RemoteObjectManager
 except ImportError:
     RemoteObjectManager = None
 from .module import BaseMixin, Connector
+from . import process_host
+
+
+class ModuleActivationWorker(QtCore.QObject):
+    """ Activates a module in the thread this worker lives in and reports the result.
+
+      @signal str str bool float sigActivated: base, name, success and duration of activation
+    """
+    sigActivated = QtCore.Signal(str, str, bool, float)
+
+    def __init__(self, base, name, module, home_thread=None):
+        """ Create a worker for a single module activation.
+
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param object module: the module instance to activate
+          @param QThread home_thread: optional, thread the module is moved to after activation
+        """
+        super().__init__()
+        self._base = base
+        self._name = name
+        self._module = module
+        self._home_thread = home_thread
+
+    @QtCore.Slot()
+    def activate(self):
+        """ Run the module activation. Must be called in the thread of the module. """
+        start = time.perf_counter()
+        success = False
+        try:
+            success = self._module.module_state.activate()
+        except:
+            logger.exception('{0} module {1}: error during activation:'.format(
+                self._base, self._name))
+        finally:
+            if self._home_thread is not None:
+                self._module.moveToThread(self._home_thread)
+        self.sigActivated.emit(self._base, self._name, bool(success), time.perf_counter() - start)
 
 
 class Manager(QtCore.QObject):
@@ -61,6 +100,7 @@ class Manager(QtCore.QObject):
       @signal sigAbortAll: abort all running things as quicly as possible
       @signal sigManagerQuit: the manager is quitting
       @signal sigManagerShow: show whatever part of the GUI is important
+      @signal sigStartupProfileUpdated: new module activation timings are available
       """
 
     # Prepare Signal declarations for Qt: Allows Python to interface with Qt
@@ -73,6 +113,7 @@ class Manager(QtCore.QObject):
     sigManagerQuit = QtCore.Signal(object, bool)
     sigShutdownAcknowledge = QtCore.Signal(bool, bool)
     sigShowManager = QtCore.Signal()
+    sigStartupProfileUpdated = QtCore.Signal()
 
     def __init__(self, args, **kwargs):
         """Constructor for Qudi main management class
@@ -103,6 +144,12 @@ class Manager(QtCore.QObject):
         self.baseDir = None
         self.alreadyQuit = False
         self.remote_server = False
+        self._status_store = None
+        # activation timings of all modules, keys are '<base>.<name>'
+        self.startupProfile = OrderedDict()
+        self._activation_workers = dict()
+        # set while activateModules runs, the event loop may deliver module requests meanwhile
+        self._activation_in_progress = False
 
         try:
             # Initialize parent class QObject
@@ -781,6 +828,18 @@ class Manager(QtCore.QObject):
                 except:
                     logger.exception('Error while loading {0} module: {1}'.format(base, key))
                     return -1
+            elif defined_module.get('process', False):
+                if base != 'hardware':
+                    logger.error('Only hardware modules can run in their own process, not '
+                                 '{0} module {1}.'.format(base, key))
+                    return -1
+                try:
+                    self.configureModule(process_host, base, 'ProcessModule', key,
+                                         defined_module)
+                except:
+                    logger.exception(
+                        'Error while loading {0} module: {1}'.format(base, key))
+                    return -1
             else:
                 try:
                     # class_name is the last part of the config entry
@@ -870,6 +929,11 @@ class Manager(QtCore.QObject):
                     self.tree['loaded'][base].pop(key, None)
                 # reload config part associated with module
                 self.reloadConfigPart(base, key)
+                if defined_module.get('process', False):
+                    # the worker process imports the module anew on activation
+                    self.configureModule(process_host, base, 'ProcessModule', key,
+                                         defined_module)
+                    return 0
                 # class_name is the last part of the config entry
                 class_name = re.split('\.', defined_module['module.Class'])[-1]
                 # module_name is the whole line without this last part (and
@@ -945,38 +1009,195 @@ class Manager(QtCore.QObject):
           @param string name: module which is going to be activated.
 
         """
+        self.activateModules([(base, name)])
+
+    def activateModules(self, modules, dependencies=None):
+        """ Activate several modules. Modules not depending on each other are activated
+            concurrently, a module is only activated after all its dependencies.
+
+          @param list modules: (base, name) tuples of the modules to activate in topological order
+          @param dict dependencies: optional, module names as keys and sets of the names of the
+                                    modules they depend on as values
+
+        Threaded modules are activated in their own thread. Modules that declare a concurrent
+        activation are activated in a temporary worker thread and moved back to the main thread
+        afterwards. All other modules are activated in the main thread one after another.
+        Hardware drivers are in general not thread-safe, so modules which use a common hardware
+        module (directly or through other modules) are never activated at the same time.
+        This call returns after all modules have been activated.
+        """
+        if self._rejectDuringActivation('activate modules {0}'.format(
+                [name for base, name in modules])):
+            return
+        if dependencies is None:
+            dependencies = dict()
+        scheduled = set(name for base, name in modules)
+        remaining = OrderedDict((name, base) for base, name in modules)
+        hardware = dict((name, self._getHardwareDependencies(name, dependencies))
+                        for base, name in modules)
+        running = set()
+        finished = set()
+        loop = QtCore.QEventLoop()
+
+        def activation_finished(base, name, success, duration):
+            self._recordActivation(base, name, success, duration)
+            running.discard(name)
+            finished.add(name)
+            loop.quit()
+
+        self._activation_in_progress = True
+        try:
+            while remaining or running:
+                started = False
+                for name, base in list(remaining.items()):
+                    if not all(dep in finished for dep in dependencies.get(name, ())
+                               if dep in scheduled):
+                        continue
+                    if any(hardware[name] & hardware[other] for other in running):
+                        # wait until the activation using the same hardware has finished
+                        continue
+                    del remaining[name]
+                    started = True
+                    if self._startModuleActivation(base, name, activation_finished):
+                        running.add(name)
+                    else:
+                        finished.add(name)
+                    QtCore.QCoreApplication.instance().processEvents()
+                if running and not started:
+                    # nothing else can be started before a running activation has finished
+                    loop.exec_()
+                elif not running and not started:
+                    logger.error('Unable to resolve activation order of modules {0}.'
+                                 ''.format(list(remaining)))
+                    break
+        finally:
+            self._activation_in_progress = False
+        self.sigStartupProfileUpdated.emit()
+
+    def _getHardwareDependencies(self, name, dependencies):
+        """ Find all hardware modules a module uses directly or through other modules.
+
+          @param str name: unique module name
+          @param dict dependencies: module names as keys and sets of the names of the modules
+                                    they depend on as values
+
+          @return set: names of the hardware modules, including the module itself if it is a
+                       hardware module
+        """
+        hardware = set()
+        visited = set()
+        pending = [name]
+        while pending:
+            module = pending.pop()
+            if module in visited:
+                continue
+            visited.add(module)
+            if module in self.tree['defined']['hardware']:
+                hardware.add(module)
+            pending.extend(dependencies.get(module, ()))
+        return hardware
+
+    def _rejectDuringActivation(self, action):
+        """ Check whether a module request arrives while modules are being activated.
+
+        The event loop keeps running during the activation of modules, so requests from the GUI
+        could change the module tree in the middle of it.
+
+          @param str action: description of the rejected request for the log
+
+          @return bool: True if the request has to be rejected
+        """
+        if self._activation_in_progress:
+            logger.error('Unable to {0} while modules are being activated. Please try again '
+                         'once the activation has finished.'.format(action))
+            return True
+        return False
+
+    def _startModuleActivation(self, base, name, callback):
+        """ Start the activation of a module.
+
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param callable callback: called with (base, name, success, duration) in the main thread
+                                    once an asynchronous activation has finished
+
+          @return bool: True if the activation runs asynchronously, False if it is already done
+        """
         if not self.isModuleLoaded(base, name):
             logger.error('{0} module {1} not loaded.'.format(base, name))
-            return
+            return False
         module = self.tree['loaded'][base][name]
         if module.module_state() != 'deactivated' and (
                 self.isModuleDefined(base, name)
                 and 'remote' in self.tree['defined'][base][name]):
             logger.debug('No need to activate remote module {0}.{1}.'.format(base, name))
-            return
+            return False
         if module.module_state() != 'deactivated':
             logger.error('{0} module {1} not deactivated'.format(base, name))
-            return
+            return False
+        start = time.perf_counter()
         try:
             module.setStatusVariables(self.loadStatusVariables(base, name))
             # start main loop for qt objects
             if module.is_module_threaded:
-                modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
-                module.moveToThread(modthread)
-                modthread.start()
-                success = QtCore.QMetaObject.invokeMethod(
-                    module.module_state,
-                    'trigger',
-                    QtCore.Qt.BlockingQueuedConnection,
-                    QtCore.Q_RETURN_ARG(bool),
-                    QtCore.Q_ARG(str, 'activate'))
+                thread_name = 'mod-{0}-{1}'.format(base, name)
+                home_thread = None
+            elif module.is_activation_concurrent:
+                thread_name = 'activate-{0}-{1}'.format(base, name)
+                home_thread = QtCore.QThread.currentThread()
             else:
                 success = module.module_state.activate() # runs on_activate in main thread
-            logger.debug('Activation success: {}'.format(success))
+                logger.debug('Activation success: {}'.format(success))
+                self._recordActivation(base, name, success, time.perf_counter() - start)
+                return False
+            thread = self.tm.newThread(thread_name)
+            module.moveToThread(thread)
+            worker = ModuleActivationWorker(base, name, module, home_thread)
+            worker.moveToThread(thread)
+            worker.sigActivated.connect(
+                lambda b, n, success, duration: self._moduleActivationFinished(
+                    b, n, success, duration, thread_name, home_thread is not None, callback),
+                QtCore.Qt.QueuedConnection)
+            self._activation_workers[thread_name] = worker
+            thread.start()
+            QtCore.QMetaObject.invokeMethod(worker, 'activate', QtCore.Qt.QueuedConnection)
+            return True
         except:
             logger.exception(
                 '{0} module {1}: error during activation:'.format(base, name))
-        QtCore.QCoreApplication.instance().processEvents()
+            self._recordActivation(base, name, False, time.perf_counter() - start)
+        return False
+
+    def _moduleActivationFinished(self, base, name, success, duration, thread_name,
+                                  temporary_thread, callback):
+        """ Clean up after an asynchronous module activation. Runs in the main thread. """
+        logger.debug('Activation success: {}'.format(success))
+        worker = self._activation_workers.pop(thread_name, None)
+        if worker is not None:
+            worker.sigActivated.disconnect()
+        if temporary_thread:
+            self.tm.quitThread(thread_name)
+            self.tm.joinThread(thread_name)
+        callback(base, name, success, duration)
+
+    def _recordActivation(self, base, name, success, duration):
+        """ Add the activation of a module to the startup profile.
+
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param bool success: whether the activation succeeded
+          @param float duration: activation time in seconds
+        """
+        module = self.tree['loaded'][base].get(name)
+        if module is not None and module.is_module_threaded:
+            thread = 'module thread'
+        elif module is not None and module.is_activation_concurrent:
+            thread = 'worker thread'
+        else:
+            thread = 'main thread'
+        self.startupProfile['{0}.{1}'.format(base, name)] = '{0:.3f} s in {1}{2}'.format(
+            duration, thread, '' if success else ', failed')
+        logger.debug('Activation of {0}.{1} took {2:.3f} s.'.format(base, name, duration))
 
     @QtCore.Slot(str, str)
     def deactivateModule(self, base, name):
@@ -986,6 +1207,8 @@ class Manager(QtCore.QObject):
           @param string name: module which is going to be activated.
 
         """
+        if self._rejectDuringActivation('deactivate {0}.{1}'.format(base, name)):
+            return
         logger.info('Deactivating {0}.{1}'.format(base, name))
         if not self.isModuleLoaded(base, name):
             logger.error('{0} module {1} not loaded.'.format(base, name))
@@ -1153,34 +1376,45 @@ class Manager(QtCore.QObject):
             If the module is already loaded, just activate it.
             If the module is an active GUI module, show its window.
         """
+        if self._rejectDuringActivation('start {0}.{1}'.format(base, key)):
+            return -1
         deps = self.getRecursiveModuleDependencies(base, key)
         sorteddeps = toposort(deps)
         if len(sorteddeps) == 0:
             sorteddeps.append(key)
 
+        # Load and connect all modules first, then activate them along the dependency graph.
+        # Modules loaded before a failure are still activated.
+        to_activate = list()
+        retval = 0
         for mkey in sorteddeps:
             for mbase in ('hardware', 'logic', 'gui'):
                 if mkey in self.tree['defined'][mbase] and mkey not in self.tree['loaded'][mbase]:
                     success = self.loadConfigureModule(mbase, mkey)
                     if success < 0:
                         logger.warning('Stopping module loading after loading failure.')
-                        return -1
+                        retval = -1
+                        break
                     elif success > 0:
                         logger.warning('Nonfatal loading error, going on.')
                     success = self.connectModule(mbase, mkey)
                     if success < 0:
                         logger.warning('Stopping loading module {0}.{1} after '
                                        'connection failure.'.format(mbase, mkey))
-                        return -1
+                        retval = -1
+                        break
                     if mkey in self.tree['loaded'][mbase]:
-                        self.activateModule(mbase, mkey)
+                        to_activate.append((mbase, mkey))
                 elif mkey in self.tree['defined'][mbase] and mkey in self.tree['loaded'][mbase]:
                     if self.tree['loaded'][mbase][mkey].module_state() == 'deactivated':
-                        self.activateModule(mbase, mkey)
+                        to_activate.append((mbase, mkey))
                     elif (self.tree['loaded'][mbase][mkey].module_state() != 'deactivated' and
                           mbase == 'gui'):
                         self.tree['loaded'][mbase][mkey].show()
-        return 0
+            if retval < 0:
+                break
+        self.activateModules(to_activate, deps)
+        return retval
 
     @QtCore.Slot(str, str)
     def stopModule(self, base, key):
@@ -1190,6 +1424,8 @@ class Manager(QtCore.QObject):
           @param str key: Unique module name
 
         """
+        if self._rejectDuringActivation('stop {0}.{1}'.format(base, key)):
+            return
         deps = self.getRecursiveModuleDependencies(base, key)
         sorteddeps = toposort(deps)
         if len(sorteddeps) == 0:
@@ -1214,6 +1450,8 @@ class Manager(QtCore.QObject):
           @param str key: Unique configured module name
 
         """
+        if self._rejectDuringActivation('reload {0}.{1}'.format(base, key)):
+            return -1
         unload_deps = self.getReverseRecursiveModuleDependencies(base, key)
         sorted_u_deps = toposort(unload_deps)
         unloaded_mods = []
@@ -1279,6 +1517,16 @@ class Manager(QtCore.QObject):
             os.makedirs(appStatusDir)
         return appStatusDir
 
+    @property
+    def statusStore(self):
+        """ Store for module status variables in the application status directory.
+
+          @return StatusStore: the status variable store
+        """
+        if self._status_store is None:
+            self._status_store = StatusStore(self.getStatusDir())
+        return self._status_store
+
     @QtCore.Slot(str, str, dict)
     def saveStatusVariables(self, base, module, variables):
         """ If a module has status variables, save them to a file in the application status directory.
@@ -1286,16 +1534,15 @@ class Manager(QtCore.QObject):
           @param str base: the module category
           @param str module: the unique module name
           @param dict variables: a dictionary of status variable names and values
+
+        The variables are written in the background. Unchanged numpy arrays are not rewritten.
         """
         if len(variables) > 0:
             try:
-                statusdir = self.getStatusDir()
                 classname = self.tree['loaded'][base][module].__class__.__name__
-                filename = os.path.join(statusdir,
-                    'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-                config.save(filename, variables)
+                self.statusStore.save(
+                    'status-{0}_{1}_{2}'.format(classname, base, module), variables)
             except:
-                print(variables)
                 logger.exception('Failed to save status variables of module '
                         '{0}.{1}:\n{2}'.format(base, module, repr(variables)))
 
@@ -1308,14 +1555,8 @@ class Manager(QtCore.QObject):
           @return dict: dictionary of satus variable names and values
         """
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['loaded'][base][module].__class__.__name__
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                variables = config.load(filename)
-            else:
-                variables = OrderedDict()
+            variables = self.statusStore.load('status-{0}_{1}_{2}'.format(classname, base, module))
         except:
             logger.exception('Failed to load status variables.')
             variables = OrderedDict()
@@ -1324,13 +1565,9 @@ class Manager(QtCore.QObject):
     @QtCore.Slot(str, str)
     def removeStatusFile(self, base, module):
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['defined'][base][
                 module]['module.Class'].split('.')[-1]
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                os.remove(filename)
+            self.statusStore.remove('status-{0}_{1}_{2}'.format(classname, base, module))
         except:
             logger.exception('Failed to remove module status file.')
 
@@ -1359,6 +1596,8 @@ class Manager(QtCore.QObject):
     @QtCore.Slot()
     def realQuit(self):
         """ Stop all modules, no questions asked. """
+        if self._rejectDuringActivation('quit'):
+            return
         deps = self.getAllRecursiveModuleDependencies(self.tree['loaded'])
         sorteddeps = toposort(deps)
         for b, mods in self.tree['loaded'].items():
@@ -1378,11 +1617,14 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        self.statusStore.wait()
         self.sigManagerQuit.emit(self, False)
 
     @QtCore.Slot()
     def restart(self):
         """Nicely request that all modules shut down for application restart."""
+        if self._rejectDuringActivation('restart'):
+            return
         for mbase,bdict in self.tree['loaded'].items():
             for module in bdict:
                 try:
@@ -1392,6 +1634,7 @@ class Manager(QtCore.QObject):
                     logger.exception(
                         'Module {0} failed to stop, continuing anyway.'.format(module))
                 QtCore.QCoreApplication.processEvents()
+        self.statusStore.wait()
         self.sigManagerQuit.emit(self, True)
 
     @QtCore.Slot(object)
@@ -26,6 +26,7 @@ from fysom import Fysom  # provides a final state machine
 from collections import OrderedDict
 from enum import Enum
 from qtpy import QtCore
+from .util.instrumentation import Instrumentation
 
 
 class StatusVar:
@@ -362,13 +363,20 @@ class BaseMixin(metaclass=ModuleMeta):
     * Get name of status variables
     * Get status variables
     * Reload module data (from saved variables)
+    * Instrumentation of hot paths with named spans, counters and histograms
     """
 
     _modclass = 'base'
     _modtype = 'base'
     _threaded = False
+    # Set to True if on_activate may run in a worker thread, i.e. it only blocks on device I/O and
+    # does not create QObjects without parent or depend on the thread it is running in.
+    _concurrent_activation = False
     _connectors = dict()
 
+    # record spans, counters and histograms in self.instrumentation right from the start
+    _instrumentation_enabled = ConfigOption('instrumentation', False)
+
     def __init__(self, manager, name, config=None, callbacks=None, **kwargs):
         """ Initialise Base class object and set up its state machine.
 
@@ -435,6 +443,7 @@ class BaseMixin(metaclass=ModuleMeta):
         self._name = name
         self._configuration = config
         self._statusVariables = OrderedDict()
+        self.instrumentation = Instrumentation(enabled=self._instrumentation_enabled)
 
     def __load_status_vars_activate(self, event):
         """ Restore status variables before activation.
@@ -489,6 +498,13 @@ class BaseMixin(metaclass=ModuleMeta):
         """
         return self._threaded
 
+    @property
+    def is_activation_concurrent(self):
+        """
+        Returns whether the module may be activated in a worker thread.
+        """
+        return self._concurrent_activation
+
     def on_activate(self):
         """ Method called when module is activated. If not overridden
             this method returns an error.
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Run a hardware module in a dedicated worker process.
+
+Drivers built on ctypes/DLL calls hold the GIL while they wait for the device, which stalls the
+GUI and the logic threads of Qudi. A hardware module configured with
+
+    process: True
+
+is loaded in its own Python process instead. Qudi loads a ProcessModule in its place, which
+forwards all method calls and attribute reads to the module in the worker process, so logic
+modules connect to it like to any other hardware module.
+
+The worker process is connected with two local connections (a Unix domain socket or a named
+pipe), one for the control messages and one for the log records. Control messages are small
+pickled tuples. Large numpy arrays in arguments and return values are not pickled, they are
+exchanged through shared memory (see core.util.shared_array) and only the path of the shared
+array is sent.
+
+Limitations: Qt signals of the hosted module are not forwarded and the hosted module has no
+access to the Qudi manager (its _manager is None).
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import traceback
+import numpy as np
+from multiprocessing.connection import Client, Listener
+from qtpy import QtCore
+
+from .module import Base, ConfigOption
+from .util.mutex import Mutex
+from .util.shared_array import SharedArray
+
+_AUTHKEY_VARIABLE = 'QUDI_PROCESS_HOST_AUTHKEY'
+_ADDRESS_PREFIX = b'Module host address: '
+
+
+class ProcessModuleError(Exception):
+    """ Raised if a call to a module in a worker process fails. """
+    pass
+
+
+class _SharedRef:
+    """ Reference to an array in a shared array file, sent instead of the array itself. """
+
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, state):
+        self.path = state
+
+
+class _SharedMemoryPlane:
+    """ Packs large arrays into shared arrays and unpacks references to shared arrays.
+
+    Every argument or return value position gets its own shared array, which is reused as long
+    as the shape and data type of the arrays do not change.
+    """
+
+    def __init__(self, name, threshold):
+        """
+        @param str name: prefix of the names of the shared arrays
+        @param int threshold: arrays of at least this many bytes are sent through shared memory
+        """
+        self.name = name
+        self.threshold = threshold
+        self._writers = dict()
+        self._readers = dict()
+
+    def pack(self, value, key):
+        """ Replace large arrays in a value (or a tuple or list of values) by references.
+
+        @param value: the value to send
+        @param str key: unique key of the position of the value, e.g. the method name
+
+        @return: value to pickle
+        """
+        if isinstance(value, np.ndarray):
+            if value.nbytes < self.threshold or value.dtype.hasobject:
+                return value
+            writer = self._writers.get(key)
+            if writer is None:
+                writer = SharedArray('{0}.{1}'.format(self.name, key),
+                                     shape=value.shape,
+                                     dtype=value.dtype,
+                                     slots=2)
+                self._writers[key] = writer
+            writer.publish(value)
+            return _SharedRef(writer.path)
+        if isinstance(value, (tuple, list)):
+            return type(value)(self.pack(item, '{0}.{1:d}'.format(key, index))
+                               for index, item in enumerate(value))
+        return value
+
+    def unpack(self, value):
+        """ Replace references to shared arrays by copies of the arrays.
+
+        @param value: the received value
+
+        @return: value with arrays
+        """
+        if isinstance(value, _SharedRef):
+            base_path = value.path.rsplit('-', 1)[0]
+            reader = self._readers.get(base_path)
+            if reader is None:
+                reader = SharedArray.attach(value.path)
+                self._readers[base_path] = reader
+            return reader.read()[1]
+        if isinstance(value, (tuple, list)):
+            return type(value)(self.unpack(item) for item in value)
+        return value
+
+    def close(self):
+        """ Remove the shared arrays written by this side. """
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = dict()
+        self._readers = dict()
+
+
+class ProcessModule(Base):
+    """ Stand-in for a hardware module that runs in a worker process.
+
+    The worker process is started on activation and stopped on deactivation. The status
+    variables of the hosted module are kept by this module. Calls from several threads are
+    serialized.
+    """
+    _modclass = 'ProcessModule'
+    _modtype = 'hardware'
+    # starting the worker process only blocks on the process and the device
+    _concurrent_activation = True
+
+    # arrays of at least this many bytes are exchanged through shared memory
+    _shared_memory_threshold = ConfigOption('shared_memory_threshold', 65536)
+    # time in s to wait for the worker process to stop before killing it
+    _process_stop_timeout = ConfigOption('process_stop_timeout', 10)
+
+    def __init__(self, config=None, **kwargs):
+        super().__init__(config=config, **kwargs)
+        self._members = None
+        self._methods = dict()
+        self._call_lock = Mutex()
+        self._process = None
+        self._connection = None
+        self._log_thread = None
+
+    def __getattr__(self, name):
+        # only called for attributes not defined in this object
+        members = self.__dict__.get('_members')
+        if name.startswith('_') or members is None or name not in members:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(
+                self.__class__.__name__, name))
+        if members[name] == 'attribute':
+            return self._request('getattr', name)
+        method = self._methods.get(name)
+        if method is None:
+            def method(*args, **kwargs):
+                return self._request('call', name, args, kwargs)
+            method.__name__ = name
+            self._methods[name] = method
+        return method
+
+    def __setattr__(self, name, value):
+        members = self.__dict__.get('_members')
+        if members is not None and members.get(name) == 'attribute':
+            self._request('setattr', name, value)
+        else:
+            super().__setattr__(name, value)
+
+    def on_activate(self):
+        """ Start the worker process and activate the hosted module in it. """
+        self._data_plane = _SharedMemoryPlane(self._name, self._shared_memory_threshold)
+        authkey = os.urandom(32)
+        env = os.environ.copy()
+        env[_AUTHKEY_VARIABLE] = authkey.hex()
+        qudi_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'core.process_host'],
+            cwd=qudi_dir,
+            env=env,
+            stdout=subprocess.PIPE)
+        # importing Qudi prints to stdout as well, skip these lines
+        address = ''
+        for line in self._process.stdout:
+            if line.startswith(_ADDRESS_PREFIX):
+                address = line[len(_ADDRESS_PREFIX):].decode().strip()
+                break
+        self._process.stdout.close()
+        if not address:
+            raise ProcessModuleError('Worker process of module {0} did not start.'
+                                     ''.format(self._name))
+        self._connection = Client(address, authkey=authkey)
+        log_connection = Client(address, authkey=authkey)
+        self._log_thread = threading.Thread(target=self._forward_log_records,
+                                            args=(log_connection,),
+                                            name='{0}-log'.format(self._name),
+                                            daemon=True)
+        self._log_thread.start()
+
+        self._members = None
+        self._methods = dict()
+        self._members = self._request('activate',
+                                      self._configuration['module.Class'],
+                                      self._name,
+                                      dict(self._configuration),
+                                      dict(self._statusVariables),
+                                      self._shared_memory_threshold)
+        self.module_state.sigStateChanged.connect(self._forward_state_change,
+                                                  QtCore.Qt.DirectConnection)
+        self.log.info('Module {0} running in process {1:d}.'.format(self._name,
+                                                                    self._process.pid))
+
+    def on_deactivate(self):
+        """ Deactivate the hosted module and stop the worker process. """
+        self.module_state.sigStateChanged.disconnect(self._forward_state_change)
+        try:
+            self._statusVariables = self._request('deactivate')
+            self._request('exit')
+        except (ProcessModuleError, OSError, EOFError):
+            self.log.exception('Deactivation of module {0} in its process failed.'
+                               ''.format(self._name))
+        finally:
+            self._members = None
+            self._methods = dict()
+            self._connection.close()
+            try:
+                self._process.wait(timeout=self._process_stop_timeout)
+            except subprocess.TimeoutExpired:
+                self.log.error('Worker process of module {0} did not stop, killing it.'
+                               ''.format(self._name))
+                self._process.kill()
+                self._process.wait()
+            self._log_thread.join(timeout=1)
+            self._data_plane.close()
+
+    @property
+    def process_id(self):
+        """ Process id of the worker process, None if it is not running. """
+        if self._process is None or self._process.poll() is not None:
+            return None
+        return self._process.pid
+
+    def _request(self, command, *args):
+        """ Send a request to the worker process and wait for the answer.
+
+        @param str command: 'activate', 'deactivate', 'call', 'getattr', 'setattr', 'state' or
+                            'exit'
+        @param args: arguments of the command
+
+        @return: answer of the worker process
+        """
+        with self._call_lock:
+            if self._connection is None or self._connection.closed:
+                raise ProcessModuleError('Worker process of module {0} is not running.'
+                                         ''.format(self._name))
+            name = args[0] if command in ('call', 'getattr', 'setattr') else command
+            with self.instrumentation.span(name):
+                if command in ('call', 'setattr'):
+                    args = (name, self._data_plane.pack(args[1], name)) + args[2:]
+                try:
+                    self._connection.send((command,) + tuple(args))
+                    status, value = self._connection.recv()
+                except (OSError, EOFError):
+                    self._connection.close()
+                    raise ProcessModuleError('Connection to the worker process of module {0} '
+                                             'lost.'.format(self._name))
+                if status == 'error':
+                    raise ProcessModuleError('{0} of module {1} failed in the worker process:\n'
+                                             '{2}'.format(name, self._name, value))
+                return self._data_plane.unpack(value)
+
+    def _forward_state_change(self, event):
+        """ Keep the state of the hosted module in line with this module, e.g. if a logic
+        module locks the hardware.
+        """
+        if event.event in ('lock', 'unlock', 'run', 'stop', 'runlock'):
+            try:
+                self._request('state', event.event)
+            except ProcessModuleError:
+                self.log.exception('Unable to forward state change.')
+
+    def _forward_log_records(self, connection):
+        """ Log the records of the worker process as if they were created in this process. """
+        while True:
+            try:
+                record = logging.makeLogRecord(connection.recv())
+            except (OSError, EOFError):
+                break
+            logging.getLogger(record.name).handle(record)
+        connection.close()
+
+
+class _LogSender(logging.Handler):
+    """ Send the log records of the worker process to the Qudi process. """
+
+    def __init__(self, connection):
+        super().__init__()
+        self._connection = connection
+        self._lock = threading.Lock()
+        self._formatter = logging.Formatter()
+
+    def emit(self, record):
+        try:
+            attributes = dict(record.__dict__)
+            attributes['msg'] = record.getMessage()
+            attributes['args'] = None
+            if record.exc_info:
+                attributes['exc_text'] = self._formatter.formatException(record.exc_info)
+            attributes['exc_info'] = None
+            with self._lock:
+                self._connection.send(attributes)
+        except Exception:
+            self.handleError(record)
+
+
+class ModuleHost(QtCore.QObject):
+    """ Serves the requests of a ProcessModule in the worker process.
+
+    Activation and deactivation run in the main thread of the worker process, which runs the Qt
+    event loop, like in Qudi. Method calls run in the thread receiving the requests.
+    """
+
+    _sigRunInMainThread = QtCore.Signal(object)
+
+    def __init__(self, connection):
+        """
+        @param multiprocessing.connection.Connection connection: control connection
+        """
+        super().__init__()
+        self._connection = connection
+        self.module = None
+        self._data_plane = None
+        self._sigRunInMainThread.connect(self._run, QtCore.Qt.BlockingQueuedConnection)
+
+    def serve(self):
+        """ Answer requests until the exit command or until the connection is closed. """
+        while True:
+            try:
+                request = self._connection.recv()
+            except (OSError, EOFError):
+                break
+            command = request[0]
+            try:
+                if command in ('activate', 'deactivate'):
+                    job = {'function': getattr(self, '_' + command), 'args': request[1:]}
+                    self._sigRunInMainThread.emit(job)
+                    if 'error' in job:
+                        raise job['error']
+                    value = job['result']
+                elif command == 'call':
+                    name, args, kwargs = request[1:]
+                    value = getattr(self.module, name)(*self._data_plane.unpack(args), **kwargs)
+                    value = self._data_plane.pack(value, name)
+                elif command == 'getattr':
+                    value = self._data_plane.pack(getattr(self.module, request[1]), request[1])
+                elif command == 'setattr':
+                    setattr(self.module, request[1], self._data_plane.unpack(request[2]))
+                    value = None
+                elif command == 'state':
+                    if self.module.module_state.can(request[1]):
+                        getattr(self.module.module_state, request[1])()
+                    value = None
+                elif command == 'exit':
+                    self._connection.send(('ok', None))
+                    break
+                else:
+                    raise ValueError('Unknown command {0}.'.format(command))
+                reply = ('ok', value)
+            except Exception:
+                reply = ('error', traceback.format_exc())
+            self._connection.send(reply)
+        if self._data_plane is not None:
+            self._data_plane.close()
+        QtCore.QMetaObject.invokeMethod(QtCore.QCoreApplication.instance(), 'quit',
+                                        QtCore.Qt.QueuedConnection)
+
+    def _run(self, job):
+        try:
+            job['result'] = job['function'](*job['args'])
+        except Exception as e:
+            job['error'] = e
+
+    def _activate(self, module_class, name, config, status_variables, threshold):
+        """ Create and activate the hosted module.
+
+        @return dict: kind ('method' or 'attribute') of each public member of the module
+        """
+        module_name, class_name = module_class.rsplit('.', 1)
+        module = importlib.import_module('hardware.{0}'.format(module_name))
+        self.module = getattr(module, class_name)(manager=None, name=name, config=config)
+        self.module._statusVariables = status_variables
+        self._data_plane = _SharedMemoryPlane('{0}.host'.format(name), threshold)
+        if not self.module.module_state.activate():
+            raise ProcessModuleError('Activation of module {0} failed.'.format(name))
+        members = dict()
+        for member in dir(self.module):
+            if member.startswith('_'):
+                continue
+            class_member = getattr(type(self.module), member, None)
+            if isinstance(class_member, property):
+                members[member] = 'attribute'
+            elif isinstance(class_member, QtCore.Signal):
+                continue
+            elif callable(getattr(self.module, member, None)):
+                members[member] = 'method'
+            else:
+                members[member] = 'attribute'
+        # members handled by the ProcessModule itself
+        for member in ('module_state', 'log', 'connectors', 'instrumentation'):
+            members.pop(member, None)
+        return members
+
+    def _deactivate(self):
+        """ Deactivate the hosted module.
+
+        @return dict: status variables of the module
+        """
+        self.module.module_state.deactivate()
+        return dict(self.module._statusVariables)
+
+
+def main():
+    """ Entry point of the worker process. Prints the address to connect to on stdout. """
+    authkey = bytes.fromhex(os.environ[_AUTHKEY_VARIABLE])
+    app = QtCore.QCoreApplication(sys.argv)
+    listener = Listener(authkey=authkey)
+    print(_ADDRESS_PREFIX.decode() + listener.address, flush=True)
+    # Further output goes to stderr, nobody reads stdout after the address
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    connection = listener.accept()
+    log_connection = listener.accept()
+    listener.close()
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(_LogSender(log_connection))
+
+    host = ModuleHost(connection)
+    thread = threading.Thread(target=host.serve, name='module-host')
+    thread.start()
+    app.exec_()
+    thread.join()
+    log_connection.close()
+
+
+if __name__ == '__main__':
+    # Run main of the imported module instead of __main__. Objects like _SharedRef then pickle
+    # as core.process_host._SharedRef, which the manager process can unpickle.
+    importlib.import_module('core.process_host').main()
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi status variable store.
+
+The status variables of a module are kept in two files inside the application status directory:
+  - <name>.status: YAML file containing all status variables. numpy arrays are replaced by
+                   references to the array container.
+  - <name>-<generation>.arrays: binary container holding the raw data of all numpy arrays.
+                                Arrays are identified by a content hash, so arrays that did not
+                                change are not written again. Arrays are memory mapped on load,
+                                so their data is only read from disk when it is accessed.
+
+Status variables saved by older versions of Qudi in <name>.cfg files are loaded transparently
+and migrated to the new format the next time the status variables are saved.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import glob
+import hashlib
+import numpy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+from .util.mutex import Mutex
+
+
+class StatusStore:
+    """ Stores and restores module status variables in the application status directory.
+
+    Saving is done asynchronously in a single worker thread. Loading the status variables of a
+    module waits for a pending save of the same module to finish.
+    """
+    # key of the mapping replacing a numpy array in the YAML file
+    array_key = '__status_array__'
+    # byte alignment of the arrays inside the container
+    alignment = 64
+    # minimum number of unused bytes in a container before it gets compacted
+    compaction_threshold = 1 << 20
+
+    def __init__(self, status_dir):
+        """
+        @param str status_dir: path of the application status directory
+        """
+        self.status_dir = status_dir
+        self._lock = Mutex()
+        self._pending = dict()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def save(self, name, variables):
+        """ Save the status variables of a module in the background.
+
+        @param str name: file name (without extension) of the status variables
+        @param dict variables: status variable names and values
+
+        @return concurrent.futures.Future: future of the write operation
+        """
+        variables = OrderedDict(variables)
+        with self._lock:
+            future = self._executor.submit(self._write, name, variables)
+            self._pending[name] = future
+        future.add_done_callback(lambda f: self._write_done(name, f))
+        return future
+
+    def load(self, name):
+        """ Load the status variables of a module.
+
+        numpy arrays are memory mapped copy-on-write, i.e. they can be altered in memory without
+        altering the stored data.
+
+        @param str name: file name (without extension) of the status variables
+
+        @return OrderedDict: status variable names and values
+        """
+        self.wait(name)
+        status_file = self._status_file(name)
+        legacy_file = self._legacy_file(name)
+        if os.path.isfile(status_file):
+            stored = config.load(status_file)
+            container = os.path.join(self.status_dir, stored.get('container', ''))
+            arrays = stored.get('arrays', OrderedDict())
+            return self._decode(stored.get('variables', OrderedDict()), container, arrays)
+        elif os.path.isfile(legacy_file):
+            return config.load(legacy_file)
+        return OrderedDict()
+
+    def remove(self, name):
+        """ Remove all files holding status variables of a module.
+
+        @param str name: file name (without extension) of the status variables
+        """
+        self.wait(name)
+        for path in [self._status_file(name), self._legacy_file(name)] + self._containers(name):
+            if os.path.isfile(path):
+                os.remove(path)
+        for path in self._legacy_array_files(name):
+            os.remove(path)
+
+    def wait(self, name=None):
+        """ Wait until pending save operations have finished.
+
+        @param str name: optional, only wait for the status variables of this module
+        """
+        with self._lock:
+            if name is None:
+                futures = list(self._pending.values())
+            else:
+                futures = [self._pending[name]] if name in self._pending else list()
+        for future in futures:
+            future.exception()
+
+    def _write_done(self, name, future):
+        with self._lock:
+            if self._pending.get(name) is future:
+                del self._pending[name]
+        if future.exception() is not None:
+            logger.error('Failed to save status variables "{0}".'.format(name),
+                         exc_info=future.exception())
+
+    def _status_file(self, name):
+        return os.path.join(self.status_dir, '{0}.status'.format(name))
+
+    def _legacy_file(self, name):
+        return os.path.join(self.status_dir, '{0}.cfg'.format(name))
+
+    def _legacy_array_files(self, name):
+        return glob.glob(os.path.join(glob.escape(self.status_dir),
+                                      '{0}-[0-9][0-9][0-9][0-9][0-9][0-9].npz'.format(
+                                          glob.escape(name))))
+
+    def _containers(self, name):
+        return glob.glob(os.path.join(glob.escape(self.status_dir),
+                                      '{0}-*.arrays'.format(glob.escape(name))))
+
+    @classmethod
+    def _is_stored_array(cls, value):
+        return (isinstance(value, numpy.ndarray) and value.dtype.fields is None
+                and not value.dtype.hasobject)
+
+    @staticmethod
+    def _hash(array):
+        array_hash = hashlib.sha1()
+        array_hash.update('{0}{1}'.format(array.dtype.str, array.shape).encode())
+        array_hash.update(array.data)
+        return array_hash.hexdigest()
+
+    def _encode(self, value, arrays):
+        """ Replace all numpy arrays by references and collect them in the arrays dict. """
+        if self._is_stored_array(value):
+            array = numpy.require(value, requirements='C')
+            array_hash = self._hash(array)
+            arrays[array_hash] = array
+            return OrderedDict([(self.array_key, array_hash)])
+        elif isinstance(value, dict):
+            return type(value)((key, self._encode(val, arrays)) for key, val in value.items())
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self._encode(val, arrays) for val in value)
+        return value
+
+    def _decode(self, value, container, arrays):
+        """ Replace all array references by memory mapped arrays. """
+        if isinstance(value, dict):
+            if len(value) == 1 and self.array_key in value:
+                info = arrays[value[self.array_key]]
+                if info['nbytes'] == 0:
+                    return numpy.empty(tuple(info['shape']), dtype=numpy.dtype(info['dtype']))
+                return numpy.asarray(numpy.memmap(container,
+                                                  dtype=numpy.dtype(info['dtype']),
+                                                  mode='c',
+                                                  offset=info['offset'],
+                                                  shape=tuple(info['shape'])))
+            return type(value)((key, self._decode(val, container, arrays))
+                               for key, val in value.items())
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self._decode(val, container, arrays) for val in value)
+        return value
+
+    def _write(self, name, variables):
+        """ Write the status variables of a module. Runs in the worker thread. """
+        status_file = self._status_file(name)
+        old_container = None
+        old_arrays = OrderedDict()
+        if os.path.isfile(status_file):
+            stored = config.load(status_file)
+            if stored.get('container'):
+                old_container = os.path.join(self.status_dir, stored['container'])
+                old_arrays = stored.get('arrays', OrderedDict())
+            if not os.path.isfile(old_container if old_container else ''):
+                old_container = None
+                old_arrays = OrderedDict()
+
+        new_arrays = OrderedDict()
+        encoded = self._encode(variables, new_arrays)
+
+        # Decide whether to append to the existing container or to write a compacted one
+        kept = OrderedDict((h, old_arrays[h]) for h in new_arrays if h in old_arrays)
+        if old_container is not None:
+            kept_bytes = sum(info['nbytes'] for info in kept.values())
+            unused_bytes = os.path.getsize(old_container) - kept_bytes
+            compact = unused_bytes > max(kept_bytes, self.compaction_threshold)
+            generation = int(old_container.rsplit('-', 1)[-1].split('.')[0])
+        else:
+            compact = True
+            generation = -1
+
+        if compact:
+            container = os.path.join(self.status_dir,
+                                     '{0}-{1:d}.arrays'.format(name, generation + 1))
+            to_write = new_arrays
+            array_info = OrderedDict()
+            mode = 'wb'
+        else:
+            container = old_container
+            to_write = OrderedDict((h, a) for h, a in new_arrays.items() if h not in kept)
+            array_info = kept
+            mode = 'r+b'
+
+        with open(container, mode) as file:
+            file.seek(0, os.SEEK_END)
+            for array_hash, array in to_write.items():
+                offset = -(-file.tell() // self.alignment) * self.alignment
+                file.write(b'\0' * (offset - file.tell()))
+                file.write(array.data)
+                array_info[array_hash] = OrderedDict([('offset', offset),
+                                                      ('dtype', array.dtype.str),
+                                                      ('shape', list(array.shape)),
+                                                      ('nbytes', array.nbytes)])
+            file.flush()
+            os.fsync(file.fileno())
+
+        stored = OrderedDict()
+        stored['container'] = os.path.basename(container)
+        stored['arrays'] = array_info
+        stored['variables'] = encoded
+        tmp_file = status_file + '.tmp'
+        config.save(tmp_file, stored)
+        os.replace(tmp_file, status_file)
+
+        # Remove outdated containers and migrated legacy files. Removing a container might fail
+        # while it is still memory mapped, in which case it is removed on a later save.
+        obsolete = [path for path in self._containers(name)
+                    if os.path.basename(path) != stored['container']]
+        obsolete.extend(self._legacy_array_files(name))
+        if os.path.isfile(self._legacy_file(name)):
+            obsolete.append(self._legacy_file(name))
+        for path in obsolete:
+            try:
+                os.remove(path)
+            except OSError:
+                logger.debug('Unable to remove outdated status file "{0}".'.format(path))
+        return
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Signal wrapper that coalesces updates which are emitted faster than they are handled.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import math
+import time
+from qtpy import QtCore
+from .mutex import Mutex
+
+
+class CoalescingSignal(QtCore.QObject):
+    """ Emits a signal in the GUI thread with only the latest of all pending updates.
+
+    A measurement loop calls emit for every step. The wrapped signal is emitted from the thread of
+    the application (the GUI thread), so slots of GUI objects connected with the default
+    connection type run directly. A new update is only scheduled once the previous one has been
+    handled. Updates emitted in the meantime replace each other, so no events pile up in the
+    event queue of a slow GUI. Optionally the rate of the updates is limited.
+
+    The latest update is always delivered, no matter how many were coalesced before.
+    """
+
+    _sigDeliver = QtCore.Signal()
+
+    def __init__(self, signal, max_rate=None, name='', instrumentation=None):
+        """
+        @param QtCore.SignalInstance signal: bound signal to emit
+        @param float max_rate: optional, maximum number of updates per second
+        @param str name: name of the signal used for the instrumentation counters
+        @param core.util.instrumentation.Instrumentation instrumentation: optional, counts the
+                                                                          delivered and coalesced
+                                                                          updates
+        """
+        super().__init__()
+        self._signal = signal
+        self.name = name
+        self._instrumentation = instrumentation
+        self._lock = Mutex()
+        self._args = None
+        self._pending = False
+        self._last_delivery = -math.inf
+        self.set_max_rate(max_rate)
+        self.reset_statistics()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._deliver)
+        self._sigDeliver.connect(self._deliver, QtCore.Qt.QueuedConnection)
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            self.moveToThread(app.thread())
+
+    @property
+    def max_rate(self):
+        """ Maximum number of updates per second, None if unlimited. """
+        return 1 / self._min_interval if self._min_interval > 0 else None
+
+    def set_max_rate(self, max_rate):
+        """ Limit the rate of the updates.
+
+        @param float max_rate: maximum number of updates per second, None or 0 for unlimited
+        """
+        self._min_interval = 1 / max_rate if max_rate else 0.
+
+    def reset_statistics(self):
+        """ Reset the counters of requested, delivered and coalesced updates. """
+        self.requested = 0
+        self.delivered = 0
+        self.coalesced = 0
+
+    def get_statistics(self):
+        """ Return the counters of the updates.
+
+        @return dict: number of requested, delivered and coalesced (i.e. dropped) updates
+        """
+        return {'requested': self.requested,
+                'delivered': self.delivered,
+                'coalesced': self.coalesced}
+
+    def emit(self, *args):
+        """ Request an update. Can be called from any thread.
+
+        @param args: arguments of the wrapped signal. Replace the ones of a pending update.
+        """
+        with self._lock:
+            self.requested += 1
+            if self._args is not None:
+                self.coalesced += 1
+                if self._instrumentation is not None:
+                    self._instrumentation.count('coalesced {0}'.format(self.name))
+            self._args = args
+            if self._pending:
+                return
+            self._pending = True
+        self._sigDeliver.emit()
+
+    def _deliver(self):
+        """ Emit the wrapped signal with the latest arguments. Runs in the application thread. """
+        wait = self._last_delivery + self._min_interval - time.perf_counter()
+        if wait > 0:
+            self._timer.start(int(math.ceil(wait * 1000)))
+            return
+
+        with self._lock:
+            args = self._args
+            self._args = None
+        if args is not None:
+            self._last_delivery = time.perf_counter()
+            self._signal.emit(*args)
+            self.delivered += 1
+            if self._instrumentation is not None:
+                self._instrumentation.count('delivered {0}'.format(self.name))
+
+        # Schedule the next delivery through the event queue, so other events are handled first
+        with self._lock:
+            if self._args is None:
+                self._pending = False
+                return
+        self._sigDeliver.emit()
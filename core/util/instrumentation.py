@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight instrumentation of the hot paths of Qudi modules.
+
+Every module owns an Instrumentation object. Measurement loops record named spans (time spent in
+a block of code), counters and histograms of arbitrary values:
+
+    with self.instrumentation.span('hardware read'):
+        data = self._counting_device.get_counter()
+    self.instrumentation.count('samples', len(data))
+    self.instrumentation.observe('queue length', len(self._queue))
+
+While the instrumentation is disabled, span returns a shared do-nothing context manager and the
+other methods return right away, so the instrumented code runs at practically full speed.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class Metric:
+    """ Aggregated statistics of a span, a counter or a histogram.
+
+    Values are sorted into logarithmic bins with bins_per_decade bins per decade, which is enough
+    to estimate percentiles without keeping every value.
+    """
+    bins_per_decade = 8
+
+    def __init__(self, kind):
+        """
+        @param str kind: 'span', 'counter' or 'histogram'
+        """
+        self.kind = kind
+        self.reset()
+
+    def reset(self):
+        """ Remove all recorded values. """
+        self.count = 0
+        self.total = 0.
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = math.nan
+        self.bins = dict()
+
+    def add(self, value):
+        """ Record a value.
+
+        @param float value: the value, e.g. the duration of a span in s
+        """
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value > 0:
+            index = math.floor(math.log10(value) * self.bins_per_decade)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        else:
+            self.bins[None] = self.bins.get(None, 0) + 1
+
+    def percentile(self, percent):
+        """ Estimate a percentile of the recorded values from the histogram bins.
+
+        @param float percent: percentile in %
+
+        @return float: upper edge of the bin containing the percentile, NaN without values
+        """
+        if self.count == 0:
+            return math.nan
+        target = percent / 100 * self.count
+        seen = self.bins.get(None, 0)
+        if seen >= target:
+            return min(0., self.max)
+        for index in sorted(key for key in self.bins if key is not None):
+            seen += self.bins[index]
+            if seen >= target:
+                return min(10 ** ((index + 1) / self.bins_per_decade), self.max)
+        return self.max
+
+    def summary(self):
+        """ Return the statistics of the metric.
+
+        @return OrderedDict: kind, count, total, mean, min, max, last, p50 and p99
+        """
+        summary = OrderedDict()
+        summary['kind'] = self.kind
+        summary['count'] = self.count
+        summary['total'] = self.total
+        summary['mean'] = self.total / self.count if self.count else math.nan
+        summary['min'] = self.min if self.count else math.nan
+        summary['max'] = self.max if self.count else math.nan
+        summary['last'] = self.last
+        summary['p50'] = self.percentile(50)
+        summary['p99'] = self.percentile(99)
+        return summary
+
+
+class _Span:
+    """ Context manager measuring the time spent in a block of code. """
+
+    __slots__ = ('_instrumentation', '_name', '_start')
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._instrumentation._record('span', self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullSpan:
+    """ Context manager doing nothing, used while the instrumentation is disabled. """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class Instrumentation:
+    """ Named spans, counters and histograms of a single module. """
+
+    def __init__(self, enabled=False):
+        """
+        @param bool enabled: record values right from the start
+        """
+        self.enabled = bool(enabled)
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """ Measure the time spent in a with block.
+
+        @param str name: name of the span
+
+        @return: context manager
+        """
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name)
+
+    def count(self, name, increment=1):
+        """ Increase a counter.
+
+        @param str name: name of the counter
+        @param int increment: value added to the counter
+        """
+        if self.enabled:
+            self._record('counter', name, increment)
+
+    def observe(self, name, value):
+        """ Record a value in a histogram.
+
+        @param str name: name of the histogram
+        @param float value: the value
+        """
+        if self.enabled:
+            self._record('histogram', name, value)
+
+    def snapshot(self):
+        """ Return the statistics of all metrics.
+
+        @return OrderedDict: summary of each metric by name, see Metric.summary
+        """
+        with self._lock:
+            return OrderedDict((name, metric.summary()) for name, metric in self._metrics.items())
+
+    def reset(self):
+        """ Remove all metrics. """
+        with self._lock:
+            self._metrics = OrderedDict()
+
+    def _record(self, kind, name, value):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Metric(kind)
+                self._metrics[name] = metric
+            metric.add(value)
+
+
+def collect(modules):
+    """ Collect the statistics of the instrumentation of several modules.
+
+    @param dict modules: modules by name
+
+    @return OrderedDict: snapshot of the instrumentation of each module with at least one metric
+    """
+    snapshots = OrderedDict()
+    for name, module in sorted(modules.items()):
+        instrumentation = getattr(module, 'instrumentation', None)
+        if instrumentation is None:
+            continue
+        snapshot = instrumentation.snapshot()
+        if snapshot:
+            snapshots[name] = snapshot
+    return snapshots
+
+
+def export(file_path, snapshots):
+    """ Write collected statistics to a tab separated text file.
+
+    @param str file_path: path of the file to write
+    @param dict snapshots: statistics as returned by collect
+
+    @return int: error code (0:OK, -1:error)
+    """
+    columns = ('kind', 'count', 'total', 'mean', 'min', 'max', 'last', 'p50', 'p99')
+    try:
+        with open(file_path, 'w') as file:
+            file.write('# Instrumentation of Qudi modules, {0}\n'.format(
+                time.strftime('%Y-%m-%d %H:%M:%S')))
+            file.write('# Times of spans are in s.\n')
+            file.write('\t'.join(('module', 'metric') + columns) + '\n')
+            for module_name, snapshot in snapshots.items():
+                for metric_name, summary in snapshot.items():
+                    values = [module_name, metric_name]
+                    values.extend(summary[column] if column == 'kind'
+                                  else '{0:.6g}'.format(summary[column]) for column in columns)
+                    file.write('\t'.join(values) + '\n')
+    except OSError:
+        logger.exception('Could not export instrumentation to {0}.'.format(file_path))
+        return -1
+    return 0
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Ring buffer for the history of a few scalar channels that can be streamed to disk.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .mutex import Mutex
+
+
+class RingHistory:
+    """ History of a number of channels with a fixed length.
+
+    Every sample is written twice into a buffer of twice the history length. The history in
+    chronological order is therefore always available as a contiguous view without copying or
+    rolling the data.
+
+    The samples can additionally be streamed to a text file. They are written in chunks by a
+    background thread, so appending a sample never waits for the disk.
+    """
+
+    def __init__(self, channels, length):
+        """
+        @param int channels: number of channels
+        @param int length: number of samples kept per channel
+        """
+        self.channels = int(channels)
+        self.length = max(int(length), 1)
+        self._buffer = np.zeros([self.channels, 2 * self.length])
+        self.count = 0
+        self._lock = Mutex()
+        self._stream_file = None
+        self._stream_start = 0
+        self._chunk_size = 1
+        self._executor = None
+
+    @property
+    def history(self):
+        """ View of the history in format [channel][sample], the newest sample is the last one.
+
+        Samples before the first appended one are zero.
+        """
+        start = self.count % self.length
+        return self._buffer[:, start:start + self.length]
+
+    def append(self, values):
+        """ Append one sample of every channel.
+
+        @param list values: value of each channel
+        """
+        index = self.count % self.length
+        self._buffer[:, index] = values
+        self._buffer[:, index + self.length] = values
+        self.count += 1
+        if self._stream_file is not None and self.count - self._stream_start >= self._chunk_size:
+            with self._lock:
+                if self._stream_file is not None:
+                    self._write_chunk()
+
+    def clear(self, length=None):
+        """ Remove all samples and optionally change the history length.
+
+        @param int length: optional, new number of samples kept per channel
+        """
+        with self._lock:
+            if length is not None:
+                self.length = max(int(length), 1)
+            self._buffer = np.zeros([self.channels, 2 * self.length])
+            self.count = 0
+            self._stream_start = 0
+
+    def read(self, first_sample, last_sample=None):
+        """ Return a copy of all samples appended since a sample number.
+
+        @param int first_sample: number of the first sample to return
+        @param int last_sample: optional, number of the sample after the last one to return.
+                                Defaults to all samples appended so far.
+
+        @return numpy.ndarray: samples in format [channel][sample]. Samples older than the
+                               history length are not available anymore and are skipped.
+        """
+        count = self.count if last_sample is None else min(last_sample, self.count)
+        first_sample = max(first_sample, count - self.length)
+        indices = np.arange(first_sample, count) % self.length
+        return self._buffer[:, indices]
+
+    @property
+    def streaming(self):
+        """ True while the samples are streamed to a file. """
+        return self._stream_file is not None
+
+    def start_stream(self, file_path, header='', chunk_size=100):
+        """ Start writing all appended samples to a text file.
+
+        @param str file_path: path of the file to write
+        @param str header: header written at the start of the file
+        @param int chunk_size: number of samples written at once. Is limited to half the
+                               history length, so no sample is overwritten before it is written.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        with self._lock:
+            if self._stream_file is not None:
+                logger.error('History is already streamed to {0}.'.format(self._stream_file.name))
+                return -1
+            try:
+                stream_file = open(file_path, 'w')
+                if header:
+                    stream_file.write(''.join('# {0}\n'.format(line)
+                                              for line in header.splitlines()))
+            except OSError:
+                logger.exception('Could not open file {0}.'.format(file_path))
+                return -1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._chunk_size = min(max(int(chunk_size), 1), max(self.length // 2, 1))
+            self._stream_start = self.count
+            self._stream_file = stream_file
+        return 0
+
+    def stop_stream(self):
+        """ Write the remaining samples and close the stream file.
+
+        @return str: path of the written file or None if no stream was running
+        """
+        with self._lock:
+            if self._stream_file is None:
+                return None
+            self._write_chunk()
+            stream_file = self._stream_file
+            self._stream_file = None
+            self._executor.submit(stream_file.close).result()
+        return stream_file.name
+
+    def _write_chunk(self):
+        """ Hand the samples appended since the last chunk to the background writer. """
+        samples = self.read(self._stream_start)
+        lost = self.count - self._stream_start - samples.shape[1]
+        self._stream_start = self.count
+        if lost > 0:
+            logger.warning('{0:d} samples could not be streamed to file.'.format(lost))
+        if samples.shape[1] > 0:
+            self._executor.submit(self._write_samples, self._stream_file, samples)
+
+    @staticmethod
+    def _write_samples(stream_file, samples):
+        try:
+            np.savetxt(stream_file, samples.T, delimiter='\t')
+        except (OSError, ValueError):
+            logger.exception('Could not write history to file {0}.'.format(stream_file.name))
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned shared memory buffer to hand large measurement arrays from a logic module to its
+readers, e.g. GUI modules or other processes.
+
+The writer publishes complete arrays. Readers get consistent snapshots of the latest published
+array. The memory is a memory mapped file, preferably in a RAM backed file system, so readers in
+other processes can map the same memory instead of receiving a pickled copy of the array.
+
+Layout of the memory mapped file:
+  - header: HEADER_FIELDS int64 values, the dtype string and the shape of the array
+  - slot table: sequence number and published version of each slot
+  - slots: the data of the array, one copy per slot, 64 byte aligned
+
+A slot is written with a sequence lock: its sequence number is odd while it is written. The
+writer never writes into the slot of the latest version, so the latest version is always
+complete.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import mmap
+import os
+import re
+import tempfile
+import weakref
+import numpy as np
+from .mutex import Mutex
+
+# header fields
+_MAGIC, _SLOTS, _LATEST_SLOT, _LATEST_VERSION, _SUPERSEDED, _NDIM = range(6)
+HEADER_FIELDS = 8
+MAX_DIMENSIONS = 8
+MAGIC = 0x71756469534841  # 'qudiSHA'
+_DTYPE_LENGTH = 32
+_ALIGNMENT = 64
+
+
+def default_directory():
+    """ Directory of the shared memory files. A RAM backed file system is used if available.
+
+    @return str: path of the directory
+    """
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    directory = os.path.join(base, 'qudi')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # On Windows the file can not be removed while it is still mapped by a reader
+        logger.debug('Unable to remove shared memory file {0}.'.format(path))
+
+
+class SharedArray:
+    """ Versioned shared memory buffer of a numpy array with a single writer.
+
+    Readers in the same process use a SharedArrayReader (see reader()), which pins the slot of its
+    snapshot so the writer does not overwrite it. Readers in other processes attach to the file
+    with SharedArray.attach(path) and use read(), which copies the array from the shared memory
+    and retries if the slot was overwritten meanwhile.
+
+    If an array with a different shape or dtype is published, a new file is created and the old
+    one is marked as superseded. Attached readers follow to the new file automatically.
+    """
+
+    def __init__(self, name, shape=(0,), dtype=float, slots=3, directory=None):
+        """ Create a new shared array. The creating object is the writer.
+
+        @param str name: name of the array, used for the file name
+        @param tuple shape: initial shape of the array
+        @param dtype: initial numpy data type of the array
+        @param int slots: number of copies of the array. One more than the number of readers
+                          in this process holding a snapshot at the same time is sufficient.
+        @param str directory: optional, directory of the file
+        """
+        if directory is None:
+            directory = default_directory()
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        self._base_path = os.path.join(directory, '{0}-{1:d}'.format(safe_name, os.getpid()))
+        self._writable = True
+        self._lock = Mutex()
+        self._generation = -1
+        self._slot_count = max(int(slots), 2)
+        self._pins = [0] * self._slot_count
+        self._finalizers = list()
+        self._map(self._create(np.dtype(dtype), tuple(shape)))
+
+    @classmethod
+    def attach(cls, path):
+        """ Attach to a shared array created by a writer, e.g. in another process.
+
+        @param str path: path of the shared memory file, see the path attribute of the writer
+
+        @return SharedArray: read only shared array
+        """
+        shared_array = cls.__new__(cls)
+        shared_array._base_path = path.rsplit('-', 1)[0]
+        shared_array._writable = False
+        shared_array._lock = Mutex()
+        shared_array._generation = int(path.rsplit('-', 1)[1].split('.')[0])
+        shared_array._finalizers = list()
+        shared_array._map(path)
+        shared_array._slot_count = int(shared_array._header[_SLOTS])
+        shared_array._pins = [0] * shared_array._slot_count
+        return shared_array
+
+    @property
+    def path(self):
+        """ Path of the shared memory file. Readers in other processes attach to this path. """
+        return '{0}-{1:d}.shm'.format(self._base_path, self._generation)
+
+    @property
+    def version(self):
+        """ Version of the latest published array, 0 if nothing has been published yet. """
+        return int(self._header[_LATEST_VERSION])
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    def publish(self, array):
+        """ Publish a new version of the array. The array is copied into the shared memory.
+
+        @param numpy.ndarray array: the new array
+
+        @return int: version of the published array
+        """
+        if not self._writable:
+            raise RuntimeError('Attached shared array {0} is read only.'.format(self.path))
+        array = np.asarray(array)
+        with self._lock:
+            if array.shape != self._shape or array.dtype != self._dtype:
+                self._reallocate(array.dtype, array.shape)
+            latest = int(self._header[_LATEST_SLOT])
+            free = [slot for slot in range(self._slot_count)
+                    if slot != latest and self._pins[slot] == 0]
+            if not free:
+                logger.warning('All slots of shared array {0} are pinned by readers, overwriting '
+                               'the oldest one.'.format(self.path))
+                free = [slot for slot in range(self._slot_count) if slot != latest]
+            slot = min(free, key=lambda s: self._slot_versions[s])
+            version = self.version + 1
+
+            self._sequences[slot] += 1
+            self._slots[slot][...] = array
+            self._slot_versions[slot] = version
+            self._sequences[slot] += 1
+            self._header[_LATEST_SLOT] = slot
+            self._header[_LATEST_VERSION] = version
+        return version
+
+    def read(self):
+        """ Return a consistent copy of the latest published array.
+
+        @return (int, numpy.ndarray): version and copy of the array
+        """
+        while True:
+            self._follow()
+            slot = int(self._header[_LATEST_SLOT])
+            sequence = int(self._sequences[slot])
+            if sequence % 2:
+                continue
+            version = int(self._slot_versions[slot])
+            data = self._slots[slot].copy()
+            if int(self._sequences[slot]) == sequence and not self._header[_SUPERSEDED]:
+                return version, data
+
+    def reader(self):
+        """ Create a reader getting snapshots without copying. Only for readers in the process
+        of the writer.
+
+        @return SharedArrayReader: the reader
+        """
+        return SharedArrayReader(self)
+
+    def close(self):
+        """ Remove the shared memory files. Only the writer removes files. Snapshots that are
+        still referenced stay valid.
+        """
+        for finalizer in self._finalizers:
+            finalizer()
+        self._finalizers = list()
+
+    def _create(self, dtype, shape):
+        """ Create the file of the next generation and return its path. """
+        if len(shape) > MAX_DIMENSIONS:
+            raise ValueError('Shared arrays can have at most {0:d} dimensions.'
+                             ''.format(MAX_DIMENSIONS))
+        dtype_str = dtype.str.encode()
+        if dtype.hasobject or len(dtype_str) > _DTYPE_LENGTH:
+            raise ValueError('Data type {0} can not be shared.'.format(dtype))
+        self._generation += 1
+        path = self.path
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        slot_size = -(-max(nbytes, 1) // _ALIGNMENT) * _ALIGNMENT
+        data_offset = self._data_offset(self._slot_count)
+        header = np.zeros(HEADER_FIELDS + MAX_DIMENSIONS, dtype=np.int64)
+        header[_MAGIC] = MAGIC
+        header[_SLOTS] = self._slot_count
+        header[_NDIM] = len(shape)
+        header[HEADER_FIELDS:HEADER_FIELDS + len(shape)] = shape
+        with open(path, 'wb') as file:
+            file.write(header.tobytes())
+            file.write(dtype_str.ljust(_DTYPE_LENGTH, b'\0'))
+            file.truncate(data_offset + self._slot_count * slot_size)
+        self._finalizers.append(weakref.finalize(self, _remove_file, path))
+        return path
+
+    @staticmethod
+    def _data_offset(slot_count):
+        table_end = (HEADER_FIELDS + MAX_DIMENSIONS) * 8 + _DTYPE_LENGTH + 2 * slot_count * 8
+        return -(-table_end // _ALIGNMENT) * _ALIGNMENT
+
+    def _map(self, path):
+        """ Map a shared memory file and create the views of the header, slot table and slots. """
+        with open(path, 'r+b' if self._writable else 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0,
+                                   access=mmap.ACCESS_WRITE if self._writable else mmap.ACCESS_READ)
+        buffer = self._mmap
+        header = np.frombuffer(buffer, dtype=np.int64, count=HEADER_FIELDS + MAX_DIMENSIONS)
+        if header[_MAGIC] != MAGIC:
+            raise ValueError('{0} is not a shared array file.'.format(path))
+        slot_count = int(header[_SLOTS])
+        dtype_offset = header.nbytes
+        dtype = np.dtype(bytes(buffer[dtype_offset:dtype_offset + _DTYPE_LENGTH])
+                         .rstrip(b'\0').decode())
+        shape = tuple(int(n) for n in header[HEADER_FIELDS:HEADER_FIELDS + header[_NDIM]])
+        table = np.frombuffer(buffer, dtype=np.int64, count=2 * slot_count,
+                              offset=dtype_offset + _DTYPE_LENGTH)
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        slot_size = -(-max(nbytes, 1) // _ALIGNMENT) * _ALIGNMENT
+        data_offset = self._data_offset(slot_count)
+        slots = list()
+        for slot in range(slot_count):
+            data = np.frombuffer(buffer, dtype=dtype, count=nbytes // dtype.itemsize,
+                                 offset=data_offset + slot * slot_size)
+            slots.append(data.reshape(shape))
+
+        self._header = header[:HEADER_FIELDS]
+        self._sequences = table[:slot_count]
+        self._slot_versions = table[slot_count:]
+        self._slots = slots
+        self._shape = shape
+        self._dtype = dtype
+
+    def _reallocate(self, dtype, shape):
+        """ Move the writer to a new file for an array of a different shape or data type. """
+        version = self.version
+        old_header = self._header
+        self._map(self._create(np.dtype(dtype), tuple(shape)))
+        self._header[_LATEST_VERSION] = version
+        self._header[_LATEST_SLOT] = 0
+        self._pins = [0] * self._slot_count
+        old_header[_SUPERSEDED] = self._generation
+        # Remove the old file. Snapshots of it stay valid as long as they are referenced.
+        for finalizer in self._finalizers[:-1]:
+            finalizer()
+        self._finalizers = self._finalizers[-1:]
+
+    def _follow(self):
+        """ Attach to the newest file if the writer has moved to a new one. """
+        if self._writable:
+            return
+        while self._header[_SUPERSEDED]:
+            self._generation = int(self._header[_SUPERSEDED])
+            self._map(self.path)
+            self._pins = [0] * int(self._header[_SLOTS])
+
+
+class SharedArrayReader:
+    """ Reader of a SharedArray in the process of the writer.
+
+    The reader holds at most one snapshot. Its slot is pinned until the next snapshot is taken or
+    the reader is released, so the snapshot can be used, e.g. displayed, without copying it.
+    """
+
+    def __init__(self, shared_array):
+        """
+        @param SharedArray shared_array: the shared array to read
+        """
+        self._shared_array = shared_array
+        self._pinned = None
+        self.version = 0
+
+    def latest(self):
+        """ Return a snapshot of the latest published array. It stays valid until the next call
+        or release().
+
+        @return (int, numpy.ndarray): version and read only view of the array
+        """
+        shared_array = self._shared_array
+        with shared_array._lock:
+            self._release()
+            slot = int(shared_array._header[_LATEST_SLOT])
+            shared_array._pins[slot] += 1
+            self._pinned = (shared_array._pins, slot)
+            self.version = int(shared_array._slot_versions[slot])
+            view = shared_array._slots[slot].view()
+        view.flags.writeable = False
+        return self.version, view
+
+    def release(self):
+        """ Release the current snapshot. """
+        with self._shared_array._lock:
+            self._release()
+
+    def _release(self):
+        if self._pinned is not None:
+            pins, slot = self._pinned
+            pins[slot] -= 1
+            self._pinned = None
@@ -250,6 +250,10 @@ class ConfocalGui(GUIBase):
         self.depth_channel = 0
         self.opt_channel = 0
 
+        # Snapshots of the counts of the images, pinned until the next refresh
+        self._xy_counts_reader = self._scanning_logic.xy_counts_buffer.reader()
+        self._depth_counts_reader = self._scanning_logic.depth_counts_buffer.reader()
+
         # Get the image for the display from the logic
         raw_data_xy = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
         raw_data_depth = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
@@ -781,6 +785,8 @@ class ConfocalGui(GUIBase):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._xy_counts_reader.release()
+        self._depth_counts_reader.release()
         self._mw.close()
         return 0
 
@@ -1569,7 +1575,7 @@ class ConfocalGui(GUIBase):
         """
         self.xy_image.getViewBox().updateAutoRange()
 
-        xy_image_data = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
+        xy_image_data = self._xy_counts_reader.latest()[1][:, :, self.xy_channel]
 
         cb_range = self.get_xy_cb_range()
 
@@ -1590,7 +1596,7 @@ class ConfocalGui(GUIBase):
 
         self.depth_image.getViewBox().enableAutoRange()
 
-        depth_image_data = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
+        depth_image_data = self._depth_counts_reader.latest()[1][:, :, self.depth_channel]
         cb_range = self.get_depth_cb_range()
 
         # Now update image with new color scale, and update colorbar
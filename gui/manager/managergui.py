@@ -26,6 +26,7 @@ import os
 
 from collections import OrderedDict
 from core.module import StatusVar
+from core.util import instrumentation
 from core.util.modules import get_main_dir
 from .errordialog import ErrorDialog
 from gui.guibase import GUIBase
@@ -140,6 +141,7 @@ class ManagerGui(GUIBase):
         self._manager.sigShowManager.connect(self.show)
         self._manager.sigConfigChanged.connect(self.updateConfigWidgets)
         self._manager.sigModulesChanged.connect(self.updateConfigWidgets)
+        self._manager.sigStartupProfileUpdated.connect(self.updateConfigWidgets)
         self._manager.sigShutdownAcknowledge.connect(self.promptForShutdown)
         # Log widget
         self._mw.logwidget.setManager(self._manager)
@@ -164,6 +166,11 @@ class ManagerGui(GUIBase):
         self.startIPythonWidget()
         # thread widget
         self._mw.threadWidget.threadListView.setModel(self._manager.tm)
+        # performance widget
+        self._mw.perfWidget.enabledCheckBox.toggled.connect(self.enableInstrumentation)
+        self._mw.perfWidget.resetButton.clicked.connect(self.resetInstrumentation)
+        self._mw.perfWidget.exportButton.clicked.connect(self.exportInstrumentation)
+        self.checkTimer.timeout.connect(self.updatePerformanceWidget)
         # remote widget
         # hide remote menu item if rpyc is not available
         self._mw.actionRemoteView.setVisible(self._manager.rm is not None)
@@ -184,6 +191,7 @@ class ManagerGui(GUIBase):
         self._mw.configDisplayDockWidget.hide()
         self._mw.remoteDockWidget.hide()
         self._mw.threadDockWidget.hide()
+        self._mw.perfDockWidget.hide()
         self._mw.show()
 
     def on_deactivate(self):
@@ -192,8 +200,11 @@ class ManagerGui(GUIBase):
         self.stopIPythonWidget()
         self.stopIPython()
         self.checkTimer.stop()
-        if len(self.modlist) > 0:
-            self.checkTimer.timeout.disconnect()
+        self.checkTimer.timeout.disconnect()
+        self._mw.perfWidget.enabledCheckBox.toggled.disconnect()
+        self._mw.perfWidget.resetButton.clicked.disconnect()
+        self._mw.perfWidget.exportButton.clicked.disconnect()
+        self._manager.sigStartupProfileUpdated.disconnect(self.updateConfigWidgets)
         self.sigStartModule.disconnect()
         self.sigReloadModule.disconnect()
         self.sigStopModule.disconnect()
@@ -240,26 +251,69 @@ class ManagerGui(GUIBase):
         self._mw.consoleDockWidget.setVisible(True)
         self._mw.remoteDockWidget.setVisible(False)
         self._mw.threadDockWidget.setVisible(False)
+        self._mw.perfDockWidget.setVisible(False)
         self._mw.logDockWidget.setVisible(True)
 
         self._mw.actionConfigurationView.setChecked(False)
         self._mw.actionConsoleView.setChecked(True)
         self._mw.actionRemoteView.setChecked(False)
         self._mw.actionThreadsView.setChecked(False)
+        self._mw.actionPerformanceView.setChecked(False)
         self._mw.actionLogView.setChecked(True)
 
         self._mw.configDisplayDockWidget.setFloating(False)
         self._mw.consoleDockWidget.setFloating(False)
         self._mw.remoteDockWidget.setFloating(False)
         self._mw.threadDockWidget.setFloating(False)
+        self._mw.perfDockWidget.setFloating(False)
         self._mw.logDockWidget.setFloating(False)
 
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.configDisplayDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(2), self._mw.consoleDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.remoteDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.threadDockWidget)
+        self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.perfDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.logDockWidget)
 
+    def _loadedModules(self):
+        """ Return all loaded modules by name. """
+        modules = dict()
+        for base in ('hardware', 'logic', 'gui'):
+            modules.update(self._manager.tree['loaded'][base])
+        return modules
+
+    def enableInstrumentation(self, enabled):
+        """ Start or stop recording the instrumentation of all loaded modules.
+
+            @param bool enabled: record spans, counters and histograms
+        """
+        for module in self._loadedModules().values():
+            module.instrumentation.enabled = enabled
+
+    def resetInstrumentation(self):
+        """ Remove the recorded instrumentation of all loaded modules. """
+        for module in self._loadedModules().values():
+            module.instrumentation.reset()
+        self.updatePerformanceWidget()
+
+    def updatePerformanceWidget(self):
+        """ Show the current instrumentation of all loaded modules. """
+        if self._mw.perfWidget.enabledCheckBox.isChecked():
+            # also record in modules loaded after the recording was started
+            self.enableInstrumentation(True)
+        if self._mw.perfDockWidget.isVisible():
+            self._mw.perfWidget.setSnapshots(instrumentation.collect(self._loadedModules()))
+
+    def exportInstrumentation(self):
+        """ Ask the user for a file and export the instrumentation of all loaded modules. """
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self._mw,
+            'Export Instrumentation',
+            os.path.expanduser('~'),
+            'Text files (*.txt);;All files (*)')[0]
+        if filename:
+            instrumentation.export(filename, instrumentation.collect(self._loadedModules()))
+
     def handleLogEntry(self, entry):
         """ Forward log entry to log widget and show an error popup if it is
             an error message.
@@ -380,6 +434,11 @@ Go, play.
         """ Clear and refill the tree widget showing the configuration.
         """
         self.fillTreeWidget(self._mw.treeWidget, self._manager.tree)
+        if len(self._manager.startupProfile) > 0:
+            profile_item = QtWidgets.QTreeWidgetItem()
+            profile_item.setText(0, 'activation times')
+            self._mw.treeWidget.invisibleRootItem().addChild(profile_item)
+            self.fillTreeItem(profile_item, self._manager.startupProfile)
 
     def updateGUIModuleList(self):
         """ Clear and refill the module list widget
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi performance widget class.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+from qtpy.QtWidgets import QWidget, QTreeWidgetItem
+from qtpy import uic
+from core.util.units import ScaledFloat
+import math
+import os
+
+
+class PerfWidget(QWidget):
+    """ This widget shows the instrumentation (spans, counters and histograms) of all loaded
+    modules.
+    """
+    _columns = ('kind', 'count', 'total', 'mean', 'p50', 'p99', 'max', 'last')
+
+    def __init__(self):
+        super().__init__()
+        this_dir = os.path.dirname(__file__)
+        ui_file = os.path.join(this_dir, 'ui_perfwidget.ui')
+
+        # Load it
+        uic.loadUi(ui_file, self)
+        self._items = dict()
+
+    def setSnapshots(self, snapshots):
+        """ Show the statistics of the modules.
+
+        @param dict snapshots: statistics of each module as returned by
+                               core.util.instrumentation.collect
+        """
+        tree = self.perfTreeWidget
+        # remove outdated metrics before their modules, which would delete them as well
+        for key in sorted(self._items, key=lambda key: key[1] is None):
+            module_name, metric_name = key
+            if module_name not in snapshots or (
+                    metric_name is not None and metric_name not in snapshots[module_name]):
+                item = self._items.pop(key)
+                parent = item.parent()
+                if parent is None:
+                    tree.takeTopLevelItem(tree.indexOfTopLevelItem(item))
+                else:
+                    parent.removeChild(item)
+
+        for module_name, snapshot in snapshots.items():
+            module_item = self._items.get((module_name, None))
+            if module_item is None:
+                module_item = QTreeWidgetItem([module_name])
+                tree.addTopLevelItem(module_item)
+                module_item.setExpanded(True)
+                self._items[(module_name, None)] = module_item
+            for metric_name, summary in snapshot.items():
+                item = self._items.get((module_name, metric_name))
+                if item is None:
+                    item = QTreeWidgetItem([metric_name])
+                    module_item.addChild(item)
+                    self._items[(module_name, metric_name)] = item
+                for column, key in enumerate(self._columns, 1):
+                    item.setText(column, self._format(summary, key))
+
+    @staticmethod
+    def _format(summary, key):
+        value = summary[key]
+        if key == 'kind':
+            return value
+        if key == 'count' or (summary['kind'] == 'counter' and key != 'mean'):
+            return '{0:d}'.format(int(value)) if not math.isnan(value) else ''
+        if math.isnan(value) or math.isinf(value):
+            return ''
+        if summary['kind'] == 'span':
+            return '{0:.3r}s'.format(ScaledFloat(value))
+        return '{0:.4g}'.format(value)
@@ -286,7 +286,8 @@ class ODMRGui(GUIBase):
                                                      QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOutputStateUpdated.connect(self.update_status,
                                                        QtCore.Qt.QueuedConnection)
-        self._odmr_logic.sigOdmrPlotsUpdated.connect(self.update_plots, QtCore.Qt.QueuedConnection)
+        # emitted in this thread with only the latest update, a direct connection keeps it that way
+        self._odmr_logic.sigOdmrPlotsUpdated.connect(self.update_plots)
         self._odmr_logic.sigOdmrFitUpdated.connect(self.update_fit, QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrElapsedTimeUpdated.connect(self.update_elapsedtime,
                                                            QtCore.Qt.QueuedConnection)
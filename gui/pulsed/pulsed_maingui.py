@@ -25,7 +25,7 @@ import os
 import pyqtgraph as pg
 import datetime
 
-from core.module import Connector, StatusVar
+from core.module import Connector, ConfigOption, StatusVar
 from core.util import units
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog
@@ -163,9 +163,23 @@ class PulsedMeasurementGui(GUIBase):
     _ana_param_errorbars = StatusVar('ana_param_errorbars_CheckBox', False)
     _predefined_methods_to_show = StatusVar('predefined_methods_to_show', [])
 
+    # minimum time between two redraws of the measurement data plots in ms
+    _plot_update_interval = ConfigOption('plot_update_interval', 50)
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
 
+        # x-axis of the laser plot and the key (size, bin width) it was calculated for
+        self._laser_x_data = np.zeros(0)
+        self._laser_x_data_key = None
+        # versions of the data currently shown in the plots
+        self._plotted_data_version = None
+        self._plotted_laser_data_version = None
+        # coalesces plot updates, exists while the logic signals are connected
+        self._plot_update_timer = None
+        # reader of the signal data buffer of the logic, exists while the GUI is active
+        self._signal_data_reader = None
+
     def on_activate(self):
         """ Initialize, connect and configure the pulsed measurement GUI.
 
@@ -188,6 +202,9 @@ class PulsedMeasurementGui(GUIBase):
         self._mw.tabWidget.addTab(self._sg, 'Sequence Generator')
         self._mw.tabWidget.addTab(self._pm, 'Predefined Methods')
 
+        # the analysis tab already draws the current data upon activation
+        self._signal_data_reader = self.pulsedmasterlogic().signal_data_buffer.reader()
+
         self._activate_main_window_ui()
         self._activate_extraction_ui()
         self._activate_analysis_ui()
@@ -210,6 +227,26 @@ class PulsedMeasurementGui(GUIBase):
         self.show()
         return
 
+    def _activate_plot_updates(self):
+        """ Set up the coalescing of measurement data updates and the level of detail of the
+        data plots.
+
+        Bursts of data update signals from the logic are collected by a single shot timer, so
+        the plots are redrawn at most once per plot_update_interval. The plots only draw the data
+        inside the visible range, reduced to the screen resolution by a min/max envelope. The
+        full resolution is drawn when zooming in.
+        """
+        self._plot_update_timer = QtCore.QTimer()
+        self._plot_update_timer.setSingleShot(True)
+        self._plot_update_timer.setInterval(int(self._plot_update_interval))
+        self._plot_update_timer.timeout.connect(self._update_measurement_plots)
+        for item in (self.signal_image, self.signal_image2, self.second_plot_image,
+                     self.second_plot_image2, self.lasertrace_image, self.measuring_error_image,
+                     self.measuring_error_image2):
+            item.setClipToView(True)
+            item.setDownsampling(auto=True, method='peak')
+        return
+
     def on_deactivate(self):
         """ Undo the Definition, configuration and initialisation of the pulsed
             measurement GUI.
@@ -379,6 +416,7 @@ class PulsedMeasurementGui(GUIBase):
         pass
 
     def _connect_logic_signals(self):
+        self._activate_plot_updates()
         # Connect update signals from pulsed_master_logic
         self.pulsedmasterlogic().sigMeasurementDataUpdated.connect(self.measurement_data_updated)
         self.pulsedmasterlogic().sigTimerUpdated.connect(self.measurement_timer_updated)
@@ -541,6 +579,11 @@ class PulsedMeasurementGui(GUIBase):
     def _disconnect_logic_signals(self):
         # Disconnect update signals from pulsed_master_logic
         self.pulsedmasterlogic().sigMeasurementDataUpdated.disconnect()
+        self._plot_update_timer.stop()
+        self._plot_update_timer.timeout.disconnect()
+        self._plot_update_timer = None
+        self._signal_data_reader.release()
+        self._signal_data_reader = None
         self.pulsedmasterlogic().sigTimerUpdated.disconnect()
         self.pulsedmasterlogic().sigFitUpdated.disconnect()
         self.pulsedmasterlogic().sigMeasurementStatusUpdated.disconnect()
@@ -2272,7 +2315,7 @@ class PulsedMeasurementGui(GUIBase):
 
         self.toggle_error_bars(self._ana_param_errorbars)
         self.second_plot_changed(self.pulsedmasterlogic().alternative_data_type)
-        self.measurement_data_updated()
+        self._plot_signal_data()
         return
 
     def _deactivate_analysis_ui(self):
@@ -2308,20 +2351,40 @@ class PulsedMeasurementGui(GUIBase):
 
     @QtCore.Slot()
     def measurement_data_updated(self):
-        """
+        """ Schedule a redraw of the measurement data plots.
 
-        @return:
+        Further updates arriving before the redraw are combined with this one.
         """
-        signal_data = self.pulsedmasterlogic().signal_data
-        signal_alt_data = self.pulsedmasterlogic().signal_alt_data
-        measurement_error = self.pulsedmasterlogic().measurement_error
-
-        # Adjust number of data sets to plot
-        self.set_plot_dimensions()
+        if self._plot_update_timer is None:
+            # Plots are not set up (any more)
+            return
+        if not self._plot_update_timer.isActive():
+            self._plot_update_timer.start()
+        return
 
+    @QtCore.Slot()
+    def _update_measurement_plots(self):
+        """ Redraw the plots whose data has changed since the last redraw. """
         # Change second plot combobox if it has been changed in the logic
         self.second_plot_changed(self.pulsedmasterlogic().alternative_data_type)
 
+        data_version = self.pulsedmasterlogic().data_version
+        if data_version != self._plotted_data_version:
+            self._plotted_data_version = data_version
+            self._plot_signal_data()
+
+        if self.pulsedmasterlogic().laser_data_version != self._plotted_laser_data_version:
+            self.update_laser_data()
+        return
+
+    def _plot_signal_data(self):
+        """ Draw signal, alternative signal and measurement error. """
+        # signal_data and measurement_error of the same analysis step, pinned until the next redraw
+        signal_data, measurement_error = self._signal_data_reader.latest()[1]
+
+        # Adjust number of data sets to plot
+        self.set_plot_dimensions()
+
         # create ErrorBarItems
         tmp_array = signal_data[0, 1:] - signal_data[0, :-1]
         if len(tmp_array) > 0:
@@ -2347,18 +2410,18 @@ class PulsedMeasurementGui(GUIBase):
         if signal_data.shape[0] > 2:
             self.signal_image2.setData(x=signal_data[0], y=signal_data[2])
 
-        # dealing with the secondary plot
-        self.second_plot_image.setData(x=signal_alt_data[0], y=signal_alt_data[1])
-        if signal_alt_data.shape[0] > 2:
-            self.second_plot_image2.setData(x=signal_alt_data[0], y=signal_alt_data[2])
+        # dealing with the secondary plot. The alternative data is computed on request, so only
+        # fetch it if it is displayed.
+        if self.pulsedmasterlogic().alternative_data_type != 'None':
+            signal_alt_data = self.pulsedmasterlogic().signal_alt_data
+            self.second_plot_image.setData(x=signal_alt_data[0], y=signal_alt_data[1])
+            if signal_alt_data.shape[0] > 2:
+                self.second_plot_image2.setData(x=signal_alt_data[0], y=signal_alt_data[2])
 
         # dealing with the error plot
         self.measuring_error_image.setData(x=measurement_error[0], y=measurement_error[1])
         if measurement_error.shape[0] > 2:
             self.measuring_error_image2.setData(x=measurement_error[0], y=measurement_error[2])
-
-        # dealing with the laser plot
-        self.update_laser_data()
         return
 
     @QtCore.Slot()
@@ -3075,6 +3138,7 @@ class PulsedMeasurementGui(GUIBase):
         laser_index = self._pe.laserpulses_ComboBox.currentIndex()
         show_raw = self._pe.laserpulses_display_raw_CheckBox.isChecked()
         is_gated = len(self.pulsedmasterlogic().raw_data.shape) > 1
+        self._plotted_laser_data_version = self.pulsedmasterlogic().laser_data_version
 
         # Determine the right array to plot as y-data
         if show_raw:
@@ -3091,12 +3155,14 @@ class PulsedMeasurementGui(GUIBase):
             else:
                 y_data = self.pulsedmasterlogic().laser_data[laser_index - 1]
 
-        # Calculate the x-axis of the laser plot here
+        # Calculate the x-axis of the laser plot only if its size or the bin width changed
         bin_width = self.pulsedmasterlogic().fast_counter_settings['bin_width']
-        x_data = np.arange(y_data.size, dtype=float) * bin_width
+        if self._laser_x_data_key != (y_data.size, bin_width):
+            self._laser_x_data = np.arange(y_data.size, dtype=float) * bin_width
+            self._laser_x_data_key = (y_data.size, bin_width)
 
         # Plot data
-        self.lasertrace_image.setData(x=x_data, y=y_data)
+        self.lasertrace_image.setData(x=self._laser_x_data, y=y_data)
         return
 
 
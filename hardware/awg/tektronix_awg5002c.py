@@ -55,6 +55,7 @@ class AWG5002C(Base, PulserInterface):
 
     _modclass = 'awg5002c'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     # config options
     ip_address = ConfigOption('awg_ip_address', missing='error')
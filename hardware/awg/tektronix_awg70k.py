@@ -54,6 +54,7 @@ class AWG70K(Base, PulserInterface):
     """
     _modclass = 'awg70k'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     # config options
     _visa_address = ConfigOption(name='awg_visa_address', missing='error')
@@ -53,6 +53,7 @@ class AWG7k(Base, PulserInterface):
 
     _modclass = 'awg7k'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     # config options
     _tmp_work_dir = ConfigOption(name='tmp_work_dir',
@@ -192,18 +192,38 @@ class IxonUltra(Base, CameraInterface):
 
         @return bool: True if supported, False if not
         """
-        return False
+        return True
 
     def start_live_acquisition(self):
         """ Start a continuous acquisition
 
+        The camera is run in RUN_TILL_ABORT mode, the acquired images are kept in the circular
+        buffer of the driver until they are retrieved by get_new_frames.
+
         @return bool: Success ?
         """
-        if self._support_live:
-            self._live = True
-            self._acquiring = False
+        if self._live:
+            return False
+        if self._shutter == 'closed':
+            msg = self._set_shutter(0, 1, 0.1, 0.1)
+            if msg == 'DRV_SUCCESS':
+                self._shutter = 'open'
+            else:
+                self.log.error('shutter did not open.{0}'.format(msg))
 
-        return False
+        self._last_acquisition_mode = self._acquisition_mode
+        if self._set_acquisition_mode('RUN_TILL_ABORT') != 0:
+            self.log.error('Could not set the camera to RUN_TILL_ABORT mode.')
+            self._last_acquisition_mode = None
+            return False
+        error_code = self.dll.StartAcquisition()
+        if ERROR_DICT[error_code] != 'DRV_SUCCESS':
+            self.log.error('Could not start live acquisition. {0}'.format(ERROR_DICT[error_code]))
+            self._restore_acquisition_mode()
+            return False
+        self._live = True
+        self._acquiring = True
+        return True
 
     def start_single_acquisition(self):
         """ Start a single acquisition
@@ -237,6 +257,7 @@ class IxonUltra(Base, CameraInterface):
         if msg == "DRV_SUCCESS":
             self._live = False
             self._acquiring = False
+            self._restore_acquisition_mode()
             return True
         else:
             return False
@@ -292,6 +313,30 @@ class IxonUltra(Base, CameraInterface):
         self._cur_image = image_array
         return image_array
 
+    def get_new_frames(self, timeout=1.):
+        """ Return all frames acquired since the last call during a live acquisition.
+
+        @param float timeout: maximum waiting time in seconds
+
+        @return numpy array: frame data in format [frame][row][col], empty if no new frame
+                             arrived within the timeout or if no live acquisition is running
+        """
+        if not self._live:
+            return np.empty((0, self._height, self._width))
+
+        first, last = self._get_number_new_images()
+        if last < first or last == 0:
+            error_code = self.dll.WaitForAcquisitionTimeOut(c_int(int(timeout * 1000)))
+            if ERROR_DICT[error_code] != 'DRV_SUCCESS':
+                return np.empty((0, self._height, self._width))
+            first, last = self._get_number_new_images()
+            if last < first or last == 0:
+                return np.empty((0, self._height, self._width))
+
+        n_images = last - first + 1
+        images = self._get_images(first, last, n_images)
+        return images.reshape((n_images, self._height, self._width))
+
     def set_exposure(self, exposure):
         """ Set the exposure time in seconds
 
@@ -429,6 +474,12 @@ class IxonUltra(Base, CameraInterface):
         self.dll.WaitForAcquisition()
         return ERROR_DICT[error_code]
 
+    def _restore_acquisition_mode(self):
+        """ Restore the acquisition mode that was set before the live acquisition. """
+        if self._last_acquisition_mode is not None:
+            self._set_acquisition_mode(self._last_acquisition_mode)
+            self._last_acquisition_mode = None
+
 # setter functions
 
     def _set_shutter(self, typ, mode, closingtime, openingtime):
@@ -723,13 +774,14 @@ class IxonUltra(Base, CameraInterface):
 
         return first.value, last.value
 
-    # not working properly (only for n_scans = 1)
     def _get_images(self, first_img, last_img, n_scans):
-        """ Return an array of last acquired image.
+        """ Return the images first_img to last_img from the circular buffer.
 
-        @return numpy array: image data in format [[row],[row]...]
+        @param int first_img: index of the first image
+        @param int last_img: index of the last image
+        @param int n_scans: number of images between first_img and last_img
 
-        Each pixel might be a float, integer or sub pixels
+        @return numpy array: flat image data of all images, one image after the other
         """
 
         width = self._width
@@ -746,7 +798,8 @@ class IxonUltra(Base, CameraInterface):
 
         first_img = c_long(first_img)
         last_img = c_long(last_img)
-        size = c_ulong(width * height)
+        # the size passed to the driver is the size of the whole buffer, not of a single image
+        size = c_ulong(dim)
         val_first = c_long()
         val_last = c_long()
         error_code = self.dll.GetImages(first_img, last_img, pointer(cimage),
@@ -754,9 +807,8 @@ class IxonUltra(Base, CameraInterface):
         if ERROR_DICT[error_code] != 'DRV_SUCCESS':
             self.log.warning('Couldn\'t retrieve an image. {0}'.format(ERROR_DICT[error_code]))
         else:
-            for i in range(len(cimage)):
-                # could be problematic for 'FVB' or 'SINGLE_TRACK' readmode
-                image_array[i] = cimage[i]
+            # could be problematic for 'FVB' or 'SINGLE_TRACK' readmode
+            image_array = np.frombuffer(cimage, dtype=c_int).astype(float)
 
         self._cur_image = image_array
         return image_array
@@ -49,6 +49,8 @@ class CameraDummy(Base, CameraInterface):
 
     _live = False
     _acquiring = False
+    _live_start_time = 0
+    _frames_delivered = 0
     _exposure = ConfigOption('exposure', .1)
     _gain = ConfigOption('gain', 1.)
 
@@ -91,6 +93,8 @@ class CameraDummy(Base, CameraInterface):
         if self._support_live:
             self._live = True
             self._acquiring = False
+            self._live_start_time = time.perf_counter()
+            self._frames_delivered = 0
 
     def start_single_acquisition(self):
         """ Start a single acquisition
@@ -124,6 +128,32 @@ class CameraDummy(Base, CameraInterface):
         data = np.random.random(self._resolution)*self._exposure*self._gain
         return data.transpose()
 
+    def get_new_frames(self, timeout=1.):
+        """ Return all frames acquired since the last call during a live acquisition.
+
+        The dummy acquires one frame per exposure time since the start of the live acquisition.
+
+        @param float timeout: maximum waiting time in seconds
+
+        @return numpy array: frame data in format [frame][row][col], empty if no new frame
+                             arrived within the timeout or if no live acquisition is running
+        """
+        width, height = self._resolution
+        if not self._live:
+            return np.empty((0, height, width))
+        exposure = max(float(self._exposure), 1e-6)
+        next_frame_time = self._live_start_time + (self._frames_delivered + 1) * exposure
+        wait_time = next_frame_time - time.perf_counter()
+        if wait_time > timeout:
+            time.sleep(timeout)
+            return np.empty((0, height, width))
+        elif wait_time > 0:
+            time.sleep(wait_time)
+        acquired = int((time.perf_counter() - self._live_start_time) / exposure)
+        num_frames = max(acquired - self._frames_delivered, 0)
+        self._frames_delivered += num_frames
+        return np.random.random((num_frames, height, width)) * self._exposure * self._gain
+
     def set_exposure(self, exposure):
         """ Set the exposure time in seconds
 
@@ -132,6 +162,10 @@ class CameraDummy(Base, CameraInterface):
         @return float: setted new exposure time
         """
         self._exposure = exposure
+        if self._live:
+            # restart the frame timing of the live acquisition with the new exposure
+            self._live_start_time = time.perf_counter()
+            self._frames_delivered = 0
         return self._exposure
 
     def get_exposure(self):
@@ -241,9 +241,13 @@ class CameraThorlabs(Base, CameraInterface):
         if self.get_ready_state():
             self._acquiring = True
             self._live = True
+            # the frame event signals get_new_frames that a new image has been captured
+            code = self._dll.is_EnableEvent(self._camera_handle, c_int(IS_SET_EVENT_FRAME))
+            self._check_error(code, "Could not enable frame event")
             code = self._dll.is_CaptureVideo(self._camera_handle, c_int(IS_DONT_WAIT))
             no_error = self._check_error(code, "Could not start live acquisition")
             if not no_error:
+                self._dll.is_DisableEvent(self._camera_handle, c_int(IS_SET_EVENT_FRAME))
                 self._acquiring = False
                 self._live = False
                 return False
@@ -271,6 +275,8 @@ class CameraThorlabs(Base, CameraInterface):
         if self._acquiring:
             code = self._dll.is_StopLiveVideo(self._camera_handle, c_int(IS_FORCE_VIDEO_STOP))
             no_error = self._check_error(code, "Could not stop acquisition")
+        if self._live:
+            self._dll.is_DisableEvent(self._camera_handle, c_int(IS_SET_EVENT_FRAME))
         self._acquiring = False
         self._live = False
         return no_error
@@ -293,6 +299,22 @@ class CameraThorlabs(Base, CameraInterface):
 
         return img_array
 
+    def get_new_frames(self, timeout=1.):
+        """
+        Return the frames captured since the last call during live acquisition
+
+        The camera has a single image memory, so at most one frame is returned per call.
+        """
+        if not self._live:
+            return np.empty((0, self._height, self._width))
+        code = self._dll.is_WaitEvent(self._camera_handle, c_int(IS_SET_EVENT_FRAME),
+                                      c_int(int(timeout * 1000)))
+        if code == IS_TIMED_OUT:
+            return np.empty((0, self._height, self._width))
+        if not self._check_error(code, "Could not wait for a new frame"):
+            return np.empty((0, self._height, self._width))
+        return self.get_acquired_data()[np.newaxis]
+
     def get_bit_depth(self):
         """
         Return the bit depth of the image
@@ -38,7 +38,17 @@ class FastCounterDummy(Base, FastCounterInterface):
         module.Class: 'fast_counter_dummy.FastCounterDummy'
         gated: False
         #load_trace: None # path to the saved dummy trace
-
+        #simulate_photon_stream: False # simulate counts from the loaded pulse sequence
+        #simulation_count_rate: 200e3 # NV count rate in ms=0 during laser illumination (1/s)
+        #simulation_dark_count_rate: 200 # background count rate (1/s)
+        #simulation_contrast: 0.3 # relative fluorescence drop of ms=+-1 with respect to ms=0
+        #simulation_polarization_time: 250e-9 # decay time of the spin dependent fluorescence (s)
+        #simulation_rabi_periods: 2 # number of population oscillations across all laser pulses
+        #simulation_sweeps_per_second: None # None runs in real time, i.e. 1/sequence length
+
+    In simulation mode the timing of the laser pulses is taken from the sampling information of
+    the currently loaded pulse sequence (see set_sampling_information). As long as no sampling
+    information is available, the trace from "load_trace" is returned instead.
     """
     _modclass = 'fastcounterinterface'
     _modtype = 'hardware'
@@ -46,6 +56,13 @@ class FastCounterDummy(Base, FastCounterInterface):
     # config option
     _gated = ConfigOption('gated', False, missing='warn')
     trace_path = ConfigOption('load_trace', None)
+    _simulate = ConfigOption('simulate_photon_stream', False)
+    _sim_count_rate = ConfigOption('simulation_count_rate', 200e3)
+    _sim_dark_count_rate = ConfigOption('simulation_dark_count_rate', 200)
+    _sim_contrast = ConfigOption('simulation_contrast', 0.3)
+    _sim_polarization_time = ConfigOption('simulation_polarization_time', 250e-9)
+    _sim_rabi_periods = ConfigOption('simulation_rabi_periods', 2)
+    _sim_sweeps_per_second = ConfigOption('simulation_sweeps_per_second', None)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -68,6 +85,14 @@ class FastCounterDummy(Base, FastCounterInterface):
         self.statusvar = 0
         self._binwidth = 1
         self._gate_length_bins = 8192
+        self._number_of_gates = 0
+
+        # photon stream simulation
+        self._sampling_information = dict()
+        self._sim_mean_counts = None
+        self._sim_run_time = 0.0
+        self._sim_last_update = 0.0
+        self._sim_elapsed_sweeps = 0
         return
 
     def on_deactivate(self):
@@ -135,6 +160,8 @@ class FastCounterDummy(Base, FastCounterInterface):
         """
         self._binwidth = int(np.rint(bin_width_s * 1e9 * 950 / 1000))
         self._gate_length_bins = int(np.rint(record_length_s / bin_width_s))
+        self._number_of_gates = number_of_gates
+        self._sim_mean_counts = None
         actual_binwidth = self._binwidth * 1000 / 950e9
         actual_length = self._gate_length_bins * actual_binwidth
         self.statusvar = 1
@@ -154,6 +181,12 @@ class FastCounterDummy(Base, FastCounterInterface):
         return self.statusvar
 
     def start_measure(self):
+        if self._simulate and self._sampling_information:
+            self._start_simulation()
+            self.statusvar = 2
+            return 0
+
+        self._sim_mean_counts = None
         time.sleep(1)
         self.statusvar = 2
         try:
@@ -170,14 +203,20 @@ class FastCounterDummy(Base, FastCounterInterface):
 
         Fast counter must be initially in the run state to make it pause.
         """
-        time.sleep(1)
+        if self._sim_mean_counts is not None:
+            self._update_simulation()
+        else:
+            time.sleep(1)
         self.statusvar = 3
         return 0
 
     def stop_measure(self):
         """ Stop the fast counter. """
 
-        time.sleep(1)
+        if self._sim_mean_counts is not None:
+            self._update_simulation()
+        else:
+            time.sleep(1)
         self.statusvar = 1
         return 0
 
@@ -186,7 +225,7 @@ class FastCounterDummy(Base, FastCounterInterface):
 
         If fast counter is in pause state, then fast counter will be continued.
         """
-
+        self._sim_last_update = time.time()
         self.statusvar = 2
         return 0
 
@@ -226,6 +265,13 @@ class FastCounterDummy(Base, FastCounterInterface):
         If the hardware does not support these features, the values should be None
         """
 
+        if self._sim_mean_counts is not None:
+            if self.statusvar == 2:
+                self._update_simulation()
+            info_dict = {'elapsed_sweeps': self._sim_elapsed_sweeps,
+                         'elapsed_time': self._sim_run_time}
+            return self._count_data.copy(), info_dict
+
         # include an artificial waiting time
         time.sleep(0.5)
         info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
@@ -235,3 +281,138 @@ class FastCounterDummy(Base, FastCounterInterface):
         freq = 950.
         time.sleep(0.5)
         return freq
+
+    def set_sampling_information(self, info_dict):
+        """ Set the sampling information of the currently loaded pulse sequence.
+
+        Only needed for the photon stream simulation which uses the laser pulse timing.
+
+        @param dict info_dict: sampling_information dict of a sampled PulseBlockEnsemble or
+                               PulseSequence. Needs the keys 'laser_rising_bins',
+                               'laser_falling_bins' and 'pulse_generator_settings'.
+        """
+        required = ('laser_rising_bins', 'laser_falling_bins', 'pulse_generator_settings')
+        if isinstance(info_dict, dict) and all(key in info_dict for key in required):
+            self._sampling_information = info_dict
+        else:
+            self._sampling_information = dict()
+        self._sim_mean_counts = None
+        return
+
+    def set_simulation_parameters(self, count_rate=None, dark_count_rate=None, contrast=None,
+                                  polarization_time=None, rabi_periods=None,
+                                  sweeps_per_second=None):
+        """ Change the parameters of the photon stream simulation. Parameters that are not given
+        stay unchanged. Changes take effect at the next start of the measurement.
+
+        @param float count_rate: NV count rate in ms=0 during laser illumination in 1/s
+        @param float dark_count_rate: background count rate in 1/s
+        @param float contrast: relative fluorescence drop of ms=+-1 with respect to ms=0
+        @param float polarization_time: decay time of the spin dependent fluorescence in s
+        @param float rabi_periods: number of population oscillations across all laser pulses
+        @param float sweeps_per_second: simulated sweep rate. 0 runs in real time.
+
+        @return dict: the currently set simulation parameters
+        """
+        if count_rate is not None:
+            self._sim_count_rate = float(count_rate)
+        if dark_count_rate is not None:
+            self._sim_dark_count_rate = float(dark_count_rate)
+        if contrast is not None:
+            self._sim_contrast = float(contrast)
+        if polarization_time is not None:
+            self._sim_polarization_time = float(polarization_time)
+        if rabi_periods is not None:
+            self._sim_rabi_periods = float(rabi_periods)
+        if sweeps_per_second is not None:
+            self._sim_sweeps_per_second = float(sweeps_per_second) if sweeps_per_second > 0 else None
+        self._simulate = True
+        return {'count_rate': self._sim_count_rate,
+                'dark_count_rate': self._sim_dark_count_rate,
+                'contrast': self._sim_contrast,
+                'polarization_time': self._sim_polarization_time,
+                'rabi_periods': self._sim_rabi_periods,
+                'sweeps_per_second': self._sim_sweeps_per_second}
+
+    def _start_simulation(self):
+        """ Set up the expected counts per sweep and reset the accumulated simulated trace.
+        """
+        self._sim_mean_counts = self._simulated_mean_counts()
+        self._count_data = np.zeros(self._sim_mean_counts.shape, dtype='int64')
+        self._sim_run_time = 0.0
+        self._sim_elapsed_sweeps = 0
+        self._sim_last_update = time.time()
+        return
+
+    def _update_simulation(self):
+        """ Add the counts of all sweeps that happened since the last update to the trace.
+        """
+        now = time.time()
+        self._sim_run_time += now - self._sim_last_update
+        self._sim_last_update = now
+
+        if self._sim_sweeps_per_second:
+            sweeps_per_second = self._sim_sweeps_per_second
+        else:
+            ideal_length = self._sampling_information.get('ideal_length')
+            if not ideal_length:
+                ideal_length = self._gate_length_bins * self.get_binwidth()
+            sweeps_per_second = 1 / ideal_length
+
+        new_sweeps = int(self._sim_run_time * sweeps_per_second) - self._sim_elapsed_sweeps
+        if new_sweeps > 0:
+            # The sum of Poissonian counts from many sweeps is again Poissonian
+            self._count_data += np.random.poisson(self._sim_mean_counts * new_sweeps)
+            self._sim_elapsed_sweeps += new_sweeps
+        return
+
+    def _simulated_mean_counts(self):
+        """ Calculate the expected number of counts in each bin for a single sweep.
+
+        During each laser pulse the NV fluorescence starts at a level determined by the spin
+        population (ms=0 bright, ms=+-1 dark by the given contrast) and relaxes to the ms=0 level
+        with the polarization time. The ms=0 population oscillates over the laser pulse index.
+
+        @return numpy.ndarray: expected counts per bin. 1D for ungated, 2D (gate, bin) for gated.
+        """
+        binwidth = self.get_binwidth()
+        sample_rate = self._sampling_information['pulse_generator_settings']['sample_rate']
+        rising = np.asarray(self._sampling_information['laser_rising_bins'], dtype=float)
+        falling = np.asarray(self._sampling_information['laser_falling_bins'], dtype=float)
+        # Sort out trailing laser pulse without falling edge
+        number_of_lasers = min(len(rising), len(falling))
+        rising = np.rint(rising[:number_of_lasers] / sample_rate / binwidth).astype('int64')
+        falling = np.rint(falling[:number_of_lasers] / sample_rate / binwidth).astype('int64')
+
+        laser_index = np.arange(number_of_lasers)
+        population = 0.5 * (1 + np.cos(
+            2 * np.pi * self._sim_rabi_periods * laser_index / max(number_of_lasers, 1)))
+        initial_drop = self._sim_contrast * (1 - population)
+        laser_counts = self._sim_count_rate * binwidth
+        dark_counts = self._sim_dark_count_rate * binwidth
+
+        if self._gated:
+            number_of_gates = self._number_of_gates if self._number_of_gates > 0 else number_of_lasers
+            bins = np.arange(self._gate_length_bins)
+            mean_counts = np.full((number_of_gates, self._gate_length_bins), dark_counts)
+            gates = min(number_of_gates, number_of_lasers)
+            laser_length = (falling - rising)[:gates, np.newaxis]
+            decay = np.exp(-bins * binwidth / self._sim_polarization_time)[np.newaxis, :]
+            mean_counts[:gates] += np.where(
+                bins[np.newaxis, :] < laser_length,
+                laser_counts * (1 - initial_drop[:gates, np.newaxis] * decay),
+                0)
+            return mean_counts
+
+        bins = np.arange(self._gate_length_bins)
+        mean_counts = np.full(self._gate_length_bins, dark_counts)
+        if number_of_lasers == 0:
+            return mean_counts
+        # index of the last laser pulse starting at or before each bin
+        pulse = np.searchsorted(rising, bins, side='right') - 1
+        in_laser = (pulse >= 0) & (bins < falling[pulse])
+        pulse = pulse[in_laser]
+        time_in_laser = (bins[in_laser] - rising[pulse]) * binwidth
+        mean_counts[in_laser] += laser_counts * (
+            1 - initial_drop[pulse] * np.exp(-time_in_laser / self._sim_polarization_time))
+        return mean_counts
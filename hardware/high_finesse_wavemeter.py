@@ -23,6 +23,8 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from qtpy import QtCore
+import time
+import numpy as np
 import ctypes   # is a foreign function library for Python. It provides C
                 # compatible data types, and allows calling functions in DLLs
                 # or shared libraries. It can be used to wrap these libraries
@@ -31,10 +33,14 @@ import ctypes   # is a foreign function library for Python. It provides C
 from interface.wavemeter_interface import WavemeterInterface
 from core.module import Base, ConfigOption
 from core.util.mutex import Mutex
+from core.util.ring_history import RingHistory
 
 
 class HardwarePull(QtCore.QObject):
-    """ Helper class for running the hardware communication in a separate thread. """
+    """ Helper class for polling the wavemeter in a separate thread.
+
+    Only used in the acquisition mode 'poll'.
+    """
 
     # signal to deliver the wavelength to the parent class
     sig_wavelength = QtCore.Signal(float, float)
@@ -68,7 +74,9 @@ class HardwarePull(QtCore.QObject):
         if self._parentclass.module_state() == 'running':
             # get the current wavelength from the wavemeter
             temp1=float(self._parentclass._wavemeterdll.GetWavelength(0))
-            temp2=float(self._parentclass._wavemeterdll.GetWavelength(0))
+            temp2=float(self._parentclass._wavemeterdll.GetWavelength2(0))
+            self._parentclass._add_reading(time.time(), temp1, 1)
+            self._parentclass._add_reading(time.time(), temp2, 2)
 
             # send the data to the parent via a signal
             self.sig_wavelength.emit(temp1, temp2)
@@ -78,11 +86,19 @@ class HardwarePull(QtCore.QObject):
 class HighFinesseWavemeter(Base,WavemeterInterface):
     """ Hardware class to controls a High Finesse Wavemeter.
 
+    In the acquisition mode 'callback' the wavemeter DLL calls back on every new measurement, so
+    every reading is recorded with the time of the measurement. In the mode 'poll' the
+    wavelength is read periodically with the measurement timing.
+    The readings are kept in a ring buffer and can be fetched in batches with
+    get_wavelength_data.
+
     Example config for copy-paste:
 
     high_finesse_wavemeter:
         module.Class: 'high_finesse_wavemeter.HighFinesseWavemeter'
         measurement_timing: 10.0 # in seconds
+        acquisition_mode: 'callback' # optional, 'callback' or 'poll'
+        buffer_length: 100000 # optional, number of buffered readings
 
     """
 
@@ -91,6 +107,8 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
 
     # config options
     _measurement_timing = ConfigOption('measurement_timing', default=10.)
+    _acquisition_mode = ConfigOption('acquisition_mode', default='callback')
+    _buffer_length = ConfigOption('buffer_length', default=100000)
 
     # signals
     sig_handle_timer = QtCore.Signal(bool)
@@ -105,6 +123,12 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
     _cCtrlStartMeasurment        = ctypes.c_uint16(0x1002)
     _cReturnWavelangthAir        = ctypes.c_long(0x0001)
     _cReturnWavelangthVac        = ctypes.c_long(0x0000)
+    # flags to install and remove the callback for new measurements
+    _cInstNotification           = ctypes.c_long(0x0001)
+    _cNotifyInstallCallback      = ctypes.c_long(0x0002)
+    _cNotifyRemoveCallback       = ctypes.c_long(0x0003)
+    # callback modes of new wavelength readings and their channel
+    _cmiWavelength               = {42: 1, 43: 2}
 
 
     def __init__(self, config, **kwargs):
@@ -117,6 +141,13 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
         self._current_wavelength = 0.0
         self._current_wavelength2 = 0.0
 
+        # readings in format [time of the wavemeter (s), wavelength (nm, vac),
+        # wavelength (nm, air), channel]
+        self._readings = None
+        # offset of the wavemeter time to the time since epoch
+        self._clock_offset = 0.
+        self._callback = None
+
 
     def on_activate(self):
         #############################################
@@ -159,6 +190,21 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
         # parameter data type of the Operation function of the wavemeter
         self._wavemeterdll.Operation.argtypes = [ctypes.c_ushort]
 
+        if self._acquisition_mode not in ('callback', 'poll'):
+            self.log.error('Unknown acquisition mode "{0}", using "poll" instead.'
+                           ''.format(self._acquisition_mode))
+            self._acquisition_mode = 'poll'
+        self._readings = RingHistory(4, self._buffer_length)
+
+        if self._acquisition_mode == 'callback':
+            # the callback of the DLL: void __stdcall CallbackProc(long Mode, long IntVal,
+            # double DblVal). The reference has to be kept as long as the callback is installed.
+            callback_type = ctypes.WINFUNCTYPE(None, ctypes.c_long, ctypes.c_long, ctypes.c_double)
+            self._callback = callback_type(self._wavelength_callback)
+            self._wavemeterdll.Instantiate.restype = ctypes.c_long
+            self._wavemeterdll.Instantiate.argtypes = [ctypes.c_long, ctypes.c_long,
+                                                       callback_type, ctypes.c_long]
+
         # create an indepentent thread for the hardware communication
         self.hardware_thread = QtCore.QThread()
 
@@ -178,8 +224,10 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
         if self.module_state() != 'idle' and self.module_state() != 'deactivated':
             self.stop_acqusition()
         self.hardware_thread.quit()
+        self.hardware_thread.wait()
         self.sig_handle_timer.disconnect()
         self._hardware_pull.sig_wavelength.disconnect()
+        self._callback = None
 
         try:
             # clean up by removing reference to the ctypes library object
@@ -200,6 +248,40 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
         self._current_wavelength = wavelength1
         self._current_wavelength2 = wavelength2
 
+    def _wavelength_callback(self, mode, int_val, dbl_val):
+        """ Callback of the wavemeter DLL. Runs in a thread of the DLL, so it only stores the
+        reading.
+
+        @param int mode: kind of the notification
+        @param int int_val: for new wavelength readings the time of the measurement in ms
+        @param float dbl_val: for new wavelength readings the wavelength in nm (vac)
+        """
+        channel = self._cmiWavelength.get(mode)
+        if channel is None:
+            return
+        measurement_time = int_val / 1000
+        # The reading arrives after the measurement, so the smallest difference is closest to
+        # the offset between the clock of the wavemeter and the time since epoch.
+        self._clock_offset = min(self._clock_offset, time.time() - measurement_time)
+        if channel == 1:
+            self._current_wavelength = dbl_val
+        else:
+            self._current_wavelength2 = dbl_val
+        self._add_reading(measurement_time, dbl_val, channel)
+
+    def _add_reading(self, measurement_time, wavelength, channel):
+        """ Add a reading to the buffer. Negative values are error codes of the wavemeter, e.g. for
+        no or too much signal, and are skipped.
+
+        The wavelength in air is converted here, once per reading, so the batches can be read
+        without calling the DLL for every reading.
+        """
+        if wavelength > 0:
+            wavelength_air = self._wavemeterdll.ConvertUnit(wavelength,
+                                                            self._cReturnWavelangthVac,
+                                                            self._cReturnWavelangthAir)
+            self._readings.append((measurement_time, wavelength, wavelength_air, channel))
+
     def start_acqusition(self):
         """ Method to start the wavemeter software.
 
@@ -215,11 +297,19 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
 
 
         self.module_state.run()
+        self._readings.clear()
+        if self._acquisition_mode == 'callback':
+            self._clock_offset = np.inf
+            self._wavemeterdll.Instantiate(self._cInstNotification, self._cNotifyInstallCallback,
+                                           self._callback, 0)
+        else:
+            self._clock_offset = 0.
         # actually start the wavemeter
         self._wavemeterdll.Operation(self._cCtrlStartMeasurment) #starts measurement
 
         # start the measuring thread
-        self.sig_handle_timer.emit(True)
+        if self._acquisition_mode == 'poll':
+            self.sig_handle_timer.emit(True)
 
         return 0
 
@@ -234,7 +324,11 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
                     'anyway!')
         else:
             # stop the measurement thread
-            self.sig_handle_timer.emit(True)
+            if self._acquisition_mode == 'callback':
+                self._wavemeterdll.Instantiate(self._cInstNotification,
+                                               self._cNotifyRemoveCallback, None, 0)
+            else:
+                self.sig_handle_timer.emit(False)
             # set status to idle again
             self.module_state.stop()
 
@@ -273,6 +367,25 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
             return float(self._current_wavelength2)
         return -2.0
 
+    def get_wavelength_data(self, first_sample=0, kind="air"):
+        """ Return all wavelength readings acquired since a sample number.
+
+        @param int first_sample: number of the first reading to return. Readings that are not
+                                 buffered anymore are skipped.
+        @param str kind: can either be "air" or "vac" for the wavelength in air or vacuum,
+                         respectively.
+
+        @return (int, numpy.ndarray): number of the next reading and the readings in format
+                                      [time (s since epoch), wavelength (nm), channel][reading]
+        """
+        count = self._readings.count
+        # the wavelengths in air are converted when the readings are stored
+        wavelength_row = 2 if kind in "air" else 1
+        data = self._readings.read(first_sample, count)[[0, wavelength_row, 3]]
+        if np.isfinite(self._clock_offset):
+            data[0] += self._clock_offset
+        return count, data
+
     def get_timing(self):
         """ Get the timing of the internal measurement thread.
 
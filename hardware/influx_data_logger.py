@@ -19,14 +19,67 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import json
+import os
+import threading
+import time
+from collections import deque
+from qtpy import QtCore
+
 from core.module import Base, ConfigOption
+from core.util.modules import get_home_dir
 from interface.data_logger_interface import DataLoggerInterface
 
 from influxdb import InfluxDBClient
 
+
+class InfluxWriter(QtCore.QObject):
+    """ Helper class writing the logged points to the database in a separate thread.
+
+    Points are collected into batches which are written as soon as they contain batch_size points
+    or flush_interval seconds have passed since the last write. If the database is unavailable,
+    the batches are appended to the spool file instead. The spooled points are written to the
+    database once it is reachable again, before any new points.
+    """
+
+    def __init__(self, parentclass):
+        super().__init__()
+
+        # remember the reference to the parent class to access functions ad settings
+        self._parentclass = parentclass
+
+    def run(self):
+        """ Write points until the parent module is deactivated. """
+        logger = self._parentclass
+        next_retry = 0
+        while True:
+            with logger._points_condition:
+                if len(logger._points) < logger.batch_size and not logger._stop_writer:
+                    logger._points_condition.wait(logger.flush_interval)
+                stop = logger._stop_writer
+                batch = [logger._points.popleft()
+                         for _ in range(min(len(logger._points), logger.batch_size))]
+
+            if logger.spooled_points > 0 and time.monotonic() >= next_retry:
+                if logger._replay_spool() < 0:
+                    next_retry = time.monotonic() + logger.retry_interval
+            # while there are spooled points, new points are spooled as well to keep the order
+            if len(batch) > 0 and (logger.spooled_points > 0 or logger._write_batch(batch) < 0):
+                if logger.spooled_points == 0:
+                    next_retry = time.monotonic() + logger.retry_interval
+                logger._spool_batch(batch)
+            if stop and len(logger._points) == 0:
+                break
+
+
 class InfluxLogger(Base, DataLoggerInterface):
     """ Log instrument values to InfluxDB.
 
+    The values are not written one by one. They are collected and written in batches by a
+    background thread, so log_to_channel returns immediately. If the database cannot be reached,
+    the points are appended to a local spool file and written to the database when the connection
+    is back.
+
     Example config for copy-paste:
 
     influx_data_logger:
@@ -39,6 +92,11 @@ class InfluxLogger(Base, DataLoggerInterface):
         dataseries: 'data_series_name'
         field: 'field_name'
         criterion: 'criterion_name'
+        batch_size: 500  # optional, maximum number of points written at once
+        flush_interval: 1  # optional, maximum time in s a point waits before it is written
+        retry_interval: 10  # optional, time in s between reconnection attempts
+        write_timeout: 5  # optional, time in s after which a write to the database fails
+        spool_file: 'C:/Data/influx_spool.txt'  # optional, default is in the home directory
 
     """
 
@@ -53,25 +111,64 @@ class InfluxLogger(Base, DataLoggerInterface):
     series = ConfigOption('dataseries', missing='error')
     field = ConfigOption('field', missing='error')
     cr = ConfigOption('criterion', missing='error')
+    batch_size = ConfigOption('batch_size', 500)
+    flush_interval = ConfigOption('flush_interval', 1.)
+    retry_interval = ConfigOption('retry_interval', 10.)
+    write_timeout = ConfigOption('write_timeout', 5.)
+    spool_file = ConfigOption('spool_file', os.path.join(get_home_dir(), 'influx_spool.txt'))
 
+    sigStartWriter = QtCore.Signal()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.log_channels = {}
 
+        self._points = deque()
+        self._points_condition = threading.Condition()
+        self._stop_writer = False
+        self.spooled_points = 0
+
     def on_activate(self):
         """ Activate module.
         """
         self.connect_db()
 
+        # points left in the spool file by a previous session are written first
+        self.spooled_points = 0
+        if os.path.isfile(self.spool_file):
+            with open(self.spool_file, 'r') as spool:
+                self.spooled_points = sum(1 for line in spool if line.strip())
+            if self.spooled_points > 0:
+                self.log.info('{0:d} spooled points will be written to the database.'
+                              ''.format(self.spooled_points))
+
+        self._stop_writer = False
+        self._writer = InfluxWriter(self)
+        self._writer_thread = QtCore.QThread()
+        self._writer.moveToThread(self._writer_thread)
+        self.sigStartWriter.connect(self._writer.run, QtCore.Qt.QueuedConnection)
+        self._writer_thread.start()
+        self.sigStartWriter.emit()
+
     def on_deactivate(self):
         """ Deactivate module.
+
+        The points not written yet are written to the database or the spool file.
         """
+        with self._points_condition:
+            self._stop_writer = True
+            self._points_condition.notify_all()
+        self._writer_thread.quit()
+        self._writer_thread.wait()
+        self.sigStartWriter.disconnect()
         del self.conn
 
     def connect_db(self):
         """ Connect to Influx database """
-        self.conn = InfluxDBClient(self.host, self.port, self.user, self.pw, self.dbname)
+        # a single attempt per write with a timeout, failed batches are spooled and retried by
+        # the writer thread, which must not hang on an unreachable database
+        self.conn = InfluxDBClient(self.host, self.port, self.user, self.pw, self.dbname,
+                                   timeout=self.write_timeout, retries=1)
 
     def get_log_channels(self):
         """ Get number of logging channels
@@ -83,33 +180,53 @@ class InfluxLogger(Base, DataLoggerInterface):
     def set_log_channels(self, channelspec):
         """ Set number of logging channels.
 
-            @param channelspec dict: name, spec
+            @param channelspec dict: name, spec. The spec is a dict with the list of field names
+                                     'fields' and optionally the dict of tags 'tags' of the
+                                     channel. A spec of None removes the channel.
         """
         for name, spec in channelspec.items():
-            if spec is None and name in self.log_channels:
-                self.log_channels.pop(name)
-            elif name in self.log_channels:
-                pass
+            if spec is None:
+                self.log_channels.pop(name, None)
+            elif 'fields' not in spec:
+                self.log.error('The spec of channel {0} contains no fields.'.format(name))
             else:
-                pass
-                if True:
-                    pass
+                self.log_channels[name] = {'fields': list(spec['fields']),
+                                           'tags': dict(spec.get('tags', dict()))}
 
     def log_to_channel(self, channel, values):
         """ Log values to a specific channel.
 
+            The values are written to the database in the background.
+
             @param channel str: channel name
-            @param values list: data to be logged
+            @param values list: data to be logged, one value per field of the channel
+
+            @return int: error code (0:OK, -1:error)
         """
-        if channel in self.log_channels.keys() and len(values) == len(self.log_channels[channel][values]):
-            conn.write_points(format_data(channel, values, channeltags))
+        if channel not in self.log_channels:
+            self.log.error('Channel {0} is not configured.'.format(channel))
+            return -1
+        fields = self.log_channels[channel]['fields']
+        if len(values) != len(fields):
+            self.log.error('Channel {0} needs {1:d} values, {2:d} were given.'
+                           ''.format(channel, len(fields), len(values)))
+            return -1
+        point = self.format_data(channel, dict(zip(fields, values)),
+                                 self.log_channels[channel]['tags'])[0]
+        # the time stamp is taken here, so the delayed write does not change it
+        point['time'] = int(time.time() * 1e9)
+        with self._points_condition:
+            self._points.append(point)
+            if len(self._points) >= self.batch_size:
+                self._points_condition.notify_all()
+        return 0
 
     def format_data(self, channel_name, values, tags):
         """ Format data according to InfluxDB JSON API.
 
             @param channel_name str: channel name
-            @param values list: data
-            @param tags list(str): list of tags
+            @param values dict: field names and values
+            @param tags dict: tag names and values
         """
         return [{
              'measurement': channel_name,
@@ -117,3 +234,88 @@ class InfluxLogger(Base, DataLoggerInterface):
              'tags': tags
             }]
 
+    def get_backlog(self):
+        """ Number of points that are not written to the database yet.
+
+            @return tuple(int, int): number of points waiting in memory and in the spool file
+        """
+        return len(self._points), self.spooled_points
+
+    def _write_batch(self, batch):
+        """ Write a batch of points to the database.
+
+            @param list batch: points in InfluxDB JSON format
+
+            @return int: error code (0:OK, -1:error)
+        """
+        try:
+            self.conn.write_points(batch, time_precision='n')
+        except Exception as e:
+            self.log.warning('Writing to InfluxDB failed: {0}'.format(e))
+            return -1
+        return 0
+
+    def _spool_batch(self, batch):
+        """ Append a batch of points to the spool file.
+
+            @param list batch: points in InfluxDB JSON format
+        """
+        try:
+            with open(self.spool_file, 'a') as spool:
+                spool.write(''.join(json.dumps(point) + '\n' for point in batch))
+            self.spooled_points += len(batch)
+        except (OSError, TypeError, ValueError):
+            self.log.exception('{0:d} points could not be written to the spool file and are '
+                               'lost.'.format(len(batch)))
+
+    def _replay_spool(self):
+        """ Write the points of the spool file to the database.
+
+            The points written successfully are removed from the spool file. Points are written
+            with their original time stamp, so writing a point twice does not duplicate it.
+
+            @return int: error code (0:OK, -1:error)
+        """
+        try:
+            with open(self.spool_file, 'r') as spool:
+                lines = [line for line in spool if line.strip()]
+        except OSError:
+            self.log.exception('Could not read the spool file.')
+            return -1
+
+        # only invalid lines are dropped, the valid points around them are still written
+        points = list()
+        for line in lines:
+            try:
+                points.append((line.rstrip('\n') + '\n', json.loads(line)))
+            except ValueError:
+                pass
+        if len(points) < len(lines):
+            self.log.error('Spool file contains {0:d} invalid points, they are skipped.'
+                           ''.format(len(lines) - len(points)))
+        lines = [line for line, point in points]
+
+        written = 0
+        error = 0
+        while written < len(points):
+            batch = [point for line, point in points[written:written + self.batch_size]]
+            if self._write_batch(batch) < 0:
+                error = -1
+                break
+            written += len(batch)
+
+        try:
+            if error < 0:
+                tmp_file = self.spool_file + '.tmp'
+                with open(tmp_file, 'w') as spool:
+                    spool.writelines(lines[written:])
+                os.replace(tmp_file, self.spool_file)
+            else:
+                os.remove(self.spool_file)
+        except OSError:
+            self.log.exception('Could not update the spool file.')
+            return -1
+        self.spooled_points = len(lines) - written
+        if error == 0:
+            self.log.info('{0:d} spooled points written to the database.'.format(len(lines)))
+        return error
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the continuous gated counter acquisition of the NI X series card and a
+simulated DAQmx backend to run it without a card.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import ctypes
+import threading
+import numpy as np
+
+
+class GatedCounterStream:
+    """ Continuous gated photon counting into a circular buffer of preallocated blocks.
+
+    DAQmx acquires the counts of every gate into its own circular buffer. Every block_samples
+    gates DAQmx calls back, and the callback reads the new samples directly into the next
+    block of the buffer, so nothing is allocated while streaming. The logic fetches the blocks
+    with read, which never waits for the card.
+
+    The blocks returned by read are views into the buffer. They are overwritten once the
+    acquisition has wrapped around the buffer, i.e. buffer_blocks - 1 blocks later.
+    """
+
+    def __init__(self, daq, block_samples, buffer_blocks):
+        """
+        @param daq: DAQmx backend, the PyDAQmx module or a SimulatedDaq
+        @param int block_samples: number of gates per block
+        @param int buffer_blocks: number of blocks in the buffer
+        """
+        self._daq = daq
+        self.block_samples = int(block_samples)
+        self.buffer_blocks = max(int(buffer_blocks), 2)
+        self._blocks = np.zeros((self.buffer_blocks, self.block_samples), dtype=np.uint32)
+        self._n_read_samples = daq.int32()
+        self._task = None
+        self._callback = None
+        self.written_blocks = 0
+        self.error = None
+
+    def set_up(self, counter_channel, gate_channel, photon_source, max_counts,
+               counting_edge_rising=True):
+        """ Create the counter task and register the callback.
+
+        @param str counter_channel: physical channel of the counter
+        @param str gate_channel: terminal of the gate pulses
+        @param str photon_source: terminal of the photon pulses
+        @param float max_counts: expected maximum number of counts in a gate
+        @param bool counting_edge_rising: start counting on the rising edge of the gate
+        """
+        daq = self._daq
+        self._task = daq.TaskHandle()
+        daq.DAQmxCreateTask('GatedCounterStream', daq.byref(self._task))
+        # count photon ticks during every gate pulse
+        daq.DAQmxCreateCIPulseWidthChan(
+            self._task,
+            counter_channel,
+            'Gated Counter Stream',
+            0,
+            max_counts,
+            daq.DAQmx_Val_Ticks,
+            daq.DAQmx_Val_Rising if counting_edge_rising else daq.DAQmx_Val_Falling,
+            '')
+        daq.DAQmxSetCIPulseWidthTerm(self._task, counter_channel, gate_channel)
+        daq.DAQmxSetCICtrTimebaseSrc(self._task, counter_channel, photon_source)
+
+        # the DAQmx buffer only has to bridge the time until the callback has read a block
+        buffer_samples = self.block_samples * self.buffer_blocks
+        daq.DAQmxCfgImplicitTiming(self._task, daq.DAQmx_Val_ContSamps, buffer_samples)
+        daq.DAQmxCfgInputBuffer(self._task, buffer_samples)
+        daq.DAQmxSetReadRelativeTo(self._task, daq.DAQmx_Val_CurrReadPos)
+        daq.DAQmxSetReadOffset(self._task, 0)
+        daq.DAQmxSetReadOverWrite(self._task, daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+
+        # keep a reference to the callback, DAQmx only holds a pointer to it
+        self._callback = daq.DAQmxEveryNSamplesEventCallbackPtr(self._every_n_samples)
+        daq.DAQmxRegisterEveryNSamplesEvent(
+            self._task,
+            daq.DAQmx_Val_Acquired_Into_Buffer,
+            self.block_samples,
+            0,
+            self._callback,
+            None)
+
+    def start(self):
+        """ Start the acquisition with an empty buffer. """
+        self.written_blocks = 0
+        self.error = None
+        self._daq.DAQmxStartTask(self._task)
+
+    def stop(self):
+        """ Stop the acquisition. Blocks already acquired can still be read. """
+        self._daq.DAQmxStopTask(self._task)
+
+    def close(self):
+        """ Stop the acquisition and clear the task. """
+        if self._task is None:
+            return
+        try:
+            self._daq.DAQmxStopTask(self._task)
+        finally:
+            self._daq.DAQmxClearTask(self._task)
+            self._task = None
+
+    def read(self, first_block=0):
+        """ Return the blocks acquired since a block number without waiting.
+
+        Only contiguous blocks of the buffer are returned at once. If more blocks are available
+        after the end of the buffer, the next call returns them.
+
+        @param int first_block: number of the first block to return
+
+        @return (int, numpy.ndarray, int): number of the block after the returned ones, view of
+                                          the blocks in format [block][gate] and the number of
+                                          blocks lost since first_block because they have been
+                                          overwritten
+        """
+        written = self.written_blocks
+        # the block after the newest one may be written by the callback right now
+        lost = max(written - (self.buffer_blocks - 1) - first_block, 0)
+        first_block += lost
+        start = first_block % self.buffer_blocks
+        count = min(written - first_block, self.buffer_blocks - start)
+        return first_block + count, self._blocks[start:start + count], lost
+
+    def _every_n_samples(self, task, event_type, n_samples, callback_data):
+        """ Callback of DAQmx in its own thread: read the new samples into the next block. """
+        try:
+            self._daq.DAQmxReadCounterU32(
+                self._task,
+                self.block_samples,
+                0.,
+                self._blocks[self.written_blocks % self.buffer_blocks],
+                self.block_samples,
+                self._daq.byref(self._n_read_samples),
+                None)
+        except Exception as e:
+            # raising would end up in DAQmx, the owner checks error instead
+            self.error = e
+            return -1
+        self.written_blocks += 1
+        return 0
+
+
+class SimulatedDaq:
+    """ Simulation of the DAQmx functions used by GatedCounterStream.
+
+    Gates arrive with a fixed rate and their counts are Poisson distributed. Like the card, the
+    simulation raises an error if unread samples would be overwritten.
+    """
+    DAQmx_Val_Ticks = 10304
+    DAQmx_Val_Rising = 10280
+    DAQmx_Val_Falling = 10171
+    DAQmx_Val_ContSamps = 10123
+    DAQmx_Val_CurrReadPos = 10425
+    DAQmx_Val_DoNotOverwriteUnreadSamps = 10159
+    DAQmx_Val_Acquired_Into_Buffer = 1
+
+    TaskHandle = ctypes.c_void_p
+    int32 = ctypes.c_int32
+    uInt32 = ctypes.c_uint32
+    byref = staticmethod(ctypes.byref)
+    DAQmxEveryNSamplesEventCallbackPtr = ctypes.CFUNCTYPE(
+        ctypes.c_int32, ctypes.c_void_p, ctypes.c_int32, ctypes.c_uint32, ctypes.c_void_p)
+
+    class DAQError(Exception):
+        pass
+
+    def __init__(self, gate_rate=1000., mean_counts=20.):
+        """
+        @param float gate_rate: number of gates per second
+        @param float mean_counts: mean number of counts in a gate
+        """
+        self.gate_rate = gate_rate
+        self.mean_counts = mean_counts
+        self._tasks = dict()
+
+    def DAQmxCreateTask(self, name, task_ref):
+        task_ref._obj.value = len(self._tasks) + 1
+        self._tasks[task_ref._obj.value] = {'buffer': 1000, 'callback': None, 'thread': None}
+
+    def _task(self, task):
+        return self._tasks[task.value if isinstance(task, ctypes.c_void_p) else task]
+
+    def DAQmxCreateCIPulseWidthChan(self, task, *args):
+        self._task(task)
+
+    def DAQmxSetCIPulseWidthTerm(self, task, *args):
+        self._task(task)
+
+    def DAQmxSetCICtrTimebaseSrc(self, task, *args):
+        self._task(task)
+
+    def DAQmxSetReadRelativeTo(self, task, *args):
+        self._task(task)
+
+    def DAQmxSetReadOffset(self, task, *args):
+        self._task(task)
+
+    def DAQmxSetReadOverWrite(self, task, *args):
+        self._task(task)
+
+    def DAQmxCfgImplicitTiming(self, task, mode, samples):
+        self._task(task)['buffer'] = int(samples)
+
+    def DAQmxCfgInputBuffer(self, task, samples):
+        self._task(task)['buffer'] = int(samples)
+
+    def DAQmxRegisterEveryNSamplesEvent(self, task, event_type, n_samples, options, callback,
+                                        callback_data):
+        self._task(task).update(callback=callback, n_samples=int(n_samples))
+
+    def DAQmxStartTask(self, task):
+        state = self._task(task)
+        if state['thread'] is not None:
+            raise self.DAQError('Task is already running.')
+        state['samples'] = np.zeros(0, dtype=np.uint32)
+        state.pop('error', None)
+        state['stop'] = threading.Event()
+        state['lock'] = threading.Lock()
+        state['thread'] = threading.Thread(target=self._acquire, args=(task, state), daemon=True)
+        state['thread'].start()
+
+    def DAQmxStopTask(self, task):
+        state = self._task(task)
+        if state['thread'] is not None:
+            state['stop'].set()
+            state['thread'].join()
+            state['thread'] = None
+
+    def DAQmxClearTask(self, task):
+        self.DAQmxStopTask(task)
+        del self._tasks[task.value]
+
+    def DAQmxGetReadAvailSampPerChan(self, task, available_ref):
+        available_ref._obj.value = len(self._task(task)['samples'])
+
+    def DAQmxReadCounterU32(self, task, num_samples, timeout, data, array_size, n_read_ref,
+                            reserved):
+        state = self._task(task)
+        with state['lock']:
+            if 'error' in state:
+                raise state['error']
+            if len(state['samples']) < num_samples:
+                raise self.DAQError('Timeout while waiting for {0:d} samples.'
+                                    ''.format(num_samples))
+            data[:num_samples] = state['samples'][:num_samples]
+            state['samples'] = state['samples'][num_samples:]
+        n_read_ref._obj.value = num_samples
+
+    def _acquire(self, task, state):
+        n_samples = state.get('n_samples', 1)
+        while not state['stop'].wait(n_samples / self.gate_rate):
+            new = np.random.poisson(self.mean_counts, n_samples).astype(np.uint32)
+            with state['lock']:
+                if len(state['samples']) + n_samples > state['buffer']:
+                    # the card stops with an error instead of overwriting unread samples
+                    state['error'] = self.DAQError('Buffer overflow, samples were not read.')
+                    return
+                state['samples'] = np.concatenate((state['samples'], new))
+            if state['callback'] is not None:
+                state['callback'](task, self.DAQmx_Val_Acquired_Into_Buffer, n_samples, None)
@@ -31,6 +31,7 @@ from interface.kolkowitz.slow_counter_interface import SlowCounterConstraints
 from interface.kolkowitz.slow_counter_interface import CountingMode
 from interface.odmr_counter_interface import ODMRCounterInterface
 from interface.kolkowitz.confocal_scanner_interface import ConfocalScannerInterface
+from .gated_counter_stream import GatedCounterStream, SimulatedDaq
 
 
 class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInterface, ODMRCounterInterface):
@@ -79,12 +80,15 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             - [-10, 10]
 
         odmr_trigger_channel: '/Dev1/PFI7'
+        odmr_buffer_sweeps: 100 # optional, buffer length of the continuous ODMR acquisition
 
         gate_in_channel: '/Dev1/PFI9'
         default_samples_number: 50
         max_counts: 3e7
         read_write_timeout: 10
         counting_edge_rising: True
+        gated_stream_buffer_blocks: 100 # optional, blocks buffered by continuous gated counting
+        gated_stream_backend: 'daqmx' # optional, 'simulated' streams without a card
 
     """
 
@@ -115,6 +119,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
     _odmr_trigger_channel = ConfigOption('odmr_trigger_channel', missing='error')
     _odmr_trigger_line = ConfigOption('odmr_trigger_line', 'Dev1/port0/line0', missing='warn')
     _odmr_switch_line = ConfigOption('odmr_switch_line', 'Dev1/port0/line1', missing='warn')
+    # number of sweeps fitting into the circular buffer of the continuous ODMR acquisition
+    _odmr_buffer_sweeps = ConfigOption('odmr_buffer_sweeps', 100, missing='info')
 
     _gate_in_channel = ConfigOption('gate_in_channel', missing='error')
     # number of readout samples, mainly used for gated counter
@@ -124,6 +130,11 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
     # timeout for the Read or/and write process in s
     _RWTimeout = ConfigOption('read_write_timeout', default=10)
     _counting_edge_rising = ConfigOption('counting_edge_rising', default=True)
+    # continuous gated counting: number of blocks buffered for the logic and the DAQmx backend,
+    # 'daqmx' for the card or 'simulated' to stream without a card
+    _gated_stream_buffer_blocks = ConfigOption('gated_stream_buffer_blocks', 100)
+    _gated_stream_backend = ConfigOption('gated_stream_backend', 'daqmx')
+    _simulated_gate_rate = ConfigOption('simulated_gate_rate', 1000.)
 
     def on_activate(self):
         """ Starts up the NI Card at activation.
@@ -138,8 +149,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         self._line_length = None
         self._odmr_length = None
         self._gated_counter_daq_task = None
+        self._gated_stream = None
+        self._counter_raw_data = np.empty((0, 0), dtype=np.uint32)
         self._scanner_analog_daq_task = None
         self._odmr_pulser_daq_task = None
+        self._odmr_continuous = False
+        self._odmr_sweep_length = None
         self._oversampling = 0
         self._lock_in_active = False
 
@@ -167,6 +182,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
     def on_deactivate(self):
         """ Shut down the NI card.
         """
+        if self._gated_stream is not None:
+            self.close_gated_counter_stream()
         self.reset_hardware()
 
     # =================== SlowCounterInterface Commands ========================
@@ -395,8 +412,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         else:
             samples = int(samples)
         try:
-            # count data will be written here in the NumPy array of length samples
-            count_data = np.empty((len(self._counter_daq_tasks), 2 * samples), dtype=np.uint32)
+            # count data will be written here, the array is reused as long as the number of
+            # samples does not change
+            if self._counter_raw_data.shape != (len(self._counter_daq_tasks), 2 * samples):
+                self._counter_raw_data = np.empty((len(self._counter_daq_tasks), 2 * samples),
+                                                  dtype=np.uint32)
+            count_data = self._counter_raw_data
 
             # number of samples which were actually read, will be stored here
             n_read_samples = daq.int32()
@@ -442,16 +463,14 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # in case of error return a lot of -1
             return np.ones((len(self.get_counter_channels()), samples), dtype=np.uint32) * -1
 
-        real_data = np.empty((len(self._counter_channels), samples), dtype=np.uint32)
+        all_data = np.empty((len(self.get_counter_channels()), samples), dtype=np.float64)
+        real_data = all_data[:len(self._counter_daq_tasks)]
 
         # add up adjoint pixels to also get the counts from the low time of
-        # the clock:
-        real_data = count_data[:, ::2]
-        real_data += count_data[:, 1::2]
-
-        all_data = np.full((len(self.get_counter_channels()), samples), 222, dtype=np.float64)
+        # the clock, directly into the output array:
+        np.add(count_data[:, ::2], count_data[:, 1::2], out=real_data)
         # normalize to counts per second for counter channels
-        all_data[0:len(real_data)] = np.array(real_data * self._clock_frequency, np.float64)
+        real_data *= self._clock_frequency
 
         if len(self._counter_ai_channels) > 0:
             all_data[-len(self._counter_ai_channels):] = analog_data
@@ -1608,23 +1627,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
         if self._odmr_pulser_daq_task:
             try:
-
-                # The pulse pattern is an alternating 0 and 1 on the switching channel (line0),
-                # while the first half of the whole microwave pulse is 1 and the other half is 0.
-                # This way the beginning of the microwave has a rising edge.
-                pulse_pattern = np.zeros(self.oversampling * 2, dtype=np.uint32)
-                pulse_pattern[:self.oversampling] += 1
-                pulse_pattern[::2] += 2
-
-                daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
-                                         len(pulse_pattern),
-                                         0,
-                                         self._RWTimeout * self._odmr_length,
-                                         daq.DAQmx_Val_GroupByChannel,
-                                         pulse_pattern,
-                                         None,
-                                         None)
-
+                self._write_odmr_pulse_pattern()
                 daq.DAQmxStartTask(self._odmr_pulser_daq_task)
             except:
                 self.log.exception('Cannot start ODMR pulser.')
@@ -1694,59 +1697,255 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             if self._odmr_pulser_daq_task:
                 daq.DAQmxStopTask(self._odmr_pulser_daq_task)
 
-            # prepare array to return data
-            all_data = np.full((len(self.get_odmr_channels()), length),
-                               222,
-                               dtype=np.float64)
+            # drop the last sample and treat the line as a batch of a single sweep
+            if len(self._scanner_ai_channels) > 0:
+                analog_sweeps = odmr_analog_data[:, np.newaxis, :self._odmr_length]
+            else:
+                analog_sweeps = None
+            all_data = self._demodulate_odmr_data(
+                odmr_data[np.newaxis, :2 * self._odmr_length], analog_sweeps, length)
 
-            # create a new array for the final data (this time of the length
-            # number of samples)
-            real_data = np.zeros((self._odmr_length, ), dtype=np.uint32)
+            return False, all_data[0]
+        except:
+            self.log.exception('Error while counting for ODMR.')
+            return True, np.full((len(self.get_odmr_channels()), 1), [-1.])
 
-            # add upp adjoint pixels to also get the counts from the low time of
-            # the clock:
+    def supports_continuous_odmr(self):
+        """ Whether the counter can acquire sweeps continuously with a free running microwave sweep.
+
+        @return bool: True if start_continuous_odmr is supported, False if not
+        """
+        return True
 
-            real_data += odmr_data[1:-1:2]
-            real_data += odmr_data[:-1:2]
+    def start_continuous_odmr(self, length=100):
+        """ Start a continuous ODMR acquisition into a circular buffer.
+
+        The clock runs continuously and triggers the microwave for every pixel, so the list/sweep
+        of the microwave source has to wrap around to its first step after the last one. The
+        counter (and analog input) tasks write into circular buffers holding odmr_buffer_sweeps
+        sweeps, which are read out with read_odmr_sweeps.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if len(self._scanner_counter_daq_tasks) < 1:
+            self.log.error('No counter is running, cannot start a continuous ODMR without one.')
+            return -1
+
+        if len(self._scanner_ai_channels) > 0 and self._scanner_analog_daq_task is None:
+            self.log.error('No analog task is running, cannot do ODMR without one.')
+            return -1
+
+        if self._odmr_continuous:
+            self.log.error('Continuous ODMR is already running, stop it first.')
+            return -1
+
+        self._odmr_sweep_length = int(length)
+        if self._odmr_pulser_daq_task:
+            self._odmr_length = self._odmr_sweep_length * self.oversampling * 2
+        else:
+            self._odmr_length = self._odmr_sweep_length
+        buffer_samples = self._odmr_length * max(int(self._odmr_buffer_sweeps), 2)
+
+        try:
+            # free running clock
+            daq.DAQmxCfgImplicitTiming(
+                self._scanner_clock_daq_task,
+                daq.DAQmx_Val_ContSamps,
+                1000)
+
+            # two semi periods are counted for each clock pulse
+            daq.DAQmxCfgImplicitTiming(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_ContSamps,
+                2 * buffer_samples)
+            daq.DAQmxCfgInputBuffer(self._scanner_counter_daq_tasks[0], 2 * buffer_samples)
+
+            # read samples from current position of acquisition and raise an error if the
+            # circular buffer overflows instead of silently losing sweeps
+            daq.DAQmxSetReadRelativeTo(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_CurrReadPos)
+            daq.DAQmxSetReadOffset(
+                self._scanner_counter_daq_tasks[0],
+                0)
+            daq.DAQmxSetReadOverWrite(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxCfgSampClkTiming(
+                    self._scanner_analog_daq_task,
+                    self._scanner_clock_channel + 'InternalOutput',
+                    self._scanner_clock_frequency,
+                    daq.DAQmx_Val_Rising,
+                    daq.DAQmx_Val_ContSamps,
+                    buffer_samples)
+                daq.DAQmxCfgInputBuffer(self._scanner_analog_daq_task, buffer_samples)
 
             if self._odmr_pulser_daq_task:
-                differential_data = np.zeros((self.oversampling * length, ), dtype=np.float64)
-
-                differential_data += real_data[1::2]
-                differential_data -= real_data[::2]
-                differential_data = np.divide(differential_data, real_data[::2],
-                                              np.zeros_like(differential_data),
-                                              where=real_data[::2] != 0)
-
-                all_data[0] = np.median(np.reshape(differential_data,
-                                                   (-1, self.oversampling)),
-                                        axis=1
-                                        )
-
-                if len(self._scanner_ai_channels) > 0:
-                    for i, analog_data in enumerate(odmr_analog_data):
-                        differential_data = np.zeros((self.oversampling * length, ), dtype=np.float64)
-
-                        differential_data += analog_data[1:-1:2]
-                        differential_data -= analog_data[:-1:2]
-                        differential_data = np.divide(differential_data, analog_data[:-1:2],
-                                                      np.zeros_like(differential_data),
-                                                      where=analog_data[:-1:2] != 0)
-
-                        all_data[i+1] = np.median(np.reshape(differential_data,
-                                                             (-1, self.oversampling)),
-                                                  axis=1
-                                                  )
+                daq.DAQmxCfgSampClkTiming(
+                    self._odmr_pulser_daq_task,
+                    self._scanner_clock_channel + 'InternalOutput',
+                    self._scanner_clock_frequency,
+                    daq.DAQmx_Val_Rising,
+                    daq.DAQmx_Val_ContSamps,
+                    self.oversampling * 2)
+                self._write_odmr_pulse_pattern()
 
-            else:
-                all_data[0] = np.array(real_data * self._scanner_clock_frequency, np.float64)
-                if len(self._scanner_ai_channels) > 0:
-                    all_data[1:] = odmr_analog_data[:, :-1]
+            daq.DAQmxStartTask(self._scanner_counter_daq_tasks[0])
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxStartTask(self._scanner_analog_daq_task)
+            if self._odmr_pulser_daq_task:
+                daq.DAQmxStartTask(self._odmr_pulser_daq_task)
+            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+        except:
+            self.log.exception('Error while starting continuous ODMR.')
+            self._stop_odmr_tasks()
+            return -1
+
+        self._odmr_continuous = True
+        return 0
+
+    def read_odmr_sweeps(self, max_sweeps=None):
+        """ Return all sweeps completed since the last call of a continuous ODMR acquisition.
+
+        Waits for at least one sweep to complete. The demodulation of all sweeps is done at once.
+
+        @param int max_sweeps: optional, maximum number of sweeps to return
+
+        @return (bool, float[][][]): tuple: was there an error, the data of the sweeps in
+                                     format [sweep][channel][pixel]
+        """
+        channel_number = len(self.get_odmr_channels())
+        if not self._odmr_continuous:
+            self.log.error('No continuous ODMR is running, cannot read sweeps.')
+            return True, np.full((0, channel_number, 1), -1.)
+
+        sweep_samples = 2 * self._odmr_length
+        sweep_time = self._odmr_length / self._scanner_clock_frequency
+        try:
+            available = daq.uInt32()
+            daq.DAQmxGetReadAvailSampPerChan(self._scanner_counter_daq_tasks[0],
+                                             daq.byref(available))
+            n_sweeps = max(available.value // sweep_samples, 1)
+            if max_sweeps is not None:
+                n_sweeps = min(n_sweeps, max(int(max_sweeps), 1))
+
+            odmr_data = np.full((n_sweeps * sweep_samples, ), 222, dtype=np.uint32)
+            n_read_samples = daq.int32()
+            daq.DAQmxReadCounterU32(
+                self._scanner_counter_daq_tasks[0],
+                n_sweeps * sweep_samples,
+                self._RWTimeout + sweep_time,
+                odmr_data,
+                n_sweeps * sweep_samples,
+                daq.byref(n_read_samples),
+                None)
+
+            analog_sweeps = None
+            if len(self._scanner_ai_channels) > 0:
+                odmr_analog_data = np.full(
+                    (len(self._scanner_ai_channels), n_sweeps * self._odmr_length),
+                    222,
+                    dtype=np.float64)
+                analog_read_samples = daq.int32()
+                daq.DAQmxReadAnalogF64(
+                    self._scanner_analog_daq_task,
+                    n_sweeps * self._odmr_length,
+                    self._RWTimeout + sweep_time,
+                    daq.DAQmx_Val_GroupByChannel,
+                    odmr_analog_data,
+                    odmr_analog_data.size,
+                    daq.byref(analog_read_samples),
+                    None)
+                analog_sweeps = odmr_analog_data.reshape(
+                    len(self._scanner_ai_channels), n_sweeps, self._odmr_length)
 
-            return False, all_data
+            return False, self._demodulate_odmr_data(
+                odmr_data.reshape(n_sweeps, sweep_samples), analog_sweeps, self._odmr_sweep_length)
         except:
-            self.log.exception('Error while counting for ODMR.')
-            return True, np.full((len(self.get_odmr_channels()), 1), [-1.])
+            self.log.exception('Error while reading continuous ODMR sweeps.')
+            return True, np.full((0, channel_number, 1), -1.)
+
+    def stop_continuous_odmr(self):
+        """ Stop a continuous ODMR acquisition. The counter stays set up until close_odmr.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if not self._odmr_continuous:
+            return 0
+        self._odmr_continuous = False
+        return self._stop_odmr_tasks()
+
+    def _stop_odmr_tasks(self):
+        """ Stop the clock, counter, analog and pulser tasks of the ODMR.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        try:
+            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            daq.DAQmxStopTask(self._scanner_counter_daq_tasks[0])
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+            if self._odmr_pulser_daq_task:
+                daq.DAQmxStopTask(self._odmr_pulser_daq_task)
+        except:
+            self.log.exception('Error while stopping ODMR tasks.')
+            return -1
+        return 0
+
+    def _write_odmr_pulse_pattern(self):
+        """ Write the lock-in pulse pattern to the ODMR pulser task. """
+        # The pulse pattern is an alternating 0 and 1 on the switching channel (line0),
+        # while the first half of the whole microwave pulse is 1 and the other half is 0.
+        # This way the beginning of the microwave has a rising edge.
+        pulse_pattern = np.zeros(self.oversampling * 2, dtype=np.uint32)
+        pulse_pattern[:self.oversampling] += 1
+        pulse_pattern[::2] += 2
+
+        daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
+                                 len(pulse_pattern),
+                                 0,
+                                 self._RWTimeout * self._odmr_length,
+                                 daq.DAQmx_Val_GroupByChannel,
+                                 pulse_pattern,
+                                 None,
+                                 None)
+
+    def _demodulate_odmr_data(self, counter_data, analog_data, length):
+        """ Convert the raw samples of complete sweeps into count rates or lock-in signals.
+
+        All sweeps of a batch are processed at once.
+
+        @param numpy.ndarray counter_data: semi period counts in format [sweep][sample]
+        @param numpy.ndarray analog_data: analog input in format [channel][sweep][sample] or None
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: data in format [sweep][channel][pixel]
+        """
+        n_sweeps = counter_data.shape[0]
+        # add up adjoint semi periods to also get the counts from the low time of the clock
+        pixel_counts = counter_data.reshape(n_sweeps, -1, 2).sum(axis=2, dtype=np.float64)
+        if analog_data is not None:
+            all_data = np.concatenate(
+                (pixel_counts[:, np.newaxis, :], np.swapaxes(analog_data, 0, 1)), axis=1)
+        else:
+            all_data = pixel_counts[:, np.newaxis, :]
+
+        if self._odmr_pulser_daq_task:
+            # microwave off (reference) and on (signal) samples alternate
+            reference = all_data[:, :, ::2]
+            differential_data = np.divide(all_data[:, :, 1::2] - reference,
+                                          reference,
+                                          out=np.zeros_like(reference),
+                                          where=reference != 0)
+            return np.median(
+                differential_data.reshape(n_sweeps, all_data.shape[1], length, -1), axis=3)
+
+        all_data[:, 0] *= self._scanner_clock_frequency
+        return all_data
 
     def close_odmr(self):
         """ Closes the odmr and cleans up afterwards.
@@ -1754,6 +1953,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         @return int: error code (0:OK, -1:error)
         """
         retval = 0
+        if self.stop_continuous_odmr() < 0:
+            retval = -1
         try:
             # disconnect the trigger channel
             daq.DAQmxDisconnectTerms(
@@ -2054,6 +2255,129 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             retval = -1
         return retval
 
+    # ==================== Continuous gated photon counting ====================
+
+    def set_up_gated_counter_stream(self, block_samples, buffer_blocks=None):
+        """ Set up a continuous gated counting, e.g. for long single shot readouts clocked
+            by the pulse streamer.
+
+        DAQmx calls back every block_samples gates and the counts are read into a circular
+        buffer of preallocated blocks. The logic fetches them with get_gated_counter_blocks,
+        which does not wait for the card.
+
+        @param int block_samples: number of gates per block
+        @param int buffer_blocks: optional, number of blocks in the buffer. Default is the config
+                                  option gated_stream_buffer_blocks.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._gated_stream is not None or self._gated_counter_daq_task is not None:
+            self.log.error('Another gated counter is already running, close this one first.')
+            return -1
+        if buffer_blocks is None:
+            buffer_blocks = self._gated_stream_buffer_blocks
+
+        if self._gated_stream_backend == 'simulated':
+            backend = SimulatedDaq(gate_rate=self._simulated_gate_rate)
+        elif self._gated_stream_backend == 'daqmx':
+            backend = daq
+        else:
+            self.log.error('Unknown gated stream backend "{0}", use "daqmx" or "simulated".'
+                           ''.format(self._gated_stream_backend))
+            return -1
+
+        stream = GatedCounterStream(backend, block_samples, buffer_blocks)
+        try:
+            stream.set_up(counter_channel=self._counter_channels[0],
+                          gate_channel=self._gate_in_channel,
+                          photon_source=self._photon_sources[0],
+                          max_counts=self._max_counts,
+                          counting_edge_rising=self._counting_edge_rising)
+        except:
+            self.log.exception('Error while setting up continuous gated counting.')
+            try:
+                stream.close()
+            except:
+                self.log.exception('Could not clear continuous gated counter after error.')
+            return -1
+        self._gated_stream = stream
+        return 0
+
+    def start_gated_counter_stream(self):
+        """ Start the continuous gated counting with an empty buffer.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._gated_stream is None:
+            self.log.error('Cannot start continuous gated counter since it is not configured!\n'
+                           'Run the set_up_gated_counter_stream routine.')
+            return -1
+        try:
+            self._gated_stream.start()
+        except:
+            self.log.exception('Error while starting continuous gated counting.')
+            return -1
+        return 0
+
+    def get_gated_counter_blocks(self, first_block=0):
+        """ Return the blocks of gate counts acquired since a block number. Does not wait for
+            new blocks.
+
+        The blocks are views into the circular buffer. Process or copy them before the
+        acquisition wraps around the buffer.
+
+        @param int first_block: number of the first block to return, i.e. the next block number
+                                returned by the previous call
+
+        @return (int, numpy.ndarray): number of the next block to ask for and the counts in
+                                      format [block][gate]. On error the next block number is
+                                      -1.
+        """
+        if self._gated_stream is None:
+            self.log.error('No continuous gated counter running, call '
+                           'set_up_gated_counter_stream before reading it.')
+            return -1, np.zeros((0, 0), dtype=np.uint32)
+        if self._gated_stream.error is not None:
+            self.log.error('Continuous gated counting failed: {0}'
+                           ''.format(self._gated_stream.error))
+            return -1, np.zeros((0, self._gated_stream.block_samples), dtype=np.uint32)
+        next_block, blocks, lost = self._gated_stream.read(first_block)
+        if lost > 0:
+            self.log.warning('{0:d} blocks of the continuous gated counter were overwritten '
+                             'before they were read.'.format(lost))
+        return next_block, blocks
+
+    def stop_gated_counter_stream(self):
+        """ Stop the continuous gated counting. Acquired blocks can still be read.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._gated_stream is None:
+            self.log.error('Cannot stop continuous gated counter since it is not running!')
+            return -1
+        try:
+            self._gated_stream.stop()
+        except:
+            self.log.exception('Error while stopping continuous gated counting.')
+            return -1
+        return 0
+
+    def close_gated_counter_stream(self):
+        """ Stop the continuous gated counting and clear its task.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._gated_stream is None:
+            return 0
+        retval = 0
+        try:
+            self._gated_stream.close()
+        except:
+            self.log.exception('Error while clearing continuous gated counter.')
+            retval = -1
+        self._gated_stream = None
+        return retval
+
 
     # ======================== Digital channel control ==========================
 
@@ -29,6 +29,7 @@ import numpy as np
 import time
 
 from core.module import Base, ConfigOption
+from hardware.microwave.scpi_pipeline import ScpiPipeline
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -51,6 +52,7 @@ class MicrowaveAgilent(Base, MicrowaveInterface):
 
     _modclass = 'MicrowaveAgilent'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     _usb_address = ConfigOption('usb_address', missing='error')
     _usb_timeout = ConfigOption('usb_timeout', 100, missing='warn')
@@ -65,6 +67,7 @@ class MicrowaveAgilent(Base, MicrowaveInterface):
             self._usb_connection = self.rm.open_resource(
                 resource_name=self._usb_address,
                 timeout=self._usb_timeout)
+            self._scpi = ScpiPipeline(self._usb_connection)
 
             self.log.info('MWAGILENT initialised and connected to hardware.')
             self.model = self._usb_connection.query('*IDN?').split(',')[1]
@@ -537,10 +540,7 @@ class MicrowaveAgilent(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._usb_connection.write(command_str)
-        self._usb_connection.write('*WAI')
-        while int(float(self._usb_connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        self._scpi.send(command_str)
 
         return
 
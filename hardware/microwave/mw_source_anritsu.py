@@ -28,6 +28,7 @@ import time
 import numpy as np
 
 from core.module import Base, ConfigOption
+from hardware.microwave.scpi_pipeline import ScpiPipeline
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -50,6 +51,7 @@ class MicrowaveAnritsu(Base, MicrowaveInterface):
 
     _modclass = 'MicrowaveAnritsu'
     _modtype = 'hardware'
+    _concurrent_activation = True
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
 
@@ -69,6 +71,7 @@ class MicrowaveAnritsu(Base, MicrowaveInterface):
             self.log.error('This is MWanritsu: could not connect to the GPIB '
                         'address >>{}<<.'.format(self._gpib_address))
             raise
+        self._scpi = ScpiPipeline(self._gpib_connection)
         self.model = self._gpib_connection.query('*IDN?').split(',')[1]
         self.log.info('MicrowaveAnritsu initialised and connected to '
                 'hardware.')
@@ -86,10 +89,7 @@ class MicrowaveAnritsu(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._gpib_connection.write(command_str)
-        self._gpib_connection.write('*WAI')
-        while int(float(self._gpib_connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        self._scpi.send(command_str)
         return
 
     def get_limits(self):
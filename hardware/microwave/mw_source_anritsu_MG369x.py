@@ -47,6 +47,7 @@ class MicrowaveAnritsuMG369x(Base, MicrowaveInterface):
     """
     _modclass = 'MicrowaveAanritsu70GHz'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
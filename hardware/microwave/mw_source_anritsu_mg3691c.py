@@ -53,6 +53,7 @@ class MicrowaveAnritsu(Base, MicrowaveInterface):
 
     _modclass = 'MicrowaveAnritsu'
     _modtype = 'hardware'
+    _concurrent_activation = True
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
 
@@ -28,6 +28,7 @@ import numpy as np
 import time
 
 from core.module import Base, ConfigOption
+from hardware.microwave.scpi_pipeline import ScpiPipeline
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -48,6 +49,7 @@ class MicrowaveGigatronics(Base, MicrowaveInterface):
 
     _modclass = 'MicrowaveInterface'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
@@ -68,6 +70,7 @@ class MicrowaveGigatronics(Base, MicrowaveInterface):
             self.log.error('This is MWgigatronics: could not connect to the GPIB address >>{}<<.'
                            ''.format(self._gpib_address))
             raise
+        self._scpi = ScpiPipeline(self._gpib_connection)
         self._gpib_connection.write('*RST')
         idnlist = []
         while len(idnlist) < 3:
@@ -131,10 +134,7 @@ class MicrowaveGigatronics(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._gpib_connection.write(command_str)
-        self._gpib_connection.write('*WAI')
-        while int(float(self._gpib_connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        self._scpi.send(command_str)
         return
 
     def off(self):
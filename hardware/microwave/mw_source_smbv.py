@@ -28,6 +28,7 @@ import time
 import numpy as np
 
 from core.module import Base, ConfigOption
+from hardware.microwave.scpi_pipeline import ScpiPipeline
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -44,11 +45,13 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         gpib_address: 'GPIB0::12::INSTR'
         gpib_address: 'GPIB0::12::INSTR'
         gpib_timeout: 10
+        completion_mode: 'opc'  # optional, 'opc' or 'srq' (service request, GPIB only)
 
     """
 
     _modclass = 'MicrowaveSmbv'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     # visa address of the hardware : this can be over ethernet, the name is here for
     # backward compatibility
@@ -58,6 +61,9 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
     # to limit the power to a lower value that the hardware can provide
     _max_power = ConfigOption('max_power', None)
 
+    # how to wait for the completion of commands, see ScpiPipeline
+    _completion_mode = ConfigOption('completion_mode', 'opc')
+
     # Indicate how fast frequencies within a list or sweep mode can be changed:
     _FREQ_SWITCH_SPEED = 0.003  # Frequency switching speed in s (acc. to specs)
 
@@ -73,10 +79,10 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
             self.log.error('Could not connect to the address >>{}<<.'.format(self._address))
             raise
 
-        self.model = self._connection.query('*IDN?').split(',')[1]
+        self._scpi = ScpiPipeline(self._connection, completion=self._completion_mode)
+        self.model = self._scpi.query('*IDN?').split(',')[1]
         self.log.info('MW {} initialised and connected.'.format(self.model))
-        self._command_wait('*CLS')
-        self._command_wait('*RST')
+        self._scpi.send('*CLS', '*RST')
         return
 
     def on_deactivate(self):
@@ -91,10 +97,20 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._connection.write(command_str)
-        self._connection.write('*WAI')
-        while int(float(self._connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        self._scpi.send(command_str)
+        return
+
+    def _wait_output_state(self, state):
+        """
+        Waits until the output of the device is switched on or off.
+
+        @param bool state: the expected output state
+        """
+        if not self._scpi.wait_until(':OUTP:STAT?',
+                                     lambda answer: bool(int(float(answer))) == state,
+                                     timeout=self._timeout / 1000):
+            self.log.error('MW {0} did not switch the output {1}.'
+                           ''.format(self.model, 'on' if state else 'off'))
         return
 
     def get_limits(self):
@@ -140,10 +156,8 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         if not is_running:
             return 0
 
-        self._connection.write('OUTP:STAT OFF')
-        self._connection.write('*WAI')
-        while int(float(self._connection.query('OUTP:STAT?'))) != 0:
-            time.sleep(0.2)
+        self._scpi.send(':OUTP:STAT OFF')
+        self._wait_output_state(False)
         return 0
 
     def get_status(self):
@@ -153,8 +167,9 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
 
         @return str, bool: mode ['cw', 'list', 'sweep'], is_running [True, False]
         """
-        is_running = bool(int(float(self._connection.query('OUTP:STAT?'))))
-        mode = self._connection.query(':FREQ:MODE?').strip('\n').lower()
+        state, mode = self._scpi.query(':OUTP:STAT?;:FREQ:MODE?').strip().split(';')
+        is_running = bool(int(float(state)))
+        mode = mode.strip().lower()
         if mode == 'swe':
             mode = 'sweep'
         return mode, is_running
@@ -166,7 +181,7 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         @return float: the power set at the device in dBm
         """
         # This case works for cw AND sweep mode
-        return float(self._connection.query(':POW?'))
+        return float(self._scpi.query(':POW?'))
 
     def get_frequency(self):
         """
@@ -179,11 +194,10 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         """
         mode, is_running = self.get_status()
         if 'cw' in mode:
-            return_val = float(self._connection.query(':FREQ?'))
+            return_val = float(self._scpi.query(':FREQ?'))
         elif 'sweep' in mode:
-            start = float(self._connection.query(':FREQ:STAR?'))
-            stop = float(self._connection.query(':FREQ:STOP?'))
-            step = float(self._connection.query(':SWE:STEP?'))
+            start, stop, step = self._scpi.query(':FREQ:STAR?;:FREQ:STOP?;:SWE:STEP?').split(';')
+            start, stop, step = float(start), float(stop), float(step)
             return_val = [start+step, stop, step]
         return return_val
 
@@ -202,14 +216,10 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
                 self.off()
 
         if current_mode != 'cw':
-            self._command_wait(':FREQ:MODE CW')
-
-        self._connection.write(':OUTP:STAT ON')
-        self._connection.write('*WAI')
-        dummy, is_running = self.get_status()
-        while not is_running:
-            time.sleep(0.2)
-            dummy, is_running = self.get_status()
+            self._scpi.write(':FREQ:MODE CW')
+
+        self._scpi.send(':OUTP:STAT ON')
+        self._wait_output_state(True)
         return 0
 
     def set_cw(self, frequency=None, power=None):
@@ -230,15 +240,16 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
 
         # Activate CW mode
         if mode != 'cw':
-            self._command_wait(':FREQ:MODE CW')
+            self._scpi.write(':FREQ:MODE CW')
 
         # Set CW frequency
         if frequency is not None:
-            self._command_wait(':FREQ {0:f}'.format(frequency))
+            self._scpi.write(':FREQ {0:f}'.format(frequency))
 
         # Set CW power
         if power is not None:
-            self._command_wait(':POW {0:f}'.format(power))
+            self._scpi.write(':POW {0:f}'.format(power))
+        self._scpi.flush()
 
         # Return actually set values
         mode, dummy = self.get_status()
@@ -294,13 +305,10 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
                 self.off()
 
         if current_mode != 'sweep':
-            self._command_wait(':FREQ:MODE SWEEP')
+            self._scpi.write(':FREQ:MODE SWEEP')
 
-        self._connection.write(':OUTP:STAT ON')
-        dummy, is_running = self.get_status()
-        while not is_running:
-            time.sleep(0.2)
-            dummy, is_running = self.get_status()
+        self._scpi.send(':OUTP:STAT ON')
+        self._wait_output_state(True)
         return 0
 
     def set_sweep(self, start=None, stop=None, step=None, power=None):
@@ -319,22 +327,19 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
             self.off()
 
         if mode != 'sweep':
-            self._command_wait(':FREQ:MODE SWEEP')
+            self._scpi.write(':FREQ:MODE SWEEP')
 
         if (start is not None) and (stop is not None) and (step is not None):
-            self._connection.write(':SWE:MODE STEP')
-            self._connection.write(':SWE:SPAC LIN')
-            self._connection.write('*WAI')
-            self._connection.write(':FREQ:START {0:f}'.format(start - step))
-            self._connection.write(':FREQ:STOP {0:f}'.format(stop))
-            self._connection.write(':SWE:STEP:LIN {0:f}'.format(step))
-            self._connection.write('*WAI')
+            self._scpi.write(':SWE:MODE STEP',
+                             ':SWE:SPAC LIN',
+                             ':FREQ:START {0:f}'.format(start - step),
+                             ':FREQ:STOP {0:f}'.format(stop),
+                             ':SWE:STEP:LIN {0:f}'.format(step))
 
         if power is not None:
-            self._connection.write(':POW {0:f}'.format(power))
-            self._connection.write('*WAI')
+            self._scpi.write(':POW {0:f}'.format(power))
 
-        self._command_wait('TRIG:FSW:SOUR EXT')
+        self._scpi.send(':TRIG:FSW:SOUR EXT')
 
         actual_power = self.get_power()
         freq_list = self.get_frequency()
@@ -374,7 +379,7 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         if edge is not None:
             self._command_wait(':TRIG1:SLOP {0}'.format(edge))
 
-        polarity = self._connection.query(':TRIG1:SLOP?')
+        polarity = self._scpi.query(':TRIG1:SLOP?')
         if 'NEG' in polarity:
             return TriggerEdge.FALLING, timing
         else:
@@ -393,6 +398,7 @@ class MicrowaveSmbv(Base, MicrowaveInterface):
         # The manual trigger functionality was not tested for this device!
         # Might not work well! Please check that!
 
-        self._connection.write('*TRG')
+        self._scpi.write('*TRG')
+        self._scpi.flush(wait=False)
         time.sleep(self._FREQ_SWITCH_SPEED)  # that is the switching speed
         return 0
@@ -28,6 +28,7 @@ import time
 import numpy as np
 
 from core.module import Base, ConfigOption
+from hardware.microwave.scpi_pipeline import ScpiPipeline
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -49,10 +50,13 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         frequency_max: 3e6  # optional, in Hz
         power_min: -100  # optional, in dBm
         power_max: 13  # optional, in dBm
+        completion_mode: 'opc'  # optional, 'opc' or 'srq' (service request, GPIB only)
+        binary_list_upload: False  # optional, upload frequency lists as binary block
     """
 
     _modclass = 'MicrowaveSmiq'
     _modtype = 'hardware'
+    _concurrent_activation = True
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
     _gpib_baud_rate = ConfigOption('gpib_baud_rate', None)
@@ -60,6 +64,8 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
     _config_freq_max = ConfigOption('frequency_max', None)
     _config_power_min = ConfigOption('power_min', None)
     _config_power_max = ConfigOption('power_max', None)
+    _completion_mode = ConfigOption('completion_mode', 'opc')
+    _binary_list_upload = ConfigOption('binary_list_upload', False)
 
     # Indicate how fast frequencies within a list or sweep mode can be changed:
     _FREQ_SWITCH_SPEED = 0.003  # Frequency switching speed in s (acc. to specs)
@@ -82,10 +88,10 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
                            ''.format(self._gpib_address))
             raise
 
+        self._scpi = ScpiPipeline(self._gpib_connection, completion=self._completion_mode)
         self.log.info('MWSMIQ initialised and connected to hardware.')
-        self.model = self._gpib_connection.query('*IDN?').split(',')[1]
-        self._command_wait('*CLS')
-        self._command_wait('*RST')
+        self.model = self._scpi.query('*IDN?').split(',')[1]
+        self._scpi.send('*CLS', '*RST')
         return
 
     def on_deactivate(self):
@@ -101,10 +107,19 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._gpib_connection.write(command_str)
-        self._gpib_connection.write('*WAI')
-        while int(float(self._gpib_connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        self._scpi.send(command_str)
+        return
+
+    def _wait_output_state(self, state):
+        """
+        Waits until the output of the device is switched on or off.
+
+        @param bool state: the expected output state
+        """
+        if not self._scpi.wait_until(':OUTP:STAT?',
+                                     lambda answer: bool(int(float(answer))) == state,
+                                     timeout=self._gpib_timeout / 1000):
+            self.log.error('MWSMIQ did not switch the output {0}.'.format('on' if state else 'off'))
         return
 
     def get_limits(self):
@@ -171,16 +186,13 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
             return 0
 
         if mode == 'list':
-            self._command_wait(':FREQ:MODE CW')
+            self._scpi.write(':FREQ:MODE CW')
 
-        self._gpib_connection.write('OUTP:STAT OFF')
-        self._gpib_connection.write('*WAI')
-        while int(float(self._gpib_connection.query('OUTP:STAT?'))) != 0:
-            time.sleep(0.2)
+        self._scpi.send(':OUTP:STAT OFF')
+        self._wait_output_state(False)
 
         if mode == 'list':
-            self._command_wait(':LIST:LEARN')
-            self._command_wait(':FREQ:MODE LIST')
+            self._scpi.send(':LIST:LEARN', ':FREQ:MODE LIST')
         return 0
 
     def get_status(self):
@@ -190,8 +202,9 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
 
         @return str, bool: mode ['cw', 'list', 'sweep'], is_running [True, False]
         """
-        is_running = bool(int(float(self._gpib_connection.query('OUTP:STAT?'))))
-        mode = self._gpib_connection.query(':FREQ:MODE?').strip('\n').lower()
+        state, mode = self._scpi.query(':OUTP:STAT?;:FREQ:MODE?').strip().split(';')
+        is_running = bool(int(float(state)))
+        mode = mode.strip().lower()
         if mode == 'swe':
             mode = 'sweep'
         return mode, is_running
@@ -204,10 +217,10 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         """
         mode, dummy = self.get_status()
         if mode == 'list':
-            return float(self._gpib_connection.query(':LIST:POW?'))
+            return float(self._scpi.query(':LIST:POW?'))
         else:
             # This case works for cw AND sweep mode
-            return float(self._gpib_connection.query(':POW?'))
+            return float(self._scpi.query(':POW?'))
 
     def get_frequency(self):
         """
@@ -220,16 +233,15 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         """
         mode, is_running = self.get_status()
         if 'cw' in mode:
-            return_val = float(self._gpib_connection.query(':FREQ?'))
+            return_val = float(self._scpi.query(':FREQ?'))
         elif 'sweep' in mode:
-            start = float(self._gpib_connection.query(':FREQ:STAR?'))
-            stop = float(self._gpib_connection.query(':FREQ:STOP?'))
-            step = float(self._gpib_connection.query(':SWE:STEP?'))
+            start, stop, step = self._scpi.query(':FREQ:STAR?;:FREQ:STOP?;:SWE:STEP?').split(';')
+            start, stop, step = float(start), float(stop), float(step)
             return_val = [start+step, stop, step]
         elif 'list' in mode:
             # Exclude first frequency entry (duplicate due to trigger issues)
-            frequency_str = self._gpib_connection.query(':LIST:FREQ?').split(',', 1)[1]
-            return_val = np.array([float(freq) for freq in frequency_str.split(',')])
+            frequency_str = self._scpi.query(':LIST:FREQ?').split(',', 1)[1]
+            return_val = np.array(frequency_str.split(','), dtype=float)
         return return_val
 
     def cw_on(self):
@@ -247,14 +259,10 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
                 self.off()
 
         if current_mode != 'cw':
-            self._command_wait(':FREQ:MODE CW')
-
-        self._gpib_connection.write(':OUTP:STAT ON')
-        self._gpib_connection.write('*WAI')
-        dummy, is_running = self.get_status()
-        while not is_running:
-            time.sleep(0.2)
-            dummy, is_running = self.get_status()
+            self._scpi.write(':FREQ:MODE CW')
+
+        self._scpi.send(':OUTP:STAT ON')
+        self._wait_output_state(True)
         return 0
 
     def set_cw(self, frequency=None, power=None):
@@ -275,15 +283,16 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
 
         # Activate CW mode
         if mode != 'cw':
-            self._command_wait(':FREQ:MODE CW')
+            self._scpi.write(':FREQ:MODE CW')
 
         # Set CW frequency
         if frequency is not None:
-            self._command_wait(':FREQ {0:f}'.format(frequency))
+            self._scpi.write(':FREQ {0:f}'.format(frequency))
 
         # Set CW power
         if power is not None:
-            self._command_wait(':POW {0:f}'.format(power))
+            self._scpi.write(':POW {0:f}'.format(power))
+        self._scpi.flush()
 
         # Return actually set values
         mode, dummy = self.get_status()
@@ -307,12 +316,8 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
 
         # This needs to be done due to stupid design of the list mode (sweep is better)
         self.cw_on()
-        self._command_wait(':LIST:LEARN')
-        self._command_wait(':FREQ:MODE LIST')
-        dummy, is_running = self.get_status()
-        while not is_running:
-            time.sleep(0.2)
-            dummy, is_running = self.get_status()
+        self._scpi.send(':LIST:LEARN', ':FREQ:MODE LIST')
+        self._wait_output_state(True)
         return 0
 
     def set_list(self, frequency=None, power=None):
@@ -335,33 +340,33 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         if mode != 'cw':
             self.set_cw()
 
-        self._gpib_connection.write(":LIST:SEL 'QUDI'")
-        self._gpib_connection.write('*WAI')
+        self._scpi.write(":LIST:SEL 'QUDI'")
 
-        # Set list frequencies
+        # Set list frequencies. The first frequency is doubled due to trigger issues.
         if frequency is not None:
-            s = ' {0:f},'.format(frequency[0])
-            for f in frequency[:-1]:
-                s += ' {0:f},'.format(f)
-            s += ' {0:f}'.format(frequency[-1])
-            self._gpib_connection.write(':LIST:FREQ' + s)
-            self._gpib_connection.write('*WAI')
-            self._gpib_connection.write(':LIST:MODE STEP')
-            self._gpib_connection.write('*WAI')
+            frequency = np.concatenate(([frequency[0]], frequency))
+            if self._binary_list_upload:
+                # 64 bit floats with the least significant byte first
+                self._scpi.write(':FORM PACK', ':FORM:BORD NORM')
+                self._scpi.write_values(':LIST:FREQ', frequency, binary=True, datatype='d',
+                                        is_big_endian=False)
+                self._scpi.write(':FORM ASC')
+            else:
+                self._scpi.write_values(':LIST:FREQ', frequency)
+            self._scpi.write(':LIST:MODE STEP')
 
         # Set list power
         if power is not None:
-            self._gpib_connection.write(':LIST:POW {0:f}'.format(power))
-            self._gpib_connection.write('*WAI')
+            self._scpi.write(':LIST:POW {0:f}'.format(power))
 
-        self._command_wait(':TRIG1:LIST:SOUR EXT')
+        self._scpi.write(':TRIG1:LIST:SOUR EXT')
 
         # Apply settings in hardware
-        self._command_wait(':LIST:LEARN')
+        self._scpi.write(':LIST:LEARN')
         # If there are timeout  problems after this command, update the smiq  firmware to > 5.90
         # as there was a problem with excessive wait times after issuing :LIST:LEARN over a
         # GPIB connection in firmware 5.88
-        self._command_wait(':FREQ:MODE LIST')
+        self._scpi.send(':FREQ:MODE LIST')
 
         actual_freq = self.get_frequency()
         actual_power = self.get_power()
@@ -390,13 +395,10 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
                 self.off()
 
         if current_mode != 'sweep':
-            self._command_wait(':FREQ:MODE SWEEP')
+            self._scpi.write(':FREQ:MODE SWEEP')
 
-        self._gpib_connection.write(':OUTP:STAT ON')
-        dummy, is_running = self.get_status()
-        while not is_running:
-            time.sleep(0.2)
-            dummy, is_running = self.get_status()
+        self._scpi.send(':OUTP:STAT ON')
+        self._wait_output_state(True)
         return 0
 
     def set_sweep(self, start=None, stop=None, step=None, power=None):
@@ -415,22 +417,19 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
             self.off()
 
         if mode != 'sweep':
-            self._command_wait(':FREQ:MODE SWEEP')
+            self._scpi.write(':FREQ:MODE SWEEP')
 
         if (start is not None) and (stop is not None) and (step is not None):
-            self._gpib_connection.write(':SWE:MODE STEP')
-            self._gpib_connection.write(':SWE:SPAC LIN')
-            self._gpib_connection.write('*WAI')
-            self._gpib_connection.write(':FREQ:START {0:f}'.format(start - step))
-            self._gpib_connection.write(':FREQ:STOP {0:f}'.format(stop))
-            self._gpib_connection.write(':SWE:STEP:LIN {0:f}'.format(step))
-            self._gpib_connection.write('*WAI')
+            self._scpi.write(':SWE:MODE STEP',
+                             ':SWE:SPAC LIN',
+                             ':FREQ:START {0:f}'.format(start - step),
+                             ':FREQ:STOP {0:f}'.format(stop),
+                             ':SWE:STEP:LIN {0:f}'.format(step))
 
         if power is not None:
-            self._gpib_connection.write(':POW {0:f}'.format(power))
-            self._gpib_connection.write('*WAI')
+            self._scpi.write(':POW {0:f}'.format(power))
 
-        self._command_wait(':TRIG1:SWE:SOUR EXT')
+        self._scpi.send(':TRIG1:SWE:SOUR EXT')
 
         actual_power = self.get_power()
         freq_list = self.get_frequency()
@@ -470,7 +469,7 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         if edge is not None:
             self._command_wait(':TRIG1:SLOP {0}'.format(edge))
 
-        polarity = self._gpib_connection.query(':TRIG1:SLOP?')
+        polarity = self._scpi.query(':TRIG1:SLOP?')
         if 'NEG' in polarity:
             return TriggerEdge.FALLING, timing
         else:
@@ -489,6 +488,7 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         # The manual trigger functionality was not tested for this device!
         # Might not work well! Please check that!
 
-        self._gpib_connection.write('*TRG')
+        self._scpi.write('*TRG')
+        self._scpi.flush(wait=False)
         time.sleep(self._FREQ_SWITCH_SPEED)  # that is the switching speed
         return 0
@@ -44,6 +44,7 @@ class MicrowaveSRSSG(Base, MicrowaveInterface):
 
     _modclass = 'MicrowaveSRSSG'
     _modtype = 'hardware'
+    _concurrent_activation = True
 
     _gpib_address = ConfigOption('gpib_address', missing='error')
     _gpib_timeout = ConfigOption('gpib_timeout', 10, missing='warn')
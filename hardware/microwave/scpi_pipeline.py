@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a helper class to communicate with SCPI instruments with few round trips.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+import numpy as np
+
+
+class ScpiPipeline:
+    """ Command layer on top of a VISA resource of a SCPI instrument.
+
+    Commands are queued and sent as a single compound write (commands separated by ';') when
+    the queue is flushed or a query is made. Waiting for the instrument to finish the commands is
+    done in the same transaction, either by appending '*OPC?', which blocks until all commands
+    are done, or by a service request after '*OPC' for instruments on a bus with service request
+    support. There is no polling with fixed sleeps.
+
+    Instrument states that need time to settle (e.g. the output state) are polled with an
+    adaptive interval that starts short and grows up to a maximum.
+    """
+
+    completion_modes = ('opc', 'srq')
+
+    def __init__(self, connection, completion='opc', max_write_length=4096,
+                 min_poll_interval=1e-3, max_poll_interval=0.2):
+        """
+        @param connection: VISA resource of the instrument
+        @param str completion: how to wait for the completion of commands. 'opc' queries
+                               '*OPC?', 'srq' waits for a service request of the instrument.
+        @param int max_write_length: maximum length of a single compound write in characters
+        @param float min_poll_interval: first interval in s when polling an instrument state
+        @param float max_poll_interval: maximum interval in s when polling an instrument state
+        """
+        if completion not in self.completion_modes:
+            raise ValueError('Completion mode "{0}" is not one of {1}.'
+                             ''.format(completion, self.completion_modes))
+        self.connection = connection
+        self.completion = completion
+        self.max_write_length = max_write_length
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._queue = list()
+        self.reset_statistics()
+        if self.completion == 'srq':
+            # Set the service request on "operation complete" in the event status register
+            self.connection.write('*ESE 1;*SRE 32')
+
+    def reset_statistics(self):
+        """ Reset the number of transactions and the time spent communicating. """
+        self.transactions = 0
+        self.busy_time = 0.
+
+    def write(self, *commands):
+        """ Queue commands. They are sent with the next flush or query.
+
+        @param str commands: SCPI commands
+        """
+        self._queue.extend(commands)
+
+    def send(self, *commands):
+        """ Send commands and wait until the instrument has finished processing them.
+
+        @param str commands: SCPI commands
+        """
+        self._queue.extend(commands)
+        self.flush(wait=True)
+
+    def flush(self, wait=True):
+        """ Send all queued commands in as few writes as possible.
+
+        @param bool wait: wait until the instrument has finished processing the commands
+        """
+        for compound in self._compounds(self._queue):
+            self._transaction(self.connection.write, compound)
+        self._queue = list()
+        if wait:
+            self.wait_complete()
+
+    def wait_complete(self):
+        """ Wait until the instrument has finished processing all commands sent before. """
+        if self.completion == 'srq':
+            self._transaction(self.connection.write, '*OPC')
+            self._transaction(self.connection.wait_for_srq, self.connection.timeout)
+            # reading the event status register clears the request
+            self._transaction(self.connection.query, '*ESR?')
+        else:
+            self._transaction(self.connection.query, '*OPC?')
+
+    def query(self, command):
+        """ Send the queued commands and the query in a single write and read the answer.
+
+        @param str command: SCPI query
+
+        @return str: answer of the instrument
+        """
+        compounds = self._compounds(self._queue + [command])
+        self._queue = list()
+        for compound in compounds[:-1]:
+            self._transaction(self.connection.write, compound)
+        return self._transaction(self.connection.query, compounds[-1])
+
+    def wait_until(self, command, condition, timeout=10.):
+        """ Poll an instrument state until it fulfills a condition.
+
+        The polling interval starts at min_poll_interval and is doubled after every poll up to
+        max_poll_interval.
+
+        @param str command: SCPI query of the state
+        @param callable condition: function condition(answer) returning True once the state is
+                                   reached
+        @param float timeout: maximum time to wait in s
+
+        @return bool: True if the condition was fulfilled, False on timeout
+        """
+        interval = self.min_poll_interval
+        deadline = time.perf_counter() + timeout
+        while not condition(self.query(command)):
+            if time.perf_counter() + interval > deadline:
+                return False
+            time.sleep(interval)
+            interval = min(2 * interval, self.max_poll_interval)
+        return True
+
+    def write_values(self, header, values, fmt='{0:f}', binary=False, datatype='f',
+                     is_big_endian=False):
+        """ Write a command with a long list of values, e.g. a frequency list.
+
+        @param str header: SCPI command header, e.g. ':LIST:FREQ'
+        @param list values: values to write
+        @param str fmt: format of a single value if written as text
+        @param bool binary: write the values as IEEE 488.2 binary block
+        @param str datatype: struct format character of a value in the binary block
+        @param bool is_big_endian: byte order of the binary block
+        """
+        self.flush(wait=False)
+        if binary:
+            self._transaction(self.connection.write_binary_values, header + ' ',
+                              np.asarray(values), datatype=datatype, is_big_endian=is_big_endian)
+        else:
+            self._transaction(self.connection.write,
+                              header + ' ' + ','.join(fmt.format(value) for value in values))
+
+    def _compounds(self, commands):
+        """ Join commands to compound commands not longer than max_write_length.
+
+        Commands in a compound command without leading colon are relative to the subsystem of
+        the previous command, so all commands are made absolute.
+        """
+        compounds = list()
+        current = ''
+        for command in commands:
+            command = command.strip()
+            if not command.startswith((':', '*')):
+                command = ':' + command
+            if current and len(current) + len(command) + 1 > self.max_write_length:
+                compounds.append(current)
+                current = ''
+            current = command if not current else current + ';' + command
+        if current:
+            compounds.append(current)
+        return compounds
+
+    def _transaction(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self.transactions += 1
+            self.busy_time += time.perf_counter() - start
@@ -79,6 +79,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             - [-10, 10]
 
         odmr_trigger_channel: '/Dev1/PFI7'
+        odmr_buffer_sweeps: 100 # optional, buffer length of the continuous ODMR acquisition
 
         gate_in_channel: '/Dev1/PFI9'
         default_samples_number: 50
@@ -90,6 +91,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
     _modtype = 'NICard'
     _modclass = 'hardware'
+    _concurrent_activation = True
 
     # config options
     _photon_sources = ConfigOption('photon_sources', missing='error')
@@ -115,6 +117,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
     _odmr_trigger_channel = ConfigOption('odmr_trigger_channel', missing='error')
     _odmr_trigger_line = ConfigOption('odmr_trigger_line', 'Dev1/port0/line0', missing='warn')
     _odmr_switch_line = ConfigOption('odmr_switch_line', 'Dev1/port0/line1', missing='warn')
+    # number of sweeps fitting into the circular buffer of the continuous ODMR acquisition
+    _odmr_buffer_sweeps = ConfigOption('odmr_buffer_sweeps', 100, missing='info')
 
     _gate_in_channel = ConfigOption('gate_in_channel', missing='error')
     # number of readout samples, mainly used for gated counter
@@ -140,6 +144,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         self._gated_counter_daq_task = None
         self._scanner_analog_daq_task = None
         self._odmr_pulser_daq_task = None
+        self._odmr_continuous = False
+        self._odmr_sweep_length = None
         self._oversampling = 0
         self._lock_in_active = False
 
@@ -1736,23 +1742,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
         if self._odmr_pulser_daq_task:
             try:
-
-                # The pulse pattern is an alternating 0 and 1 on the switching channel (line0),
-                # while the first half of the whole microwave pulse is 1 and the other half is 0.
-                # This way the beginning of the microwave has a rising edge.
-                pulse_pattern = np.zeros(self.oversampling * 2, dtype=np.uint32)
-                pulse_pattern[:self.oversampling] += 1
-                pulse_pattern[::2] += 2
-
-                daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
-                                         len(pulse_pattern),
-                                         0,
-                                         self._RWTimeout * self._odmr_length,
-                                         daq.DAQmx_Val_GroupByChannel,
-                                         pulse_pattern,
-                                         None,
-                                         None)
-
+                self._write_odmr_pulse_pattern()
                 daq.DAQmxStartTask(self._odmr_pulser_daq_task)
             except:
                 self.log.exception('Cannot start ODMR pulser.')
@@ -1822,59 +1812,255 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             if self._odmr_pulser_daq_task:
                 daq.DAQmxStopTask(self._odmr_pulser_daq_task)
 
-            # prepare array to return data
-            all_data = np.full((len(self.get_odmr_channels()), length),
-                               222,
-                               dtype=np.float64)
+            # drop the last sample and treat the line as a batch of a single sweep
+            if len(self._scanner_ai_channels) > 0:
+                analog_sweeps = odmr_analog_data[:, np.newaxis, :self._odmr_length]
+            else:
+                analog_sweeps = None
+            all_data = self._demodulate_odmr_data(
+                odmr_data[np.newaxis, :2 * self._odmr_length], analog_sweeps, length)
 
-            # create a new array for the final data (this time of the length
-            # number of samples)
-            real_data = np.zeros((self._odmr_length, ), dtype=np.uint32)
+            return False, all_data[0]
+        except:
+            self.log.exception('Error while counting for ODMR.')
+            return True, np.full((len(self.get_odmr_channels()), 1), [-1.])
 
-            # add upp adjoint pixels to also get the counts from the low time of
-            # the clock:
+    def supports_continuous_odmr(self):
+        """ Whether the counter can acquire sweeps continuously with a free running microwave sweep.
+
+        @return bool: True if start_continuous_odmr is supported, False if not
+        """
+        return True
+
+    def start_continuous_odmr(self, length=100):
+        """ Start a continuous ODMR acquisition into a circular buffer.
+
+        The clock runs continuously and triggers the microwave for every pixel, so the list/sweep
+        of the microwave source has to wrap around to its first step after the last one. The
+        counter (and analog input) tasks write into circular buffers holding odmr_buffer_sweeps
+        sweeps, which are read out with read_odmr_sweeps.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if len(self._scanner_counter_daq_tasks) < 1:
+            self.log.error('No counter is running, cannot start a continuous ODMR without one.')
+            return -1
+
+        if len(self._scanner_ai_channels) > 0 and self._scanner_analog_daq_task is None:
+            self.log.error('No analog task is running, cannot do ODMR without one.')
+            return -1
+
+        if self._odmr_continuous:
+            self.log.error('Continuous ODMR is already running, stop it first.')
+            return -1
+
+        self._odmr_sweep_length = int(length)
+        if self._odmr_pulser_daq_task:
+            self._odmr_length = self._odmr_sweep_length * self.oversampling * 2
+        else:
+            self._odmr_length = self._odmr_sweep_length
+        buffer_samples = self._odmr_length * max(int(self._odmr_buffer_sweeps), 2)
+
+        try:
+            # free running clock
+            daq.DAQmxCfgImplicitTiming(
+                self._scanner_clock_daq_task,
+                daq.DAQmx_Val_ContSamps,
+                1000)
+
+            # two semi periods are counted for each clock pulse
+            daq.DAQmxCfgImplicitTiming(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_ContSamps,
+                2 * buffer_samples)
+            daq.DAQmxCfgInputBuffer(self._scanner_counter_daq_tasks[0], 2 * buffer_samples)
+
+            # read samples from current position of acquisition and raise an error if the
+            # circular buffer overflows instead of silently losing sweeps
+            daq.DAQmxSetReadRelativeTo(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_CurrReadPos)
+            daq.DAQmxSetReadOffset(
+                self._scanner_counter_daq_tasks[0],
+                0)
+            daq.DAQmxSetReadOverWrite(
+                self._scanner_counter_daq_tasks[0],
+                daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
 
-            real_data += odmr_data[1:-1:2]
-            real_data += odmr_data[:-1:2]
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxCfgSampClkTiming(
+                    self._scanner_analog_daq_task,
+                    self._scanner_clock_channel + 'InternalOutput',
+                    self._scanner_clock_frequency,
+                    daq.DAQmx_Val_Rising,
+                    daq.DAQmx_Val_ContSamps,
+                    buffer_samples)
+                daq.DAQmxCfgInputBuffer(self._scanner_analog_daq_task, buffer_samples)
 
             if self._odmr_pulser_daq_task:
-                differential_data = np.zeros((self.oversampling * length, ), dtype=np.float64)
-
-                differential_data += real_data[1::2]
-                differential_data -= real_data[::2]
-                differential_data = np.divide(differential_data, real_data[::2],
-                                              np.zeros_like(differential_data),
-                                              where=real_data[::2] != 0)
-
-                all_data[0] = np.median(np.reshape(differential_data,
-                                                   (-1, self.oversampling)),
-                                        axis=1
-                                        )
-
-                if len(self._scanner_ai_channels) > 0:
-                    for i, analog_data in enumerate(odmr_analog_data):
-                        differential_data = np.zeros((self.oversampling * length, ), dtype=np.float64)
-
-                        differential_data += analog_data[1:-1:2]
-                        differential_data -= analog_data[:-1:2]
-                        differential_data = np.divide(differential_data, analog_data[:-1:2],
-                                                      np.zeros_like(differential_data),
-                                                      where=analog_data[:-1:2] != 0)
-
-                        all_data[i+1] = np.median(np.reshape(differential_data,
-                                                             (-1, self.oversampling)),
-                                                  axis=1
-                                                  )
+                daq.DAQmxCfgSampClkTiming(
+                    self._odmr_pulser_daq_task,
+                    self._scanner_clock_channel + 'InternalOutput',
+                    self._scanner_clock_frequency,
+                    daq.DAQmx_Val_Rising,
+                    daq.DAQmx_Val_ContSamps,
+                    self.oversampling * 2)
+                self._write_odmr_pulse_pattern()
 
-            else:
-                all_data[0] = np.array(real_data * self._scanner_clock_frequency, np.float64)
-                if len(self._scanner_ai_channels) > 0:
-                    all_data[1:] = odmr_analog_data[:, :-1]
+            daq.DAQmxStartTask(self._scanner_counter_daq_tasks[0])
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxStartTask(self._scanner_analog_daq_task)
+            if self._odmr_pulser_daq_task:
+                daq.DAQmxStartTask(self._odmr_pulser_daq_task)
+            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+        except:
+            self.log.exception('Error while starting continuous ODMR.')
+            self._stop_odmr_tasks()
+            return -1
+
+        self._odmr_continuous = True
+        return 0
+
+    def read_odmr_sweeps(self, max_sweeps=None):
+        """ Return all sweeps completed since the last call of a continuous ODMR acquisition.
+
+        Waits for at least one sweep to complete. The demodulation of all sweeps is done at once.
+
+        @param int max_sweeps: optional, maximum number of sweeps to return
+
+        @return (bool, float[][][]): tuple: was there an error, the data of the sweeps in
+                                     format [sweep][channel][pixel]
+        """
+        channel_number = len(self.get_odmr_channels())
+        if not self._odmr_continuous:
+            self.log.error('No continuous ODMR is running, cannot read sweeps.')
+            return True, np.full((0, channel_number, 1), -1.)
+
+        sweep_samples = 2 * self._odmr_length
+        sweep_time = self._odmr_length / self._scanner_clock_frequency
+        try:
+            available = daq.uInt32()
+            daq.DAQmxGetReadAvailSampPerChan(self._scanner_counter_daq_tasks[0],
+                                             daq.byref(available))
+            n_sweeps = max(available.value // sweep_samples, 1)
+            if max_sweeps is not None:
+                n_sweeps = min(n_sweeps, max(int(max_sweeps), 1))
+
+            odmr_data = np.full((n_sweeps * sweep_samples, ), 222, dtype=np.uint32)
+            n_read_samples = daq.int32()
+            daq.DAQmxReadCounterU32(
+                self._scanner_counter_daq_tasks[0],
+                n_sweeps * sweep_samples,
+                self._RWTimeout + sweep_time,
+                odmr_data,
+                n_sweeps * sweep_samples,
+                daq.byref(n_read_samples),
+                None)
+
+            analog_sweeps = None
+            if len(self._scanner_ai_channels) > 0:
+                odmr_analog_data = np.full(
+                    (len(self._scanner_ai_channels), n_sweeps * self._odmr_length),
+                    222,
+                    dtype=np.float64)
+                analog_read_samples = daq.int32()
+                daq.DAQmxReadAnalogF64(
+                    self._scanner_analog_daq_task,
+                    n_sweeps * self._odmr_length,
+                    self._RWTimeout + sweep_time,
+                    daq.DAQmx_Val_GroupByChannel,
+                    odmr_analog_data,
+                    odmr_analog_data.size,
+                    daq.byref(analog_read_samples),
+                    None)
+                analog_sweeps = odmr_analog_data.reshape(
+                    len(self._scanner_ai_channels), n_sweeps, self._odmr_length)
 
-            return False, all_data
+            return False, self._demodulate_odmr_data(
+                odmr_data.reshape(n_sweeps, sweep_samples), analog_sweeps, self._odmr_sweep_length)
         except:
-            self.log.exception('Error while counting for ODMR.')
-            return True, np.full((len(self.get_odmr_channels()), 1), [-1.])
+            self.log.exception('Error while reading continuous ODMR sweeps.')
+            return True, np.full((0, channel_number, 1), -1.)
+
+    def stop_continuous_odmr(self):
+        """ Stop a continuous ODMR acquisition. The counter stays set up until close_odmr.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if not self._odmr_continuous:
+            return 0
+        self._odmr_continuous = False
+        return self._stop_odmr_tasks()
+
+    def _stop_odmr_tasks(self):
+        """ Stop the clock, counter, analog and pulser tasks of the ODMR.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        try:
+            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            daq.DAQmxStopTask(self._scanner_counter_daq_tasks[0])
+            if len(self._scanner_ai_channels) > 0:
+                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+            if self._odmr_pulser_daq_task:
+                daq.DAQmxStopTask(self._odmr_pulser_daq_task)
+        except:
+            self.log.exception('Error while stopping ODMR tasks.')
+            return -1
+        return 0
+
+    def _write_odmr_pulse_pattern(self):
+        """ Write the lock-in pulse pattern to the ODMR pulser task. """
+        # The pulse pattern is an alternating 0 and 1 on the switching channel (line0),
+        # while the first half of the whole microwave pulse is 1 and the other half is 0.
+        # This way the beginning of the microwave has a rising edge.
+        pulse_pattern = np.zeros(self.oversampling * 2, dtype=np.uint32)
+        pulse_pattern[:self.oversampling] += 1
+        pulse_pattern[::2] += 2
+
+        daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
+                                 len(pulse_pattern),
+                                 0,
+                                 self._RWTimeout * self._odmr_length,
+                                 daq.DAQmx_Val_GroupByChannel,
+                                 pulse_pattern,
+                                 None,
+                                 None)
+
+    def _demodulate_odmr_data(self, counter_data, analog_data, length):
+        """ Convert the raw samples of complete sweeps into count rates or lock-in signals.
+
+        All sweeps of a batch are processed at once.
+
+        @param numpy.ndarray counter_data: semi period counts in format [sweep][sample]
+        @param numpy.ndarray analog_data: analog input in format [channel][sweep][sample] or None
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: data in format [sweep][channel][pixel]
+        """
+        n_sweeps = counter_data.shape[0]
+        # add up adjoint semi periods to also get the counts from the low time of the clock
+        pixel_counts = counter_data.reshape(n_sweeps, -1, 2).sum(axis=2, dtype=np.float64)
+        if analog_data is not None:
+            all_data = np.concatenate(
+                (pixel_counts[:, np.newaxis, :], np.swapaxes(analog_data, 0, 1)), axis=1)
+        else:
+            all_data = pixel_counts[:, np.newaxis, :]
+
+        if self._odmr_pulser_daq_task:
+            # microwave off (reference) and on (signal) samples alternate
+            reference = all_data[:, :, ::2]
+            differential_data = np.divide(all_data[:, :, 1::2] - reference,
+                                          reference,
+                                          out=np.zeros_like(reference),
+                                          where=reference != 0)
+            return np.median(
+                differential_data.reshape(n_sweeps, all_data.shape[1], length, -1), axis=3)
+
+        all_data[:, 0] *= self._scanner_clock_frequency
+        return all_data
 
     def close_odmr(self):
         """ Closes the odmr and cleans up afterwards.
@@ -1882,6 +2068,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         @return int: error code (0:OK, -1:error)
         """
         retval = 0
+        if self.stop_continuous_odmr() < 0:
+            retval = -1
         try:
             # disconnect the trigger channel
             daq.DAQmxDisconnectTerms(
@@ -35,6 +35,7 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         module.Class: 'odmr_counter_dummy.ODMRCounterDummy'
         clock_frequency: 100 # in Hz
         number_of_channels: 2
+        buffer_sweeps: 100 # number of sweeps fitting into the simulated continuous buffer
         fitlogic: 'fitlogic' # name of the fitlogic module, see default config
 
     """
@@ -48,6 +49,7 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
     # config options
     _clock_frequency = ConfigOption('clock_frequency', 100, missing='warn')
     _number_of_channels = ConfigOption('number_of_channels', 2, missing='warn')
+    _buffer_sweeps = ConfigOption('buffer_sweeps', 100, missing='nothing')
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -57,6 +59,9 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         self._pulse_out_channel = 'dummy'
         self._lock_in_active = False
         self._oversampling = 10
+        self._continuous_start = None
+        self._continuous_sweeps_read = 0
+        self._continuous_spectrum = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -138,6 +143,104 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
 
         self._odmr_length = length
 
+        ret = np.random.uniform(0, 5e4, (self._number_of_channels, length))
+        ret += self._simulate_odmr_spectrum(length)
+
+        time.sleep(self._odmr_length*1./self._clock_frequency)
+
+        self.module_state.unlock()
+        return False, ret
+
+    def supports_continuous_odmr(self):
+        """ Whether the counter can acquire sweeps continuously with a free running microwave sweep.
+
+        @return bool: True if start_continuous_odmr is supported, False if not
+        """
+        return True
+
+    def start_continuous_odmr(self, length=100):
+        """ Start a simulated continuous ODMR acquisition.
+
+        Sweeps are completed at the rate given by the clock frequency (and the oversampling in
+        lock-in mode), like with a free running microwave sweep.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('A scan_line is already running, close this one first.')
+            return -1
+
+        self.module_state.lock()
+        self._odmr_length = length
+        self._continuous_spectrum = self._simulate_odmr_spectrum(length)
+        if self._lock_in_active:
+            # relative change of the signal with respect to the microwave off reference, which
+            # is the mean of the noise plus the offset of the resonances
+            offset = self._continuous_spectrum[:, :1]
+            self._continuous_spectrum = (self._continuous_spectrum - offset) / (2.5e4 + offset)
+        self._continuous_sweeps_read = 0
+        self._continuous_start = time.perf_counter()
+        return 0
+
+    def read_odmr_sweeps(self, max_sweeps=None):
+        """ Return all simulated sweeps completed since the last call.
+
+        Waits for at least one sweep to complete. If more sweeps than fit into the buffer are
+        pending, the buffer overflows and an error is returned like for the real hardware.
+
+        @param int max_sweeps: optional, maximum number of sweeps to return
+
+        @return (bool, float[][][]): tuple: was there an error, the data of the sweeps in
+                                     format [sweep][channel][pixel]
+        """
+        if self._continuous_start is None:
+            self.log.error('No continuous ODMR is running, cannot read sweeps.')
+            return True, np.full((0, self._number_of_channels, 1), -1.)
+
+        sweep_time = self._odmr_length / self._clock_frequency
+        if self._lock_in_active:
+            sweep_time *= 2 * self._oversampling
+        completed = int((time.perf_counter() - self._continuous_start) / sweep_time)
+        if completed <= self._continuous_sweeps_read:
+            next_sweep_end = self._continuous_start + (self._continuous_sweeps_read + 1) * sweep_time
+            time.sleep(max(next_sweep_end - time.perf_counter(), 0))
+            completed = self._continuous_sweeps_read + 1
+
+        n_sweeps = completed - self._continuous_sweeps_read
+        if n_sweeps > self._buffer_sweeps:
+            self.log.error('Buffer overflow: {0:d} sweeps pending, but the buffer only holds '
+                           '{1:d} sweeps.'.format(n_sweeps, self._buffer_sweeps))
+            return True, np.full((0, self._number_of_channels, 1), -1.)
+        if max_sweeps is not None:
+            n_sweeps = min(n_sweeps, max(int(max_sweeps), 1))
+        self._continuous_sweeps_read += n_sweeps
+
+        shape = (n_sweeps, self._number_of_channels, self._odmr_length)
+        if self._lock_in_active:
+            noise = np.random.normal(0, 0.05 / np.sqrt(self._oversampling), shape)
+        else:
+            noise = np.random.uniform(0, 5e4, shape)
+        return False, noise + self._continuous_spectrum
+
+    def stop_continuous_odmr(self):
+        """ Stop the simulated continuous ODMR acquisition.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._continuous_start is not None:
+            self._continuous_start = None
+            self.module_state.unlock()
+        return 0
+
+    def _simulate_odmr_spectrum(self, length):
+        """ Noise free ODMR spectrum with two resonances for all channels.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: spectrum in format [channel][pixel]
+        """
         lorentians, params = self._fit_logic.make_lorentziandouble_model()
 
         sigma = 3.
@@ -150,18 +253,8 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         params.add('l1_sigma', value=sigma)
         params.add('offset', value=50000.)
 
-        ret = np.empty((self._number_of_channels, length))
-
-        for chnl_index in range(self._number_of_channels):
-            count_data = np.random.uniform(0, 5e4, length)
-            count_data += (chnl_index + 1) * lorentians.eval(x=np.arange(1, length + 1, 1),
-                                                             params=params)
-            ret[chnl_index] = count_data
-
-        time.sleep(self._odmr_length*1./self._clock_frequency)
-
-        self.module_state.unlock()
-        return False, ret
+        spectrum = lorentians.eval(x=np.arange(1, length + 1, 1), params=params)
+        return np.outer(np.arange(1, self._number_of_channels + 1), spectrum)
 
 
     def close_odmr(self):
@@ -172,6 +265,7 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
 
         self.log.info('ODMRCounterDummy>close_odmr')
 
+        self.stop_continuous_odmr()
         self._scanner_counter_daq_task = None
 
         return 0
@@ -215,4 +309,4 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         else:
             self._lock_in_active = val
             if self._lock_in_active:
-                self.log.warn('Lock-In is not implemented')
+                self.log.warn('Lock-In is only simulated for the continuous acquisition.')
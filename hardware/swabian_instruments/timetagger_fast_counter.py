@@ -24,6 +24,7 @@ import numpy as np
 import TimeTagger as tt
 from core.module import Base, ConfigOption
 import os
+import time
 
 
 class TimeTaggerFastCounter(Base, FastCounterInterface):
@@ -39,6 +40,9 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         timetagger_channel_sequence: 3
         timetagger_sum_channels: 4
 
+    The histogram is read into a preallocated int64 buffer which is reused and returned by
+    get_data_trace. It stays valid only until the next readout. get_data_trace_delta returns
+    only the counts added since its previous call.
     """
     _modclass = 'TimeTaggerFastCounter'
     _modtype = 'hardware'
@@ -68,6 +72,17 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         self.log.info('TimeTagger (fast counter) configured to use  channel {0}'
                       .format(self._channel_apd))
 
+        self.pulsed = None
+        # Reusable readout buffers, allocated in configure
+        self._data_buffer = np.zeros((0, 0), dtype='int64')
+        self._delta_buffer = np.zeros((0, 0), dtype='int64')
+        self._last_data = np.zeros((0, 0), dtype='int64')
+        self._last_sweeps = 0
+        self._last_time = 0.0
+        # Software measurement time for TimeTagger versions without getCaptureDuration
+        self._elapsed_time = 0.0
+        self._start_time = 0.0
+
         self.statusvar = 0
 
     def get_constraints(self):
@@ -157,12 +172,22 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
 
         self.pulsed.stop()
 
+        data_shape = (max(number_of_gates, 1), self._record_length)
+        self._data_buffer = np.zeros(data_shape, dtype='int64')
+        self._delta_buffer = np.zeros(data_shape, dtype='int64')
+        self._last_data = np.zeros(data_shape, dtype='int64')
+
         return bin_width_s, record_length_s, number_of_gates
 
     def start_measure(self):
         """ Start the fast counter. """
         self.module_state.lock()
         self.pulsed.clear()
+        self._last_data[:] = 0
+        self._last_sweeps = 0
+        self._last_time = 0.0
+        self._elapsed_time = 0.0
+        self._start_time = time.time()
         self.pulsed.start()
         self.statusvar = 2
         return 0
@@ -171,6 +196,8 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         """ Stop the fast counter. """
         if self.module_state() == 'locked':
             self.pulsed.stop()
+            if self.statusvar == 2:
+                self._elapsed_time += time.time() - self._start_time
             self.module_state.unlock()
         self.statusvar = 1
         return 0
@@ -182,6 +209,7 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         """
         if self.module_state() == 'locked':
             self.pulsed.stop()
+            self._elapsed_time += time.time() - self._start_time
             self.statusvar = 3
         return 0
 
@@ -191,6 +219,7 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         If fast counter is in pause state, then fast counter will be continued.
         """
         if self.module_state() == 'locked':
+            self._start_time = time.time()
             self.pulsed.start()
             self.statusvar = 2
         return 0
@@ -214,11 +243,67 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
         The binning, specified by calling configure() in forehand, must be taken
         care of in this hardware class. A possible overflow of the histogram
         bins must be caught here and taken care of.
+
+        The returned array is a buffer that is reused by the next call of get_data_trace or
+        get_data_trace_delta. Copy it if you need to keep the data.
         """
-        info_dict = {'elapsed_sweeps': None,
-                     'elapsed_time': None}  # TODO : implement that according to hardware capabilities
-        return np.array(self.pulsed.getData(), dtype='int64'), info_dict
+        self._read_histogram()
+        info_dict = {'elapsed_sweeps': self._get_elapsed_sweeps(),
+                     'elapsed_time': self._get_elapsed_time()}
+        return self._data_buffer, info_dict
+
+    def get_data_trace_delta(self):
+        """ Polls the counts added to the timetrace since the last call of this method (or since
+        the start of the measurement).
+
+        @return tuple(numpy.ndarray, dict): 2D array of dtype int64 (gate_index, timebin_index)
+                                            with the new counts and info_dict with the keys:
+            - 'elapsed_sweeps' : the total elapsed number of sweeps
+            - 'elapsed_time' : the total elapsed time in seconds
+            - 'interval_sweeps' : the number of sweeps since the last call
+            - 'interval_time' : the elapsed measurement time since the last call in seconds
+
+        The returned array is a buffer that is reused by the next call of this method.
+        """
+        self._read_histogram()
+        np.subtract(self._data_buffer, self._last_data, out=self._delta_buffer)
+        self._last_data[:] = self._data_buffer
+
+        elapsed_sweeps = self._get_elapsed_sweeps()
+        elapsed_time = self._get_elapsed_time()
+        info_dict = {'elapsed_sweeps': elapsed_sweeps,
+                     'elapsed_time': elapsed_time,
+                     'interval_sweeps': elapsed_sweeps - self._last_sweeps,
+                     'interval_time': elapsed_time - self._last_time}
+        self._last_sweeps = elapsed_sweeps
+        self._last_time = elapsed_time
+        return self._delta_buffer, info_dict
+
+    def _read_histogram(self):
+        """ Copy the current TimeDifferences histogram into the preallocated int64 buffer.
+        """
+        data = self.pulsed.getData()
+        if data.shape != self._data_buffer.shape:
+            self._data_buffer = np.zeros(data.shape, dtype='int64')
+            self._delta_buffer = np.zeros(data.shape, dtype='int64')
+            self._last_data = np.zeros(data.shape, dtype='int64')
+        np.copyto(self._data_buffer, data, casting='unsafe')
+        return
+
+    def _get_elapsed_sweeps(self):
+        """ Number of completed sweeps, i.e. rollovers of the histogram index.
+        """
+        return int(self.pulsed.getCounts())
 
+    def _get_elapsed_time(self):
+        """ Elapsed measurement time in seconds. Uses the capture duration of the TimeTagger if
+        the installed software version supports it.
+        """
+        if hasattr(self.pulsed, 'getCaptureDuration'):
+            return self.pulsed.getCaptureDuration() * 1e-12
+        if self.statusvar == 2:
+            return self._elapsed_time + time.time() - self._start_time
+        return self._elapsed_time
 
     def get_status(self):
         """ Receives the current status of the Fast Counter and outputs it as
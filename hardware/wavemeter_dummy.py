@@ -22,16 +22,22 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import random
+import threading
+import time
+import numpy as np
 from qtpy import QtCore
 
 from core.module import Base, ConfigOption
 from interface.wavemeter_interface import WavemeterInterface
 from core.util.mutex import Mutex
+from core.util.ring_history import RingHistory
 
 
 class HardwarePull(QtCore.QObject):
-    """ Helper class for running the hardware communication in a separate
-    thread.
+    """ Helper class emulating the callback thread of the wavemeter DLL.
+
+    A new measurement is made every measurement_timing and reported to the parent class with
+    the same callback the real hardware module installs in the DLL.
     """
 
     def __init__(self, parentclass):
@@ -40,41 +46,39 @@ class HardwarePull(QtCore.QObject):
         # remember the reference to the parent class to access functions ad settings
         self._parentclass = parentclass
 
-    def handle_timer(self, state_change):
-        """ Threaded method that can be called by a signal from outside to start
-            the timer.
-
-        @param bool state_change: (True) starts timer, (False) stops it.
-        """
-
-        if state_change:
-            self.timer = QtCore.QTimer()
-            self.timer.timeout.connect(self._measure_thread)
-            self.timer.start(self._parentclass._measurement_timing)
-        else:
-            if hasattr(self, 'timer'):
-                self.timer.stop()
-
-    def _measure_thread(self):
-        """ The threaded method querying the data from the wavemeter. """
-
+    def run(self):
+        """ Emulate measurements until the acquisition is stopped. """
         range_step = 0.1
-
-        # update as long as the status is busy
-        if self._parentclass.module_state() == 'running':
-            # get the current wavelength from the wavemeter
-            self._parentclass._current_wavelength += random.uniform(-range_step, range_step)
-            self._parentclass._current_wavelength2 += random.uniform(-range_step, range_step)
+        parent = self._parentclass
+        period = parent._measurement_timing / 1000
+        next_measurement = time.perf_counter()
+        while not parent._stop_event.is_set():
+            next_measurement += period
+            wait = next_measurement - time.perf_counter()
+            if wait > 0 and parent._stop_event.wait(wait):
+                break
+            # the wavemeter reports the time of the measurement in ms
+            measurement_time = int(time.perf_counter() * 1000)
+            parent._wavelength_callback(
+                42, measurement_time,
+                parent._current_wavelength + random.uniform(-range_step, range_step))
+            parent._wavelength_callback(
+                43, measurement_time,
+                parent._current_wavelength2 + random.uniform(-range_step, range_step))
 
 
 class WavemeterDummy(Base, WavemeterInterface):
     """ Dummy hardware class to simulate the controls for a wavemeter.
 
+    The wavelength makes a random walk and every step is reported like the callbacks of the
+    wavemeter DLL.
+
     Example config for copy-paste:
 
     temp_tsys:
         module.Class: 'wavemeter_dummy.WavemeterDummy'
-        measurement_timing: 10.0
+        measurement_timing: 10.0 # time between measurements in ms
+        buffer_length: 100000 # optional, number of buffered readings
 
     """
     _modclass = 'WavemeterDummy'
@@ -82,8 +86,12 @@ class WavemeterDummy(Base, WavemeterInterface):
 
     # config opts
     _measurement_timing = ConfigOption('measurement_timing', 10.)
+    _buffer_length = ConfigOption('buffer_length', default=100000)
+
+    sig_start_measurement = QtCore.Signal()
 
-    sig_handle_timer = QtCore.Signal(bool)
+    # callback modes of new wavelength readings and their channel
+    _cmiWavelength = {42: 1, 43: 2}
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -95,9 +103,15 @@ class WavemeterDummy(Base, WavemeterInterface):
         self._current_wavelength = 700.0
         self._current_wavelength2 = 700.0
 
+        self._readings = None
+        self._clock_offset = np.inf
+        self._stop_event = threading.Event()
+
     def on_activate(self):
         """ Activate module.
         """
+        self._readings = RingHistory(3, self._buffer_length)
+
         # create an indepentent thread for the hardware communication
         self.hardware_thread = QtCore.QThread()
 
@@ -106,7 +120,7 @@ class WavemeterDummy(Base, WavemeterInterface):
         self._hardware_pull.moveToThread(self.hardware_thread)
 
         # connect the signals in and out of the threaded object
-        self.sig_handle_timer.connect(self._hardware_pull.handle_timer)
+        self.sig_start_measurement.connect(self._hardware_pull.run, QtCore.Qt.QueuedConnection)
 
         # start the event loop for the hardware
         self.hardware_thread.start()
@@ -117,7 +131,8 @@ class WavemeterDummy(Base, WavemeterInterface):
 
         self.stop_acqusition()
         self.hardware_thread.quit()
-        self.sig_handle_timer.disconnect()
+        self.hardware_thread.wait()
+        self.sig_start_measurement.disconnect()
 
     #############################################
     # Methods of the main class
@@ -138,9 +153,12 @@ class WavemeterDummy(Base, WavemeterInterface):
         self.module_state.run()
         # actually start the wavemeter
         self.log.warning('starting Wavemeter')
+        self._readings.clear()
+        self._clock_offset = np.inf
 
         # start the measuring thread
-        self.sig_handle_timer.emit(True)
+        self._stop_event.clear()
+        self.sig_start_measurement.emit()
 
         return 0
 
@@ -155,7 +173,7 @@ class WavemeterDummy(Base, WavemeterInterface):
                     'anyway!')
         else:
             # stop the measurement thread
-            self.sig_handle_timer.emit(False)
+            self._stop_event.set()
             # set status to idle again
             self.module_state.stop()
 
@@ -194,6 +212,41 @@ class WavemeterDummy(Base, WavemeterInterface):
             return float(self._current_wavelength2)
         return -2.0
 
+    def _wavelength_callback(self, mode, int_val, dbl_val):
+        """ Callback for new wavelength readings, same as in the real hardware module.
+
+        @param int mode: kind of the notification
+        @param int int_val: for new wavelength readings the time of the measurement in ms
+        @param float dbl_val: for new wavelength readings the wavelength in nm (vac)
+        """
+        channel = self._cmiWavelength.get(mode)
+        if channel is None:
+            return
+        measurement_time = int_val / 1000
+        self._clock_offset = min(self._clock_offset, time.time() - measurement_time)
+        if channel == 1:
+            self._current_wavelength = dbl_val
+        else:
+            self._current_wavelength2 = dbl_val
+        self._readings.append((measurement_time, dbl_val, channel))
+
+    def get_wavelength_data(self, first_sample=0, kind="air"):
+        """ Return all wavelength readings acquired since a sample number.
+
+        @param int first_sample: number of the first reading to return. Readings that are not
+                                 buffered anymore are skipped.
+        @param str kind: can either be "air" or "vac" for the wavelength in air or vacuum,
+                         respectively. The dummy does not distinguish them.
+
+        @return (int, numpy.ndarray): number of the next reading and the readings in format
+                                      [time (s since epoch), wavelength (nm), channel][reading]
+        """
+        count = self._readings.count
+        data = self._readings.read(first_sample, count)
+        if np.isfinite(self._clock_offset):
+            data[0] += self._clock_offset
+        return count, data
+
     def get_timing(self):
         """ Get the timing of the internal measurement thread.
 
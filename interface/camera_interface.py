@@ -91,6 +91,20 @@ class CameraInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    @abc.abstractmethod
+    def get_new_frames(self, timeout=1.):
+        """ Return all frames acquired since the last call during a live acquisition.
+
+        Waits at most timeout for at least one new frame to arrive. The frames are returned in
+        the order they were acquired, no frame is returned twice.
+
+        @param float timeout: maximum waiting time in seconds
+
+        @return numpy array: frame data in format [frame][row][col], empty if no new frame
+                             arrived within the timeout or if no live acquisition is running
+        """
+        pass
+
     @abc.abstractmethod
     def set_exposure(self, exposure):
         """ Set the exposure time in seconds
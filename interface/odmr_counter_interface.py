@@ -80,6 +80,49 @@ class ODMRCounterInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    @abc.abstractmethod
+    def supports_continuous_odmr(self):
+        """ Whether the counter can acquire sweeps continuously with a free running microwave sweep.
+
+        @return bool: True if start_continuous_odmr is supported, False if not
+        """
+        pass
+
+    @abc.abstractmethod
+    def start_continuous_odmr(self, length=100):
+        """ Start a continuous ODMR acquisition into a circular buffer.
+
+        The microwave is triggered continuously, i.e. the list/sweep of the microwave source has
+        to be running and has to wrap around to its first step after the last one. The counter
+        has to be set up with set_up_odmr before.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        pass
+
+    @abc.abstractmethod
+    def read_odmr_sweeps(self, max_sweeps=None):
+        """ Return all sweeps completed since the last call of a continuous ODMR acquisition.
+
+        Waits for at least one sweep to complete.
+
+        @param int max_sweeps: optional, maximum number of sweeps to return
+
+        @return (bool, float[][][]): tuple: was there an error, the data of the sweeps in
+                                     format [sweep][channel][pixel]
+        """
+        pass
+
+    @abc.abstractmethod
+    def stop_continuous_odmr(self):
+        """ Stop a continuous ODMR acquisition. The counter stays set up until close_odmr.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        pass
+
     @abc.abstractmethod
     def close_odmr(self):
         """ Close the odmr and clean up afterwards.
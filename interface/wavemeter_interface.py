@@ -72,6 +72,23 @@ class WavemeterInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    @abc.abstractmethod
+    def get_wavelength_data(self, first_sample=0, kind="air"):
+        """ Return all wavelength readings acquired since a sample number.
+
+        Every reading of the wavemeter is kept with the time of the measurement, so readings
+        can be fetched in batches without losing any of them.
+
+        @param int first_sample: number of the first reading to return. Readings that are not
+                                 buffered anymore are skipped.
+        @param str kind: can either be "air" or "vac" for the wavelength in air
+                         or vacuum, respectively.
+
+        @return (int, numpy.ndarray): number of the next reading and the readings in format
+                                      [time (s since epoch), wavelength (nm), channel][reading]
+        """
+        pass
+
     @abc.abstractmethod
     def get_timing(self):
         """ Get the timing of the internal measurement thread.
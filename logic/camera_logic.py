@@ -21,6 +21,9 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import numpy as np
+import os
+import threading
+import time
 
 from core.module import Connector, ConfigOption, StatusVar
 from core.util.mutex import Mutex
@@ -33,9 +36,195 @@ import datetime
 from collections import OrderedDict
 
 
+class FrameRingBuffer:
+    """ Preallocated ring of frame buffers.
+
+    The frames are written by the acquisition thread and read by the preview and the recorder.
+    Every frame gets a consecutive frame number, so a reader only has to remember the number of
+    the next frame it wants to read. Frames older than the size of the ring are overwritten.
+    """
+
+    def __init__(self, size, frame_shape, dtype):
+        """
+        @param int size: number of frames in the ring
+        @param tuple frame_shape: shape (rows, columns) of a single frame
+        @param numpy.dtype dtype: data type of the frames
+        """
+        self.size = int(size)
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.frames = np.zeros((self.size,) + self.frame_shape, dtype=self.dtype)
+        self.timestamps = np.zeros(self.size)
+        self.frame_count = 0
+        self._condition = threading.Condition()
+
+    def write(self, frames, timestamps):
+        """ Copy new frames into the ring.
+
+        @param numpy.ndarray frames: frames in format [frame][row][col]
+        @param numpy.ndarray timestamps: acquisition time of each frame
+        """
+        # only the last frames fit into the ring, the others still count as written
+        skipped = max(len(frames) - self.size, 0)
+        frames = frames[skipped:]
+        timestamps = timestamps[skipped:]
+        with self._condition:
+            indices = (self.frame_count + skipped + np.arange(len(frames))) % self.size
+            self.frames[indices] = frames
+            self.timestamps[indices] = timestamps
+            self.frame_count += skipped + len(frames)
+            self._condition.notify_all()
+
+    def read(self, next_frame, timeout=None):
+        """ Copy all frames from frame number next_frame on.
+
+        @param int next_frame: number of the first frame to read
+        @param float timeout: optional, time in s to wait for a new frame if there is none yet
+
+        @return tuple(numpy.ndarray, numpy.ndarray, int): frames, timestamps and the number of
+                                                          the first returned frame. Frames that
+                                                          were already overwritten are skipped.
+        """
+        with self._condition:
+            if timeout is not None and self.frame_count <= next_frame:
+                self._condition.wait(timeout)
+            first_frame = max(next_frame, self.frame_count - self.size)
+            indices = np.arange(first_frame, self.frame_count) % self.size
+            return self.frames[indices], self.timestamps[indices], first_frame
+
+    def latest(self):
+        """ Return a copy of the most recent frame or None if no frame was written yet. """
+        with self._condition:
+            if self.frame_count == 0:
+                return None
+            return self.frames[(self.frame_count - 1) % self.size].copy()
+
+
+class FrameGrabber(QtCore.QObject):
+    """ Helper class fetching the frames from the camera in a separate thread.
+
+    The camera is read out as fast as it delivers frames, independent of the display rate.
+    """
+    sigGrabbingFinished = QtCore.Signal()
+
+    def __init__(self, parentclass):
+        super().__init__()
+
+        # remember the reference to the parent class to access functions ad settings
+        self._parentclass = parentclass
+
+    def run(self):
+        """ Fetch frames from the camera until the video of the parent class is stopped. """
+        logic = self._parentclass
+        hardware = logic._hardware
+        live = hardware.support_live_acquisition()
+        if live:
+            live = hardware.start_live_acquisition() is not False
+            if not live:
+                logic.log.warning('Starting the live acquisition failed. Falling back to '
+                                  'repeated single acquisitions.')
+        try:
+            while logic.enabled:
+                if live:
+                    timeout = min(max(2 * logic._exposure, 0.1), 1.)
+                    frames = np.asarray(hardware.get_new_frames(timeout))
+                else:
+                    hardware.start_single_acquisition()
+                    frames = np.asarray(hardware.get_acquired_data())[np.newaxis]
+                if len(frames) > 0:
+                    logic._process_frames(frames, time.time())
+        except Exception:
+            logic.log.exception('Frame acquisition failed.')
+            logic.enabled = False
+        finally:
+            hardware.stop_acquisition()
+            self.sigGrabbingFinished.emit()
+
+
+class FrameRecorder(QtCore.QObject):
+    """ Helper class streaming the frames of the ring buffer to disk in a separate thread.
+
+    The frames are appended in chunks to a raw binary file. The frame format and the timestamps
+    are saved to a separate data file when the recording is stopped.
+    """
+    sigRecordingFinished = QtCore.Signal(str, int, int)
+
+    def __init__(self, parentclass):
+        super().__init__()
+
+        # remember the reference to the parent class to access functions ad settings
+        self._parentclass = parentclass
+
+    def run(self, file_path):
+        """ Write frames to file_path until the recording of the parent class is stopped.
+
+        @param str file_path: path of the raw frame file
+        """
+        logic = self._parentclass
+        ring = None
+        next_frame = 0
+        recorded_frames = 0
+        lost_frames = 0
+        chunk = list()
+        chunk_frames = 0
+        try:
+            with open(file_path, 'wb') as frame_file:
+                while logic._recording:
+                    if ring is None:
+                        ring = logic._ring_buffer
+                        if ring is None:
+                            time.sleep(0.01)
+                            continue
+                        next_frame = ring.frame_count
+                    elif logic._ring_buffer is not ring:
+                        logic.log.error('The frame format changed during the recording. '
+                                        'Recording stopped.')
+                        break
+                    frames, timestamps, first_frame = ring.read(next_frame, timeout=0.1)
+                    lost_frames += first_frame - next_frame
+                    next_frame = first_frame + len(frames)
+                    if len(frames) == 0:
+                        continue
+                    chunk.append(frames)
+                    logic._recorded_timestamps.extend(timestamps)
+                    chunk_frames += len(frames)
+                    if chunk_frames >= logic._recording_chunk_size:
+                        frame_file.write(np.concatenate(chunk).tobytes())
+                        recorded_frames += chunk_frames
+                        chunk = list()
+                        chunk_frames = 0
+                if chunk_frames > 0:
+                    frame_file.write(np.concatenate(chunk).tobytes())
+                    recorded_frames += chunk_frames
+        except Exception:
+            logic.log.exception('Recording of frames failed.')
+        finally:
+            logic._recording = False
+            if lost_frames > 0:
+                logic.log.warning('{0:d} frames were lost during the recording. Increase the '
+                                  'ring buffer size.'.format(lost_frames))
+            self.sigRecordingFinished.emit(file_path, recorded_frames, lost_frames)
+
+
 class CameraLogic(GenericLogic):
     """
     Control a camera.
+
+    The frames are fetched from the camera in a separate thread and stored in a preallocated
+    ring buffer. Every frame can be accumulated into a running sum, reduced to the mean over
+    regions of interest (ROI) and streamed to disk. The display only receives the most recent
+    frame at a rate of at most default_exposure frames per second.
+
+    Example config for copy-paste:
+
+    camera_logic:
+        module.Class: 'camera_logic.CameraLogic'
+        ring_buffer_size: 64
+        roi_trace_length: 10000
+        recording_chunk_size: 16
+        connect:
+            hardware: 'cameradummy'
+            savelogic: 'savelogic'
     """
     _modclass = 'cameralogic'
     _modtype = 'logic'
@@ -45,11 +234,20 @@ class CameraLogic(GenericLogic):
     savelogic = Connector(interface='SaveLogic')
     _max_fps = ConfigOption('default_exposure', 20)
     _fps = _max_fps
+    _ring_buffer_size = ConfigOption('ring_buffer_size', 64)
+    _roi_trace_length = ConfigOption('roi_trace_length', 10000)
+    _recording_chunk_size = ConfigOption('recording_chunk_size', 16)
+
+    # regions of interest as name: [x, y, width, height] in pixel
+    _rois = StatusVar('rois', OrderedDict())
 
     # signals
     sigUpdateDisplay = QtCore.Signal()
     sigAcquisitionFinished = QtCore.Signal()
     sigVideoFinished = QtCore.Signal()
+    sigRecordingStateChanged = QtCore.Signal(bool)
+    sigStartGrabbing = QtCore.Signal()
+    sigStartRecording = QtCore.Signal(str)
     timer = None
 
     enabled = False
@@ -62,6 +260,7 @@ class CameraLogic(GenericLogic):
         super().__init__(config=config, **kwargs)
 
         self.threadlock = Mutex()
+        self._frame_lock = Mutex()
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -70,6 +269,17 @@ class CameraLogic(GenericLogic):
         self._save_logic = self.savelogic()
 
         self.enabled = False
+        self._ring_buffer = None
+        self._accumulating = False
+        self._frame_sum = None
+        self._accumulated_frames = 0
+        self._recording = False
+        self._recorded_timestamps = list()
+        self._recording_start = None
+        self._recording_label = 'frames'
+        self._grabbing = False
+        self._rois = OrderedDict((name, [int(v) for v in roi]) for name, roi in self._rois.items())
+        self.clear_roi_traces()
 
         self.get_exposure()
         self.get_gain()
@@ -78,9 +288,35 @@ class CameraLogic(GenericLogic):
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.loop)
 
+        # create independent threads for fetching the frames and for writing them to disk
+        self._grabber_thread = QtCore.QThread()
+        self._frame_grabber = FrameGrabber(self)
+        self._frame_grabber.moveToThread(self._grabber_thread)
+        self.sigStartGrabbing.connect(self._frame_grabber.run)
+        self._frame_grabber.sigGrabbingFinished.connect(
+            self._grabbing_finished, QtCore.Qt.QueuedConnection)
+        self._grabber_thread.start()
+
+        self._recorder_thread = QtCore.QThread()
+        self._frame_recorder = FrameRecorder(self)
+        self._frame_recorder.moveToThread(self._recorder_thread)
+        self.sigStartRecording.connect(self._frame_recorder.run)
+        self._frame_recorder.sigRecordingFinished.connect(
+            self._recording_finished, QtCore.Qt.QueuedConnection)
+        self._recorder_thread.start()
+
     def on_deactivate(self):
         """ Perform required deactivation. """
-        pass
+        self._recording = False
+        self.enabled = False
+        if self.timer is not None:
+            self.timer.stop()
+        self.sigStartGrabbing.disconnect()
+        self.sigStartRecording.disconnect()
+        self._grabber_thread.quit()
+        self._recorder_thread.quit()
+        self._grabber_thread.wait()
+        self._recorder_thread.wait()
 
     def set_exposure(self, time):
         """ Set exposure of hardware """
@@ -105,6 +341,9 @@ class CameraLogic(GenericLogic):
         """
 
         """
+        if self.enabled or self._grabbing:
+            self.log.error('Single acquisition is not possible while the video is running.')
+            return
         self._hardware.start_single_acquisition()
         self._last_image = self._hardware.get_acquired_data()
         self.sigUpdateDisplay.emit()
@@ -113,37 +352,246 @@ class CameraLogic(GenericLogic):
     def start_loop(self):
         """ Start the data recording loop.
         """
+        if self._grabbing:
+            self.log.error('The video is still running.')
+            return
         self.enabled = True
-        self.timer.start(1000*1/self._fps)
-
-        if self._hardware.support_live_acquisition():
-            self._hardware.start_live_acquisition()
-        else:
-            self._hardware.start_single_acquisition()
+        self._grabbing = True
+        self.sigStartGrabbing.emit()
+        self.timer.start(int(1000 / self._fps))
 
     def stop_loop(self):
         """ Stop the data recording loop.
+
+        The video is finished as soon as the acquisition thread released the camera.
         """
         self.timer.stop()
         self.enabled = False
-        self._hardware.stop_acquisition()
-        self.sigVideoFinished.emit()
+        if self._recording:
+            self.stop_recording()
 
+    def _grabbing_finished(self):
+        """ Called when the acquisition thread released the camera. """
+        self._grabbing = False
+        self.enabled = False
+        self.timer.stop()
+        self.sigVideoFinished.emit()
 
     def loop(self):
-        """ Execute step in the data recording loop: save one of each control and process values
+        """ Execute step in the display loop: show the most recent frame of the ring buffer.
+
+        The frames are fetched by the acquisition thread, so the display rate does not limit the
+        camera frame rate.
         """
-        self._last_image = self._hardware.get_acquired_data()
-        self.sigUpdateDisplay.emit()
+        if self._ring_buffer is not None:
+            image = self._ring_buffer.latest()
+            if image is not None:
+                self._last_image = image
+                self.sigUpdateDisplay.emit()
         if self.enabled:
-            self.timer.start(1000 * 1 / self._fps)
-            if not self._hardware.support_live_acquisition():
-                self._hardware.start_single_acquisition()  # the hardware has to check it's not busy
+            self.timer.start(int(1000 / self._fps))
+
+    def _process_frames(self, frames, timestamp):
+        """ Store new frames in the ring buffer and update the accumulation and ROI traces.
+
+        Called from the acquisition thread for every batch of frames delivered by the camera.
+
+        @param numpy.ndarray frames: frames in format [frame][row][col]
+        @param float timestamp: time the last frame of the batch was received
+        """
+        num_frames = len(frames)
+        timestamps = timestamp - self._exposure * np.arange(num_frames - 1, -1, -1)
+        ring = self._ring_buffer
+        if ring is None or ring.frame_shape != frames.shape[1:] or ring.dtype != frames.dtype:
+            self._ring_buffer = FrameRingBuffer(self._ring_buffer_size,
+                                                frames.shape[1:],
+                                                frames.dtype)
+            ring = self._ring_buffer
+        ring.write(frames, timestamps)
+
+        with self._frame_lock:
+            if self._accumulating:
+                if self._frame_sum is None or self._frame_sum.shape != frames.shape[1:]:
+                    self._frame_sum = np.zeros(frames.shape[1:])
+                    self._accumulated_frames = 0
+                self._frame_sum += frames.sum(axis=0)
+                self._accumulated_frames += num_frames
+
+            if len(self._rois) > 0:
+                indices = (self._trace_count + np.arange(num_frames)) % self._roi_trace_length
+                self._trace_times[indices] = timestamps
+                for name, (x, y, width, height) in self._rois.items():
+                    roi_frames = frames[:, y:y + height, x:x + width]
+                    if roi_frames.size == 0:
+                        self._roi_traces[name][indices] = np.nan
+                    else:
+                        self._roi_traces[name][indices] = roi_frames.mean(axis=(1, 2))
+                self._trace_count += num_frames
 
     def get_last_image(self):
         """ Return last acquired image """
         return self._last_image
 
+    def get_frame_count(self):
+        """ Return the number of frames fetched from the camera since the start of the video.
+
+        @return int: number of frames
+        """
+        if self._ring_buffer is None:
+            return 0
+        return self._ring_buffer.frame_count
+
+    def start_accumulation(self):
+        """ Start summing up all frames fetched from the camera. """
+        with self._frame_lock:
+            self._frame_sum = None
+            self._accumulated_frames = 0
+            self._accumulating = True
+
+    def stop_accumulation(self):
+        """ Stop summing up the frames. The accumulated image is kept. """
+        with self._frame_lock:
+            self._accumulating = False
+
+    def get_accumulated_image(self, mean=True):
+        """ Return the accumulated image.
+
+        @param bool mean: return the mean (True) or the sum (False) of the accumulated frames
+
+        @return tuple(numpy.ndarray, int): accumulated image (None if no frame was accumulated)
+                                           and number of accumulated frames
+        """
+        with self._frame_lock:
+            if self._frame_sum is None or self._accumulated_frames == 0:
+                return None, 0
+            if mean:
+                image = self._frame_sum / self._accumulated_frames
+            else:
+                image = self._frame_sum.copy()
+            return image, self._accumulated_frames
+
+    def add_roi(self, name, x, y, width, height):
+        """ Add or replace a region of interest. The mean of every frame over the ROI is traced.
+
+        @param str name: name of the ROI
+        @param int x: first column of the ROI
+        @param int y: first row of the ROI
+        @param int width: number of columns of the ROI
+        @param int height: number of rows of the ROI
+        """
+        if width < 1 or height < 1 or x < 0 or y < 0:
+            self.log.error('Invalid ROI "{0}": position must not be negative and size must be '
+                           'at least one pixel.'.format(name))
+            return
+        with self._frame_lock:
+            self._rois[name] = [int(x), int(y), int(width), int(height)]
+            self._roi_traces[name] = np.full(self._roi_trace_length, np.nan)
+
+    def remove_roi(self, name):
+        """ Remove a region of interest and its trace.
+
+        @param str name: name of the ROI
+        """
+        with self._frame_lock:
+            self._rois.pop(name, None)
+            self._roi_traces.pop(name, None)
+
+    def get_rois(self):
+        """ Return the regions of interest.
+
+        @return OrderedDict: ROI names and [x, y, width, height] in pixel
+        """
+        with self._frame_lock:
+            return OrderedDict((name, list(roi)) for name, roi in self._rois.items())
+
+    def clear_roi_traces(self):
+        """ Clear the traces of all regions of interest. """
+        with self._frame_lock:
+            self._trace_count = 0
+            self._trace_times = np.zeros(self._roi_trace_length)
+            self._roi_traces = OrderedDict(
+                (name, np.full(self._roi_trace_length, np.nan)) for name in self._rois)
+
+    def get_roi_traces(self):
+        """ Return the traces of the regions of interest in chronological order.
+
+        Only the last roi_trace_length frames are kept.
+
+        @return tuple(numpy.ndarray, OrderedDict): timestamps of the frames and the mean over
+                                                   each ROI for every frame
+        """
+        with self._frame_lock:
+            length = min(self._trace_count, self._roi_trace_length)
+            indices = np.arange(self._trace_count - length, self._trace_count) % \
+                self._roi_trace_length
+            traces = OrderedDict(
+                (name, trace[indices]) for name, trace in self._roi_traces.items())
+            return self._trace_times[indices], traces
+
+    def start_recording(self, name_tag=''):
+        """ Stream all frames fetched from the camera to disk.
+
+        @param str name_tag: optional, label appended to the file name
+        """
+        if not self.enabled:
+            self.log.error('The video has to be running to record frames.')
+            return
+        if self._recording:
+            self.log.error('A recording is already running.')
+            return
+        filepath = self._save_logic.get_path_for_module('Camera')
+        self._recording_start = datetime.datetime.now()
+        self._recording_label = 'frames_{0}'.format(name_tag) if name_tag else 'frames'
+        filename = '{0}_{1}.raw'.format(self._recording_start.strftime('%Y%m%d-%H%M-%S'),
+                                        self._recording_label)
+        self._recorded_timestamps = list()
+        self._recording = True
+        self.sigStartRecording.emit(os.path.join(filepath, filename))
+        self.sigRecordingStateChanged.emit(True)
+
+    def stop_recording(self):
+        """ Stop streaming the frames to disk. The remaining frames are written in the background.
+        """
+        self._recording = False
+
+    def get_recording_state(self):
+        """ Return whether frames are currently streamed to disk.
+
+        @return bool: recording
+        """
+        return self._recording
+
+    def _recording_finished(self, file_path, recorded_frames, lost_frames):
+        """ Save the frame format and timestamps next to the raw frame file.
+
+        @param str file_path: path of the raw frame file
+        @param int recorded_frames: number of frames written to the file
+        @param int lost_frames: number of frames overwritten before they could be written
+        """
+        ring = self._ring_buffer
+        parameters = OrderedDict()
+        parameters['Frame file'] = os.path.basename(file_path)
+        if ring is not None:
+            parameters['Frame shape (rows, columns)'] = ring.frame_shape
+            parameters['Data type'] = ring.dtype.str
+        parameters['Number of frames'] = recorded_frames
+        parameters['Lost frames'] = lost_frames
+        parameters['Gain'] = self._gain
+        parameters['Exposure time (s)'] = self._exposure
+
+        timestamps = np.array(self._recorded_timestamps[:recorded_frames])
+        data = OrderedDict()
+        data['Frame'] = np.arange(len(timestamps))
+        data['Timestamp (s)'] = timestamps - timestamps[0] if len(timestamps) > 0 else timestamps
+        self._save_logic.save_data(data,
+                                   filepath=os.path.dirname(file_path),
+                                   timestamp=self._recording_start,
+                                   parameters=parameters,
+                                   filelabel=self._recording_label + '_info',
+                                   fmt=['%d', '%.6f'])
+        self.log.debug('Recorded {0:d} frames to {1}.'.format(recorded_frames, file_path))
+        self.sigRecordingStateChanged.emit(False)
+
     def save_xy_data(self, colorscale_range=None, percentile_range=None):
         """ Save the current confocal xy data to file.
 
@@ -22,7 +22,9 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from collections import OrderedDict
 from copy import copy
+import os
 import time
+import uuid
 import datetime
 import numpy as np
 import matplotlib as mpl
@@ -32,6 +34,7 @@ from io import BytesIO
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 from core.module import Connector, ConfigOption, StatusVar
+from core.util.modules import get_home_dir
 
 
 class OldConfigFileError(Exception):
@@ -41,6 +44,229 @@ class OldConfigFileError(Exception):
         super().__init__('Old configuration file detected. Ignoring confocal history.')
 
 
+class ConfocalImage:
+    """ Compact representation of a confocal scan image.
+
+    Only the count values are stored as (rows, columns, channels) array. The scanner coordinates
+    of each pixel are given implicitly by the horizontal axis (one value per column), the vertical
+    axis (one value per row) and the position along the image normal (one value per row, e.g. the
+    z position of each line of an xy scan).
+
+    For backwards compatibility the object can be indexed like the former
+    (rows, columns, 3 + channels) image array, i.e. image[:, :, 0:3] yields the x, y and z
+    coordinates and image[:, :, 3 + n] the counts of channel n. Coordinate planes are computed on
+    the fly, count planes are views into the counts array.
+    """
+
+    # Source of the x, y and z coordinate for each image plane orientation:
+    # 'h' = horizontal axis, 'v' = vertical axis, 'n' = normal axis
+    _coordinate_sources = {'xy': ('h', 'v', 'n'),
+                           'xz': ('h', 'n', 'v'),
+                           'yz': ('n', 'h', 'v')}
+
+    def __init__(self, horizontal_axis, vertical_axis, channels, plane='xy', normal_position=0.0,
+                 counts=None, normal_axis=None):
+        """
+        @param numpy.ndarray horizontal_axis: scanner positions of the image columns
+        @param numpy.ndarray vertical_axis: scanner positions of the image rows
+        @param int channels: number of count channels
+        @param str plane: image plane orientation, one of 'xy', 'xz' or 'yz'
+        @param float normal_position: scanner position along the image normal for all rows
+        @param numpy.ndarray counts: optional, (rows, columns, channels) array of count values
+        @param numpy.ndarray normal_axis: optional, scanner position along the image normal for
+                                          each row. Overrides normal_position.
+        """
+        if plane not in self._coordinate_sources:
+            raise ValueError('Unknown confocal image plane "{0}". Valid planes are {1}.'
+                             ''.format(plane, tuple(self._coordinate_sources)))
+        self.plane = plane
+        self.horizontal_axis = np.array(horizontal_axis, dtype=float)
+        self.vertical_axis = np.array(vertical_axis, dtype=float)
+        shape = (self.vertical_axis.size, self.horizontal_axis.size, int(channels))
+        if counts is None:
+            self.counts = np.zeros(shape)
+        else:
+            self.counts = np.array(counts, dtype=float).reshape(shape)
+        if normal_axis is None:
+            self.normal_axis = np.full(shape[0], normal_position, dtype=float)
+        else:
+            self.normal_axis = np.array(normal_axis, dtype=float).reshape(shape[0])
+        # Path of the file holding this image once it has been written to the history store
+        self.storage_path = None
+
+    @property
+    def shape(self):
+        """ Shape of the equivalent (rows, columns, 3 + channels) image array. """
+        return self.counts.shape[0], self.counts.shape[1], 3 + self.counts.shape[2]
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.horizontal_axis.nbytes + self.vertical_axis.nbytes + \
+               self.normal_axis.nbytes
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        """ Materializes the full (rows, columns, 3 + channels) image array. """
+        # numpy passes the keyword copy, bind it to a name not shadowing copy.copy
+        copy_ = copy
+        if copy_ is False:
+            # the image array is always assembled from the counts and the axes
+            raise ValueError('A ConfocalImage can not be converted to an array without a copy.')
+        image = self[:, :, :]
+        return image if dtype is None else image.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        row_key, col_key, plane_key = self._expand_key(key)
+        planes = np.arange(self.shape[2])[plane_key]
+        if planes.ndim == 0:
+            return self._get_plane(int(planes), row_key, col_key)
+        plane_data = [np.asarray(self._get_plane(int(p), row_key, col_key)) for p in planes]
+        if not plane_data:
+            rows = np.arange(self.shape[0])[row_key]
+            cols = np.arange(self.shape[1])[col_key]
+            return np.empty(np.shape(rows) + np.shape(cols) + (0,))
+        return np.stack(plane_data, axis=-1)
+
+    def __setitem__(self, key, value):
+        row_key, col_key, plane_key = self._expand_key(key)
+        planes = np.arange(self.shape[2])[plane_key]
+        if np.any(planes < 3):
+            raise IndexError('Coordinate planes of a ConfocalImage are defined by its axes and can '
+                             'not be assigned.')
+        if planes.ndim == 0:
+            self.counts[row_key, col_key, int(planes) - 3] = value
+        elif planes.size > 0:
+            step = planes[1] - planes[0] if planes.size > 1 else 1
+            if planes.size > 1 and not np.all(np.diff(planes) == step):
+                raise IndexError('Only regularly spaced channel planes can be assigned.')
+            channels = slice(planes[0] - 3, planes[-1] - 3 + (1 if step > 0 else -1), step)
+            if channels.stop < 0:
+                channels = slice(channels.start, None, step)
+            self.counts[row_key, col_key, channels] = value
+        return
+
+    @staticmethod
+    def _expand_key(key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3:
+            raise IndexError('Too many indices for ConfocalImage.')
+        return key + (slice(None),) * (3 - len(key))
+
+    def _get_plane(self, plane, row_key, col_key):
+        """ Returns the values of a single plane of the equivalent full image array. """
+        if plane >= 3:
+            return self.counts[row_key, col_key, plane - 3]
+        source = self._coordinate_sources[self.plane][plane]
+        if source == 'h':
+            row_values = np.zeros(np.shape(np.arange(self.shape[0])[row_key]))
+            col_values = self.horizontal_axis[col_key]
+        else:
+            row_values = self.vertical_axis[row_key] if source == 'v' else self.normal_axis[row_key]
+            col_values = np.zeros(np.shape(np.arange(self.shape[1])[col_key]))
+        return np.add.outer(row_values, col_values)[()]
+
+    def line_positions(self, row):
+        """ Scanner path of an image line.
+
+        @param int row: index of the image line
+
+        @return numpy.ndarray: (3, columns) array of x, y and z positions
+        """
+        positions = np.empty((3, self.shape[1]))
+        for plane, source in enumerate(self._coordinate_sources[self.plane]):
+            if source == 'h':
+                positions[plane] = self.horizontal_axis
+            elif source == 'v':
+                positions[plane] = self.vertical_axis[row]
+            else:
+                positions[plane] = self.normal_axis[row]
+        return positions
+
+    def copy(self):
+        """ Returns a deep copy of the image. """
+        return ConfocalImage(self.horizontal_axis,
+                             self.vertical_axis,
+                             self.counts.shape[2],
+                             plane=self.plane,
+                             counts=self.counts,
+                             normal_axis=self.normal_axis)
+
+    def serialize(self):
+        """ Give out a dictionary that can be saved via the usual means """
+        serialized = dict()
+        serialized['plane'] = self.plane
+        serialized['horizontal_axis'] = self.horizontal_axis
+        serialized['vertical_axis'] = self.vertical_axis
+        serialized['normal_axis'] = self.normal_axis
+        serialized['counts'] = self.counts
+        return serialized
+
+    @classmethod
+    def deserialize(cls, serialized, plane='xy'):
+        """ Restore a ConfocalImage from a dict created by serialize or from a full
+        (rows, columns, 3 + channels) image array as stored by older versions.
+
+        @param dict|numpy.ndarray serialized: serialized image
+        @param str plane: image plane orientation, only used for full image arrays
+
+        @return ConfocalImage: the restored image
+        """
+        if isinstance(serialized, np.ndarray):
+            sources = cls._coordinate_sources[plane]
+            horizontal_axis = serialized[0, :, sources.index('h')]
+            vertical_axis = serialized[:, 0, sources.index('v')]
+            normal_axis = serialized[:, 0, sources.index('n')]
+            return cls(horizontal_axis,
+                       vertical_axis,
+                       serialized.shape[2] - 3,
+                       plane=plane,
+                       counts=serialized[:, :, 3:],
+                       normal_axis=normal_axis)
+        counts = np.asarray(serialized['counts'])
+        return cls(serialized['horizontal_axis'],
+                   serialized['vertical_axis'],
+                   counts.shape[2],
+                   plane=serialized.get('plane', plane),
+                   counts=counts,
+                   normal_axis=serialized['normal_axis'])
+
+
+class ConfocalImageFile:
+    """ Handle of a ConfocalImage stored in the disk backed confocal history store.
+
+    The image is only loaded from file when it is requested for the first time. All history
+    entries referring to the same file share one handle and thus one loaded image.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._image = None
+
+    @property
+    def is_loaded(self):
+        return self._image is not None
+
+    def load(self):
+        """ Returns the image, reading it from file if necessary.
+
+        @return ConfocalImage: the stored image
+        """
+        if self._image is None:
+            with np.load(self.path) as data:
+                serialized = {key: data[key] for key in data.files}
+            serialized['plane'] = str(serialized['plane'])
+            self._image = ConfocalImage.deserialize(serialized)
+            self._image.storage_path = self.path
+        return self._image
+
+    def release(self):
+        """ Drops the loaded image from memory. It will be read from file again on demand. """
+        self._image = None
+
+
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
@@ -103,8 +329,50 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.tilt_reference_x = 0
         self.tilt_reference_y = 0
 
+    @property
+    def xy_image(self):
+        if isinstance(self._xy_image, ConfocalImageFile):
+            return self._xy_image.load()
+        return self._xy_image
+
+    @xy_image.setter
+    def xy_image(self, image):
+        self._xy_image = image
+
+    @property
+    def depth_image(self):
+        if isinstance(self._depth_image, ConfocalImageFile):
+            return self._depth_image.load()
+        return self._depth_image
+
+    @depth_image.setter
+    def depth_image(self, image):
+        self._depth_image = image
+
+    @property
+    def storage_paths(self):
+        """ Set of history store files this entry refers to. """
+        paths = set()
+        for image in (getattr(self, '_xy_image', None), getattr(self, '_depth_image', None)):
+            if isinstance(image, ConfocalImageFile):
+                paths.add(image.path)
+        return paths
+
+    def spill(self, confocal):
+        """ Move the images of this entry to the disk backed history store of the confocal logic.
+        They are loaded again as soon as they are accessed.
+        """
+        if hasattr(self, '_xy_image'):
+            self._xy_image = confocal._store_history_image(self._xy_image)
+        if hasattr(self, '_depth_image'):
+            self._depth_image = confocal._store_history_image(self._depth_image)
+
     def restore(self, confocal):
-        """ Write data back into confocal logic and pull all the necessary strings """
+        """ Write data back into confocal logic and pull all the necessary strings
+
+        The images are shared with the confocal logic, which has to copy them before altering
+        them (see ConfocalLogic.continue_scanner).
+        """
         confocal._current_x = self.current_x
         confocal._current_y = self.current_y
         confocal._current_z = self.current_z
@@ -133,21 +401,25 @@ class ConfocalHistoryEntry(QtCore.QObject):
         confocal.initialize_image()
         try:
             if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
+                confocal.xy_image = self.xy_image
         except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+            self.xy_image = confocal.xy_image
 
         confocal._zscan = True
         confocal.initialize_image()
         try:
             if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
+                confocal.depth_image = self.depth_image
         except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+            self.depth_image = confocal.depth_image
         confocal._zscan = False
 
     def snapshot(self, confocal):
-        """ Extract all necessary data from a confocal logic and keep it for later use """
+        """ Extract all necessary data from a confocal logic and keep it for later use
+
+        The images are not copied but shared with the confocal logic. Images of consecutive
+        history entries thus share their buffers as long as they have not been rescanned.
+        """
         self.current_x = confocal._current_x
         self.current_y = confocal._current_y
         self.current_z = confocal._current_z
@@ -172,8 +444,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
+        self.xy_image = confocal.xy_image
+        self.depth_image = confocal.depth_image
 
     def serialize(self):
         """ Give out a dictionary that can be saved via the usual means """
@@ -197,12 +469,22 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        for key, image in (('xy_image', self._xy_image), ('depth_image', self._depth_image)):
+            if isinstance(image, ConfocalImageFile):
+                serialized[key] = image.path
+            else:
+                serialized[key] = image.serialize()
         return serialized
 
-    def deserialize(self, serialized):
-        """ Restore Confocal history object from a dict """
+    def deserialize(self, serialized, image_files=None):
+        """ Restore Confocal history object from a dict
+
+        @param dict serialized: the serialized history entry
+        @param dict image_files: optional, already existing ConfocalImageFile handles with file
+                                 paths as keys. Used to share images between history entries.
+        """
+        if image_files is None:
+            image_files = dict()
         if 'focus_position' in serialized and len(serialized['focus_position']) == 4:
             self.current_x = serialized['focus_position'][0]
             self.current_y = serialized['focus_position'][1]
@@ -236,14 +518,23 @@ class ConfocalHistoryEntry(QtCore.QObject):
             self.point2 = np.array(serialized['tilt_point2'])
         if 'tilt_point3' in serialized and len(serialized['tilt_point3']) == 3:
             self.point3 = np.array(serialized['tilt_point3'])
-        if 'xy_image' in serialized:
-            if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
+        for key in ('xy_image', 'depth_image'):
+            if isinstance(serialized.get(key), str):
+                if not os.path.isfile(serialized[key]):
+                    raise FileNotFoundError('Confocal history image file "{0}" not found.'
+                                            ''.format(serialized[key]))
+                image_file = image_files.setdefault(serialized[key],
+                                                    ConfocalImageFile(serialized[key]))
+                setattr(self, '_{0}'.format(key), image_file)
+        if 'xy_image' in serialized and not isinstance(serialized['xy_image'], str):
+            if isinstance(serialized['xy_image'], (np.ndarray, dict)):
+                self.xy_image = ConfocalImage.deserialize(serialized['xy_image'], plane='xy')
             else:
                 raise OldConfigFileError()
-        if 'depth_image' in serialized:
-            if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+        if 'depth_image' in serialized and not isinstance(serialized['depth_image'], str):
+            if isinstance(serialized['depth_image'], (np.ndarray, dict)):
+                self.depth_image = ConfocalImage.deserialize(
+                    serialized['depth_image'], plane='xz' if self.depth_img_is_xz else 'yz')
             else:
                 raise OldConfigFileError()
 
@@ -259,6 +550,13 @@ class ConfocalLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    _history_storage_dir = ConfigOption(name='history_storage_path',
+                                        default=os.path.join(get_home_dir(), 'confocal_history'),
+                                        missing='nothing')
+    # number of history entries around the current one whose images are kept in memory
+    _history_in_memory = ConfigOption(name='history_in_memory', default=2, missing='nothing')
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
@@ -304,18 +602,29 @@ class ConfocalLogic(GenericLogic):
         self._scanning_device = self.confocalscanner1()
         self._save_logic = self.savelogic()
 
+        # the images are updated with every scan line, slow GUIs only get the latest update
+        self._xy_image_updated = self.coalesce_signal('signal_xy_image_updated')
+        self._depth_image_updated = self.coalesce_signal('signal_depth_image_updated')
+        # consistent snapshots of the counts of the images for the GUI and other processes
+        self.xy_counts_buffer = self.shared_array('xy_counts')
+        self.depth_counts_buffer = self.shared_array('depth_counts')
+
         # Reads in the maximal scanning range. The unit of that scan range is micrometer!
         self.x_range = self._scanning_device.get_position_range()[0]
         self.y_range = self._scanning_device.get_position_range()[1]
         self.z_range = self._scanning_device.get_position_range()[2]
 
+        if not os.path.exists(self._history_storage_dir):
+            os.makedirs(self._history_storage_dir)
+        self._history_image_files = dict()
+
         # restore here ...
         self.history = []
         for i in reversed(range(1, self.max_history_length)):
             try:
                 new_history_item = ConfocalHistoryEntry(self)
                 new_history_item.deserialize(
-                    self._statusVariables['history_{0}'.format(i)])
+                    self._statusVariables['history_{0}'.format(i)], self._history_image_files)
                 self.history.append(new_history_item)
             except KeyError:
                 pass
@@ -327,7 +636,7 @@ class ConfocalLogic(GenericLogic):
                         'Restoring history {0} failed.'.format(i))
         try:
             new_state = ConfocalHistoryEntry(self)
-            new_state.deserialize(self._statusVariables['history_0'])
+            new_state.deserialize(self._statusVariables['history_0'], self._history_image_files)
             new_state.restore(self)
         except:
             new_state = ConfocalHistoryEntry(self)
@@ -336,6 +645,8 @@ class ConfocalLogic(GenericLogic):
             self.history.append(new_state)
 
         self.history_index = len(self.history) - 1
+        self._spill_history()
+        self._clean_history_store()
 
         # Sets connections between signals and functions
         self.signal_scan_lines_next.connect(self._scan_line, QtCore.Qt.QueuedConnection)
@@ -343,6 +654,8 @@ class ConfocalLogic(GenericLogic):
         self.signal_continue_scanning.connect(self.continue_scanner, QtCore.Qt.QueuedConnection)
 
         self._change_position('activation')
+        self._publish_xy_image()
+        self._publish_depth_image()
 
     def on_deactivate(self):
         """ Reverse steps of activation
@@ -352,10 +665,15 @@ class ConfocalLogic(GenericLogic):
         closing_state = ConfocalHistoryEntry(self)
         closing_state.snapshot(self)
         self.history.append(closing_state)
+        # Only references to the history store files end up in the status variables
         histindex = 0
         for state in reversed(self.history):
+            state.spill(self)
             self._statusVariables['history_{0}'.format(histindex)] = state.serialize()
             histindex += 1
+        self._clean_history_store()
+        self.xy_counts_buffer.close()
+        self.depth_counts_buffer.close()
         return 0
 
     def switch_hardware(self, to_on=False):
@@ -494,40 +812,24 @@ class ConfocalLogic(GenericLogic):
             # depth scan is in xz plane
             if self.depth_img_is_xz:
                 #self._image_horz_axis = self._X
-                # creates an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._X),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = np.full(
-                    (len(self._image_vert_axis), len(self._X)), self._XL)
-
-                self.depth_image[:, :, 1] = self._current_y * np.ones(
-                    (len(self._image_vert_axis), len(self._X)))
-
-                z_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                # creates an image with the counts of each pixel. The pixel positions are given
+                # by the x axis, the z axis and the current y position.
+                self.depth_image = ConfocalImage(self._XL,
+                                                 self._Z,
+                                                 len(self.get_scanner_count_channels()),
+                                                 plane='xz',
+                                                 normal_position=self._current_y)
 
             # depth scan is yz plane instead of xz plane
             else:
                 #self._image_horz_axis = self._Y
-                # creats an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._Y),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = self._current_x * np.ones(
-                    (len(self._image_vert_axis), len(self._Y)))
-
-                self.depth_image[:, :, 1] = np.full(
-                    (len(self._image_vert_axis), len(self._Y)), self._YL)
-
-                z_value_matrix = np.full((len(self._Y), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                # creates an image with the counts of each pixel. The pixel positions are given
+                # by the y axis, the z axis and the current x position.
+                self.depth_image = ConfocalImage(self._YL,
+                                                 self._Z,
+                                                 len(self.get_scanner_count_channels()),
+                                                 plane='yz',
+                                                 normal_position=self._current_x)
 
                 # now we are scanning along the y-axis, so we need a new return line along Y:
                 self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
@@ -539,21 +841,13 @@ class ConfocalLogic(GenericLogic):
         else:
             #self._image_horz_axis = self._X
             self._image_vert_axis = self._Y
-            # creats an image where each pixel will be [x,y,z,counts]
-            self.xy_image = np.zeros((
-                    len(self._image_vert_axis),
-                    len(self._X),
-                    3 + len(self.get_scanner_count_channels())
-                ))
-
-            self.xy_image[:, :, 0] = np.full(
-                (len(self._image_vert_axis), len(self._X)), self._XL)
-
-            y_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Y)
-            self.xy_image[:, :, 1] = y_value_matrix.transpose()
-
-            self.xy_image[:, :, 2] = self._current_z * np.ones(
-                (len(self._image_vert_axis), len(self._X)))
+            # creates an image with the counts of each pixel. The pixel positions are given by
+            # the x axis, the y axis and the z position of each line.
+            self.xy_image = ConfocalImage(self._XL,
+                                          self._Y,
+                                          len(self.get_scanner_count_channels()),
+                                          plane='xy',
+                                          normal_position=self._current_z)
 
             self.sigImageXYInitialized.emit()
         return 0
@@ -600,6 +894,12 @@ class ConfocalLogic(GenericLogic):
         self.module_state.lock()
         self._scanning_device.module_state.lock()
 
+        # The image might be shared with history entries. Copy it before scanning into it.
+        if self._zscan:
+            self.depth_image = self.depth_image.copy()
+        else:
+            self.xy_image = self.xy_image.copy()
+
         clock_status = self._scanning_device.set_up_scanner_clock(
             clock_frequency=self._clock_frequency)
 
@@ -706,6 +1006,16 @@ class ConfocalLogic(GenericLogic):
         """
         return self._scanning_device.get_scanner_count_channels()
 
+    def _publish_xy_image(self):
+        """ Publish the counts of the xy image to its readers and notify them. """
+        self.xy_counts_buffer.publish(self.xy_image.counts)
+        self._xy_image_updated.emit()
+
+    def _publish_depth_image(self):
+        """ Publish the counts of the depth image to its readers and notify them. """
+        self.depth_counts_buffer.publish(self.depth_image.counts)
+        self._depth_image_updated.emit()
+
     def _scan_line(self):
         """scanning an image in either depth or xy
 
@@ -716,8 +1026,8 @@ class ConfocalLogic(GenericLogic):
                 self.kill_scanner()
                 self.stopRequested = False
                 self.module_state.unlock()
-                self.signal_xy_image_updated.emit()
-                self.signal_depth_image_updated.emit()
+                self._publish_xy_image()
+                self._publish_depth_image()
                 self.set_position('scanner')
                 if self._zscan:
                     self._depth_line_pos = self._scan_counter
@@ -730,6 +1040,7 @@ class ConfocalLogic(GenericLogic):
                 if len(self.history) > self.max_history_length:
                     self.history.pop(0)
                 self.history_index = len(self.history) - 1
+                self._spill_history()
                 return
 
         image = self.depth_image if self._zscan else self.xy_image
@@ -741,9 +1052,10 @@ class ConfocalLogic(GenericLogic):
                 # make a line from the current cursor position to
                 # the starting position of the first sn can line of the scan
                 rs = self.return_slowness
-                lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
-                lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
-                lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
+                start_x, start_y, start_z = image.line_positions(self._scan_counter)[:, 0]
+                lsx = np.linspace(self._current_x, start_x, rs)
+                lsy = np.linspace(self._current_y, start_y, rs)
+                lsz = np.linspace(self._current_z, start_z, rs)
                 if n_ch <= 3:
                     start_line = np.vstack([lsx, lsy, lsz][0:n_ch])
                 else:
@@ -758,13 +1070,10 @@ class ConfocalLogic(GenericLogic):
 
             # adjust z of line in image to current z before building the line
             if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
+                image.normal_axis[self._scan_counter] = self._current_z
 
             # make a line in the scan, _scan_counter says which one it is
-            lsx = image[self._scan_counter, :, 0]
-            lsy = image[self._scan_counter, :, 1]
-            lsz = image[self._scan_counter, :, 2]
+            lsx, lsy, lsz = image.line_positions(self._scan_counter)
             if n_ch <= 3:
                 line = np.vstack([lsx, lsy, lsz][0:n_ch])
             else:
@@ -772,7 +1081,8 @@ class ConfocalLogic(GenericLogic):
                     [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
 
             # scan the line in the scan
-            line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
+            with self.instrumentation.span('hardware scan line'):
+                line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
             if np.any(line_counts == -1):
                 self.stopRequested = True
                 self.signal_scan_lines_next.emit()
@@ -783,48 +1093,51 @@ class ConfocalLogic(GenericLogic):
                 if n_ch <= 3:
                     return_line = np.vstack([
                         self._return_XL,
-                        image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                        image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape)
+                        lsy[0] * np.ones(self._return_XL.shape),
+                        lsz[0] * np.ones(self._return_XL.shape)
                     ][0:n_ch])
                 else:
                     return_line = np.vstack([
                             self._return_XL,
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape),
+                            lsy[0] * np.ones(self._return_XL.shape),
+                            lsz[0] * np.ones(self._return_XL.shape),
                             np.ones(self._return_XL.shape) * self._current_a
                         ])
             else:
                 if n_ch <= 3:
                     return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
+                            lsy[0] * np.ones(self._return_YL.shape),
                             self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape)
+                            lsz[0] * np.ones(self._return_YL.shape)
                         ][0:n_ch])
                 else:
                     return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
+                            lsy[0] * np.ones(self._return_YL.shape),
                             self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape),
+                            lsz[0] * np.ones(self._return_YL.shape),
                             np.ones(self._return_YL.shape) * self._current_a
                         ])
 
             # return the scanner to the start of next line, counts are thrown away
-            return_line_counts = self._scanning_device.scan_line(return_line)
+            with self.instrumentation.span('hardware return line'):
+                return_line_counts = self._scanning_device.scan_line(return_line)
             if np.any(return_line_counts == -1):
                 self.stopRequested = True
                 self.signal_scan_lines_next.emit()
                 return
 
             # update image with counts from the line we just scanned
-            if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+            with self.instrumentation.span('processing and signal emission'):
+                if self._zscan:
+                    if self.depth_img_is_xz:
+                        self.depth_image.counts[self._scan_counter, :, 0:s_ch] = line_counts
+                    else:
+                        self.depth_image.counts[self._scan_counter, :, 0:s_ch] = line_counts
+                    self._publish_depth_image()
                 else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_depth_image_updated.emit()
-            else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_xy_image_updated.emit()
+                    self.xy_image.counts[self._scan_counter, :, 0:s_ch] = line_counts
+                    self._publish_xy_image()
+            self.instrumentation.count('lines')
 
             # next line in scan
             self._scan_counter += 1
@@ -1214,8 +1527,9 @@ class ConfocalLogic(GenericLogic):
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
             self.history[self.history_index].restore(self)
-            self.signal_xy_image_updated.emit()
-            self.signal_depth_image_updated.emit()
+            self._spill_history()
+            self._publish_xy_image()
+            self._publish_depth_image()
             self.signal_tilt_correction_update.emit()
             self.signal_tilt_correction_active.emit(self._scanning_device.tiltcorrection)
             self._change_position('history')
@@ -1228,10 +1542,59 @@ class ConfocalLogic(GenericLogic):
         if self.history_index > 0:
             self.history_index -= 1
             self.history[self.history_index].restore(self)
-            self.signal_xy_image_updated.emit()
-            self.signal_depth_image_updated.emit()
+            self._spill_history()
+            self._publish_xy_image()
+            self._publish_depth_image()
             self.signal_tilt_correction_update.emit()
             self.signal_tilt_correction_active.emit(self._scanning_device.tiltcorrection)
             self._change_position('history')
             self.signal_change_position.emit('history')
             self.signal_history_event.emit()
+
+    def _spill_history(self):
+        """ Keep only the images of the history entries next to the current history index in
+        memory and move all others to the disk backed history store.
+        """
+        for index, entry in enumerate(self.history):
+            if abs(index - self.history_index) >= self._history_in_memory:
+                entry.spill(self)
+
+    def _store_history_image(self, image):
+        """ Write an image to the history store unless it has been stored before.
+
+        @param ConfocalImage|ConfocalImageFile image: the image to store
+
+        @return ConfocalImageFile: handle of the stored image
+        """
+        if isinstance(image, ConfocalImageFile):
+            image.release()
+            return image
+        if image.storage_path is None or not os.path.isfile(image.storage_path):
+            path = os.path.join(self._history_storage_dir,
+                                '{0}{1}.npz'.format(self._history_file_prefix, uuid.uuid4().hex))
+            np.savez_compressed(path, **image.serialize())
+            image.storage_path = path
+        return self._history_image_files.setdefault(image.storage_path,
+                                                    ConfocalImageFile(image.storage_path))
+
+    def _clean_history_store(self):
+        """ Remove all files from the history store that are not referenced by a history entry.
+        """
+        referenced = set()
+        for entry in self.history:
+            referenced.update(entry.storage_paths)
+        with os.scandir(self._history_storage_dir) as scan:
+            unreferenced = [f.path for f in scan if f.is_file()
+                            and f.name.startswith(self._history_file_prefix)
+                            and f.name.endswith('.npz')
+                            and f.path not in referenced]
+        for path in unreferenced:
+            try:
+                os.remove(path)
+            except OSError:
+                self.log.warning('Unable to remove confocal history file "{0}".'.format(path))
+            self._history_image_files.pop(path, None)
+
+    @property
+    def _history_file_prefix(self):
+        return '{0}_history_'.format(self._name)
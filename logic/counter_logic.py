@@ -128,6 +128,8 @@ class CounterLogic(GenericLogic):
 
         # connect signals
         self.sigCountDataNext.connect(self.count_loop_body, QtCore.Qt.QueuedConnection)
+        # the trace is updated in every loop step, slow GUIs only get the latest update
+        self._counter_updated = self.coalesce_signal('sigCounterUpdated')
         return
 
     def on_deactivate(self):
@@ -463,26 +465,32 @@ class CounterLogic(GenericLogic):
                     # switch the state variable off again
                     self.stopRequested = False
                     self.module_state.unlock()
-                    self.sigCounterUpdated.emit()
+                    self._counter_updated.emit()
                     return
 
                 # read the current counter value
-                self.rawdata = self._counting_device.get_counter(samples=self._counting_samples)
+                with self.instrumentation.span('hardware read'):
+                    self.rawdata = self._counting_device.get_counter(
+                        samples=self._counting_samples)
                 if self.rawdata[0, 0] < 0:
                     self.log.error('The counting went wrong, killing the counter.')
                     self.stopRequested = True
                 else:
-                    if self._counting_mode == CountingMode['CONTINUOUS']:
-                        self._process_data_continous()
-                    elif self._counting_mode == CountingMode['GATED']:
-                        self._process_data_gated()
-                    elif self._counting_mode == CountingMode['FINITE_GATED']:
-                        self._process_data_finite_gated()
-                    else:
-                        self.log.error('No valid counting mode set! Can not process counter data.')
+                    self.instrumentation.count('samples', self.rawdata.shape[-1])
+                    with self.instrumentation.span('processing'):
+                        if self._counting_mode == CountingMode['CONTINUOUS']:
+                            self._process_data_continous()
+                        elif self._counting_mode == CountingMode['GATED']:
+                            self._process_data_gated()
+                        elif self._counting_mode == CountingMode['FINITE_GATED']:
+                            self._process_data_finite_gated()
+                        else:
+                            self.log.error(
+                                'No valid counting mode set! Can not process counter data.')
 
             # call this again from event loop
-            self.sigCounterUpdated.emit()
+            with self.instrumentation.span('signal emission'):
+                self._counter_updated.emit()
             self.sigCountDataNext.emit()
         return
 
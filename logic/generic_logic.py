@@ -19,8 +19,10 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 from qtpy import QtCore
-from core.module import Base
+from core.module import Base, ConfigOption
+from core.util.coalescing_signal import CoalescingSignal
 from core.util.mutex import Mutex
+from core.util.shared_array import SharedArray
 
 
 class GenericLogic(Base):
@@ -30,6 +32,9 @@ class GenericLogic(Base):
     _modtype = 'logic'
     _threaded = True
 
+    # maximum rate in Hz of coalesced signals by signal name, overrides the module defaults
+    _signal_max_rates = ConfigOption('signal_max_rates', dict())
+
     def __init__(self, **kwargs):
         """ Initialzize a logic module.
 
@@ -37,6 +42,56 @@ class GenericLogic(Base):
         """
         super().__init__(**kwargs)
         self.taskLock = Mutex()
+        self._shared_arrays = dict()
+
+    def coalesce_signal(self, signal_name, max_rate=None):
+        """ Wrap a signal of this module, so slow receivers only get the latest pending update.
+
+          @param str signal_name: name of the signal attribute of this module
+          @param float max_rate: optional, default maximum number of updates per second. Can be
+                                 overridden with the config option signal_max_rates.
+
+          @return CoalescingSignal: object to emit the updates with
+        """
+        max_rate = self._signal_max_rates.get(signal_name, max_rate)
+        return CoalescingSignal(getattr(self, signal_name),
+                                max_rate=max_rate,
+                                name=signal_name,
+                                instrumentation=self.instrumentation)
+
+    def shared_array(self, name, shape=(0,), dtype=float, slots=3):
+        """ Create a shared memory buffer to publish a large array to GUI modules and other
+            processes without copying it for every reader.
+
+          @param str name: name of the array, unique in this module
+          @param tuple shape: initial shape of the array
+          @param dtype: initial numpy data type of the array
+          @param int slots: number of copies of the array, one more than the readers in this
+                            process holding a snapshot at the same time
+
+          @return SharedArray: the buffer to publish the array with
+        """
+        if name in self._shared_arrays:
+            self._shared_arrays[name].close()
+        shared_array = SharedArray('{0}.{1}'.format(self._name, name),
+                                   shape=shape,
+                                   dtype=dtype,
+                                   slots=slots)
+        self._shared_arrays[name] = shared_array
+        return shared_array
+
+    def get_shared_array_path(self, name):
+        """ Get the path of the file of a shared array, e.g. for a remote client on the same
+            computer to attach to it with core.util.shared_array.SharedArray.attach.
+
+          @param str name: name of the array
+
+          @return str: path of the file, None if there is no shared array of this name
+        """
+        if name not in self._shared_arrays:
+            self.log.error('There is no shared array "{0}".'.format(name))
+            return None
+        return self._shared_arrays[name].path
 
     @QtCore.Slot(QtCore.QThread)
     def moveToThread(self, thread):
@@ -123,6 +123,41 @@ class ODMRCounterMicrowaveInterfuse(GenericLogic, ODMRCounterInterface,
         self.trigger()
         return False, counts
 
+    def supports_continuous_odmr(self):
+        """ Whether the counter can acquire sweeps continuously with a free running microwave sweep.
+
+        @return bool: True if start_continuous_odmr is supported, False if not
+        """
+        return False
+
+    def start_continuous_odmr(self, length=100):
+        """ Continuous ODMR is not supported by this counter. Use count_odmr instead.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self.log.error('Continuous ODMR is not supported by this counter.')
+        return -1
+
+    def read_odmr_sweeps(self, max_sweeps=None):
+        """ Continuous ODMR is not supported by this counter. Use count_odmr instead.
+
+        @param int max_sweeps: optional, maximum number of sweeps to return
+
+        @return (bool, float[][][]): tuple: was there an error, the data of the sweeps in
+                                     format [sweep][channel][pixel]
+        """
+        self.log.error('Continuous ODMR is not supported by this counter.')
+        return True, np.full((0, len(self.get_odmr_channels()), 1), -1.)
+
+    def stop_continuous_odmr(self):
+        """ Continuous ODMR is not supported by this counter, nothing to stop.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
+
     def close_odmr(self):
         """ Close the odmr and clean up afterwards.
 
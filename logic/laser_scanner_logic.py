@@ -29,7 +29,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import time
 
-from core.module import Connector, StatusVar
+from core.module import Connector, ConfigOption, StatusVar
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
@@ -55,6 +55,12 @@ class LaserScannerLogic(GenericLogic):
     resolution = StatusVar('resolution', 500)
     _scan_speed = StatusVar('scan_speed', 10)
     _static_v = StatusVar('goto_voltage', 5)
+    # 'line': scan each up and down ramp separately,
+    # 'continuous': scan blocks of consecutive up and down ramps in one hardware timed line
+    scan_mode = StatusVar('scan_mode', 'line')
+
+    # maximal duration of a block of ramps in continuous scan mode in s
+    _max_block_duration = ConfigOption('max_block_duration', 1.0)
 
     sigChangeVoltage = QtCore.Signal(float)
     sigVoltageChanged = QtCore.Signal(float)
@@ -284,6 +290,15 @@ class LaserScannerLogic(GenericLogic):
         self._upwards_ramp = self._generate_ramp(v_min, v_max, self._scan_speed)
         self._downwards_ramp = self._generate_ramp(v_max, v_min, self._scan_speed)
 
+        # In continuous mode the up and down ramps are repeated in one scan line. The number of
+        # ramp pairs per block is limited by max_block_duration to keep the plots updating and
+        # the scan responsive to a stop request.
+        self._continuous_ramp = np.hstack((self._upwards_ramp, self._downwards_ramp))
+        self._lines_per_block = int(np.clip(
+            self._max_block_duration * self._clock_frequency / self._continuous_ramp.shape[1],
+            1,
+            self.number_of_repeats))
+
         self._initialise_data_matrix(len(self._upwards_ramp[3]))
 
         # Lock and set up scanner
@@ -329,7 +344,9 @@ class LaserScannerLogic(GenericLogic):
             # move from current voltage to start of scan range.
             self._goto_during_scan(self.scan_range[0])
 
-        if self.upwards_scan:
+        if self.scan_mode == 'continuous':
+            self._scan_block()
+        elif self.upwards_scan:
             counts = self._scan_line(self._upwards_ramp)
             self.scan_matrix[self._scan_counter_up] = counts
             self.plot_y += counts
@@ -345,6 +362,43 @@ class LaserScannerLogic(GenericLogic):
         self.sigUpdatePlots.emit()
         self.sigScanNextLine.emit()
 
+    def _scan_block(self):
+        """ Scan a block of consecutive up and down ramps and sort the counts into the matrices.
+
+        All ramps of the block are output in a single hardware timed scan line, so there is no
+        dead time between the lines of a block. Since all blocks but the last one have the same
+        length, the scanner does not need to be reconfigured between blocks.
+        """
+        num_of_lines = min(self._lines_per_block, self.number_of_repeats - self._scan_counter_up)
+        counts = self._scan_line(np.tile(self._continuous_ramp, num_of_lines))
+
+        # one row per ramp pair, first half is the up ramp, second half the down ramp
+        counts = counts.reshape((num_of_lines, 2, -1))
+        up_lines = slice(self._scan_counter_up, self._scan_counter_up + num_of_lines)
+        down_lines = slice(self._scan_counter_down, self._scan_counter_down + num_of_lines)
+        self.scan_matrix[up_lines] = counts[:, 0]
+        self.scan_matrix2[down_lines] = counts[:, 1]
+        self.plot_y += counts[:, 0].sum(axis=0)
+        self.plot_y2 += counts[:, 1].sum(axis=0)
+        self._scan_counter_up += num_of_lines
+        self._scan_counter_down += num_of_lines
+
+    def set_scan_mode(self, mode):
+        """ Set the scan mode, either 'line' or 'continuous'.
+
+        @param str mode: 'line' to scan up and down ramps separately or 'continuous' to scan
+                         blocks of ramps in one hardware timed line
+
+        @return str: the scan mode in use
+        """
+        if self.module_state() == 'locked':
+            self.log.error('Cannot change the scan mode while scanning.')
+        elif mode not in ('line', 'continuous'):
+            self.log.error('Unknown scan mode "{0}", use "line" or "continuous".'.format(mode))
+        else:
+            self.scan_mode = mode
+        return self.scan_mode
+
     def _generate_ramp(self, voltage1, voltage2, speed):
         """Generate a ramp vrom voltage1 to voltage2 that
         satisfies the speed, step, smoothing_steps parameters.  Smoothing_steps=0 means that the
@@ -370,10 +424,9 @@ class LaserScannerLogic(GenericLogic):
 
             # Sanity check in case the range is too short
 
-            # The voltage range covered while accelerating in the smoothing steps
-            v_range_of_accel = sum(
-                n * linear_v_step / smoothing_range for n in range(0, smoothing_range)
-                )
+            # The voltage range covered while accelerating in the smoothing steps, i.e. the sum
+            # of n * linear_v_step / smoothing_range for n in range(0, smoothing_range)
+            v_range_of_accel = linear_v_step * (smoothing_range - 1) / 2
 
             # Obtain voltage bounds for the linear part of the ramp
             v_min_linear = v_min + v_range_of_accel
@@ -384,19 +437,17 @@ class LaserScannerLogic(GenericLogic):
                     'Voltage ramp too short to apply the '
                     'configured smoothing_steps. A simple linear ramp '
                     'was created instead.')
-                num_of_linear_steps = np.rint((v_max - v_min) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max - v_min) / linear_v_step))
                 ramp = np.linspace(v_min, v_max, num_of_linear_steps)
 
             else:
 
-                num_of_linear_steps = np.rint((v_max_linear - v_min_linear) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max_linear - v_min_linear) / linear_v_step))
 
-                # Calculate voltage step values for smooth acceleration part of ramp
-                smooth_curve = np.array(
-                    [sum(
-                        n * linear_v_step / smoothing_range for n in range(1, N)
-                        ) for N in range(1, smoothing_range)
-                    ])
+                # Calculate voltage step values for smooth acceleration part of ramp, i.e. the
+                # cumulative sum of n * linear_v_step / smoothing_range for n in range(1, N)
+                steps = np.arange(1, smoothing_range)
+                smooth_curve = linear_v_step / smoothing_range * steps * (steps - 1) / 2
 
                 accel_part = v_min + smooth_curve
                 decel_part = v_max - smooth_curve[::-1]
@@ -499,6 +550,7 @@ class LaserScannerLogic(GenericLogic):
         parameters['Stop Voltage (V)'] = self.scan_range[1]
         parameters['Scan speed [V/s]'] = self._scan_speed
         parameters['Clock Frequency (Hz)'] = self._clock_frequency
+        parameters['Scan mode'] = self.scan_mode
 
         fig = self.draw_figure(
             self.scan_matrix,
@@ -84,6 +84,8 @@ class MagnetLogic(GenericLogic):
     align_2d_axis1_step = StatusVar('align_2d_axis1_step', 1e-3)
     align_2d_axis1_vel = StatusVar('align_2d_axis1_vel', 10e-6)
     curr_2d_pathway_mode = StatusVar('curr_2d_pathway_mode', 'snake-wise')
+    align_2d_adaptive_stride = StatusVar('align_2d_adaptive_stride', 4)
+    align_2d_adaptive_maximize = StatusVar('align_2d_adaptive_maximize', True)
 
     _checktime = StatusVar('_checktime', 2.5)
     _1D_axis0_data = StatusVar('_1D_axis0_data', default=np.arange(3))
@@ -218,7 +220,15 @@ class MagnetLogic(GenericLogic):
         self._sigStepwiseAlignmentNext.connect(self._stepwise_loop_body,
                                                QtCore.Qt.QueuedConnection)
 
-        self.pathway_modes = ['spiral-in', 'spiral-out', 'snake-wise', 'diagonal-snake-wise']
+        self.pathway_modes = ['snake-wise', 'line-wise', 'hilbert', 'adaptive']
+        self._2d_adaptive_stride = 1
+
+        # timer to check whether the magnet has reached the next point of the
+        # pathway without blocking the thread:
+        self._motion_timer = QtCore.QTimer()
+        self._motion_timer.setSingleShot(True)
+        self._motion_timer.timeout.connect(self._check_motion_finished)
+        self._motion_finished_callback = None
 
         # relative movement settings
 
@@ -288,6 +298,10 @@ class MagnetLogic(GenericLogic):
     def on_deactivate(self):
         """ Deactivate the module properly.
         """
+        self._motion_timer.stop()
+        self._motion_timer.timeout.disconnect()
+        self._motion_finished_callback = None
+
         constraints = self.get_hardware_constraints()
         for axis_label in constraints:
             self._statusVariables[('move_rel_' + axis_label)] = self.move_rel_dict[axis_label]
@@ -453,173 +467,298 @@ class MagnetLogic(GenericLogic):
         and the acceleration of the movement.
         E.g. if no velocity is specified, then nothing will be changed in terms
         of speed during the move.
+
+        The order in which the points of the matrix are visited is given by
+        self.curr_2d_pathway_mode:
+            'snake-wise': go back and forth along axis0, stepping axis1 at the
+                          end of each line.
+            'line-wise':  go along axis0 always in the same direction and move
+                          back to the beginning of the line after each line.
+            'hilbert':    follow a (generalized) Hilbert curve through the
+                          matrix, which keeps consecutive points close to each
+                          other in both directions.
+            'adaptive':   visit only a coarse grid (every
+                          self.align_2d_adaptive_stride-th point) snake-wise
+                          and refine the grid around the best measured point
+                          afterwards, see _plan_2d_refinement.
         """
+        if self.curr_2d_pathway_mode not in self.pathway_modes:
+            self.log.error('The pathway creation method "{0}" through the '
+                           'matrix is not implemented!\nReturn an empty '
+                           'patharray.'.format(self.curr_2d_pathway_mode))
+            return [], []
+
+        # calculate number of points (steps + 1) along each axis
+        axis0_num_of_points = int(axis0_range / axis0_step) + 1
+        axis1_num_of_points = int(axis1_range / axis1_step) + 1
 
-        # calculate number of steps (those are NOT the number of points!)
-        axis0_num_of_steps = int(axis0_range / axis0_step)
-        axis1_num_of_steps = int(axis1_range / axis1_step)
+        self.log.debug(axis0_name)
+        self.log.debug(axis0_range)
+        self.log.debug(init_pos[axis0_name])
+        axis0_start = round(init_pos[axis0_name] - axis0_range / 2, 7)
+        axis1_start = round(init_pos[axis1_name] - axis1_range / 2, 7)
 
-        # make an array of movement steps
-        axis0_steparray = [axis0_step] * axis0_num_of_steps
-        axis1_steparray = [axis1_step] * axis1_num_of_steps
+        if self.curr_2d_pathway_mode == 'adaptive':
+            self._2d_adaptive_stride = max(int(self.align_2d_adaptive_stride), 1)
+        index_order = self._order_2d_grid(axis0_num_of_points, axis1_num_of_points)
 
         pathway = []
+        # that is a map to transform a pathway index value back to an
+        # absolute position and index. That will be important for saving the
+        # data corresponding to a certain path_index value.
+        back_map = dict()
 
-        # FIXME: create these path modes:
-        if self.curr_2d_pathway_mode == 'spiral-in':
-            self.log.error('The pathway creation method "{0}" through the '
-                           'matrix is not implemented yet!\nReturn an empty '
-                           'patharray.'.format(self.curr_2d_pathway_mode))
-            return [], []
+        for path_index, (axis0_index, axis1_index) in enumerate(index_order):
+            axis0_pos = round(axis0_start + axis0_index * axis0_step, 7)
+            axis1_pos = round(axis1_start + axis1_index * axis1_step, 7)
 
-        elif self.curr_2d_pathway_mode == 'spiral-out':
-            self.log.error('The pathway creation method "{0}" through the '
-                           'matrix is not implemented yet!\nReturn an empty '
-                           'patharray.'.format(self.curr_2d_pathway_mode))
-            return [], []
+            # step_config is the dict containing the commands for one pathway
+            # entry. Absolute movements are used for all points.
+            pathway.append(self._create_2d_step_config(axis0_name, axis0_pos, axis0_vel,
+                                                       axis1_name, axis1_pos, axis1_vel))
+            back_map[path_index] = {axis0_name: axis0_pos,
+                                    axis1_name: axis1_pos,
+                                    'index': (axis0_index, axis1_index)}
 
-        elif self.curr_2d_pathway_mode == 'diagonal-snake-wise':
-            self.log.error('The pathway creation method "{0}" through the '
-                           'matrix is not implemented yet!\nReturn an empty '
-                           'patharray.'.format(self.current_2d_pathway_mode))
-            return [], []
+        return pathway, back_map
 
-        elif self.curr_2d_pathway_mode == 'selected-points':
-            self.log.error('The pathway creation method "{0}" through the '
-                           'matrix is not implemented yet!\nReturn an empty '
-                           'patharray.'.format(self.current_2d_pathway_mode))
-            return [], []
+    def _create_2d_step_config(self, axis0_name, axis0_pos, axis0_vel,
+                               axis1_name, axis1_pos, axis1_vel):
+        """ Create the movement commands of one pathway entry.
 
-        # choose the snake-wise as default for now.
-        else:
+        @param str axis0_name:
+        @param float axis0_pos: absolute target position of axis0
+        @param float axis0_vel: velocity of axis0, None to keep the velocity
+        @param str axis1_name:
+        @param float axis1_pos: absolute target position of axis1
+        @param float axis1_vel: velocity of axis1, None to keep the velocity
 
-            # create a snake-wise stepping procedure through the matrix:
-            self.log.debug(axis0_name)
-            self.log.debug(axis0_range)
-            self.log.debug(init_pos[axis0_name])
-            axis0_pos = round(init_pos[axis0_name] - axis0_range / 2, 7)
-            axis1_pos = round(init_pos[axis1_name] - axis1_range / 2, 7)
+        @return dict: pathway entry, see _create_2d_pathway
+        """
+        step_config = dict()
+        step_config[axis0_name] = {'move_abs': axis0_pos}
+        step_config[axis1_name] = {'move_abs': axis1_pos}
 
-            # append again so that the for loop later will run once again
-            # through the axis0 array but the last value of axis1_steparray will
-            # not be performed.
-            axis1_steparray.append(axis1_num_of_steps)
+        if axis0_vel is not None:
+            step_config[axis0_name]['move_vel'] = axis0_vel
+        if axis1_vel is not None:
+            step_config[axis1_name]['move_vel'] = axis1_vel
+        return step_config
 
-            # step_config is the dict containing the commands for one pathway
-            # entry. Move at first to start position:
-            step_config = dict()
+    def _order_2d_grid(self, axis0_num_of_points, axis1_num_of_points):
+        """ Order the points of the 2D measurement matrix according to the pathway mode.
 
-            if axis0_vel is None:
-                step_config[axis0_name] = {'move_abs': axis0_pos}
-            else:
-                step_config[axis0_name] = {'move_abs': axis0_pos, 'move_vel': axis0_vel}
+        @param int axis0_num_of_points:
+        @param int axis1_num_of_points:
 
-            if axis1_vel is None:
-                step_config[axis1_name] = {'move_abs': axis1_pos}
+        @return list: (axis0_index, axis1_index) tuples in the order the points
+                      should be visited.
+        """
+        if self.curr_2d_pathway_mode == 'line-wise':
+            return [(axis0_index, axis1_index)
+                    for axis1_index in range(axis1_num_of_points)
+                    for axis0_index in range(axis0_num_of_points)]
+
+        elif self.curr_2d_pathway_mode == 'hilbert':
+            if axis0_num_of_points >= axis1_num_of_points:
+                return list(self._hilbert_2d(0, 0, axis0_num_of_points, 0, 0, axis1_num_of_points))
             else:
-                step_config[axis1_name] = {'move_abs': axis1_pos, 'move_vel': axis1_vel}
+                return list(self._hilbert_2d(0, 0, 0, axis1_num_of_points, axis0_num_of_points, 0))
 
-            pathway.append(step_config)
+        elif self.curr_2d_pathway_mode == 'adaptive':
+            axis0_indices = self._stride_indices(axis0_num_of_points, self._2d_adaptive_stride)
+            axis1_indices = self._stride_indices(axis1_num_of_points, self._2d_adaptive_stride)
+        else:
+            axis0_indices = list(range(axis0_num_of_points))
+            axis1_indices = list(range(axis1_num_of_points))
 
-            path_index = 0
+        # snake-wise stepping through the (sub-)grid
+        index_order = []
+        for line, axis1_index in enumerate(axis1_indices):
+            line_indices = axis0_indices if line % 2 == 0 else axis0_indices[::-1]
+            index_order.extend((axis0_index, axis1_index) for axis0_index in line_indices)
+        return index_order
 
-            # these indices should be used to facilitate the mapping to a 2D
-            # array, since the
-            axis0_index = 0
-            axis1_index = 0
+    @staticmethod
+    def _stride_indices(num_of_points, stride):
+        """ Indices of every stride-th point including the last point of an axis.
 
-            # that is a map to transform a pathway index value back to an
-            # absolute position and index. That will be important for saving the
-            # data corresponding to a certain path_index value.
-            back_map = dict()
-            back_map[path_index] = {axis0_name: axis0_pos,
-                                    axis1_name: axis1_pos,
-                                    'index': (axis0_index, axis1_index)}
+        @param int num_of_points:
+        @param int stride:
 
-            path_index += 1
-            # axis0_index += 1
-
-            go_pos_dir = True
-            for step_in_axis1 in axis1_steparray:
-
-                if go_pos_dir:
-                    go_pos_dir = False
-                    direction = +1
-                else:
-                    go_pos_dir = True
-                    direction = -1
-
-                for step_in_axis0 in axis0_steparray:
-
-                    axis0_index += direction
-                    # make move along axis0:
-                    step_config = dict()
-
-                    # relative movement:
-                    # step_config[axis0_name] = {'move_rel': direction*step_in_axis0}
-
-                    # absolute movement:
-                    axis0_pos = round(axis0_pos + direction * step_in_axis0, 7)
-
-                    # if axis0_vel is None:
-                    #     step_config[axis0_name] = {'move_abs': axis0_pos}
-                    #     step_config[axis1_name] = {'move_abs': axis1_pos}
-                    # else:
-                    #     step_config[axis0_name] = {'move_abs': axis0_pos,
-                    #                                'move_vel': axis0_vel}
-                    if axis1_vel is None and axis0_vel is None:
-                        step_config[axis0_name] = {'move_abs': axis0_pos}
-                        step_config[axis1_name] = {'move_abs': axis1_pos}
-                    else:
-                        step_config[axis0_name] = {'move_abs': axis0_pos}
-                        step_config[axis1_name] = {'move_abs': axis1_pos}
-
-                        if axis0_vel is not None:
-                            step_config[axis0_name] = {'move_abs': axis0_pos, 'move_vel': axis0_vel}
-
-                        if axis1_vel is not None:
-                            step_config[axis1_name] = {'move_abs': axis1_pos, 'move_vel': axis1_vel}
-
-                    # append to the pathway
-                    pathway.append(step_config)
-                    back_map[path_index] = {axis0_name: axis0_pos,
-                                            axis1_name: axis1_pos,
-                                            'index': (axis0_index, axis1_index)}
-                    path_index += 1
-
-                if (axis1_index + 1) >= len(axis1_steparray):
-                    break
-
-                # make a move along axis1:
-                step_config = dict()
-
-                # relative movement:
-                # step_config[axis1_name] = {'move_rel' : step_in_axis1}
-
-                # absolute movement:
-                axis1_pos = round(axis1_pos + step_in_axis1, 7)
-
-                if axis1_vel is None and axis0_vel is None:
-                    step_config[axis0_name] = {'move_abs': axis0_pos}
-                    step_config[axis1_name] = {'move_abs': axis1_pos}
-                else:
-                    step_config[axis0_name] = {'move_abs': axis0_pos}
-                    step_config[axis1_name] = {'move_abs': axis1_pos}
-
-                    if axis0_vel is not None:
-                        step_config[axis0_name] = {'move_abs': axis0_pos, 'move_vel': axis0_vel}
-
-                    if axis1_vel is not None:
-                        step_config[axis1_name] = {'move_abs': axis1_pos, 'move_vel': axis1_vel}
-
-                pathway.append(step_config)
-                axis1_index += 1
-                back_map[path_index] = {axis0_name: axis0_pos,
-                                        axis1_name: axis1_pos,
-                                        'index': (axis0_index, axis1_index)}
-                path_index += 1
+        @return list: sorted indices
+        """
+        return sorted(set(range(0, num_of_points, stride)) | {num_of_points - 1})
 
-        return pathway, back_map
+    @classmethod
+    def _hilbert_2d(cls, x, y, ax, ay, bx, by):
+        """ Generalized Hilbert curve through a rectangle of arbitrary size.
+
+        @param int x: start index along axis0
+        @param int y: start index along axis1
+        @param int ax: extent (and direction) of the major edge along axis0
+        @param int ay: extent (and direction) of the major edge along axis1
+        @param int bx: extent (and direction) of the minor edge along axis0
+        @param int by: extent (and direction) of the minor edge along axis1
+
+        @return generator: (axis0_index, axis1_index) tuples
+
+        The rectangle is split recursively into two or three smaller rectangles
+        whose curves are joined at adjacent points (J. Cerveny, "gilbert").
+        Consecutive points are neighbours, only for odd-sized rectangles a
+        single diagonal step may occur.
+        """
+        width = abs(ax + ay)
+        height = abs(bx + by)
+        dax, day = int(np.sign(ax)), int(np.sign(ay))
+        dbx, dby = int(np.sign(bx)), int(np.sign(by))
+
+        if height == 1:
+            for i in range(width):
+                yield x, y
+                x, y = x + dax, y + day
+            return
+        if width == 1:
+            for i in range(height):
+                yield x, y
+                x, y = x + dbx, y + dby
+            return
+
+        ax2, ay2 = ax // 2, ay // 2
+        bx2, by2 = bx // 2, by // 2
+        width2 = abs(ax2 + ay2)
+        height2 = abs(bx2 + by2)
+
+        if 2 * width > 3 * height:
+            # long rectangle: split along the major edge only
+            if width2 % 2 and width > 2:
+                ax2, ay2 = ax2 + dax, ay2 + day
+            yield from cls._hilbert_2d(x, y, ax2, ay2, bx, by)
+            yield from cls._hilbert_2d(x + ax2, y + ay2, ax - ax2, ay - ay2, bx, by)
+        else:
+            if height2 % 2 and height > 2:
+                bx2, by2 = bx2 + dbx, by2 + dby
+            yield from cls._hilbert_2d(x, y, bx2, by2, ax2, ay2)
+            yield from cls._hilbert_2d(x + bx2, y + by2, ax, ay, bx - bx2, by - by2)
+            yield from cls._hilbert_2d(x + (ax - dax) + (bx2 - dbx), y + (ay - day) + (by2 - dby),
+                                       -bx2, -by2, -(ax - ax2), -(ay - ay2))
+
+    def _plan_2d_refinement(self, measured, stride, current_index):
+        """ Plan the next points of an adaptive 2D pathway.
+
+        @param dict measured: measured values with (axis0_index, axis1_index)
+                              as keys
+        @param int stride: distance in points of the grid measured last
+        @param tuple current_index: (axis0_index, axis1_index) of the current
+                                    magnet position
+
+        @return tuple(list, int): ordered indices of the new points and the
+                                  stride of the new points. An empty list means
+                                  that the refinement is finished.
+
+        The points of the next finer grid (half the stride) around the best
+        measured point are added, i.e. around the maximum value if
+        self.align_2d_adaptive_maximize is True, the minimum otherwise. Once
+        the full resolution is reached, the neighbours of the best point are
+        added until all of them have been measured. The new points are ordered
+        nearest neighbour first in terms of the travel time of the magnet.
+        """
+        num_points = np.shape(self._2D_data_matrix)
+        if self.align_2d_adaptive_maximize:
+            best_index = max(measured, key=lambda index: measured[index])
+        else:
+            best_index = min(measured, key=lambda index: measured[index])
+
+        radius = max(stride - 1, 1)
+        stride = max(stride // 2, 1)
+        candidates = [(axis0_index, axis1_index)
+                      for axis0_index in self._stride_indices(num_points[0], stride)
+                      if abs(axis0_index - best_index[0]) <= radius
+                      for axis1_index in self._stride_indices(num_points[1], stride)
+                      if abs(axis1_index - best_index[1]) <= radius
+                      and (axis0_index, axis1_index) not in measured]
+
+        index_order = []
+        while candidates:
+            current_index = min(candidates,
+                                key=lambda index: self._2d_step_time(current_index, index))
+            candidates.remove(current_index)
+            index_order.append(current_index)
+        return index_order, stride
+
+    def _extend_2d_adaptive_pathway(self):
+        """ Append the next refinement points to the pathway of an adaptive 2D alignment.
+
+        @return int: number of added points
+        """
+        measured = dict()
+        for path_index in range(self._pathway_index):
+            index = self._backmap[path_index]['index']
+            measured[index] = self._2D_data_matrix[index]
+
+        current_index = self._backmap[self._pathway_index - 1]['index']
+        index_order, self._2d_adaptive_stride = self._plan_2d_refinement(
+            measured, self._2d_adaptive_stride, current_index)
+
+        for axis0_index, axis1_index in index_order:
+            axis0_pos = round(self._2D_axis0_data[axis0_index], 7)
+            axis1_pos = round(self._2D_axis1_data[axis1_index], 7)
+            self._backmap[len(self._pathway)] = {self.align_2d_axis0_name: axis0_pos,
+                                                 self.align_2d_axis1_name: axis1_pos,
+                                                 'index': (axis0_index, axis1_index)}
+            self._pathway.append(self._create_2d_step_config(self.align_2d_axis0_name,
+                                                             axis0_pos,
+                                                             self.align_2d_axis0_vel,
+                                                             self.align_2d_axis1_name,
+                                                             axis1_pos,
+                                                             self.align_2d_axis1_vel))
+        self.log.debug('Adaptive alignment: added {0} points with a stride of {1}.'.format(
+            len(index_order), self._2d_adaptive_stride))
+        return len(index_order)
+
+    def _2d_step_time(self, start_index, end_index):
+        """ Travel time of the magnet between two points of the 2D measurement matrix.
+
+        @param tuple start_index: (axis0_index, axis1_index)
+        @param tuple end_index: (axis0_index, axis1_index)
+
+        @return float: travel time in s, both axes moving at the same time. Without valid
+                       velocities the number of steps of the longer axis movement is returned.
+        """
+        if not (self.align_2d_axis0_vel and self.align_2d_axis1_vel
+                and self.align_2d_axis0_vel > 0 and self.align_2d_axis1_vel > 0):
+            return max(abs(end_index[0] - start_index[0]), abs(end_index[1] - start_index[1]))
+        return max(abs(end_index[0] - start_index[0]) * self.align_2d_axis0_step / self.align_2d_axis0_vel,
+                   abs(end_index[1] - start_index[1]) * self.align_2d_axis1_step / self.align_2d_axis1_vel)
+
+    def estimate_2d_travel_time(self, pathway, axis0_vel=None, axis1_vel=None):
+        """ Estimate the time the magnet needs to travel along a 2D pathway.
+
+        @param list pathway: pathway as created by _create_2d_pathway
+        @param float axis0_vel: optional, velocity of axis0, if not given the
+                                alignment velocity self.align_2d_axis0_vel is used
+        @param float axis1_vel: optional, velocity of axis1, if not given the
+                                alignment velocity self.align_2d_axis1_vel is used
+
+        @return float: travel time in s. Both axes are assumed to move at the
+                       same time with constant velocity, so each step takes as
+                       long as the slower of the two axis movements. -1 if a velocity
+                       is not positive.
+        """
+        if len(pathway) < 2:
+            return 0.0
+        axis0_vel = self.align_2d_axis0_vel if axis0_vel is None else axis0_vel
+        axis1_vel = self.align_2d_axis1_vel if axis1_vel is None else axis1_vel
+        if not (axis0_vel and axis1_vel and axis0_vel > 0 and axis1_vel > 0):
+            self.log.error('Unable to estimate the travel time of the magnet. The velocities of '
+                           'the axes ({0}, {1}) have to be positive.'.format(axis0_vel, axis1_vel))
+            return -1
+
+        axis0_pos = np.array([step[self.align_2d_axis0_name]['move_abs'] for step in pathway])
+        axis1_pos = np.array([step[self.align_2d_axis1_name]['move_abs'] for step in pathway])
+        step_times = np.maximum(np.abs(np.diff(axis0_pos)) / axis0_vel,
+                                np.abs(np.diff(axis1_pos)) / axis1_vel)
+        return float(np.sum(step_times))
 
     def _create_2d_cont_pathway(self, pathway):
 
@@ -799,24 +938,14 @@ class MagnetLogic(GenericLogic):
         # self.set_velocity(move_dict_vel)
         self._magnet_device.move_abs(move_dict_abs)
         # self.move_rel(move_dict_rel)
-        while self._check_is_moving():
-            time.sleep(self._checktime)
-            self.log.debug("Went into while loop in _move_to_curr_pathway_index")
-
-        # this function will return to this function if position is reached:
-        start_pos = self._saved_pos_before_align
-        end_pos = dict()
-        for axis_name in self._saved_pos_before_align:
-            end_pos[axis_name] = self._backmap[self._pathway_index][axis_name]
-
-        self.log.debug("(first movement) magnet moving ? {0}".format(self._check_is_moving()))
 
         if stepwise_meas:
-            # start the Stepwise alignment loop body self._stepwise_loop_body:
-            self._sigStepwiseAlignmentNext.emit()
+            # start the Stepwise alignment loop body self._stepwise_loop_body
+            # as soon as the position is reached:
+            self._wait_for_motion(self._sigStepwiseAlignmentNext.emit)
         else:
             # start the continuous alignment loop body self._continuous_loop_body:
-            self._sigContinuousAlignmentNext.emit()
+            self._wait_for_motion(self._sigContinuousAlignmentNext.emit)
 
     def _stepwise_loop_body(self):
         """ Go one by one through the created path
@@ -870,6 +999,11 @@ class MagnetLogic(GenericLogic):
         # increase the index
         self._pathway_index += 1
 
+        # the adaptive pathway is extended at its end until the refinement is
+        # finished:
+        if self._pathway_index >= len(self._pathway) and self.curr_2d_pathway_mode == 'adaptive':
+            self._extend_2d_adaptive_pathway()
+
         if self._pathway_index < len(self._pathway):
 
             #
@@ -882,21 +1016,8 @@ class MagnetLogic(GenericLogic):
             # self.set_velocity(move_dict_vel)
             self._magnet_device.move_abs(move_dict_abs)
 
-            while self._check_is_moving():
-                time.sleep(self._checktime)
-                self.log.debug("Went into while loop in stepwise_loop_body")
-
-            self.log.debug("stepwise_loop_body reports magnet moving ? {0}".format(self._check_is_moving()))
-
-            # this function will return to this function if position is reached:
-            start_pos = dict()
-            end_pos = dict()
-            for axis_name in self._saved_pos_before_align:
-                start_pos[axis_name] = self._backmap[self._pathway_index - 1][axis_name]
-                end_pos[axis_name] = self._backmap[self._pathway_index][axis_name]
-
-            # rerun this loop again
-            self._sigStepwiseAlignmentNext.emit()
+            # rerun this loop again as soon as the position is reached
+            self._wait_for_motion(self._sigStepwiseAlignmentNext.emit)
 
         else:
             self._end_alignment_procedure()
@@ -936,10 +1057,10 @@ class MagnetLogic(GenericLogic):
             last_pos[axis_name] = self._backmap[self._pathway_index - 1][axis_name]
 
         self._magnet_device.move_abs(self._saved_pos_before_align)
+        self._wait_for_motion(self._alignment_procedure_finished)
 
-        while self._check_is_moving():
-            time.sleep(self._checktime)
-
+    def _alignment_procedure_finished(self):
+        """ Called when the magnet is back at the position before the alignment. """
         self.sigMeasurementFinished.emit()
 
         self._pathway_index = 0
@@ -999,6 +1120,30 @@ class MagnetLogic(GenericLogic):
 
                 # return either pos reached signal of check position
 
+    def _wait_for_motion(self, callback):
+        """ Call a function as soon as the magnet has stopped moving.
+
+        @param callable callback: function to call when the magnet has stopped
+
+        The magnet status is checked every self._checktime seconds with a
+        single shot timer, so the thread keeps processing events in between.
+        """
+        self._motion_finished_callback = callback
+        self._check_motion_finished()
+
+    def _check_motion_finished(self):
+        """ Check the magnet status and call the waiting callback if it stopped moving.
+        """
+        if self._check_is_moving():
+            self.log.debug('Magnet is still moving, check again in {0} s.'.format(self._checktime))
+            self._motion_timer.start(int(round(1000 * self._checktime)))
+            return
+
+        callback = self._motion_finished_callback
+        self._motion_finished_callback = None
+        if callback is not None:
+            callback()
+
     def _check_is_moving(self):
         """
 
@@ -1940,6 +2085,41 @@ class MagnetLogic(GenericLogic):
                              'Choose a proper checktime value in seconds, the old '
                              'value will be kept!')
 
+    def set_2d_pathway_mode(self, mode):
+        """ Set the order in which the points of a 2D alignment are visited.
+
+        @param str mode: one of self.pathway_modes
+
+        @return str: the pathway mode in use
+        """
+        if mode in self.pathway_modes:
+            self.curr_2d_pathway_mode = mode
+        else:
+            self.log.error('Unknown pathway mode "{0}", choose one of {1}. The old mode "{2}" '
+                           'will be kept.'.format(mode, self.pathway_modes,
+                                                   self.curr_2d_pathway_mode))
+        return self.curr_2d_pathway_mode
+
+    def set_2d_adaptive_settings(self, stride=None, maximize=None):
+        """ Set the parameters of the 'adaptive' pathway mode.
+
+        @param int stride: optional, distance in points of the coarse grid
+                           measured first
+        @param bool maximize: optional, refine around the maximum (True) or
+                              the minimum (False) of the measured values
+
+        @return tuple(int, bool): stride and maximize in use
+        """
+        if stride is not None:
+            if int(stride) >= 1:
+                self.align_2d_adaptive_stride = int(stride)
+            else:
+                self.log.warning('The stride of the adaptive pathway has to be at least 1. The old '
+                                 'value {0} will be kept.'.format(self.align_2d_adaptive_stride))
+        if maximize is not None:
+            self.align_2d_adaptive_maximize = bool(maximize)
+        return self.align_2d_adaptive_stride, self.align_2d_adaptive_maximize
+
     def get_2d_data_matrix(self):
         return self._2D_data_matrix
 
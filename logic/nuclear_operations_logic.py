@@ -25,6 +25,7 @@ import numpy as np
 import time
 
 from collections import OrderedDict
+from scipy import optimize
 from core.module import Connector, StatusVar
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
@@ -106,9 +107,23 @@ class NuclearOperationsLogic(GenericLogic):
     # How often the measurement should be repeated.
     num_of_meas_runs = StatusVar('num_of_meas_runs', 1)
 
+    # Order of the measurement points, either 'uniform' (repeated sweeps) or
+    # 'adaptive' (repetitions where the fit uncertainty is reduced the most):
+    meas_point_scheduling = StatusVar('meas_point_scheduling', 'uniform')
+    # Stop the measurement as soon as the fit error of the Rabi period or the
+    # resonance frequency is below this value (0 to disable):
+    target_parameter_error = StatusVar('target_parameter_error', 0.0)
+
     # parameters for confocal and odmr optimization:
     optimize_period_odmr = StatusVar('optimize_period_odmr', 200)
     optimize_period_confocal = StatusVar('optimize_period_confocal', 300)   # in s
+    # Either optimize every optimize_period_odmr ('fixed') or when the drift
+    # measured between the last optimizations exceeds the tolerances ('drift'):
+    optimize_scheduling = StatusVar('optimize_scheduling', 'fixed')
+    drift_tolerance_freq = StatusVar('drift_tolerance_freq', 50e3)          # in Hz
+    drift_tolerance_pos = StatusVar('drift_tolerance_pos', 50e-9)           # in m
+    optimize_period_min = StatusVar('optimize_period_min', 60)              # in s
+    optimize_period_max = StatusVar('optimize_period_max', 3600)            # in s
     odmr_meas_freq0 = StatusVar('odmr_meas_freq0', 10000e6)                 # in Hz
     odmr_meas_freq1 = StatusVar('odmr_meas_freq1', 10002.1e6)               # in Hz
     odmr_meas_freq2 = StatusVar('odmr_meas_freq2', 10004.2e6)               # in Hz
@@ -171,6 +186,10 @@ class NuclearOperationsLogic(GenericLogic):
 
         # store here all the measured odmr peaks
         self.measured_odmr_list = []
+        # store here all the optimized positions
+        self.measured_pos_list = []
+
+        self._scheduler = None
 
         self._optimize_now = False
         self._stop_requested = False
@@ -238,11 +257,20 @@ class NuclearOperationsLogic(GenericLogic):
             self.num_of_current_meas_runs = 0
 
             self.measured_odmr_list = []
+            self.measured_pos_list = []
+
+            self._scheduler = None
 
             self.elapsed_time = 0
             self.start_time = datetime.datetime.now()
             self.next_optimize_time = 0
 
+        if self._scheduler is None:
+            self._scheduler = NuclearMeasurementScheduler(
+                self.x_axis_list,
+                self.current_meas_asset_name,
+                adaptive=self.meas_point_scheduling == 'adaptive')
+
         # load the measurement sequence:
         self._load_measurement_seq(self.current_meas_asset_name)
         self._pulser_on()
@@ -312,7 +340,7 @@ class NuclearOperationsLogic(GenericLogic):
             self._pulser_on()
 
             self.elapsed_time = (datetime.datetime.now() - self.start_time).total_seconds()
-            self.next_optimize_time = self.elapsed_time + self.optimize_period_odmr
+            self.next_optimize_time = self.elapsed_time + self.get_optimize_period()
 
         # if stop request was done already here, do not perform the current
         # measurement but jump to the switch off procedure at the top of this
@@ -327,16 +355,21 @@ class NuclearOperationsLogic(GenericLogic):
 
         # this routine will handle the saving and storing of the measurement
         # results:
-        self._set_meas_point(num_of_meas_runs=self.num_of_current_meas_runs,
+        self._set_meas_point(num_of_meas_runs=self._scheduler.counts[self.current_meas_index],
                              meas_index=self.current_meas_index,
                              meas_points=curr_meas_points,
                              meas_param=meas_param)
-
+        self._scheduler.add(self.current_meas_index, curr_meas_points)
 
         if self._stop_requested:
             self.sigNextMeasPoint.emit()
             return
 
+        if self.meas_point_scheduling == 'adaptive':
+            self._next_adaptive_meas_point()
+            self.sigNextMeasPoint.emit()
+            return
+
         # increment the measurement index or set it back to zero if it exceed
         # the maximal number of x axis measurement points. The measurement index
         # will be used for the next measurement
@@ -375,6 +408,102 @@ class NuclearOperationsLogic(GenericLogic):
 
         self.sigNextMeasPoint.emit()
 
+    def _next_adaptive_meas_point(self):
+        """ Select the next measurement point with the scheduler or stop the measurement.
+
+        The measurement is finished if the number of measurements of
+        num_of_meas_runs full sweeps is used up or the target error of the
+        fitted parameter is reached.
+        """
+        self.num_of_current_meas_runs = int(self._scheduler.counts.min())
+
+        if self._scheduler.total_count >= self.num_of_meas_runs * len(self.x_axis_list):
+            self.stop_nuclear_meas()
+            return
+        if self.target_parameter_error > 0 and not self._scheduler.is_sweeping:
+            error = self._scheduler.parameter_error()
+            if error <= self.target_parameter_error:
+                self.log.info('Target parameter error reached ({0:.3e} after {1} '
+                              'measurements).'.format(error, self._scheduler.total_count))
+                self.stop_nuclear_meas()
+                return
+
+        self.current_meas_index = self._scheduler.next_index()
+        self.current_meas_point = self.x_axis_list[self.current_meas_index]
+
+        self.adjust_measurement(self.current_meas_asset_name)
+        self._load_measurement_seq(self.current_meas_asset_name)
+
+    def get_optimize_period(self):
+        """ Time until the next position and ODMR frequency optimization.
+
+        @return float: period in s
+
+        In the 'drift' optimize scheduling the period is chosen such that the
+        drift rates of the ODMR frequencies and of the position, measured
+        between the last two optimizations, stay within drift_tolerance_freq
+        and drift_tolerance_pos. optimize_period_odmr is used as long as no
+        drift rate is known.
+        """
+        if self.optimize_scheduling != 'drift' or len(self.measured_odmr_list) < 2:
+            return self.optimize_period_odmr
+
+        periods = []
+        for measured, tolerance in ((self.measured_odmr_list, self.drift_tolerance_freq),
+                                    (self.measured_pos_list, self.drift_tolerance_pos)):
+            if len(measured) < 2:
+                continue
+            last = np.array(measured[-2:], dtype=float)
+            time_diff = last[1, 0] - last[0, 0]
+            drift = np.max(np.abs(last[1, 1:] - last[0, 1:]))
+            if time_diff > 0:
+                periods.append(tolerance * time_diff / drift if drift > 0 else np.inf)
+
+        if len(periods) == 0:
+            return self.optimize_period_odmr
+        return float(np.clip(min(periods), self.optimize_period_min, self.optimize_period_max))
+
+    def simulate_meas_scheduling(self, true_param, noise, target_error, time_per_point=1.0,
+                                 seed=None):
+        """ Compare the uniform and the adaptive scheduling in a simulated measurement.
+
+        @param list true_param: model parameters of the simulated curve, i.e.
+                                [amplitude, period, offset] for 'Nuclear_Rabi' and
+                                [amplitude, frequency, offset, width] for
+                                'Nuclear_Frequency_Scan'
+        @param float noise: standard deviation of the flip probability of a single measurement
+        @param float target_error: standard error of the period or frequency to reach
+        @param float time_per_point: duration of a single measurement in s
+        @param int seed: optional, seed of the random number generator
+
+        @return OrderedDict: number of measurements, total time and reached
+                             parameter error for each scheduling
+
+        The current x axis and measurement type are used.
+        """
+        results = OrderedDict()
+        for scheduling in ('uniform', 'adaptive'):
+            scheduler = NuclearMeasurementScheduler.simulate(
+                self.x_axis_list,
+                self.current_meas_asset_name,
+                true_param,
+                noise,
+                target_error,
+                adaptive=scheduling == 'adaptive',
+                max_measurements=self.num_of_meas_runs * len(self.x_axis_list),
+                seed=seed)
+            results[scheduling] = OrderedDict()
+            results[scheduling]['measurements'] = scheduler.total_count
+            results[scheduling]['time'] = scheduler.total_count * time_per_point
+            results[scheduling]['parameter error'] = scheduler.parameter_error()
+
+        self.log.info('Simulated {0} scheduling: {1} measurements instead of {2} for a '
+                      'parameter error of {3:.3e}.'.format(self.current_meas_asset_name,
+                                                           results['adaptive']['measurements'],
+                                                           results['uniform']['measurements'],
+                                                           target_error))
+        return results
+
     def _set_meas_point(self, num_of_meas_runs, meas_index,  meas_points, meas_param):
         """ Handle the proper setting of the current meas_point and store all
             the additional measurement parameter.
@@ -386,6 +515,13 @@ class NuclearOperationsLogic(GenericLogic):
         @return:
         """
 
+        # with adaptive scheduling a point can be repeated more often than the
+        # number of completed runs, add rows as needed:
+        if num_of_meas_runs >= self.y_axis_matrix.shape[0]:
+            new_row = np.zeros(len(self.x_axis_list))
+            self.y_axis_matrix = np.vstack((self.y_axis_matrix, new_row))
+            self.parameter_matrix = np.vstack((self.parameter_matrix, new_row))
+
         # one matrix contains all the measured values, the other one contains
         # all the parameters for the specified measurement point:
         self.y_axis_matrix[num_of_meas_runs, meas_index] = meas_points
@@ -393,7 +529,7 @@ class NuclearOperationsLogic(GenericLogic):
 
         # the y_axis_list contains the summed and averaged values for each
         # measurement index:
-        self.y_axis_list[meas_index] = self.y_axis_matrix[:, meas_index].mean()
+        self.y_axis_list[meas_index] = self.y_axis_matrix[:num_of_meas_runs + 1, meas_index].mean()
 
         self.sigCurrMeasPointUpdated.emit()
 
@@ -769,6 +905,12 @@ class NuclearOperationsLogic(GenericLogic):
                                           self._optimizer_logic.optim_pos_y,
                                           self._optimizer_logic.optim_pos_z)
 
+        curr_time = (datetime.datetime.now() - self.start_time).total_seconds()
+        self.measured_pos_list.append([curr_time,
+                                       self._optimizer_logic.optim_pos_x,
+                                       self._optimizer_logic.optim_pos_y,
+                                       self._optimizer_logic.optim_pos_z])
+
     def _create_pulsed_odmr(self):
         """ Create the pulsed ODMR asset. """
         #FIXME: Move this creation routine to the tasks!
@@ -932,6 +1074,9 @@ class NuclearOperationsLogic(GenericLogic):
 
             data2['y axis matrix)'] = self.y_axis_matrix
 
+        if self._scheduler is not None:
+            data1['Number of repetitions'] = self._scheduler.counts
+
         data3['Additional Data Matrix'] = self.parameter_matrix
         data4['Measured ODMR Data Matrix'] = np.array(self.measured_odmr_list)
 
@@ -942,6 +1087,10 @@ class NuclearOperationsLogic(GenericLogic):
         param['Current measurement index'] = self.current_meas_index
         param['Optimize Period ODMR (s)'] = self.optimize_period_odmr
         param['Optimize Period Confocal (s)'] = self.optimize_period_confocal
+        param['Optimize Scheduling'] = self.optimize_scheduling
+        param['Measurement Point Scheduling'] = self.meas_point_scheduling
+        if self._scheduler is not None:
+            param['Fit Parameter Error'] = self._scheduler.parameter_error()
 
         param['current ODMR trans freq0 (MHz)'] = self.odmr_meas_freq0/1e6
         param['current ODMR trans freq1 (MHz)'] = self.odmr_meas_freq1/1e6
@@ -984,3 +1133,215 @@ class NuclearOperationsLogic(GenericLogic):
 
         self.log.info('Nuclear Operation data saved to:\n{0}'.format(filepath))
 
+
+class NuclearMeasurementScheduler:
+    """ Decides at which x axis point the next repetition of a nuclear measurement is performed.
+
+    In the 'uniform' mode the x axis is swept point by point and the sweep is repeated. In the
+    'adaptive' mode every point is measured min_repetitions times first. Afterwards the measured
+    curve is fitted and the next repetition is spent on the point which reduces the variance of
+    the parameter of interest (Rabi period or resonance frequency) the most. This is the
+    sequential Bayesian (Laplace) update of the fit covariance:
+
+        delta_var = (C J)_k^2 / (sigma^2 + J^T C J)
+
+    with the fit covariance C, the gradient J of the model at the point with respect to the fit
+    parameters and the noise variance sigma^2 of a single measurement, which is estimated from
+    the scatter of the repetitions and the fit residuals. Measurement types without
+    a fit model are always scheduled uniformly.
+    """
+
+    # index of the parameter of interest in the parameters of each model
+    interest_index = 1
+
+    def __init__(self, x_axis, meas_type, adaptive=False, min_repetitions=1):
+        """
+        @param numpy.ndarray x_axis: the measurement points
+        @param str meas_type: measurement type, one of NuclearOperationsLogic.get_meas_type_list
+        @param bool adaptive: use the adaptive scheduling
+        @param int min_repetitions: number of uniform sweeps before adaptive scheduling starts
+        """
+        self.x_axis = np.array(x_axis, dtype=float)
+        self.meas_type = meas_type
+        self.adaptive = adaptive and meas_type in ('Nuclear_Rabi', 'Nuclear_Frequency_Scan')
+        self.min_repetitions = max(int(min_repetitions), 1)
+
+        self.counts = np.zeros(len(self.x_axis), dtype=int)
+        self._sums = np.zeros(len(self.x_axis))
+        self._squares = np.zeros(len(self.x_axis))
+        self.fit_param = None
+        self.fit_cov = None
+        self.noise_variance = None
+        self._fit_count = -1
+
+    @property
+    def total_count(self):
+        return int(self.counts.sum())
+
+    @property
+    def means(self):
+        """ Mean value of each measurement point, nan for points not measured yet. """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._sums / self.counts
+
+    @property
+    def is_sweeping(self):
+        """ True as long as not all points are measured min_repetitions times. """
+        return self.counts.min() < self.min_repetitions
+
+    def add(self, index, value):
+        """ Add the result of a measurement.
+
+        @param int index: index of the x axis point
+        @param float value: measured value
+        """
+        self.counts[index] += 1
+        self._sums[index] += value
+        self._squares[index] += value ** 2
+
+    def next_index(self):
+        """ Index of the x axis point to measure next.
+
+        @return int: x axis index
+        """
+        least_measured = int(np.argmin(self.counts))
+        if not self.adaptive or self.is_sweeping or self.fit() is None:
+            return least_measured
+
+        jacobian = self._jacobian(self.x_axis, self.fit_param)
+        cov_j = jacobian.dot(self.fit_cov)
+        variance_reduction = (cov_j[:, self.interest_index] ** 2
+                              / (self.noise_variance + np.sum(cov_j * jacobian, axis=1)))
+        return int(np.argmax(variance_reduction))
+
+    def parameter_error(self):
+        """ Standard error of the parameter of interest from the current fit.
+
+        @return float: the standard error, inf if the data can not be fitted (yet)
+        """
+        if self.fit() is None:
+            return np.inf
+        return float(np.sqrt(self.fit_cov[self.interest_index, self.interest_index]))
+
+    def fit(self):
+        """ Fit the model of the measurement type to the mean values of the measured points.
+
+        @return numpy.ndarray: the fit parameters or None if the fit failed
+        """
+        # the fit is only repeated if new data was added
+        if self._fit_count == self.total_count:
+            return self.fit_param
+        self._fit_count = self.total_count
+        self.fit_param = None
+        self.fit_cov = None
+        self.noise_variance = None
+        measured = self.counts > 0
+        if self.meas_type not in ('Nuclear_Rabi', 'Nuclear_Frequency_Scan') or \
+                np.count_nonzero(measured) <= 4:
+            return None
+
+        x_axis = self.x_axis[measured]
+        counts = self.counts[measured]
+        means = self.means[measured]
+        try:
+            param = optimize.curve_fit(self._model, x_axis, means,
+                                       p0=self._estimate(x_axis, means),
+                                       sigma=1 / np.sqrt(counts))[0]
+        except (RuntimeError, ValueError):
+            return None
+        if param[1] <= 0 or (self.meas_type == 'Nuclear_Frequency_Scan'
+                             and not x_axis[0] <= param[1] <= x_axis[-1]):
+            return None
+
+        # Variance of a single measurement from the scatter of the repetitions
+        # and the residuals of the fit:
+        residuals = means - self._model(x_axis, *param)
+        scatter = self._squares[measured] - self._sums[measured] ** 2 / counts
+        dof = self.total_count - len(param)
+        noise_variance = (np.sum(scatter) + np.sum(counts * residuals ** 2)) / dof
+        jacobian = self._jacobian(x_axis, param)
+        try:
+            cov = np.linalg.inv(jacobian.T.dot(counts[:, np.newaxis] * jacobian)) * noise_variance
+        except np.linalg.LinAlgError:
+            return None
+        if not np.all(np.isfinite(cov)):
+            return None
+
+        self.fit_param = param
+        self.fit_cov = cov
+        self.noise_variance = max(noise_variance, 1e-12)
+        return param
+
+    def _model(self, x, amplitude, position, offset, width=None):
+        """ Flip probability model of the measurement type.
+
+        Nuclear_Rabi: offset + amplitude * (1 - cos(2 pi x / period)) / 2, position is the period.
+        Nuclear_Frequency_Scan: Lorentzian line, position is the resonance frequency.
+        """
+        if self.meas_type == 'Nuclear_Rabi':
+            return offset + amplitude * (1 - np.cos(2 * np.pi * x / position)) / 2
+        return offset + amplitude * width ** 2 / ((x - position) ** 2 + width ** 2)
+
+    def _estimate(self, x_axis, means):
+        """ Initial fit parameters from the measured mean values. """
+        offset = np.min(means)
+        amplitude = np.max(means) - offset
+        if self.meas_type == 'Nuclear_Rabi':
+            # dominant frequency of the data on a regular grid
+            grid = np.linspace(x_axis[0], x_axis[-1], len(x_axis))
+            spectrum = np.abs(np.fft.rfft(np.interp(grid, x_axis, means) - np.mean(means)))
+            freq = np.fft.rfftfreq(len(grid), grid[1] - grid[0])
+            peak = max(int(np.argmax(spectrum[1:])) + 1, 1)
+            return [amplitude, 1 / freq[peak], offset]
+        offset = np.median(means)
+        peak = int(np.argmax(np.abs(means - offset)))
+        width = (x_axis[-1] - x_axis[0]) / 10
+        return [means[peak] - offset, x_axis[peak], offset, width]
+
+    def _jacobian(self, x_axis, param):
+        """ Numerical gradient of the model with respect to the fit parameters.
+
+        @return numpy.ndarray: shape (len(x_axis), len(param))
+        """
+        jacobian = np.empty((len(x_axis), len(param)))
+        for index, value in enumerate(param):
+            delta = 1e-6 * max(abs(value), 1e-12)
+            upper = np.array(param, dtype=float)
+            lower = np.array(param, dtype=float)
+            upper[index] += delta
+            lower[index] -= delta
+            jacobian[:, index] = (self._model(x_axis, *upper)
+                                  - self._model(x_axis, *lower)) / (2 * delta)
+        return jacobian
+
+    @classmethod
+    def simulate(cls, x_axis, meas_type, true_param, noise, target_error, adaptive=True,
+                 min_repetitions=1, max_measurements=100000, seed=None):
+        """ Simulate a measurement with gaussian noise until the parameter error is reached.
+
+        @param numpy.ndarray x_axis: the measurement points
+        @param str meas_type: 'Nuclear_Rabi' or 'Nuclear_Frequency_Scan'
+        @param list true_param: model parameters of the simulated curve, see _model
+        @param float noise: standard deviation of a single measurement
+        @param float target_error: standard error of the parameter of interest to reach
+        @param bool adaptive: use the adaptive scheduling
+        @param int min_repetitions: number of uniform sweeps before adaptive scheduling starts
+        @param int max_measurements: abort the simulation after this number of measurements
+        @param int seed: optional, seed of the random number generator
+
+        @return NuclearMeasurementScheduler: the scheduler after the simulation. total_count is
+                                             the number of measurements needed.
+        """
+        scheduler = cls(x_axis, meas_type, adaptive=adaptive, min_repetitions=min_repetitions)
+        random = np.random.RandomState(seed)
+        while scheduler.total_count < max_measurements:
+            index = scheduler.next_index()
+            value = scheduler._model(scheduler.x_axis[index], *true_param)
+            scheduler.add(index, value + random.normal(0, noise))
+            # the error is checked after every full sweep in uniform mode
+            if scheduler.is_sweeping or \
+                    (not adaptive and scheduler.total_count % len(scheduler.x_axis) != 0):
+                continue
+            if scheduler.parameter_error() <= target_error:
+                break
+        return scheduler
@@ -68,6 +68,10 @@ class ODMRLogic(GenericLogic):
     lines_to_average = StatusVar('lines_to_average', 0)
     _oversampling = StatusVar('oversampling', default=10)
     _lock_in_active = StatusVar('lock_in_active', default=False)
+    # 'line': the sweep is reset and counted line by line
+    # 'continuous': free running sweep, completed sweeps are read from the counter in batches
+    _acquisition_mode = StatusVar('acquisition_mode', default='line')
+    acquisition_modes = ['line', 'continuous']
 
     # Internal signals
     sigNextLine = QtCore.Signal()
@@ -87,6 +91,9 @@ class ODMRLogic(GenericLogic):
         """
         Initialisation performed during activation of the module.
         """
+        # the plots are updated with every sweep, slow GUIs only get the latest update
+        self._odmr_plots_updated = self.coalesce_signal('sigOdmrPlotsUpdated')
+
         # Get connectors
         self._mw_device = self.microwave1()
         self._fit_logic = self.fitlogic()
@@ -121,6 +128,10 @@ class ODMRLogic(GenericLogic):
         self._stopRequested = False
         # for clearing the ODMR data during a measurement
         self._clearOdmrData = False
+        # whether the counter is running a continuous acquisition
+        self._continuous_acquisition = False
+        if self._acquisition_mode not in self.acquisition_modes:
+            self._acquisition_mode = 'line'
 
         # Initalize the ODMR data arrays (mean signal and sweep matrix)
         self._initialize_odmr_plots()
@@ -209,7 +220,7 @@ class ODMRLogic(GenericLogic):
         self.odmr_fit_y = np.zeros(self.odmr_fit_x.size)
         self.odmr_plot_xy = np.zeros(
             [self.number_of_lines, len(self.get_odmr_channels()), self.odmr_plot_x.size])
-        self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+        self._odmr_plots_updated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         current_fit = self.fc.current_fit
         self.sigOdmrFitUpdated.emit(self.odmr_fit_x, self.odmr_fit_y, {}, current_fit)
         return
@@ -258,7 +269,7 @@ class ODMRLogic(GenericLogic):
                 dtype=np.float64
             )
 
-        self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+        self._odmr_plots_updated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
         return self.lines_to_average
 
@@ -332,6 +343,31 @@ class ODMRLogic(GenericLogic):
         self.lock_in = active
         return self.lock_in
 
+    @property
+    def acquisition_mode(self):
+        return self._acquisition_mode
+
+    @acquisition_mode.setter
+    def acquisition_mode(self, mode):
+        """
+        Sets the acquisition mode of the ODMR counter
+
+        @param str mode: 'line' to reset and count the sweep line by line,
+                         'continuous' to read the sweeps of a free running sweep in batches
+        """
+        if self.module_state() != 'locked' and mode in self.acquisition_modes:
+            self._acquisition_mode = mode
+        else:
+            self.log.warning('setter of acquisition mode failed. Logic is either locked or mode '
+                             'is not one of {0}.'.format(self.acquisition_modes))
+
+        update_dict = {'acquisition_mode': self._acquisition_mode}
+        self.sigParameterUpdated.emit(update_dict)
+
+    def set_acquisition_mode(self, mode):
+        self.acquisition_mode = mode
+        return self.acquisition_mode
+
     def set_matrix_line_number(self, number_of_lines):
         """
         Sets the number of lines in the ODMR matrix
@@ -553,12 +589,39 @@ class ODMRLogic(GenericLogic):
 
         return 0
 
+    def _start_continuous_acquisition(self):
+        """
+        Starting the continuous acquisition of the ODMR counter if it is selected and supported.
+        The microwave sweep has to be running already.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self._continuous_acquisition = False
+        if self._acquisition_mode != 'continuous':
+            return 0
+        if not self._odmr_counter.supports_continuous_odmr():
+            self.log.warning('ODMR counter does not support continuous acquisition. '
+                             'Falling back to line acquisition.')
+            return 0
+
+        # the free running sweep starts at the first frequency and is never reset again
+        self.reset_sweep()
+        if self._odmr_counter.start_continuous_odmr(length=self.odmr_plot_x.size) < 0:
+            self.log.error('Continuous ODMR acquisition could not be started!')
+            return -1
+        self._continuous_acquisition = True
+        return 0
+
     def _stop_odmr_counter(self):
         """
         Stopping the ODMR counter.
 
         @return int: error code (0:OK, -1:error)
         """
+        if self._continuous_acquisition:
+            self._continuous_acquisition = False
+            if self._odmr_counter.stop_continuous_odmr() != 0:
+                self.log.error('Continuous ODMR acquisition could not be stopped!')
 
         ret_val1 = self._odmr_counter.close_odmr()
         if ret_val1 != 0:
@@ -606,6 +669,11 @@ class ODMRLogic(GenericLogic):
                 return -1
 
             self._initialize_odmr_plots()
+            if self._start_continuous_acquisition() < 0:
+                self.mw_off()
+                self._stop_odmr_counter()
+                self.module_state.unlock()
+                return -1
             # initialize raw_data array
             estimated_number_of_lines = self.run_time * self.clock_frequency / self.odmr_plot_x.size
             estimated_number_of_lines = int(1.5 * estimated_number_of_lines)  # Safety
@@ -653,6 +721,12 @@ class ODMRLogic(GenericLogic):
                 self.module_state.unlock()
                 return -1
 
+            if self._start_continuous_acquisition() < 0:
+                self.mw_off()
+                self._stop_odmr_counter()
+                self.module_state.unlock()
+                return -1
+
             self.sigNextLine.emit()
             return 0
 
@@ -699,65 +773,83 @@ class ODMRLogic(GenericLogic):
                 self.elapsed_sweeps = 0
                 self._startTime = time.time()
 
-            # reset position so every line starts from the same frequency
-            self.reset_sweep()
+            with self.instrumentation.span('hardware read'):
+                if self._continuous_acquisition:
+                    # Acquire all sweeps completed since the last call, the sweep is free running
+                    error, new_counts = self._odmr_counter.read_odmr_sweeps()
+                else:
+                    # reset position so every line starts from the same frequency
+                    self.reset_sweep()
 
-            # Acquire count data
-            error, new_counts = self._odmr_counter.count_odmr(length=self.odmr_plot_x.size)
+                    # Acquire count data
+                    error, new_counts = self._odmr_counter.count_odmr(
+                        length=self.odmr_plot_x.size)
+                    new_counts = np.asarray(new_counts)[np.newaxis]
 
             if error:
                 self.stopRequested = True
                 self.sigNextLine.emit()
                 return
+            num_sweeps = new_counts.shape[0]
+
+            with self.instrumentation.span('processing'):
+                # Add new count data to raw_data array and append if array is too small
+                if self._clearOdmrData:
+                    self.odmr_raw_data[:, :, :] = 0
+                    self._clearOdmrData = False
+                if self.elapsed_sweeps + num_sweeps > (self.odmr_raw_data.shape[0] - 1):
+                    expanded_array = np.zeros((max(self.odmr_raw_data.shape[0], num_sweeps),
+                                               self.odmr_raw_data.shape[1],
+                                               self.odmr_raw_data.shape[2]))
+                    self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array),
+                                                        axis=0)
+                    self.log.warning('raw data array in ODMRLogic was not big enough for the '
+                                     'entire measurement. Array will be expanded.\nOld array '
+                                     'shape was '
+                                     '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
+                                     ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
+                                               self.odmr_raw_data.shape[1],
+                                               self.odmr_raw_data.shape[0],
+                                               self.odmr_raw_data.shape[1]))
+
+                # shift data in the array "up" and add new data at the "bottom", newest sweep first
+                self.odmr_raw_data = np.roll(self.odmr_raw_data, num_sweeps, axis=0)
+
+                self.odmr_raw_data[:num_sweeps] = new_counts[::-1]
+
+                # Add new count data to mean signal
+                if self._clearOdmrData:
+                    self.odmr_plot_y[:, :] = 0
+
+                acquired_sweeps = self.elapsed_sweeps + num_sweeps
+                if self.lines_to_average <= 0:
+                    self.odmr_plot_y = np.mean(
+                        self.odmr_raw_data[:acquired_sweeps, :, :],
+                        axis=0,
+                        dtype=np.float64
+                    )
+                else:
+                    self.odmr_plot_y = np.mean(
+                        self.odmr_raw_data[:min(self.lines_to_average, acquired_sweeps), :, :],
+                        axis=0,
+                        dtype=np.float64
+                    )
+
+                # Set plot slice of matrix
+                self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
+
+                # Update elapsed time/sweeps
+                self.elapsed_sweeps += num_sweeps
+                self.elapsed_time = time.time() - self._startTime
+                if self.elapsed_time >= self.run_time:
+                    self.stopRequested = True
 
-            # Add new count data to raw_data array and append if array is too small
-            if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
-                self._clearOdmrData = False
-            if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
-                expanded_array = np.zeros(self.odmr_raw_data.shape)
-                self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array), axis=0)
-                self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
-                                 'measurement. Array will be expanded.\nOld array shape was '
-                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
-                                 ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
-                                           self.odmr_raw_data.shape[1],
-                                           self.odmr_raw_data.shape[0],
-                                           self.odmr_raw_data.shape[1]))
-
-            # shift data in the array "up" and add new data at the "bottom"
-            self.odmr_raw_data = np.roll(self.odmr_raw_data, 1, axis=0)
-
-            self.odmr_raw_data[0] = new_counts
-
-            # Add new count data to mean signal
-            if self._clearOdmrData:
-                self.odmr_plot_y[:, :] = 0
-
-            if self.lines_to_average <= 0:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-            else:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-
-            # Set plot slice of matrix
-            self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
-
-            # Update elapsed time/sweeps
-            self.elapsed_sweeps += 1
-            self.elapsed_time = time.time() - self._startTime
-            if self.elapsed_time >= self.run_time:
-                self.stopRequested = True
             # Fire update signals
-            self.sigOdmrElapsedTimeUpdated.emit(self.elapsed_time, self.elapsed_sweeps)
-            self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+            with self.instrumentation.span('signal emission'):
+                self.sigOdmrElapsedTimeUpdated.emit(self.elapsed_time, self.elapsed_sweeps)
+                self._odmr_plots_updated.emit(self.odmr_plot_x, self.odmr_plot_y,
+                                              self.odmr_plot_xy)
+            self.instrumentation.count('sweeps', num_sweeps)
             self.sigNextLine.emit()
             return
 
@@ -838,6 +930,7 @@ class ODMRLogic(GenericLogic):
             parameters['Stop Frequency (Hz)'] = self.mw_stop
             parameters['Step size (Hz)'] = self.mw_step
             parameters['Clock Frequency (Hz)'] = self.clock_frequency
+            parameters['Acquisition mode'] = self._acquisition_mode
             parameters['Channel'] = '{0}: {1}'.format(nch, channel)
             if self.fc.current_fit != 'No Fit':
                 parameters['Fit function'] = self.fc.current_fit
@@ -306,7 +306,8 @@ class OptimizerLogic(GenericLogic):
         else:
             move_to_start_line = np.vstack((lsx, lsy, lsz, np.ones(lsx.shape) * scanner_pos[3]))
 
-        counts = self._scanning_device.scan_line(move_to_start_line)
+        with self.instrumentation.span('hardware move to start'):
+            counts = self._scanning_device.scan_line(move_to_start_line)
         if np.any(counts == -1):
             return -1
 
@@ -351,7 +352,8 @@ class OptimizerLogic(GenericLogic):
         else:
             line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        line_counts = self._scanning_device.scan_line(line)
+        with self.instrumentation.span('hardware xy scan line'):
+            line_counts = self._scanning_device.scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -366,7 +368,8 @@ class OptimizerLogic(GenericLogic):
         else:
             return_line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        return_line_counts = self._scanning_device.scan_line(return_line)
+        with self.instrumentation.span('hardware xy return line'):
+            return_line_counts = self._scanning_device.scan_line(return_line)
         if np.any(return_line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -375,7 +378,8 @@ class OptimizerLogic(GenericLogic):
 
         s_ch = len(self.get_scanner_count_channels())
         self.xy_refocus_image[self._xy_scan_line_count, :, 3:3 + s_ch] = line_counts
-        self.sigImageUpdated.emit()
+        with self.instrumentation.span('signal emission'):
+            self.sigImageUpdated.emit()
 
         self._xy_scan_line_count += 1
 
@@ -535,7 +539,8 @@ class OptimizerLogic(GenericLogic):
             line = np.vstack((scan_x_line, scan_y_line, scan_z_line, np.zeros(scan_x_line.shape)))
 
         # Perform scan
-        line_counts = self._scanning_device.scan_line(line)
+        with self.instrumentation.span('hardware z scan line'):
+            line_counts = self._scanning_device.scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('Z scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -567,7 +572,8 @@ class OptimizerLogic(GenericLogic):
                      scan_z_line,
                      np.zeros(scan_x_line.shape)))
 
-            line_bg_counts = self._scanning_device.scan_line(line_bg)
+            with self.instrumentation.span('hardware z background line'):
+                line_bg_counts = self._scanning_device.scan_line(line_bg)
             if np.any(line_bg_counts[0] == -1):
                 self.log.error('The scan went wrong, killing the scanner.')
                 self.stop_refocus()
@@ -20,10 +20,12 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
-import numpy as np
+import datetime
+import os
 
 from core.module import Connector, ConfigOption, StatusVar
 from core.util.mutex import Mutex
+from core.util.ring_history import RingHistory
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 
@@ -60,17 +62,28 @@ class PIDLogic(GenericLogic):
         self._controller = self.controller()
         self._save_logic = self.savelogic()
 
-        self.history = np.zeros([3, self.bufferLength])
+        self._history = RingHistory(3, self.bufferLength)
         self.savingState = False
         self.enabled = False
+        # the timer runs periodically, so the time needed by loop does not delay the next sample
         self.timer = QtCore.QTimer()
-        self.timer.setSingleShot(True)
+        self.timer.setSingleShot(False)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
         self.timer.setInterval(self.timestep)
         self.timer.timeout.connect(self.loop)
 
     def on_deactivate(self):
         """ Perform required deactivation. """
-        pass
+        self.timer.stop()
+        if self.savingState:
+            self.saveData()
+
+    @property
+    def history(self):
+        """ Process value, control value and setpoint in format [value][sample], the newest
+        sample is the last one.
+        """
+        return self._history.history
 
     def getBufferLength(self):
         """ Get the current data buffer length.
@@ -81,7 +94,7 @@ class PIDLogic(GenericLogic):
         """ Start the data recording loop.
         """
         self.enabled = True
-        self.timer.start(self.timestep)
+        self.timer.start()
 
     def stopLoop(self):
         """ Stop the data recording loop.
@@ -91,13 +104,12 @@ class PIDLogic(GenericLogic):
     def loop(self):
         """ Execute step in the data recording loop: save one of each control and process values
         """
-        self.history = np.roll(self.history, -1, axis=1)
-        self.history[0, -1] = self._controller.get_process_value()
-        self.history[1, -1] = self._controller.get_control_value()
-        self.history[2, -1] = self._controller.get_setpoint()
+        self._history.append((self._controller.get_process_value(),
+                              self._controller.get_control_value(),
+                              self._controller.get_setpoint()))
         self.sigUpdateDisplay.emit()
-        if self.enabled:
-            self.timer.start(self.timestep)
+        if not self.enabled:
+            self.timer.stop()
 
     def getSavingState(self):
         """ Return whether we are saving data
@@ -107,18 +119,34 @@ class PIDLogic(GenericLogic):
         return self.savingState
 
     def startSaving(self):
-        """ Start saving data.
+        """ Start streaming the recorded data to a file in the PID data directory.
 
-            Function does nothing right now.
+            @return int: error code (0:OK, -1:error)
         """
-        pass
+        timestamp = datetime.datetime.now()
+        file_path = os.path.join(self._save_logic.get_path_for_module(module_name='PID'),
+                                 timestamp.strftime('%Y%m%d-%H%M-%S') + '_pid_trace.dat')
+        header = ('Saved Data from the class {0} on {1}.\n'
+                  'Timestep (ms): {2}\n'
+                  'process value\tcontrol value\tsetpoint'
+                  ''.format(self.__class__.__name__,
+                            timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'),
+                            self.timestep))
+        if self._history.start_stream(file_path, header, chunk_size=10) < 0:
+            return -1
+        self.savingState = True
+        return 0
 
     def saveData(self):
-        """ Stop saving data and write data to file.
+        """ Stop saving data and close the data file.
 
-            Function does nothing right now.
+            @return str: path of the data file
         """
-        pass
+        file_path = self._history.stop_stream()
+        self.savingState = False
+        if file_path is not None:
+            self.log.info('PID data saved to {0}.'.format(file_path))
+        return file_path
 
     def setBufferLength(self, newBufferLength):
         """ Change buffer length to new value.
@@ -126,7 +154,7 @@ class PIDLogic(GenericLogic):
             @param int newBufferLength: new buffer length
         """
         self.bufferLength = newBufferLength
-        self.history = np.zeros([3, self.bufferLength])
+        self._history.clear(self.bufferLength)
 
     def get_kp(self):
         """ Return the proportional constant.
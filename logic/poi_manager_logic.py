@@ -24,13 +24,17 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import logging
 import math
 import numpy as np
+import os
 import re
 import scipy.ndimage as ndimage
 import scipy.ndimage.filters as filters
 import time
 
 from collections import OrderedDict
-from core.module import Connector, StatusVar
+from concurrent.futures import ThreadPoolExecutor
+from core.config import load, save
+from core.module import Connector, ConfigOption, StatusVar
+from core.util.modules import get_home_dir
 from core.util.mutex import Mutex
 from datetime import datetime
 from logic.generic_logic import GenericLogic
@@ -204,6 +208,12 @@ class PoiManagerLogic(GenericLogic):
     scannerlogic = Connector(interface='ConfocalLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # the checkpoints of POI batches must not depend on the date, batches may run over night
+    _batch_directory = ConfigOption(name='batch_directory',
+                                    default=os.path.join(get_home_dir(), 'poi_batch'),
+                                    missing='nothing')
+
     # status vars
     poi_list = StatusVar(default=OrderedDict())
     roi_name = StatusVar(default='')
@@ -216,6 +226,10 @@ class PoiManagerLogic(GenericLogic):
     signal_periodic_opt_started = QtCore.Signal()
     signal_periodic_opt_duration_changed = QtCore.Signal()
     signal_periodic_opt_stopped = QtCore.Signal()
+    signal_batch_updated = QtCore.Signal(dict)
+    signal_batch_finished = QtCore.Signal()
+    signal_batch_next = QtCore.Signal()
+    signal_batch_measure = QtCore.Signal()
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -232,6 +246,12 @@ class PoiManagerLogic(GenericLogic):
         # locking for thread safety
         self.threadlock = Mutex()
 
+        # batch measurement of many POIs
+        self._batch_lock = Mutex()
+        self._batch_running = False
+        self._batch_stop_requested = False
+        self._batch_executor = None
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -249,7 +269,15 @@ class PoiManagerLogic(GenericLogic):
         # Initialise the roi_map_data (xy confocal image)
         self.roi_map_data = self._confocal_logic.xy_image
 
+        self.signal_batch_next.connect(self._batch_next_poi, QtCore.Qt.QueuedConnection)
+        self.signal_batch_measure.connect(self._batch_measure_poi, QtCore.Qt.QueuedConnection)
+
     def on_deactivate(self):
+        if self._batch_running:
+            self._batch_stop_requested = True
+            self._finish_batch()
+        self.signal_batch_next.disconnect()
+        self.signal_batch_measure.disconnect()
         return
 
     def user_move_deactivates_poi(self, tag):
@@ -641,6 +669,8 @@ class PoiManagerLogic(GenericLogic):
                     self._current_poi_key = temp_key
                 else:
                     self.go_to_poi(poikey=self._current_poi_key)
+                if self._batch_running and self._batch_stage == 'refocus':
+                    self.signal_batch_measure.emit()
                 return 0
             else:
                 self.log.error('The given POI ({0}) does not exist.'.format(
@@ -1007,3 +1037,326 @@ class PoiManagerLogic(GenericLogic):
 
         # Now that all the POIs are created, emit the signal for other things (ie gui) to update
         self.signal_poi_updated.emit()
+
+    def order_pois_by_travel(self, poi_keys, start_position=None):
+        """ Order POIs such that the scanner travel visiting all of them is short.
+
+        The path is built from the nearest neighbour of each POI and then improved by reversing
+        path segments as long as this shortens the path (2-opt).
+
+        @param list poi_keys: keys of the POIs to order
+        @param float[3] start_position: optional, position the path starts at. Default is the
+                                        current scanner position.
+
+        @return list: POI keys in the order they should be visited
+        """
+        poi_keys = list(poi_keys)
+        if len(poi_keys) < 2:
+            return poi_keys
+        if start_position is None:
+            start_position = self._confocal_logic.get_position()[:3]
+        positions = np.array([self.get_poi_position(poikey=key) for key in poi_keys], dtype=float)
+
+        # nearest neighbour path
+        unvisited = np.ones(len(poi_keys), dtype=bool)
+        order = list()
+        current = np.asarray(start_position, dtype=float)
+        for _ in range(len(poi_keys)):
+            distances = np.linalg.norm(positions - current, axis=1)
+            distances[~unvisited] = np.inf
+            index = int(np.argmin(distances))
+            order.append(index)
+            unvisited[index] = False
+            current = positions[index]
+
+        # 2-opt improvement of the open path, the start position is fixed
+        path = np.vstack((np.asarray(start_position, dtype=float), positions[order]))
+        order = np.array(order)
+        tolerance = 1e-9 * max(np.ptp(path, axis=0).max(), 1e-12)
+        for _ in range(len(poi_keys)):
+            improved = False
+            for i in range(len(path) - 2):
+                # gain of reversing path[i + 1:j + 1] for all j > i + 1. Reversing the tail of
+                # the path only replaces a single edge.
+                candidates = path[i + 2:]
+                next_edges = np.append(np.linalg.norm(np.diff(candidates, axis=0), axis=1), 0.)
+                new_edges = np.append(np.linalg.norm(path[i + 3:] - path[i + 1], axis=1), 0.)
+                gain = (np.linalg.norm(path[i + 1] - path[i]) + next_edges
+                        - np.linalg.norm(candidates - path[i], axis=1) - new_edges)
+                best = int(np.argmax(gain))
+                if gain[best] > tolerance:
+                    j = i + 2 + best
+                    path[i + 1:j + 1] = path[i + 1:j + 1][::-1].copy()
+                    order[i:j] = order[i:j][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return [poi_keys[index] for index in order]
+
+    def start_poi_batch(self, recipe, poi_keys=None, name='poi_batch', refocus=True,
+                        resume=False):
+        """ Measure many POIs one after the other.
+
+        For every POI the scanner moves to the POI, optionally refocuses on it and then runs the
+        measurement recipe. The POIs are visited in an order that keeps the scanner travel short.
+        Saving and fitting of a POI is done in the background while the next POI is approached
+        and refocused.
+
+        The recipe is a list of measurement steps (name, measure, process):
+            - name: name of the step, used for the timing report
+            - measure: function measure(poikey, position) running the measurement until it is
+                       finished and returning its data
+            - process: function process(poikey, data) saving and/or fitting the data or None.
+                       It runs in a background thread, data saved with the save logic inside is
+                       tagged with the name of the measured POI.
+
+        The progress is written to a checkpoint file in the batch_directory after every POI. If
+        a batch with the same name is started with resume=True, the POIs finished before are
+        skipped.
+
+        @param list recipe: measurement steps as tuples (name, measure, process)
+        @param list poi_keys: optional, keys of the POIs to measure. Default are all POIs.
+        @param str name: name of the batch, used for the checkpoint and timing file names
+        @param bool refocus: refocus on every POI before the measurement
+        @param bool resume: skip the POIs finished in a previous run of this batch. It is an
+                            error if there is no checkpoint of a previous run.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._batch_running:
+            self.log.error('A POI batch is already running.')
+            return -1
+        if len(recipe) < 1:
+            self.log.error('The measurement recipe of the POI batch is empty.')
+            return -1
+
+        if poi_keys is None:
+            poi_keys = self.get_all_pois(abc_sort=True)
+        poi_keys = [key for key in poi_keys if key not in ('crosshair', 'sample')]
+        unknown_keys = [key for key in poi_keys if key not in self.poi_list]
+        if len(unknown_keys) > 0:
+            self.log.error('The POIs {0} do not exist.'.format(unknown_keys))
+            return -1
+
+        filepath = self._save_logic.get_path_for_module(module_name='POI batch')
+        try:
+            os.makedirs(self._batch_directory, exist_ok=True)
+        except OSError:
+            self.log.exception('Could not create the POI batch directory {0}.'
+                               ''.format(self._batch_directory))
+            return -1
+        checkpoint_file = os.path.join(self._batch_directory, '{0}_checkpoint.cfg'.format(name))
+        checkpoint = OrderedDict()
+        if resume:
+            if not os.path.isfile(checkpoint_file):
+                self.log.error('Unable to resume POI batch "{0}". There is no checkpoint file {1}.'
+                               ''.format(name, checkpoint_file))
+                return -1
+            try:
+                checkpoint = load(checkpoint_file)
+            except:
+                self.log.exception('Could not load checkpoint file {0}.'.format(checkpoint_file))
+                return -1
+        finished_keys = list(checkpoint.get('finished', list()))
+        timings = OrderedDict(checkpoint.get('timings', OrderedDict()))
+        poi_keys = [key for key in poi_keys if key not in finished_keys]
+
+        self._batch_name = name
+        self._batch_recipe = list(recipe)
+        self._batch_refocus = refocus
+        self._batch_filepath = filepath
+        self._batch_checkpoint_file = checkpoint_file
+        self._batch_queue = self.order_pois_by_travel(poi_keys)
+        self._batch_finished_keys = finished_keys
+        # POIs which failed before are measured again, only the others stay failed
+        self._batch_failed_keys = [key for key in checkpoint.get('failed', list())
+                                   if key not in poi_keys]
+        self._batch_timings = timings
+        self._batch_total = len(finished_keys) + len(self._batch_queue)
+        self._batch_current_key = None
+        self._batch_stage = 'idle'
+        self._batch_stop_requested = False
+        self._batch_executor = ThreadPoolExecutor(max_workers=1)
+        self._batch_running = True
+        self._write_batch_checkpoint()
+
+        self.log.info('Starting POI batch "{0}" with {1:d} POIs ({2:d} already finished).'
+                      ''.format(name, len(self._batch_queue), len(finished_keys)))
+        self.signal_batch_next.emit()
+        return 0
+
+    def stop_poi_batch(self):
+        """ Stop the POI batch after the measurement of the current POI.
+
+        The batch can be continued later with start_poi_batch(..., resume=True).
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if not self._batch_running:
+            self.log.warning('No POI batch is running.')
+            return -1
+        self._batch_stop_requested = True
+        return 0
+
+    def get_batch_timing(self):
+        """ Return the time spent in every stage of the POI batch.
+
+        @return OrderedDict: stage name and tuple (total time, mean time per POI) in seconds
+        """
+        with self._batch_lock:
+            stage_times = OrderedDict()
+            for poi_timing in self._batch_timings.values():
+                for stage, duration in poi_timing.items():
+                    stage_times.setdefault(stage, list()).append(duration)
+        return OrderedDict((stage, (float(np.sum(times)), float(np.mean(times))))
+                           for stage, times in stage_times.items())
+
+    def _batch_next_poi(self):
+        """ Move to the next POI of the batch and start refocusing on it. """
+        if not self._batch_running:
+            return
+        if self._batch_stop_requested or len(self._batch_queue) == 0:
+            self._finish_batch()
+            return
+
+        poikey = self._batch_queue.pop(0)
+        if poikey not in self.poi_list:
+            self.log.warning('POI {0} was deleted, it is skipped.'.format(poikey))
+            self.signal_batch_next.emit()
+            return
+
+        self._batch_current_key = poikey
+        self._batch_current_timing = OrderedDict()
+        self._batch_stage = 'move'
+        start = time.perf_counter()
+        self.go_to_poi(poikey=poikey)
+        self._batch_current_timing['move'] = time.perf_counter() - start
+
+        if self._batch_refocus:
+            self._batch_stage = 'refocus'
+            self._batch_stage_start = time.perf_counter()
+            if self.optimise_poi(poikey=poikey) < 0:
+                self._batch_stage = 'measure'
+                self.signal_batch_measure.emit()
+        else:
+            self._batch_stage = 'measure'
+            self.signal_batch_measure.emit()
+
+    def _batch_measure_poi(self):
+        """ Run the measurement recipe on the current POI of the batch.
+
+        The processing of the data is handed to the background worker.
+        """
+        if not self._batch_running:
+            return
+        if self._batch_stage == 'refocus':
+            self._batch_current_timing['refocus'] = time.perf_counter() - self._batch_stage_start
+        if self._batch_stop_requested:
+            # the current POI is not finished and will be measured when the batch is resumed
+            self._finish_batch()
+            return
+
+        self._batch_stage = 'measure'
+        poikey = self._batch_current_key
+        position = self.get_poi_position(poikey=poikey)
+        poi_name = self.poi_list[poikey].get_name()
+        timing = self._batch_current_timing
+        failed = False
+        for step_name, measure, process in self._batch_recipe:
+            start = time.perf_counter()
+            try:
+                data = measure(poikey, position)
+            except:
+                self.log.exception('Measurement "{0}" of POI {1} failed.'.format(step_name,
+                                                                                poi_name))
+                failed = True
+                break
+            timing['measure: {0}'.format(step_name)] = time.perf_counter() - start
+            if process is not None:
+                self._batch_executor.submit(
+                    self._batch_process, poikey, poi_name, step_name, process, data, timing)
+
+        # the worker runs the tasks in order, so the POI is done after its processing finished
+        self._batch_executor.submit(self._batch_poi_done, poikey, timing, failed)
+        self._batch_stage = 'idle'
+        self.signal_batch_next.emit()
+
+    def _batch_process(self, poikey, poi_name, step_name, process, data, timing):
+        """ Process the data of a measurement step. Runs in the background worker. """
+        start = time.perf_counter()
+        try:
+            with self._save_logic.poi_context(poi_name):
+                process(poikey, data)
+        except:
+            self.log.exception('Processing "{0}" of POI {1} failed.'.format(step_name, poi_name))
+        timing['process: {0}'.format(step_name)] = time.perf_counter() - start
+
+    def _batch_poi_done(self, poikey, timing, failed):
+        """ Record a finished POI in the checkpoint. Runs in the background worker. """
+        with self._batch_lock:
+            if failed:
+                self._batch_failed_keys.append(poikey)
+            else:
+                self._batch_finished_keys.append(poikey)
+            self._batch_timings[poikey] = timing
+            progress = {'finished': len(self._batch_finished_keys),
+                        'failed': len(self._batch_failed_keys),
+                        'total': self._batch_total,
+                        'poi': poikey,
+                        'timing': dict(timing)}
+        self._write_batch_checkpoint()
+        self.signal_batch_updated.emit(progress)
+
+    def _write_batch_checkpoint(self):
+        """ Write the progress of the POI batch to the checkpoint file. """
+        with self._batch_lock:
+            checkpoint = OrderedDict()
+            checkpoint['name'] = self._batch_name
+            checkpoint['finished'] = list(self._batch_finished_keys)
+            checkpoint['failed'] = list(self._batch_failed_keys)
+            checkpoint['timings'] = OrderedDict(
+                (key, OrderedDict((stage, float(duration)) for stage, duration in timing.items()))
+                for key, timing in self._batch_timings.items())
+        try:
+            tmp_file = self._batch_checkpoint_file + '.tmp'
+            save(tmp_file, checkpoint)
+            os.replace(tmp_file, self._batch_checkpoint_file)
+        except:
+            self.log.exception('Could not write checkpoint of POI batch.')
+
+    def _finish_batch(self):
+        """ Wait for the background processing and save the timing report of the POI batch. """
+        self._batch_executor.shutdown(wait=True)
+        self._batch_executor = None
+        self._batch_running = False
+        self._batch_stage = 'idle'
+
+        stage_timing = self.get_batch_timing()
+        for stage, (total, mean) in stage_timing.items():
+            self.log.info('POI batch "{0}" {1}: {2:.3f} s in total, {3:.3f} s per POI.'
+                          ''.format(self._batch_name, stage, total, mean))
+        if self._batch_stop_requested:
+            self.log.info('POI batch "{0}" stopped after {1:d} of {2:d} POIs.'
+                          ''.format(self._batch_name, len(self._batch_finished_keys),
+                                    self._batch_total))
+        if len(self._batch_failed_keys) > 0:
+            self.log.warning('Measurement failed for the POIs {0}.'.format(self._batch_failed_keys))
+
+        if len(self._batch_timings) > 0:
+            stages = list(stage_timing.keys())
+            data = OrderedDict()
+            data['POI Key'] = np.array(list(self._batch_timings.keys()))
+            for stage in stages:
+                data['{0} (s)'.format(stage)] = np.array(
+                    [timing.get(stage, np.nan) for timing in self._batch_timings.values()])
+            parameters = OrderedDict()
+            parameters['Finished POIs'] = len(self._batch_finished_keys)
+            parameters['Failed POIs'] = len(self._batch_failed_keys)
+            parameters['Total POIs'] = self._batch_total
+            with self._save_logic.poi_context(''):
+                self._save_logic.save_data(data,
+                                           filepath=self._batch_filepath,
+                                           parameters=parameters,
+                                           filelabel='{0}_timing'.format(self._batch_name),
+                                           fmt=['%s'] + ['%.6f'] * len(stages))
+        self.signal_batch_finished.emit()
@@ -80,6 +80,7 @@ class PulsedMasterLogic(GenericLogic):
     sigMeasurementSettingsUpdated = QtCore.Signal(dict)
     sigAnalysisSettingsUpdated = QtCore.Signal(dict)
     sigExtractionSettingsUpdated = QtCore.Signal(dict)
+    sigMeasurementDataSaved = QtCore.Signal(str, str)
 
     # SequenceGeneratorLogic control signals
     sigSavePulseBlock = QtCore.Signal(object)
@@ -187,6 +188,8 @@ class PulsedMasterLogic(GenericLogic):
             self.sigAnalysisSettingsUpdated, QtCore.Qt.QueuedConnection)
         self.pulsedmeasurementlogic().sigExtractionSettingsUpdated.connect(
             self.sigExtractionSettingsUpdated, QtCore.Qt.QueuedConnection)
+        self.pulsedmeasurementlogic().sigMeasurementDataSaved.connect(
+            self.sigMeasurementDataSaved, QtCore.Qt.QueuedConnection)
 
         # Connect signals controlling SequenceGeneratorLogic
         self.sigSavePulseBlock.connect(
@@ -275,6 +278,7 @@ class PulsedMasterLogic(GenericLogic):
         self.pulsedmeasurementlogic().sigMeasurementSettingsUpdated.disconnect()
         self.pulsedmeasurementlogic().sigAnalysisSettingsUpdated.disconnect()
         self.pulsedmeasurementlogic().sigExtractionSettingsUpdated.disconnect()
+        self.pulsedmeasurementlogic().sigMeasurementDataSaved.disconnect()
 
         # Disconnect signals controlling SequenceGeneratorLogic
         self.sigSavePulseBlock.disconnect()
@@ -380,6 +384,18 @@ class PulsedMasterLogic(GenericLogic):
     def alternative_data_type(self):
         return self.pulsedmeasurementlogic().alternative_data_type
 
+    @property
+    def signal_data_buffer(self):
+        return self.pulsedmeasurementlogic().signal_data_buffer
+
+    @property
+    def data_version(self):
+        return self.pulsedmeasurementlogic().data_version
+
+    @property
+    def laser_data_version(self):
+        return self.pulsedmeasurementlogic().laser_data_version
+
     @property
     def fit_container(self):
         return self.pulsedmeasurementlogic().fc
@@ -583,13 +599,15 @@ class PulsedMasterLogic(GenericLogic):
     def save_measurement_data(self, tag, with_error):
         """
         Prepare data to be saved and create a proper plot of the data.
-        This is just handed over to the measurement logic.
+        This is just handed over to the measurement logic which saves the data in the background.
+        Completion is reported by sigMeasurementDataSaved.
 
         @param str tag: a filetag which will be included in the filename
         @param bool with_error: select whether errors should be saved/plotted
+
+        @return str: filepath where data will be saved
         """
-        self.pulsedmeasurementlogic().save_measurement_data(tag, with_error)
-        return
+        return self.pulsedmeasurementlogic().save_measurement_data(tag, with_error)
 
     #######################################################################
     ###             Sequence generator properties                       ###
@@ -959,6 +977,31 @@ class PulsedMasterLogic(GenericLogic):
         self.sigGeneratePredefinedSequence.emit(generator_method_name, kwarg_dict)
         return
 
+    def generate_predefined_sequence_batch(self, generator_method_name, kwarg_dict=None,
+                                           param_grid=None, sample=False):
+        """ Generate (and optionally sample) a predefined sequence for each point of a
+        parameter grid. This call blocks until the whole batch has been processed.
+
+        @param str generator_method_name: name of the predefined generate method
+        @param dict kwarg_dict: parameters common to all grid points
+        @param dict param_grid: parameter names as keys and iterables of values to sweep as values
+        @param bool sample: flag indicating if the generated assets should be uploaded to the
+                            pulse generator right away
+
+        @return list: names of the generated assets in grid order
+        """
+        if not isinstance(kwarg_dict, dict):
+            kwarg_dict = dict()
+        if not isinstance(param_grid, dict):
+            param_grid = dict()
+        self.status_dict['predefined_generation_busy'] = True
+        try:
+            asset_names = self.sequencegeneratorlogic().generate_predefined_sequence_batch(
+                generator_method_name, kwarg_dict, param_grid, sample)
+        finally:
+            self.status_dict['predefined_generation_busy'] = False
+        return asset_names
+
     @QtCore.Slot(object, bool)
     def predefined_sequence_generated(self, asset_name, is_sequence):
         self.status_dict['predefined_generation_busy'] = False
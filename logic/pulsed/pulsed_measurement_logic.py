@@ -25,7 +25,9 @@ import numpy as np
 import copy
 import time
 import datetime
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 from core.module import Connector, ConfigOption, StatusVar
 from core.util.mutex import Mutex
@@ -36,6 +38,40 @@ from logic.pulsed.pulse_extractor import PulseExtractor
 from logic.pulsed.pulse_analyzer import PulseAnalyzer
 
 
+class PulsedMeasurementSaver(QtCore.QObject):
+    """
+    Helper class for writing pulsed measurement data snapshots to file in a separate thread.
+    """
+    sigSaveFinished = QtCore.Signal(str, str)
+
+    def __init__(self, parentclass):
+        super().__init__()
+        # remember the reference to the parent class to access functions and settings
+        self._parentclass = parentclass
+
+    @QtCore.Slot(dict)
+    def save_snapshot(self, snapshot):
+        """
+        Save a data snapshot created by PulsedMeasurementLogic.save_measurement_data.
+
+        @param dict snapshot: copies of the measurement data and settings to save
+        """
+        filepath = ''
+        try:
+            savelogic = self._parentclass.savelogic()
+            # the POI of the measurement is bound to the thread which requested the save
+            with savelogic.poi_context(snapshot['poi_name']):
+                with mpl.rc_context(rc=savelogic.mpl_qd_style):
+                    filepath = self._parentclass._save_measurement_snapshot(snapshot)
+        except:
+            self._parentclass.log.exception('Saving of pulsed measurement data with tag "{0}" '
+                                            'failed.'.format(snapshot['tag']))
+        finally:
+            self._parentclass._save_finished(snapshot['tag'])
+        self.sigSaveFinished.emit(snapshot['tag'], filepath)
+        return
+
+
 class PulsedMeasurementLogic(GenericLogic):
     """
     This is the Logic class for the control of pulsed measurements.
@@ -56,6 +92,9 @@ class PulsedMeasurementLogic(GenericLogic):
     analysis_import_path = ConfigOption(name='additional_analysis_path', default=None)
     # Optional file type descriptor for saving raw data to file
     _raw_data_save_type = ConfigOption(name='raw_data_save_type', default='text')
+    # Optional flag to read only the counts added since the last readout from fast counters
+    # supporting it (get_data_trace_delta) and accumulate them here
+    _delta_readout = ConfigOption(name='delta_readout', default=False)
 
     # status variables
     # ext. microwave settings
@@ -108,9 +147,11 @@ class PulsedMeasurementLogic(GenericLogic):
     sigMeasurementSettingsUpdated = QtCore.Signal(dict)
     sigAnalysisSettingsUpdated = QtCore.Signal(dict)
     sigExtractionSettingsUpdated = QtCore.Signal(dict)
+    sigMeasurementDataSaved = QtCore.Signal(str, str)
     # Internal signals
     sigStartTimer = QtCore.Signal()
     sigStopTimer = QtCore.Signal()
+    sigSaveSnapshot = QtCore.Signal(dict)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -129,13 +170,32 @@ class PulsedMeasurementLogic(GenericLogic):
         # threading
         self._threadlock = Mutex()
 
+        # saving of data snapshots in a separate thread
+        self._saver = None
+        self._save_lock = Mutex()
+        self._pending_save_tags = set()
+
         # measurement data
         self.signal_data = np.empty((2, 0), dtype=float)
-        self.signal_alt_data = np.empty((2, 0), dtype=float)
         self.measurement_error = np.empty((2, 0), dtype=float)
         self.laser_data = np.zeros((10, 20), dtype='int64')
         self.raw_data = np.zeros((10, 20), dtype='int64')
 
+        # Alternative data is only computed on request and cached until the signal data
+        # (tracked by a version counter) or the alternative data settings change.
+        self._signal_version = 0
+        # Displayed data versions, the GUI only redraws plots if the version changed.
+        self._data_version = 0
+        self._laser_data_version = 0
+        self._alt_data_lock = Mutex()
+        self._alt_data_cache_key = None
+        self._alt_data_cache = np.empty((2, 0), dtype=float)
+        # Window function and frequency axis for the FFT, computed once per x-axis
+        self._ft_setup_key = None
+        self._ft_setup = dict()
+
+        self._accumulated_raw_data = None  # raw data accumulated in delta readout mode
+        self.interval_information = dict()  # statistics of the last delta readout interval
         self._saved_raw_data = OrderedDict()  # temporary saved raw data
         self._recalled_raw_data_tag = None  # the currently recalled raw data dict key
 
@@ -155,6 +215,11 @@ class PulsedMeasurementLogic(GenericLogic):
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
+        # the data is updated with every analysis step, slow GUIs only get the latest update
+        self._measurement_data_updated = self.coalesce_signal('sigMeasurementDataUpdated')
+        # consistent snapshots of signal_data and measurement_error for the GUI and other processes
+        self.signal_data_buffer = self.shared_array('signal_data')
+
         # Create an instance of PulseExtractor
         self._pulseextractor = PulseExtractor(pulsedmeasurementlogic=self)
         self._pulseanalyzer = PulseAnalyzer(pulsedmeasurementlogic=self)
@@ -186,6 +251,8 @@ class PulsedMeasurementLogic(GenericLogic):
             self.__fast_counter_record_length = 3e-6
         self.fast_counter_off()
         self.set_fast_counter_settings()
+        # Hand over the pulse timing of the loaded sequence in case the fast counter needs it
+        self.sampling_information = self._sampling_information
 
         # Check and configure external microwave
         if self.__use_ext_microwave:
@@ -206,6 +273,15 @@ class PulsedMeasurementLogic(GenericLogic):
         # Connect internal signals
         self.sigStartTimer.connect(self.__analysis_timer.start, QtCore.Qt.QueuedConnection)
         self.sigStopTimer.connect(self.__analysis_timer.stop, QtCore.Qt.QueuedConnection)
+
+        # Create the data saver object and let it live in its own thread
+        self._pending_save_tags = set()
+        self._saver = PulsedMeasurementSaver(self)
+        self._saver.moveToThread(self._manager.tm.newThread(self._saver_thread_name))
+        self.sigSaveSnapshot.connect(self._saver.save_snapshot, QtCore.Qt.QueuedConnection)
+        self._saver.sigSaveFinished.connect(self.sigMeasurementDataSaved,
+                                            QtCore.Qt.QueuedConnection)
+        self._saver.thread().start()
         return
 
     def on_deactivate(self):
@@ -224,8 +300,20 @@ class PulsedMeasurementLogic(GenericLogic):
         self.__analysis_timer.timeout.disconnect()
         self.sigStartTimer.disconnect()
         self.sigStopTimer.disconnect()
+
+        # Let the saver thread finish all pending saves before quitting
+        self.sigSaveSnapshot.disconnect()
+        self._manager.tm.quitThread(self._saver_thread_name)
+        self._manager.tm.joinThread(self._saver_thread_name)
+        self._saver.sigSaveFinished.disconnect()
+        self._saver = None
+        self.signal_data_buffer.close()
         return
 
+    @property
+    def _saver_thread_name(self):
+        return 'pulsed-saver-{0}'.format(self._name)
+
     ############################################################################
     # Fast counter control methods and properties
     ############################################################################
@@ -568,6 +656,9 @@ class PulsedMeasurementLogic(GenericLogic):
             self._sampling_information = info_dict
         else:
             self._sampling_information = dict()
+        # Simulating fast counters (e.g. FastCounterDummy) need to know the laser pulse timing
+        if hasattr(self.fastcounter(), 'set_sampling_information'):
+            self.fastcounter().set_sampling_information(self._sampling_information)
         return
 
     @property
@@ -762,17 +853,17 @@ class PulsedMeasurementLogic(GenericLogic):
                 self.sigMeasurementStatusUpdated.emit(False, False)
                 return
 
+        started = False
         with self._threadlock:
             if self.module_state() == 'idle':
                 # Lock module state
                 self.module_state.lock()
-
-                # Clear previous fits
-                self.do_fit('No Fit', False)
-                self.do_fit('No Fit', True)
+                started = True
 
                 # initialize data arrays
                 self._initialize_data_arrays()
+                self._accumulated_raw_data = None
+                self.interval_information = dict()
 
                 # recall stashed raw data
                 if stashed_raw_data_tag in self._saved_raw_data:
@@ -805,6 +896,12 @@ class PulsedMeasurementLogic(GenericLogic):
                 self.__is_paused = False
             else:
                 self.log.warning('Unable to start pulsed measurement. Measurement already running.')
+
+        if started:
+            # Clear previous fits. Fitting reads the data with the thread lock, so it is done
+            # after releasing it.
+            self.do_fit('No Fit', False)
+            self.do_fit('No Fit', True)
         return
 
     @QtCore.Slot(str)
@@ -938,9 +1035,10 @@ class PulsedMeasurementLogic(GenericLogic):
         @param alt_data_type:
         @return:
         """
+        # fitting reads the data with the thread lock, so it is done before taking it
+        if alt_data_type != self.alternative_data_type:
+            self.do_fit('No Fit', True)
         with self._threadlock:
-            if alt_data_type != self.alternative_data_type:
-                self.do_fit('No Fit', True)
             if alt_data_type == 'Delta' and not self._alternating:
                 if self._alternative_data_type == 'Delta':
                     self._alternative_data_type = None
@@ -952,8 +1050,8 @@ class PulsedMeasurementLogic(GenericLogic):
             else:
                 self._alternative_data_type = alt_data_type
 
-            self._compute_alt_data()
-            self.sigMeasurementDataUpdated.emit()
+            self._data_version += 1
+            self._measurement_data_updated.emit()
         return
 
     @QtCore.Slot()
@@ -1098,7 +1196,8 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 self._extract_laser_pulses()
 
-                tmp_signal, tmp_error = self._analyze_laser_pulses()
+                with self.instrumentation.span('pulse analysis'):
+                    tmp_signal, tmp_error = self._analyze_laser_pulses()
 
                 # exclude laser pulses to ignore
                 if len(self._laser_ignore_list) > 0:
@@ -1129,25 +1228,31 @@ class PulsedMeasurementLogic(GenericLogic):
                     self.signal_data[1] = tmp_signal
                     self.measurement_error[1] = tmp_error
 
-                # Compute alternative data array from signal
-                self._compute_alt_data()
+                # Invalidate alternative data computed from the previous signal
+                self._signal_version += 1
+                self._data_version += 1
+                self._publish_signal_data()
 
             # emit signals
-            self.sigTimerUpdated.emit(self.__elapsed_time, self.__elapsed_sweeps,
-                                      self.__timer_interval)
-            self.sigMeasurementDataUpdated.emit()
+            with self.instrumentation.span('signal emission'):
+                self.sigTimerUpdated.emit(self.__elapsed_time, self.__elapsed_sweeps,
+                                          self.__timer_interval)
+                self._measurement_data_updated.emit()
             return
 
     def _extract_laser_pulses(self):
         # Get counter raw data (including recalled raw data from previous measurement)
-        fc_data, info_dict = self._get_raw_data()
+        with self.instrumentation.span('hardware read'):
+            fc_data, info_dict = self._get_raw_data()
         self.raw_data = fc_data
         self.__elapsed_sweeps = info_dict['elapsed_sweeps']
         self.__elapsed_time = info_dict['elapsed_time']
 
         # extract laser pulses from raw data
-        return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
+        with self.instrumentation.span('pulse extraction'):
+            return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
         self.laser_data = return_dict['laser_counts_arr']
+        self._laser_data_version += 1
         return
 
     def _analyze_laser_pulses(self):
@@ -1169,12 +1274,15 @@ class PulsedMeasurementLogic(GenericLogic):
                                                  info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
         """
         # get raw data from fast counter
-        fc_data = self.fastcounter().get_data_trace()
-        if type(fc_data) == tuple and len(fc_data) == 2:  # if the hardware implement the new version of the interface
-            fc_data, info_dict = fc_data
+        if self._delta_readout and hasattr(self.fastcounter(), 'get_data_trace_delta'):
+            fc_data, info_dict = self._get_accumulated_delta_data()
         else:
-            info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
-        fc_data = netobtain(fc_data)
+            fc_data = self.fastcounter().get_data_trace()
+            if type(fc_data) == tuple and len(fc_data) == 2:  # if the hardware implement the new version of the interface
+                fc_data, info_dict = fc_data
+            else:
+                info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
+            fc_data = netobtain(fc_data)
 
         if isinstance(info_dict, dict) and info_dict.get('elapsed_sweeps') is not None:
             elapsed_sweeps = info_dict['elapsed_sweeps']
@@ -1208,6 +1316,36 @@ class PulsedMeasurementLogic(GenericLogic):
 
         return fc_data, {'elapsed_sweeps': elapsed_sweeps, 'elapsed_time': elapsed_time}
 
+    def _get_accumulated_delta_data(self):
+        """
+        Get the counts added since the last readout from the fast counter and add them to the
+        accumulated raw data. Also update the statistics of this readout interval.
+
+        @return tuple(numpy.ndarray, info_dict): The accumulated count data and info_dict with
+                                                 keys 'elapsed_sweeps' and 'elapsed_time'
+        """
+        delta_data, info_dict = self.fastcounter().get_data_trace_delta()
+        delta_data = netobtain(delta_data)
+
+        if self._accumulated_raw_data is None or self._accumulated_raw_data.shape != delta_data.shape:
+            self._accumulated_raw_data = np.zeros(delta_data.shape, dtype='int64')
+        self._accumulated_raw_data += delta_data
+
+        interval_counts = int(delta_data.sum())
+        interval_time = info_dict.get('interval_time')
+        self.interval_information = {
+            'sweeps': info_dict.get('interval_sweeps'),
+            'time': interval_time,
+            'counts': interval_counts,
+            'count_rate': interval_counts / interval_time if interval_time else None}
+        return self._accumulated_raw_data, info_dict
+
+    def _publish_signal_data(self):
+        """ Publish signal_data (index 0) and measurement_error (index 1) as a single array, so
+        readers always get matching versions of both.
+        """
+        self.signal_data_buffer.publish(np.stack((self.signal_data, self.measurement_error)))
+
     def _initialize_data_arrays(self):
         """
         Initializing the signal, error, laser and raw data arrays.
@@ -1218,11 +1356,12 @@ class PulsedMeasurementLogic(GenericLogic):
         self.signal_data = np.zeros((signal_dim, len(self._controlled_variable)), dtype=float)
         self.signal_data[0] = self._controlled_variable
 
-        self.signal_alt_data = np.zeros((signal_dim, len(self._controlled_variable)), dtype=float)
-        self.signal_alt_data[0] = self._controlled_variable
+        self._signal_version += 1
+        self._data_version += 1
 
         self.measurement_error = np.zeros((signal_dim, len(self._controlled_variable)), dtype=float)
         self.measurement_error[0] = self._controlled_variable
+        self._publish_signal_data()
 
         number_of_bins = int(self.__fast_counter_record_length / self.__fast_counter_binwidth)
         laser_length = number_of_bins if self.__fast_counter_gates > 0 else 500
@@ -1232,8 +1371,9 @@ class PulsedMeasurementLogic(GenericLogic):
             self.raw_data = np.zeros((self._number_of_lasers, number_of_bins), dtype='int64')
         else:
             self.raw_data = np.zeros(number_of_bins, dtype='int64')
+        self._laser_data_version += 1
 
-        self.sigMeasurementDataUpdated.emit()
+        self._measurement_data_updated.emit()
         return
 
     # FIXME: Revise everything below
@@ -1242,15 +1382,100 @@ class PulsedMeasurementLogic(GenericLogic):
     @QtCore.Slot(str, bool)
     def save_measurement_data(self, tag=None, with_error=True):
         """
-        Prepare data to be saved and create a proper plot of the data
+        Take a snapshot of the current measurement data and settings and hand it over to the saver
+        thread which writes the data files and creates a proper plot of the data.
+        This method returns immediately. Completion is reported by sigMeasurementDataSaved.
 
         @param str tag: a filetag which will be included in the filename
         @param bool with_error: select whether errors should be saved/plotted
 
+        @return str: directory the data files will be saved in (None if the save request was
+                     rejected)
+        """
+        tag = tag if tag else ''
+        with self._save_lock:
+            if tag in self._pending_save_tags:
+                self.log.error('Unable to save pulsed measurement data with tag "{0}". A save with '
+                               'the same tag is still in progress.'.format(tag))
+                return None
+            self._pending_save_tags.add(tag)
+
+        snapshot = dict()
+        snapshot['tag'] = tag
+        snapshot['with_error'] = bool(with_error)
+        snapshot['filepath'] = self.savelogic().get_path_for_module('PulsedMeasurement')
+        snapshot['timestamp'] = datetime.datetime.now()
+        snapshot['poi_name'] = self.savelogic().get_active_poi_name()
+        with self._threadlock:
+            snapshot['signal_data'] = self.signal_data.copy()
+            snapshot['signal_alt_data'] = self._get_alt_data(self._alt_data_key(),
+                                                             self.signal_data).copy()
+            snapshot['measurement_error'] = self.measurement_error.copy()
+            snapshot['laser_data'] = self.laser_data.copy()
+            snapshot['raw_data'] = self.raw_data.copy()
+            snapshot['signal_fit_data'] = self.signal_fit_data.copy()
+            snapshot['signal_fit_alt_data'] = self.signal_fit_alt_data.copy()
+            # Fit results are replaced (not altered) upon each new fit, so no copy is needed here
+            snapshot['fit_result'] = self.fit_result
+            snapshot['alt_fit_result'] = self.alt_fit_result
+            snapshot['elapsed_time'] = self.__elapsed_time
+            snapshot['elapsed_sweeps'] = self.__elapsed_sweeps
+            snapshot['number_of_lasers'] = self._number_of_lasers
+            snapshot['laser_ignore_list'] = list(self._laser_ignore_list)
+            snapshot['alternating'] = self._alternating
+            snapshot['alternative_data_type'] = self._alternative_data_type
+            snapshot['data_units'] = tuple(self._data_units)
+            snapshot['data_labels'] = tuple(self._data_labels)
+            snapshot['fast_counter_settings'] = self.fast_counter_settings
+            snapshot['analysis_settings'] = copy.deepcopy(self.analysis_settings)
+            snapshot['extraction_settings'] = copy.deepcopy(self.extraction_settings)
+
+        self.sigSaveSnapshot.emit(snapshot)
+        return snapshot['filepath']
+
+    def _save_finished(self, tag):
+        """
+        Release a save tag after the saver thread is done with it.
+
+        @param str tag: filetag of the finished save
+        """
+        with self._save_lock:
+            self._pending_save_tags.discard(tag)
+        return
+
+    def _save_measurement_snapshot(self, snapshot):
+        """
+        Write a measurement data snapshot (see save_measurement_data) to file and create a proper
+        plot of the data. This is executed by the PulsedMeasurementSaver in its own thread.
+
+        @param dict snapshot: copies of the measurement data and settings to save
+
         @return str: filepath where data were saved
         """
-        filepath = self.savelogic().get_path_for_module('PulsedMeasurement')
-        timestamp = datetime.datetime.now()
+        tag = snapshot['tag']
+        with_error = snapshot['with_error']
+        filepath = snapshot['filepath']
+        timestamp = snapshot['timestamp']
+        signal_data = snapshot['signal_data']
+        signal_alt_data = snapshot['signal_alt_data']
+        measurement_error = snapshot['measurement_error']
+        laser_data = snapshot['laser_data']
+        raw_data = snapshot['raw_data']
+        signal_fit_data = snapshot['signal_fit_data']
+        signal_fit_alt_data = snapshot['signal_fit_alt_data']
+        fit_result = snapshot['fit_result']
+        alt_fit_result = snapshot['alt_fit_result']
+        elapsed_time = snapshot['elapsed_time']
+        elapsed_sweeps = snapshot['elapsed_sweeps']
+        number_of_lasers = snapshot['number_of_lasers']
+        laser_ignore_list = snapshot['laser_ignore_list']
+        alternating = snapshot['alternating']
+        alternative_data_type = snapshot['alternative_data_type']
+        data_units = snapshot['data_units']
+        data_labels = snapshot['data_labels']
+        fast_counter_settings = snapshot['fast_counter_settings']
+        analysis_settings = snapshot['analysis_settings']
+        extraction_settings = snapshot['extraction_settings']
 
         #####################################################################
         ####                Save extracted laser pulses                  ####
@@ -1262,15 +1487,15 @@ class PulsedMeasurementLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        laser_trace = self.laser_data
+        laser_trace = laser_data
         data['Signal (counts)'] = laser_trace.transpose()
 
         # write the parameters:
         parameters = OrderedDict()
-        parameters['bin width (s)'] = self.__fast_counter_binwidth
-        parameters['record length (s)'] = self.__fast_counter_record_length
-        parameters['gated counting'] = self.fast_counter_settings['is_gated']
-        parameters['extraction parameters'] = self.extraction_settings
+        parameters['bin width (s)'] = fast_counter_settings['bin_width']
+        parameters['record length (s)'] = fast_counter_settings['record_length']
+        parameters['gated counting'] = fast_counter_settings['is_gated']
+        parameters['extraction parameters'] = extraction_settings
 
         self.savelogic().save_data(data,
                                    timestamp=timestamp,
@@ -1291,43 +1516,41 @@ class PulsedMeasurementLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         header_str = 'Controlled variable'
-        if self._data_units[0]:
-            header_str += '({0})'.format(self._data_units[0])
+        if data_units[0]:
+            header_str += '({0})'.format(data_units[0])
         header_str += '\tSignal'
-        if self._data_units[1]:
-            header_str += '({0})'.format(self._data_units[1])
-        if self._alternating:
+        if data_units[1]:
+            header_str += '({0})'.format(data_units[1])
+        if alternating:
             header_str += '\tSignal2'
-            if self._data_units[1]:
-                header_str += '({0})'.format(self._data_units[1])
+            if data_units[1]:
+                header_str += '({0})'.format(data_units[1])
         if with_error:
             header_str += '\tError'
-            if self._data_units[1]:
-                header_str += '({0})'.format(self._data_units[1])
-            if self._alternating:
+            if data_units[1]:
+                header_str += '({0})'.format(data_units[1])
+            if alternating:
                 header_str += '\tError2'
-                if self._data_units[1]:
-                    header_str += '({0})'.format(self._data_units[1])
+                if data_units[1]:
+                    header_str += '({0})'.format(data_units[1])
         data = OrderedDict()
         if with_error:
-            data[header_str] = np.vstack((self.signal_data, self.measurement_error[1:])).transpose()
+            data[header_str] = np.vstack((signal_data, measurement_error[1:])).transpose()
         else:
-            data[header_str] = self.signal_data.transpose()
+            data[header_str] = signal_data.transpose()
 
         # write the parameters:
         parameters = OrderedDict()
-        parameters['Approx. measurement time (s)'] = self.__elapsed_time
-        parameters['Measurement sweeps'] = self.__elapsed_sweeps
-        parameters['Number of laser pulses'] = self._number_of_lasers
-        parameters['Laser ignore indices'] = self._laser_ignore_list
-        parameters['alternating'] = self._alternating
-        parameters['analysis parameters'] = self.analysis_settings
-        parameters['extraction parameters'] = self.extraction_settings
-        parameters['fast counter settings'] = self.fast_counter_settings
+        parameters['Approx. measurement time (s)'] = elapsed_time
+        parameters['Measurement sweeps'] = elapsed_sweeps
+        parameters['Number of laser pulses'] = number_of_lasers
+        parameters['Laser ignore indices'] = laser_ignore_list
+        parameters['alternating'] = alternating
+        parameters['analysis parameters'] = analysis_settings
+        parameters['extraction parameters'] = extraction_settings
+        parameters['fast counter settings'] = fast_counter_settings
 
         # Prepare the figure to save as a "data thumbnail"
-        plt.style.use(self.savelogic().mpl_qd_style)
-
         # extract the possible colors from the colorscheme:
         prop_cycle = self.savelogic().mpl_qd_style['axes.prop_cycle']
         colors = {}
@@ -1335,43 +1558,45 @@ class PulsedMeasurementLogic(GenericLogic):
             colors[i] = color_setting['color']
 
         # scale the x_axis for plotting
-        max_val = np.max(self.signal_data[0])
+        max_val = np.max(signal_data[0])
         scaled_float = units.ScaledFloat(max_val)
         counts_prefix = scaled_float.scale
-        x_axis_scaled = self.signal_data[0] / scaled_float.scale_val
+        x_axis_scaled = signal_data[0] / scaled_float.scale_val
 
-        # Create the figure object
-        if self._alternative_data_type and self._alternative_data_type != 'None':
-            fig, (ax1, ax2) = plt.subplots(2, 1)
+        # Create the figure object. Do not use pyplot here since this runs outside the GUI thread.
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        if alternative_data_type and alternative_data_type != 'None':
+            ax1, ax2 = fig.subplots(2, 1)
         else:
-            fig, ax1 = plt.subplots()
+            ax1 = fig.subplots()
 
         if with_error:
-            ax1.errorbar(x=x_axis_scaled, y=self.signal_data[1],
-                         yerr=self.measurement_error[1], fmt='-o',
+            ax1.errorbar(x=x_axis_scaled, y=signal_data[1],
+                         yerr=measurement_error[1], fmt='-o',
                          linestyle=':', linewidth=0.5, color=colors[0],
                          ecolor=colors[1], capsize=3, capthick=0.9,
                          elinewidth=1.2, label='data trace 1')
 
-            if self._alternating:
-                ax1.errorbar(x=x_axis_scaled, y=self.signal_data[2],
-                             yerr=self.measurement_error[2], fmt='-D',
+            if alternating:
+                ax1.errorbar(x=x_axis_scaled, y=signal_data[2],
+                             yerr=measurement_error[2], fmt='-D',
                              linestyle=':', linewidth=0.5, color=colors[3],
                              ecolor=colors[4],  capsize=3, capthick=0.7,
                              elinewidth=1.2, label='data trace 2')
         else:
-            ax1.plot(x_axis_scaled, self.signal_data[1], '-o', color=colors[0],
+            ax1.plot(x_axis_scaled, signal_data[1], '-o', color=colors[0],
                      linestyle=':', linewidth=0.5, label='data trace 1')
 
-            if self._alternating:
-                ax1.plot(x_axis_scaled, self.signal_data[2], '-o',
+            if alternating:
+                ax1.plot(x_axis_scaled, signal_data[2], '-o',
                          color=colors[3], linestyle=':', linewidth=0.5,
                          label='data trace 2')
 
         # Do not include fit curve if there is no fit calculated.
-        if self.signal_fit_data.size != 0 and np.sum(self.signal_fit_data[1]) > 0:
-            x_axis_fit_scaled = self.signal_fit_data[0] / scaled_float.scale_val
-            ax1.plot(x_axis_fit_scaled, self.signal_fit_data[1],
+        if signal_fit_data.size != 0 and np.sum(signal_fit_data[1]) > 0:
+            x_axis_fit_scaled = signal_fit_data[0] / scaled_float.scale_val
+            ax1.plot(x_axis_fit_scaled, signal_fit_data[1],
                      color=colors[2], marker='None', linewidth=1.5,
                      label='fit')
 
@@ -1386,8 +1611,8 @@ class PulsedMeasurementLogic(GenericLogic):
             entries_per_col = 24
 
             # create the formatted fit text:
-            if hasattr(self.fit_result, 'result_str_dict'):
-                result_str = units.create_formatted_output(self.fit_result.result_str_dict)
+            if hasattr(fit_result, 'result_str_dict'):
+                result_str = units.create_formatted_output(fit_result.result_str_dict)
             else:
                 result_str = ''
             # do reverse processing to get each entry in a list
@@ -1426,44 +1651,44 @@ class PulsedMeasurementLogic(GenericLogic):
                 is_first_column = False
 
         # handle the save of the alternative data plot
-        if self._alternative_data_type and self._alternative_data_type != 'None':
+        if alternative_data_type and alternative_data_type != 'None':
 
             # scale the x_axis for plotting
-            max_val = np.max(self.signal_alt_data[0])
+            max_val = np.max(signal_alt_data[0])
             scaled_float = units.ScaledFloat(max_val)
             x_axis_prefix = scaled_float.scale
-            x_axis_ft_scaled = self.signal_alt_data[0] / scaled_float.scale_val
+            x_axis_ft_scaled = signal_alt_data[0] / scaled_float.scale_val
 
             # since no ft units are provided, make a small work around:
-            if self._alternative_data_type == 'FFT':
-                if self._data_units[0] == 's':
+            if alternative_data_type == 'FFT':
+                if data_units[0] == 's':
                     inverse_cont_var = 'Hz'
-                elif self._data_units[0] == 'Hz':
+                elif data_units[0] == 'Hz':
                     inverse_cont_var = 's'
                 else:
-                    inverse_cont_var = '(1/{0})'.format(self._data_units[0])
+                    inverse_cont_var = '(1/{0})'.format(data_units[0])
                 x_axis_ft_label = 'FT {0} ({1}{2})'.format(
-                    self._data_labels[0], x_axis_prefix, inverse_cont_var)
-                y_axis_ft_label = 'FT({0}) (arb. u.)'.format(self._data_labels[1])
+                    data_labels[0], x_axis_prefix, inverse_cont_var)
+                y_axis_ft_label = 'FT({0}) (arb. u.)'.format(data_labels[1])
                 ft_label = 'FT of data trace 1'
             else:
-                if self._data_units[0]:
-                    x_axis_ft_label = '{0} ({1}{2})'.format(self._data_labels[0], x_axis_prefix,
-                                                            self._data_units[0])
+                if data_units[0]:
+                    x_axis_ft_label = '{0} ({1}{2})'.format(data_labels[0], x_axis_prefix,
+                                                            data_units[0])
                 else:
-                    x_axis_ft_label = '{0}'.format(self._data_labels[0])
-                if self._data_units[1]:
-                    y_axis_ft_label = '{0} ({1})'.format(self._data_labels[1], self._data_units[1])
+                    x_axis_ft_label = '{0}'.format(data_labels[0])
+                if data_units[1]:
+                    y_axis_ft_label = '{0} ({1})'.format(data_labels[1], data_units[1])
                 else:
-                    y_axis_ft_label = '{0}'.format(self._data_labels[1])
+                    y_axis_ft_label = '{0}'.format(data_labels[1])
 
-                ft_label = '{0} of data traces'.format(self._alternative_data_type)
+                ft_label = '{0} of data traces'.format(alternative_data_type)
 
-            ax2.plot(x_axis_ft_scaled, self.signal_alt_data[1], '-o',
+            ax2.plot(x_axis_ft_scaled, signal_alt_data[1], '-o',
                      linestyle=':', linewidth=0.5, color=colors[0],
                      label=ft_label)
-            if self._alternating and len(self.signal_alt_data) > 2:
-                ax2.plot(x_axis_ft_scaled, self.signal_alt_data[2], '-D',
+            if alternating and len(signal_alt_data) > 2:
+                ax2.plot(x_axis_ft_scaled, signal_alt_data[2], '-D',
                          linestyle=':', linewidth=0.5, color=colors[3],
                          label=ft_label.replace('1', '2'))
 
@@ -1472,9 +1697,9 @@ class PulsedMeasurementLogic(GenericLogic):
             ax2.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
                        mode="expand", borderaxespad=0.)
 
-            if self.signal_fit_alt_data.size != 0 and np.sum(self.signal_fit_alt_data[1]) > 0:
-                x_axis_fit_scaled = self.signal_fit_alt_data[0] / scaled_float.scale_val
-                ax2.plot(x_axis_fit_scaled, self.signal_fit_alt_data[1],
+            if signal_fit_alt_data.size != 0 and np.sum(signal_fit_alt_data[1]) > 0:
+                x_axis_fit_scaled = signal_fit_alt_data[0] / scaled_float.scale_val
+                ax2.plot(x_axis_fit_scaled, signal_fit_alt_data[1],
                          color=colors[2], marker='None', linewidth=1.5,
                          label='secondary fit')
 
@@ -1489,8 +1714,8 @@ class PulsedMeasurementLogic(GenericLogic):
                 entries_per_col = 24
 
                 # create the formatted fit text:
-                if hasattr(self.alt_fit_result, 'result_str_dict'):
-                    result_str = units.create_formatted_output(self.alt_fit_result.result_str_dict)
+                if hasattr(alt_fit_result, 'result_str_dict'):
+                    result_str = units.create_formatted_output(alt_fit_result.result_str_dict)
                 else:
                     result_str = ''
                 # do reverse processing to get each entry in a list
@@ -1528,11 +1753,11 @@ class PulsedMeasurementLogic(GenericLogic):
                     is_first_column = False
 
         ax1.set_xlabel(
-            '{0} ({1}{2})'.format(self._data_labels[0], counts_prefix, self._data_units[0]))
-        if self._data_units[1]:
-            ax1.set_ylabel('{0} ({1})'.format(self._data_labels[1], self._data_units[1]))
+            '{0} ({1}{2})'.format(data_labels[0], counts_prefix, data_units[0]))
+        if data_units[1]:
+            ax1.set_ylabel('{0} ({1})'.format(data_labels[1], data_units[1]))
         else:
-            ax1.set_ylabel('{0}'.format(self._data_labels[1]))
+            ax1.set_ylabel('{0}'.format(data_labels[1]))
 
         fig.tight_layout()
         ax1.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
@@ -1552,16 +1777,16 @@ class PulsedMeasurementLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        raw_trace = self.raw_data.astype('int64')
+        raw_trace = raw_data.astype('int64')
         data['Signal(counts)'] = raw_trace.transpose()
         # write the parameters:
         parameters = OrderedDict()
-        parameters['bin width (s)'] = self.__fast_counter_binwidth
-        parameters['record length (s)'] = self.__fast_counter_record_length
-        parameters['gated counting'] = self.fast_counter_settings['is_gated']
-        parameters['Number of laser pulses'] = self._number_of_lasers
-        parameters['alternating'] = self._alternating
-        parameters['Controlled variable'] = list(self.signal_data[0])
+        parameters['bin width (s)'] = fast_counter_settings['bin_width']
+        parameters['record length (s)'] = fast_counter_settings['record_length']
+        parameters['gated counting'] = fast_counter_settings['is_gated']
+        parameters['Number of laser pulses'] = number_of_lasers
+        parameters['alternating'] = alternating
+        parameters['Controlled variable'] = list(signal_data[0])
 
         self.savelogic().save_data(data, timestamp=timestamp,
                                    parameters=parameters, fmt='%d',
@@ -1570,35 +1795,117 @@ class PulsedMeasurementLogic(GenericLogic):
                                    delimiter='\t')
         return filepath
 
-    def _compute_alt_data(self):
+    @property
+    def data_version(self):
+        """ Counter increased whenever signal_data, measurement_error or signal_alt_data change.
+        """
+        return self._data_version
+
+    @property
+    def laser_data_version(self):
+        """ Counter increased whenever laser_data and raw_data change. """
+        return self._laser_data_version
+
+    @property
+    def signal_alt_data(self):
+        """
+        Alternative signal data (e.g. Fourier transform or difference of the alternating signals).
+        It is computed on request and cached until the signal data or the settings change.
+
+        @return numpy.ndarray: alternative data (first row is the x-axis)
+        """
+        # take the signal data and its version together, the analysis loop may replace both
+        with self._threadlock:
+            key = self._alt_data_key()
+            signal_data = self.signal_data.copy()
+        return self._get_alt_data(key, signal_data)
+
+    def _alt_data_key(self):
+        """
+        Key of the cached alternative data. Call it while holding the thread lock.
+
+        @return tuple: signal version and all settings the alternative data depends on
+        """
+        return (self._signal_version, self._alternative_data_type, self.zeropad, self.window,
+                self.psd, self.base_corr)
+
+    def _get_alt_data(self, key, signal_data):
+        """
+        Return the cached alternative data or compute it if the key has changed.
+
+        @param tuple key: key of signal_data as returned by _alt_data_key
+        @param numpy.ndarray signal_data: signal data belonging to the key
+
+        @return numpy.ndarray: alternative data (first row is the x-axis)
+        """
+        with self._alt_data_lock:
+            if key != self._alt_data_cache_key:
+                self._alt_data_cache = self._compute_alt_data(signal_data)
+                self._alt_data_cache_key = key
+            return self._alt_data_cache
+
+    def _compute_alt_data(self, signal_data):
         """
         Performing transformations on the measurement data (e.g. fourier transform).
+
+        @param numpy.ndarray signal_data: signal data to transform (first row is the x-axis)
+
+        @return numpy.ndarray: alternative data (first row is the x-axis)
         """
-        if self._alternative_data_type == 'Delta' and len(self.signal_data) == 3:
-            self.signal_alt_data = np.empty((2, self.signal_data.shape[1]), dtype=float)
-            self.signal_alt_data[0] = self.signal_data[0]
-            self.signal_alt_data[1] = self.signal_data[1] - self.signal_data[2]
-        elif self._alternative_data_type == 'FFT' and self.signal_data.shape[1] >= 2:
-            fft_x, fft_y = units.compute_ft(x_val=self.signal_data[0],
-                                            y_val=self.signal_data[1],
-                                            zeropad_num=self.zeropad,
-                                            window=self.window,
-                                            base_corr=self.base_corr,
-                                            psd=self.psd)
-            self.signal_alt_data = np.empty((len(self.signal_data), len(fft_x)), dtype=float)
-            self.signal_alt_data[0] = fft_x
-            self.signal_alt_data[1] = fft_y
-            for dim in range(2, len(self.signal_data)):
-                dummy, self.signal_alt_data[dim] = units.compute_ft(x_val=self.signal_data[0],
-                                                                    y_val=self.signal_data[dim],
-                                                                    zeropad_num=self.zeropad,
-                                                                    window=self.window,
-                                                                    base_corr=self.base_corr,
-                                                                    psd=self.psd)
+        if self._alternative_data_type == 'Delta' and len(signal_data) == 3:
+            signal_alt_data = np.empty((2, signal_data.shape[1]), dtype=float)
+            signal_alt_data[0] = signal_data[0]
+            signal_alt_data[1] = signal_data[1] - signal_data[2]
+        elif self._alternative_data_type == 'FFT' and signal_data.shape[1] >= 2:
+            fft_x, fft_y = self._compute_ft(signal_data[0], signal_data[1:])
+            signal_alt_data = np.empty((len(signal_data), len(fft_x)), dtype=float)
+            signal_alt_data[0] = fft_x
+            signal_alt_data[1:] = fft_y
         else:
-            self.signal_alt_data = np.zeros(self.signal_data.shape, dtype=float)
-            self.signal_alt_data[0] = self.signal_data[0]
-        return
+            signal_alt_data = np.zeros(signal_data.shape, dtype=float)
+            signal_alt_data[0] = signal_data[0]
+        return signal_alt_data
 
+    def _compute_ft(self, x_val, y_val):
+        """
+        Compute the Fourier transform of all signal rows at once. Same result as
+        core.util.units.compute_ft for each row but the window function and frequency axis are
+        only computed once for each x-axis, zeropad and window setting.
 
+        @param numpy.ndarray x_val: 1D array of the controlled variable
+        @param numpy.ndarray y_val: 2D array with one signal per row
 
+        @return tuple(numpy.ndarray, numpy.ndarray): 1D frequency axis, 2D amplitude spectra
+        """
+        x_spacing = np.round(x_val[-1] - x_val[-2], 12)
+        setup_key = (len(x_val), x_spacing, self.zeropad, self.window)
+        if setup_key != self._ft_setup_key:
+            avail_windows = units.get_ft_windows()
+            padded_length = len(x_val) * (self.zeropad + 1)
+            middle = int((padded_length + 1) // 2)
+            self._ft_setup = dict()
+            self._ft_setup['padded_length'] = padded_length
+            self._ft_setup['middle'] = middle
+            self._ft_setup['fft_x'] = abs(np.fft.fftfreq(padded_length, d=x_spacing)[:middle])
+            if self.window in avail_windows:
+                self._ft_setup['window'] = avail_windows[self.window]['func'](len(x_val))
+                self._ft_setup['ampl_norm'] = avail_windows[self.window]['ampl_norm']
+            else:
+                self._ft_setup['window'] = None
+                self._ft_setup['ampl_norm'] = 1.0
+            self._ft_setup_key = setup_key
+
+        corrected_y = y_val
+        if self.base_corr:
+            corrected_y = y_val - y_val.mean(axis=1)[:, np.newaxis]
+        if self._ft_setup['window'] is not None:
+            corrected_y = corrected_y * self._ft_setup['window']
+
+        # rfft zeropads to the requested length. For real input its first half equals the
+        # first half of the full fft.
+        fft_y = np.abs(np.fft.rfft(corrected_y, n=self._ft_setup['padded_length'], axis=1))
+        fft_y = fft_y[:, :self._ft_setup['middle']]
+
+        power_value = 2.0 if self.psd else 1.0
+        fft_y = ((2 / len(x_val)) * fft_y * self._ft_setup['ampl_norm']) ** power_value
+        return self._ft_setup['fft_x'], fft_y
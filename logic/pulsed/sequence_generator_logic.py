@@ -25,9 +25,11 @@ import os
 import pickle
 import time
 import copy
+import itertools
 
 from qtpy import QtCore
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from core.module import StatusVar, Connector, ConfigOption
 from core.util.modules import get_main_dir, get_home_dir
 from logic.generic_logic import GenericLogic
@@ -69,6 +71,10 @@ class SequenceGeneratorLogic(GenericLogic):
     _sampling_functions_import_path = ConfigOption(name='additional_sampling_functions_path',
                                                    default=None,
                                                    missing='nothing')
+    # Number of worker threads used for batch generation of predefined sequences
+    _batch_generation_workers = ConfigOption(name='batch_generation_workers',
+                                             default=4,
+                                             missing='nothing')
 
     # status vars
     # Global parameters describing the channel usage and common parameters used during pulsed object
@@ -104,6 +110,7 @@ class SequenceGeneratorLogic(GenericLogic):
     sigAvailableSequencesUpdated = QtCore.Signal(list)
 
     sigPredefinedSequenceGenerated = QtCore.Signal(object, bool)
+    sigPredefinedSequenceBatchGenerated = QtCore.Signal(list, bool)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -134,6 +141,8 @@ class SequenceGeneratorLogic(GenericLogic):
 
         # A flag indicating if sampling of a sequence is in progress
         self.__sequence_generation_in_progress = False
+        # A flag indicating if a batch of predefined sequences is being generated
+        self.__batch_generation_in_progress = False
 
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = None
@@ -173,6 +182,7 @@ class SequenceGeneratorLogic(GenericLogic):
         self._pog = PulseObjectGenerator(sequencegeneratorlogic=self)
 
         self.__sequence_generation_in_progress = False
+        self.__batch_generation_in_progress = False
         return
 
     def on_deactivate(self):
@@ -1080,6 +1090,166 @@ class SequenceGeneratorLogic(GenericLogic):
         self.sigPredefinedSequenceGenerated.emit(kwargs_dict.get('name'), len(sequences) > 0)
         return
 
+    def generate_predefined_sequence_batch(self, predefined_sequence_name, kwargs_dict,
+                                           param_grid, sample=False):
+        """ Generates the same predefined sequence for every point of a parameter grid.
+
+        Pulse objects of all grid points are constructed concurrently in a thread pool. If
+        <sample> is True, each generated ensemble/sequence is sampled and written to the pulse
+        generator as soon as it is available, so the upload of one grid point overlaps with the
+        generation of the next one. All asset files are written in a single transaction after
+        the whole batch has been generated.
+
+        @param str predefined_sequence_name: name of the predefined generate method
+        @param dict kwargs_dict: parameters common to all grid points. The "name" parameter is
+                                 used as prefix for the names of the created assets.
+        @param dict param_grid: parameter names as keys and iterables of parameter values to
+                                sweep as values. The cartesian product of all value lists is
+                                generated.
+        @param bool sample: flag indicating if the generated assets should be sampled and
+                            uploaded to the pulse generator right away.
+
+        @return list: names of the generated PulseBlockEnsembles/PulseSequences in grid order
+        """
+        if predefined_sequence_name not in self.generate_methods:
+            self.log.error('Batch generation failed. Predefined sequence "{0}" not found.'
+                           ''.format(predefined_sequence_name))
+            return list()
+        if self.module_state() != 'idle':
+            self.log.error('Batch generation failed. SequenceGeneratorLogic is busy.')
+            return list()
+
+        gen_method = self.generate_methods[predefined_sequence_name]
+        gen_params = self.generate_method_params[predefined_sequence_name]
+        unknown_params = [param for param in param_grid if param not in gen_params]
+        if unknown_params:
+            self.log.error('Batch generation failed. Parameters {0} are not accepted by predefined '
+                           'sequence "{1}".'.format(unknown_params, predefined_sequence_name))
+            return list()
+        common_kwargs = {param: value for param, value in kwargs_dict.items()
+                         if param in gen_params and param not in param_grid}
+
+        # Expand parameter grid into one kwargs dict per grid point
+        grid_names = list(param_grid)
+        name_prefix = common_kwargs.get('name', predefined_sequence_name)
+        batch_kwargs = list()
+        for index, values in enumerate(itertools.product(*(param_grid[p] for p in grid_names))):
+            point_kwargs = common_kwargs.copy()
+            point_kwargs.update(zip(grid_names, values))
+            point_kwargs['name'] = '{0}_{1:d}'.format(name_prefix, index)
+            batch_kwargs.append(point_kwargs)
+        if not batch_kwargs:
+            self.log.warning('Empty parameter grid passed to batch generation of predefined '
+                             'sequence "{0}".'.format(predefined_sequence_name))
+            return list()
+
+        generated_blocks = list()
+        generated_ensembles = list()
+        generated_sequences = list()
+        generated_names = list()
+        sampling_futures = list()
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self._batch_generation_workers) as gen_pool, \
+                ThreadPoolExecutor(max_workers=1) as sample_pool:
+            gen_futures = [gen_pool.submit(gen_method, **point_kwargs)
+                           for point_kwargs in batch_kwargs]
+            self.__batch_generation_in_progress = True
+            try:
+                for point_kwargs, future in zip(batch_kwargs, gen_futures):
+                    try:
+                        blocks, ensembles, sequences = future.result()
+                    except:
+                        self.log.exception('Generation of predefined sequence "{0}" with '
+                                           'parameters {1} failed.'
+                                           ''.format(predefined_sequence_name, point_kwargs))
+                        continue
+                    # Register objects in memory only. Files are written at the end of the batch.
+                    for block in blocks:
+                        self._saved_pulse_blocks[block.name] = block
+                    for ensemble in ensembles:
+                        ensemble.sampling_information = dict()
+                        self._saved_pulse_block_ensembles[ensemble.name] = ensemble
+                    for sequence in sequences:
+                        sequence.sampling_information = dict()
+                        self._saved_pulse_sequences[sequence.name] = sequence
+                    generated_blocks.extend(blocks)
+                    generated_ensembles.extend(ensembles)
+                    generated_sequences.extend(sequences)
+                    generated_names.append(point_kwargs['name'])
+
+                    # Hand over to the (single) sampling worker. Device uploads are thus
+                    # serialized but overlap with the generation of the next grid points.
+                    if sample:
+                        if sequences:
+                            sample_func = self.sample_pulse_sequence
+                            assets = sequences
+                        else:
+                            sample_func = self.sample_pulse_block_ensemble
+                            assets = ensembles
+                        for asset in assets:
+                            sampling_futures.append(sample_pool.submit(sample_func, asset))
+                for future in sampling_futures:
+                    try:
+                        future.result()
+                    except:
+                        self.log.exception('Sampling during batch generation of predefined '
+                                           'sequence "{0}" failed.'.format(predefined_sequence_name))
+            finally:
+                self.__batch_generation_in_progress = False
+
+        # Write all asset files in one go and notify listeners once
+        self._save_assets_to_file(generated_blocks, generated_ensembles, generated_sequences)
+        self.sigBlockDictUpdated.emit(self._saved_pulse_blocks)
+        self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
+        self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
+        if sample:
+            self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+            self.sigAvailableSequencesUpdated.emit(self.sampled_sequences)
+        self.log.info('Batch generation of {0:d} "{1}" assets finished after {2:.3f} sec.'
+                      ''.format(len(generated_names), predefined_sequence_name,
+                                time.time() - start_time))
+        self.sigPredefinedSequenceBatchGenerated.emit(generated_names,
+                                                      len(generated_sequences) > 0)
+        return generated_names
+
+    def _save_assets_to_file(self, blocks=None, ensembles=None, sequences=None):
+        """
+        Serializes several pulse objects to file in a single transaction.
+
+        All objects are first pickled into temporary files. Only if all of them could be
+        serialized, the temporary files replace the actual asset files. Otherwise all temporary
+        files are removed and the existing asset files remain untouched.
+
+        @param list blocks: PulseBlock instances to save
+        @param list ensembles: PulseBlockEnsemble instances to save
+        @param list sequences: PulseSequence instances to save
+
+        @return bool: True if all files have been written, False otherwise
+        """
+        staged = list()
+        assets = [(obj, 'block') for obj in (blocks if blocks else list())]
+        assets.extend((obj, 'ensemble') for obj in (ensembles if ensembles else list()))
+        assets.extend((obj, 'sequence') for obj in (sequences if sequences else list()))
+        try:
+            for obj, extension in assets:
+                filepath = os.path.join(self._assets_storage_dir,
+                                        '{0}.{1}'.format(obj.name, extension))
+                tmp_filepath = filepath + '.tmp'
+                staged.append((tmp_filepath, filepath))
+                with open(tmp_filepath, 'wb') as file:
+                    pickle.dump(obj, file)
+        except:
+            self.log.exception('Failed to serialize pulse objects to file. No asset files have '
+                               'been written.')
+            for tmp_filepath, _ in staged:
+                if os.path.exists(tmp_filepath):
+                    os.remove(tmp_filepath)
+            return False
+
+        for tmp_filepath, filepath in staged:
+            os.replace(tmp_filepath, filepath)
+        return True
+
     # ---------------------------------------------------------------------------
     #                    END sequence/block generation
     # ---------------------------------------------------------------------------
@@ -1596,7 +1766,7 @@ class SequenceGeneratorLogic(GenericLogic):
         self._delete_waveform_by_nametag(waveform_name)
 
         # Take current time
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # get important parameters from the ensemble
         ensemble_info = self.analyze_block_ensemble(ensemble)
@@ -1730,13 +1900,14 @@ class SequenceGeneratorLogic(GenericLogic):
                             # Set first/last chunk flags
                             is_first_chunk = array_write_index == processed_samples
                             is_last_chunk = processed_samples == ensemble_info['number_of_samples']
-                            written_samples, wfm_list = self.pulsegenerator().write_waveform(
-                                name=waveform_name,
-                                analog_samples=analog_samples,
-                                digital_samples=digital_samples,
-                                is_first_chunk=is_first_chunk,
-                                is_last_chunk=is_last_chunk,
-                                total_number_of_samples=ensemble_info['number_of_samples'])
+                            with self.instrumentation.span('hardware write waveform'):
+                                written_samples, wfm_list = self.pulsegenerator().write_waveform(
+                                    name=waveform_name,
+                                    analog_samples=analog_samples,
+                                    digital_samples=digital_samples,
+                                    is_first_chunk=is_first_chunk,
+                                    is_last_chunk=is_last_chunk,
+                                    total_number_of_samples=ensemble_info['number_of_samples'])
 
                             # Update written waveforms set
                             written_waveforms.update(wfm_list)
@@ -1782,10 +1953,14 @@ class SequenceGeneratorLogic(GenericLogic):
             ensemble.sampling_information.update(ensemble_info)
             ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
             ensemble.sampling_information['waveforms'] = sorted(written_waveforms)
-            self.save_ensemble(ensemble)
-
-        self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: {1} sec'
-                      ''.format(ensemble.name, int(np.rint(time.time() - start_time))))
+            # During batch generation all asset files are written at the end of the batch
+            if not self.__batch_generation_in_progress:
+                self.save_ensemble(ensemble)
+
+        sampling_time = time.perf_counter() - start_time
+        self.instrumentation.observe('ensemble sampling time (s)', sampling_time)
+        self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: '
+                      '{1:.3f} sec'.format(ensemble.name, sampling_time))
         if ensemble_info['number_of_samples'] == 0:
             self.log.warning('Empty waveform (0 samples) created from PulseBlockEnsemble "{0}".'
                              ''.format(ensemble.name))
@@ -1844,10 +2019,11 @@ class SequenceGeneratorLogic(GenericLogic):
 
         # Make sure the PulseSequence is contained in the saved sequences dict
         sequence.sampling_information = dict()
-        self.save_sequence(sequence)
+        if not self.__batch_generation_in_progress:
+            self.save_sequence(sequence)
 
         # Take current time
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # Produce a set of created waveforms
         written_waveforms = set()
@@ -1901,8 +2077,9 @@ class SequenceGeneratorLogic(GenericLogic):
                 (tuple(generated_ensembles[name_tag]['waveforms']), seq_step))
 
         # pass the whole information to the sequence creation method:
-        steps_written = self.pulsegenerator().write_sequence(sequence.name,
-                                                             sequence_param_dict_list)
+        with self.instrumentation.span('hardware write sequence'):
+            steps_written = self.pulsegenerator().write_sequence(sequence.name,
+                                                                 sequence_param_dict_list)
         if steps_written != len(sequence_param_dict_list):
             self.log.error('Writing PulseSequence "{0}" to the device memory failed.\n'
                            'Returned number of sequence steps ({1:d}) does not match desired '
@@ -1917,10 +2094,13 @@ class SequenceGeneratorLogic(GenericLogic):
         sequence.sampling_information['waveforms'] = sorted(written_waveforms)
         sequence.sampling_information['step_waveform_list'] = [step[0] for step in
                                                                sequence_param_dict_list]
-        self.save_sequence(sequence)
+        if not self.__batch_generation_in_progress:
+            self.save_sequence(sequence)
 
-        self.log.info('Time needed for sampling and writing PulseSequence {0} to device: {1} sec.'
-                      ''.format(sequence.name, int(np.rint(time.time() - start_time))))
+        sampling_time = time.perf_counter() - start_time
+        self.instrumentation.observe('sequence sampling time (s)', sampling_time)
+        self.log.info('Time needed for sampling and writing PulseSequence {0} to device: '
+                      '{1:.3f} sec.'.format(sequence.name, sampling_time))
 
         # unlock module
         self.module_state.unlock()
@@ -27,9 +27,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 import sys
+import threading
 import time
 
 from collections import OrderedDict
+from contextlib import contextmanager
 from core.module import ConfigOption
 from core.util import units
 from core.util.mutex import Mutex
@@ -163,6 +165,8 @@ class SaveLogic(GenericLogic):
 
         # name of active POI, default to empty string
         self.active_poi_name = ''
+        # POI names bound to single threads, see poi_context
+        self._thread_poi = threading.local()
 
         # Some default variables concerning the operating system:
         self.os_system = None
@@ -225,6 +229,32 @@ class SaveLogic(GenericLogic):
         """
         self._daily_loghandler.setLevel(level)
 
+    def get_active_poi_name(self):
+        """ Return the POI name data saved by the calling thread is tagged with.
+
+        @return str: POI name bound to the calling thread by poi_context or the active POI name
+        """
+        return getattr(self._thread_poi, 'name', self.active_poi_name)
+
+    @contextmanager
+    def poi_context(self, poi_name):
+        """ Tag all data saved by the calling thread inside this context with the given POI name
+        instead of the active POI.
+
+        This is needed if data of a POI is saved in the background while another POI is active.
+
+        @param str poi_name: name of the POI
+        """
+        previous = getattr(self._thread_poi, 'name', None)
+        self._thread_poi.name = poi_name
+        try:
+            yield
+        finally:
+            if previous is None:
+                del self._thread_poi.name
+            else:
+                self._thread_poi.name = previous
+
     def save_data(self, data, filepath=None, parameters=None, filename=None, filelabel=None,
                   timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None):
         """
@@ -395,8 +425,9 @@ class SaveLogic(GenericLogic):
         # create filelabel if none has been passed
         if filelabel is None:
             filelabel = module_name
-        if self.active_poi_name != '':
-            filelabel = self.active_poi_name.replace(' ', '_') + '_' + filelabel
+        active_poi_name = self.get_active_poi_name()
+        if active_poi_name != '':
+            filelabel = active_poi_name.replace(' ', '_') + '_' + filelabel
 
         # determine proper unique filename to save if none has been passed
         if filename is None:
@@ -414,8 +445,8 @@ class SaveLogic(GenericLogic):
                  ''.format(module_name, timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'))
         header += '\nParameters:\n===========\n\n'
         # Include the active POI name (if not empty) as a parameter in the header
-        if self.active_poi_name != '':
-            header += 'Measured at POI: {0}\n'.format(self.active_poi_name)
+        if active_poi_name != '':
+            header += 'Measured at POI: {0}\n'.format(active_poi_name)
         # add the parameters if specified:
         if parameters is not None:
             # check whether the format for the parameters have a dict type:
@@ -22,15 +22,71 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from qtpy import QtCore
 from core.util.mutex import Mutex
+from core.util.modules import get_home_dir
+from core.util.ring_history import RingHistory
+import datetime
 import numpy as np
+import os
+import threading
+import time
 
 from logic.generic_logic import GenericLogic
 from interface.pid_controller_interface import PIDControllerInterface
 from core.module import Connector, ConfigOption, StatusVar
 
+
+class PIDStepScheduler(QtCore.QObject):
+    """ Helper class running the control steps at a fixed rate in a separate thread.
+
+    The steps are scheduled at absolute deadlines start + n * timestep, so the time spent reading
+    the process value and writing the control value does not add up to a drift of the rate.
+    If a step takes longer than a timestep, the missed deadlines are skipped and counted as
+    overruns.
+    """
+
+    def __init__(self, parentclass):
+        super().__init__()
+
+        # remember the reference to the parent class to access functions ad settings
+        self._parentclass = parentclass
+
+    def run(self):
+        """ Run control steps until the parent class is deactivated. """
+        logic = self._parentclass
+        period = logic.timestep / 1000
+        start = time.perf_counter()
+        last_step = None
+        tick = 0
+        while not logic._stop_event.is_set():
+            deadline = start + tick * period
+            wait = deadline - time.perf_counter()
+            if wait > 0 and logic._stop_event.wait(wait):
+                break
+            step_start = time.perf_counter()
+            dt = period if last_step is None else step_start - last_step
+            last_step = step_start
+            try:
+                logic._calcNextStep(dt=dt * 1000)
+            except Exception:
+                logic.log.exception('PID control step failed.')
+            step_end = time.perf_counter()
+            logic._record_step(step_start - start, dt, step_start - deadline,
+                               step_end - step_start)
+
+            tick += 1
+            elapsed_ticks = int((step_end - start) / period)
+            if elapsed_ticks >= tick:
+                logic._overruns += elapsed_ticks - tick + 1
+                tick = elapsed_ticks + 1
+
+
 class SoftPIDController(GenericLogic, PIDControllerInterface):
     """
     Control a process via software PID.
+
+    The control steps run at a fixed rate in a separate thread. The I and D terms use the
+    measured time between the steps. Process value, control value, setpoint and the step timing
+    are kept in a ring buffer and can be streamed to a file.
     """
     _modclass = 'pidlogic'
     _modtype = 'logic'
@@ -41,6 +97,9 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
 
     # config opt
     timestep = ConfigOption(default=100)
+    history_length = ConfigOption(default=1000)
+    save_chunk_size = ConfigOption(default=100)
+    save_directory = ConfigOption(default='')
 
     # status vars
     kP = StatusVar(default=1)
@@ -50,6 +109,7 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
     manualvalue = StatusVar(default=0)
 
     sigNewValue = QtCore.Signal(float)
+    sigStartScheduler = QtCore.Signal()
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -72,34 +132,56 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
 
         self.previousdelta = 0
         self.cv = self._control.getControlValue()
-
-        self.timer = QtCore.QTimer()
-        self.timer.setSingleShot(True)
-        self.timer.setInterval(self.timestep)
-
-        self.timer.timeout.connect(self._calcNextStep, QtCore.Qt.QueuedConnection)
-        self.sigNewValue.connect(self._control.setControlValue)
-
-        self.history = np.zeros([3, 5])
+        self.pv = self._process.getProcessValue()
+        self.P = 0
+        self.I = 0
+        self.D = 0
+
+        # rows: time (s), process value, control value, setpoint, step interval (ms),
+        # lateness of the step (ms), duration of the step (ms)
+        self._history = RingHistory(7, self.history_length)
+        self._overruns = 0
         self.savingState = False
         self.enable = False
         self.integrated = 0
         self.countdown = 2
 
-        self.timer.start(self.timestep)
+        self._stop_event = threading.Event()
+        self._scheduler = PIDStepScheduler(self)
+        self._scheduler_thread = QtCore.QThread()
+        self._scheduler.moveToThread(self._scheduler_thread)
+        self.sigStartScheduler.connect(self._scheduler.run, QtCore.Qt.QueuedConnection)
+        self._scheduler_thread.start()
+        self.sigStartScheduler.emit()
 
     def on_deactivate(self):
         """ Perform required deactivation.
         """
-        pass
+        self._stop_event.set()
+        self._scheduler_thread.quit()
+        self._scheduler_thread.wait()
+        self.sigStartScheduler.disconnect()
+        if self.savingState:
+            self.saveData()
+
+    @property
+    def history(self):
+        """ Process value, control value and setpoint of the last steps in format
+        [value][step], the newest step is the last one.
+        """
+        return self._history.history[1:4]
 
-    def _calcNextStep(self):
+    def _calcNextStep(self, dt=None):
         """ This function implements the Takahashi Type C PID
             controller: the P and D term are no longer dependent
              on the set-point, only on PV (which is Thlt).
              The D term is NOT low-pass filtered.
-             This function should be called once every TS seconds.
+             This function is called once every timestep by the scheduler thread.
+
+            @param float dt: time since the last step in ms. Default is the timestep.
         """
+        if dt is None or dt <= 0:
+            dt = self.timestep
         self.pv = self._process.getProcessValue()
 
         if self.countdown > 0:
@@ -113,11 +195,11 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
 
         if self.enable:
             delta = self.setpoint - self.pv
-            self.integrated += delta
+            self.integrated += delta * dt
             ## Calculate PID controller:
             self.P = self.kP * delta
-            self.I = self.kI * self.timestep * self.integrated
-            self.D = self.kD / self.timestep * (delta - self.previousdelta)
+            self.I = self.kI * self.integrated
+            self.D = self.kD / dt * (delta - self.previousdelta)
 
             self.cv += self.P + self.I + self.D
             self.previousdelta = delta
@@ -129,11 +211,6 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
             if self.cv < limits[0]:
                 self.cv = limits[0]
 
-            self.history = np.roll(self.history, -1, axis=1)
-            self.history[0, -1] = self.pv
-            self.history[1, -1] = self.cv
-            self.history[2, -1] = self.setpoint
-            self.sigNewValue.emit(self.cv)
         else:
             self.cv = self.manualvalue
             limits = self._control.getControlLimits()
@@ -141,9 +218,40 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
                 self.cv = limits[1]
             if self.cv < limits[0]:
                 self.cv = limits[0]
-            self.sigNewValue.emit(self.cv)
+        # write the control value directly from the scheduler thread to keep the timing
+        self._control.setControlValue(self.cv)
+        self.sigNewValue.emit(self.cv)
+
+    def _record_step(self, step_time, dt, lateness, duration):
+        """ Add the values and the timing of a control step to the history.
 
-        self.timer.start(self.timestep)
+            @param float step_time: start of the step in s since the start of the scheduler
+            @param float dt: time since the previous step in s
+            @param float lateness: time in s the step started after its deadline
+            @param float duration: time in s needed for the step
+        """
+        self._history.append((step_time, self.pv, self.cv, self.setpoint,
+                              dt * 1000, lateness * 1000, duration * 1000))
+
+    def get_timing_statistics(self):
+        """ Timing of the control steps kept in the history.
+
+            @return dict: number of steps, number of skipped steps (overruns) and mean and
+                          standard deviation of the step interval as well as mean and maximum
+                          lateness and duration of the steps. Times are given in ms.
+        """
+        steps = min(self._history.count, self._history.length)
+        statistics = {'steps': self._history.count, 'overruns': self._overruns}
+        if steps < 2:
+            return statistics
+        timing = self._history.history[4:, -steps + 1:]
+        statistics['interval'] = float(np.mean(timing[0]))
+        statistics['jitter'] = float(np.std(timing[0]))
+        statistics['mean_lateness'] = float(np.mean(timing[1]))
+        statistics['max_lateness'] = float(np.max(timing[1]))
+        statistics['mean_duration'] = float(np.mean(timing[2]))
+        statistics['max_duration'] = float(np.max(timing[2]))
+        return statistics
 
     def startLoop(self):
         """ Start the control loop. """
@@ -161,19 +269,41 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
         """
         return self.savingState
 
-    def startSaving(self):
-        """ Start saving process and control data.
+    def startSaving(self, file_path=None):
+        """ Start streaming process and control data of every step to a file.
+
+            @param str file_path: optional, path of the data file. Default is a time stamped file
+                                  in the configured save_directory or the home directory.
 
-            Does not do anything right now.
+            @return int: error code (0:OK, -1:error)
         """
-        pass
+        if file_path is None:
+            directory = self.save_directory if self.save_directory else get_home_dir()
+            file_path = os.path.join(
+                directory,
+                datetime.datetime.now().strftime('%Y%m%d-%H%M-%S') + '_softpid.dat')
+        header = ('Saved Data from the class {0} on {1}.\n'
+                  'Timestep (ms): {2}\n'
+                  'time (s)\tprocess value\tcontrol value\tsetpoint\tinterval (ms)\t'
+                  'lateness (ms)\tduration (ms)'
+                  ''.format(self.__class__.__name__,
+                            datetime.datetime.now().strftime('%d.%m.%Y at %Hh%Mm%Ss'),
+                            self.timestep))
+        if self._history.start_stream(file_path, header, self.save_chunk_size) < 0:
+            return -1
+        self.savingState = True
+        return 0
 
     def saveData(self):
-        """ Write process and control data to file.
+        """ Stop streaming process and control data and close the file.
 
-            Does not do anything right now.
+            @return str: path of the data file
         """
-        pass
+        file_path = self._history.stop_stream()
+        self.savingState = False
+        if file_path is not None:
+            self.log.info('PID data saved to {0}.'.format(file_path))
+        return file_path
 
     def get_kp(self):
         """ Return the proportional constant.
@@ -305,8 +435,10 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
             Do not depend on the output of this function, not every field
             exists for every PID controller.
         """
-        return {
+        extra = {
             'P': self.P,
             'I': self.I,
             'D': self.D
         }
+        extra.update(self.get_timing_statistics())
+        return extra
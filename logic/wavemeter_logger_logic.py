@@ -59,27 +59,29 @@ class HardwarePull(QtCore.QObject):
                 self.timer.stop()
 
     def _update_data(self):
-        """ This method gets the count data from the hardware.
-            It runs repeatedly in the logic module event loop by being connected
-            to sigCountNext and emitting sigCountNext through a queued connection.
+        """ This method gets all new wavelength readings from the hardware in one batch.
+            It runs repeatedly with the logic acquisition timing.
         """
 
         hardware = self._parentclass._wavemeter_device
-        self._parentclass.current_wavelength = 1.0 * hardware.get_current_wavelength()
-
-        time_stamp = time.time() - self._parentclass._acqusition_start_time
-
-        # only wavelength >200 nm make sense, ignore the rest
-        if self._parentclass.current_wavelength > 200:
-            self._parentclass._wavelength_data.append(
-                np.array([time_stamp, self._parentclass.current_wavelength])
-            )
-
-        # check if we have a new min or max and save it if so
-        if self._parentclass.current_wavelength > self._parentclass.intern_xmax:
-            self._parentclass.intern_xmax = self._parentclass.current_wavelength
-        if self._parentclass.current_wavelength < self._parentclass.intern_xmin:
-            self._parentclass.intern_xmin = self._parentclass.current_wavelength
+        next_sample, readings = hardware.get_wavelength_data(self._parentclass._next_sample)
+        if next_sample < self._parentclass._next_sample:
+            # the acquisition of the hardware was restarted
+            next_sample, readings = hardware.get_wavelength_data(0)
+        self._parentclass._next_sample = next_sample
+
+        # only the first channel with wavelength >200 nm make sense, ignore the rest.
+        # Readings from before the start of the acquisition are ignored as well.
+        time_stamps = readings[0] - self._parentclass._acqusition_start_time
+        valid = (readings[2] == 1) & (readings[1] > 200) & (time_stamps >= 0)
+        if np.any(valid):
+            wavelengths = readings[1, valid]
+            self._parentclass._append_wavelength_data(time_stamps[valid], wavelengths)
+            self._parentclass.current_wavelength = wavelengths[-1]
+
+            # check if we have a new min or max and save it if so
+            self._parentclass.intern_xmax = max(self._parentclass.intern_xmax, wavelengths.max())
+            self._parentclass.intern_xmin = min(self._parentclass.intern_xmin, wavelengths.min())
 
         if (
             (not self._parentclass._counter_logic.get_saving_state()) or
@@ -138,10 +140,17 @@ class WavemeterLoggerLogic(GenericLogic):
         self.intern_xmin = 1.0e10
         self.current_wavelength = 0
 
+        # wavelength readings in format [time (s), wavelength (nm)][reading]. The array is
+        # preallocated and only the first _wavelength_count readings are valid.
+        self._wavelength_data = np.zeros((2, 0))
+        self._wavelength_count = 0
+        # number of the next reading to fetch from the hardware
+        self._next_sample = 0
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-        self._wavelength_data = []
+        self._clear_wavelength_data()
 
         self.stopRequested = False
 
@@ -218,6 +227,38 @@ class WavemeterLoggerLogic(GenericLogic):
         if len(self.fc.fit_list) > 0:
             self._statusVariables['fits'] = self.fc.save_to_dict()
 
+    @property
+    def wavelength_data(self):
+        """ View of all wavelength readings in format [time (s), wavelength (nm)][reading]. """
+        with self.threadlock:
+            return self._wavelength_data[:, :self._wavelength_count]
+
+    def _clear_wavelength_data(self, capacity=10000):
+        """ Remove all wavelength readings and preallocate the buffer.
+
+        @param int capacity: number of readings the buffer can hold before it has to grow
+        """
+        with self.threadlock:
+            self._wavelength_data = np.zeros((2, capacity))
+            self._wavelength_count = 0
+
+    def _append_wavelength_data(self, time_stamps, wavelengths):
+        """ Append a batch of wavelength readings. The buffer doubles its size when it is full.
+
+        @param numpy.ndarray time_stamps: time of the readings since the start in s
+        @param numpy.ndarray wavelengths: wavelength of the readings in nm
+        """
+        with self.threadlock:
+            start = self._wavelength_count
+            count = start + len(wavelengths)
+            if count > self._wavelength_data.shape[1]:
+                grown = np.zeros((2, max(count, 2 * self._wavelength_data.shape[1])))
+                grown[:, :start] = self._wavelength_data[:, :start]
+                self._wavelength_data = grown
+            self._wavelength_data[0, start:count] = time_stamps
+            self._wavelength_data[1, start:count] = wavelengths
+            self._wavelength_count = count
+
     def get_max_wavelength(self):
         """ Current maximum wavelength of the scan.
 
@@ -298,7 +339,8 @@ class WavemeterLoggerLogic(GenericLogic):
 
         if not resume:
             self._acqusition_start_time = self._counter_logic._saving_start_time
-            self._wavelength_data = []
+            self._clear_wavelength_data()
+            self._next_sample = 0
 
             self.data_index = 0
 
@@ -346,23 +388,25 @@ class WavemeterLoggerLogic(GenericLogic):
         """
 
         # If there is not yet any wavelength data, then wait and signal next loop
-        if len(self._wavelength_data) == 0:
+        wavelength_data = self.wavelength_data
+        if wavelength_data.shape[1] == 0:
             time.sleep(self._logic_update_timing * 1e-3)
             self.sig_data_updated.emit()
             return
 
         # The end of the recent_wavelength_window is the time of the latest wavelength data
-        self._recent_wavelength_window[1] = self._wavelength_data[-1][0]
+        self._recent_wavelength_window[1] = wavelength_data[0, -1]
 
         # (speed-up) We only need to worry about "recent" counts, because as the count data gets
         # very long all the earlier points will already be attached to wavelength values.
         count_recentness = 100  # TODO: calculate this from count_freq and wavemeter refresh rate
 
-        # TODO: Does this depend on things, or do we loop fast enough to get every wavelength value?
-        wavelength_recentness = np.min([5, len(self._wavelength_data)])
+        # All wavelength readings of the recent window and the last one before it are needed
+        first_wavelength = max(
+            np.searchsorted(wavelength_data[0], self._recent_wavelength_window[0]) - 1, 0)
 
         recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
-        recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
+        recent_wavelengths = wavelength_data[:, first_wavelength:]
 
         # The latest counts are those recorded during the recent_wavelength_window
         count_idx = [0, 0]
@@ -373,8 +417,8 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # Interpolate to obtain wavelength values at the times of each count
         interpolated_wavelengths = np.interp(latest_counts[:, 0],
-                                             xp=recent_wavelengths[:, 0],
-                                             fp=recent_wavelengths[:, 1]
+                                             xp=recent_wavelengths[0],
+                                             fp=recent_wavelengths[1]
                                              )
 
         # Stitch interpolated wavelength into latest counts array
@@ -415,7 +459,7 @@ class WavemeterLoggerLogic(GenericLogic):
             self.log.info('Recalcutating Laser Scanning Histogram for: '
                           '{0:d} counts and {1:d} wavelength.'.format(
                               count_window,
-                              len(self._wavelength_data)
+                              self._wavelength_count
                           )
                           )
         else:
@@ -429,39 +473,38 @@ class WavemeterLoggerLogic(GenericLogic):
         temp = np.array(self._counter_logic._data_to_save[-count_window:])
 
         # only do something if there is wavelength data to work with
-        if len(self._wavelength_data) > 0:
-
-            for i in self._wavelength_data[self._data_index:]:
-                self._data_index += 1
-
-                if i[1] < self._xmin or i[1] > self._xmax:
-                    continue
-
-                # calculate the bin the new wavelength needs to go in
-                newbin = np.digitize([i[1]], self.histogram_axis)[0]
-                # if the bin make no sense, start from the beginning
-                if newbin > len(self.rawhisto) - 1:
-                    continue
-
-                # sum the counts in rawhisto and count the occurence of the bin in sumhisto
-                interpolation = np.interp(i[0], xp=temp[:, 0], fp=temp[:, 1])
-                self.rawhisto[newbin] += interpolation
-                self.sumhisto[newbin] += 1.0
-
-                self.envelope_histogram[newbin] = np.max([interpolation,
-                                                          self.envelope_histogram[newbin]
-                                                          ])
-
-                datapoint = [i[1], i[0], interpolation]
+        if self._wavelength_count > 0:
+
+            # all readings since the last update are processed in one batch
+            wavelength_data = self.wavelength_data
+            time_stamps, wavelengths = wavelength_data[:, self._data_index:]
+            self._data_index = wavelength_data.shape[1]
+
+            # calculate the bins the new wavelengths need to go in and skip the ones outside
+            newbins = np.digitize(wavelengths, self.histogram_axis)
+            in_range = ((wavelengths >= self._xmin) & (wavelengths <= self._xmax)
+                        & (newbins <= len(self.rawhisto) - 1))
+            time_stamps = time_stamps[in_range]
+            wavelengths = wavelengths[in_range]
+            newbins = newbins[in_range]
+
+            # sum the counts in rawhisto and count the occurence of the bin in sumhisto
+            interpolation = np.interp(time_stamps, xp=temp[:, 0], fp=temp[:, 1])
+            np.add.at(self.rawhisto, newbins, interpolation)
+            np.add.at(self.sumhisto, newbins, 1.0)
+            np.maximum.at(self.envelope_histogram, newbins, interpolation)
+
+            if len(wavelengths) > 0:
                 if time.time() - self.last_point_time > 1:
                     self.sig_new_data_point.emit(self.recent_avg)
                     self.last_point_time = time.time()
                     self.recent_count = 0
-                else:
-                    self.recent_count += 1
-                    for j in range(3):
-                        self.recent_avg[j] -= self.recent_avg[j] / self.recent_count
-                        self.recent_avg[j] += datapoint[j] / self.recent_count
+                # running average of the data points [wavelength, time, counts]
+                batch_avg = [wavelengths.mean(), time_stamps.mean(), interpolation.mean()]
+                self.recent_count += len(wavelengths)
+                for j in range(3):
+                    self.recent_avg[j] += ((batch_avg[j] - self.recent_avg[j])
+                                           * len(wavelengths) / self.recent_count)
 
             # the plot data is the summed counts divided by the occurence of the respective bins
             self.histogram = self.rawhisto / self.sumhisto
@@ -514,7 +557,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Time (s), Wavelength (nm)'] = self._wavelength_data
+        data['Time (s), Wavelength (nm)'] = self.wavelength_data.T
         # write the parameters:
         parameters = OrderedDict()
         parameters['Acquisition Timing (ms)'] = self._logic_acquisition_timing
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the block buffer of GatedCounterStream against the simulated DAQmx backend.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+import numpy as np
+import pytest
+
+from hardware.kolkowitz.gated_counter_stream import GatedCounterStream, SimulatedDaq
+
+
+BLOCK_SAMPLES = 5
+BUFFER_BLOCKS = 4
+
+
+def make_stream(daq):
+    stream = GatedCounterStream(daq, BLOCK_SAMPLES, BUFFER_BLOCKS)
+    stream.set_up('/Dev1/Ctr1', '/Dev1/PFI1', '/Dev1/PFI8', 1e7)
+    return stream
+
+
+@pytest.fixture
+def manual_stream():
+    """ Stream whose simulated gates never arrive by themselves, blocks are added with
+    add_block. """
+    daq = SimulatedDaq(gate_rate=1e-6)
+    stream = make_stream(daq)
+    stream.start()
+    yield stream
+    stream.close()
+
+
+def add_block(stream, value):
+    """ Let the simulated card acquire a block of gates with value counts and call back. """
+    state = stream._daq._task(stream._task)
+    with state['lock']:
+        state['samples'] = np.concatenate(
+            (state['samples'], np.full(BLOCK_SAMPLES, value, dtype=np.uint32)))
+    assert stream._every_n_samples(stream._task, SimulatedDaq.DAQmx_Val_Acquired_Into_Buffer,
+                                   BLOCK_SAMPLES, None) == 0
+
+
+def test_block_numbering(manual_stream):
+    next_block, blocks, lost = manual_stream.read()
+    assert (next_block, len(blocks), lost) == (0, 0, 0)
+
+    for value in range(3):
+        add_block(manual_stream, value)
+    assert manual_stream.written_blocks == 3
+    next_block, blocks, lost = manual_stream.read()
+    assert next_block == 3
+    assert lost == 0
+    np.testing.assert_array_equal(blocks[:, 0], [0, 1, 2])
+    assert np.all(blocks == blocks[:, :1])
+
+    # nothing new
+    next_block, blocks, lost = manual_stream.read(next_block)
+    assert (next_block, len(blocks), lost) == (3, 0, 0)
+
+    # blocks after the end of the buffer are returned by the next call
+    add_block(manual_stream, 3)
+    add_block(manual_stream, 4)
+    next_block, blocks, lost = manual_stream.read(3)
+    assert (next_block, lost) == (4, 0)
+    np.testing.assert_array_equal(blocks[:, 0], [3])
+    next_block, blocks, lost = manual_stream.read(next_block)
+    assert (next_block, lost) == (5, 0)
+    np.testing.assert_array_equal(blocks[:, 0], [4])
+
+
+def test_lost_blocks_after_wrap(manual_stream):
+    for value in range(10):
+        add_block(manual_stream, value)
+
+    # one block of the buffer is kept free for the callback, so only 3 blocks are readable
+    next_block, blocks, lost = manual_stream.read()
+    assert lost == 10 - (BUFFER_BLOCKS - 1)
+    assert next_block == 8
+    np.testing.assert_array_equal(blocks[:, 0], [7])
+    next_block, blocks, lost = manual_stream.read(next_block)
+    assert (next_block, lost) == (10, 0)
+    np.testing.assert_array_equal(blocks[:, 0], [8, 9])
+
+    # a reader which is only a little behind loses the overwritten blocks only
+    next_block, blocks, lost = manual_stream.read(6)
+    assert (next_block, lost) == (8, 1)
+    np.testing.assert_array_equal(blocks[:, 0], [7])
+
+
+def test_overflow_error():
+    daq = SimulatedDaq(gate_rate=1e5)
+    stream = make_stream(daq)
+    state = daq._task(stream._task)
+    # nobody reads the samples, e.g. because the callback does not keep up with the card
+    callback = state['callback']
+    state['callback'] = None
+    try:
+        stream.start()
+        deadline = time.monotonic() + 10.
+        while 'error' not in state and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert isinstance(state.get('error'), SimulatedDaq.DAQError)
+
+        # the next read of the callback fails and the stream keeps the error for its owner
+        assert callback(stream._task, SimulatedDaq.DAQmx_Val_Acquired_Into_Buffer,
+                        BLOCK_SAMPLES, None) == -1
+        assert isinstance(stream.error, SimulatedDaq.DAQError)
+        assert stream.written_blocks == 0
+    finally:
+        stream.close()
+
+
+def test_streaming():
+    daq = SimulatedDaq(gate_rate=2e4, mean_counts=10.)
+    stream = make_stream(daq)
+    stream.start()
+    try:
+        next_block = 0
+        received = 0
+        deadline = time.monotonic() + 10.
+        while received < 20 and time.monotonic() < deadline:
+            first_block = next_block
+            next_block, blocks, lost = stream.read(first_block)
+            assert next_block == first_block + lost + len(blocks)
+            received += lost + len(blocks)
+            time.sleep(0.001)
+        assert received >= 20
+        assert stream.error is None
+    finally:
+        stream.close()
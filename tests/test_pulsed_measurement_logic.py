@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the data access and saving of PulsedMeasurementLogic with dummy hardware.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+import types
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from core.threadmanager import ThreadManager
+from hardware.fast_counter_dummy import FastCounterDummy
+from hardware.microwave.mw_source_dummy import MicrowaveDummy
+from hardware.pulser_dummy import PulserDummy
+from logic.pulsed.pulsed_measurement_logic import PulsedMeasurementLogic
+from logic.save_logic import SaveLogic
+
+
+class FakeFitContainer:
+    """ Fit container which never fits anything. """
+
+    def __init__(self):
+        self.fit_list = dict()
+        self.current_fit = 'No Fit'
+        self.current_fit_result = None
+
+    def set_units(self, units):
+        pass
+
+    def load_from_dict(self, fit_dict):
+        pass
+
+    def save_to_dict(self):
+        return dict()
+
+    def set_current_fit(self, fit_function):
+        self.current_fit = fit_function
+
+    def do_fit(self, x_data, y_data):
+        return x_data, np.zeros_like(y_data), None
+
+
+class FakeFitLogic:
+    def make_fit_container(self, container_name, dimension):
+        return FakeFitContainer()
+
+
+def run_with_timeout(func, *args, timeout=10.):
+    """ Run func in another thread and fail if it does not return (e.g. due to a deadlock). """
+    result = dict()
+
+    def target():
+        result['value'] = func(*args)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), '{0} did not return in time'.format(func.__name__)
+    return result.get('value')
+
+
+@pytest.fixture
+def logic(tmp_path):
+    app = QtCore.QCoreApplication.instance()
+    if app is None:
+        app = QtCore.QCoreApplication([])
+    manager = types.SimpleNamespace(tm=ThreadManager())
+    hardware = {
+        'savelogic': SaveLogic(manager=manager, name='savelogic',
+                               config={'unix_data_directory': str(tmp_path)}),
+        'fastcounter': FastCounterDummy(manager=manager, name='fastcounter', config={}),
+        'pulsegenerator': PulserDummy(manager=manager, name='pulsegenerator', config={}),
+        'microwave': MicrowaveDummy(manager=manager, name='microwave', config={})}
+    for module in hardware.values():
+        assert module.module_state.activate()
+    module = PulsedMeasurementLogic(manager=manager, name='pulsedmeasurementlogic', config={})
+    module.connectors['fitlogic'].connect(FakeFitLogic())
+    for connector, target in hardware.items():
+        module.connectors[connector].connect(target)
+    assert module.module_state.activate()
+    yield module
+    module.module_state.deactivate()
+    for hw_module in hardware.values():
+        hw_module.module_state.deactivate()
+
+
+def test_delta_data_and_save(logic):
+    logic.set_measurement_settings({'controlled_variable': np.arange(4, dtype=float),
+                                    'number_of_lasers': 8,
+                                    'alternating': True})
+    with logic._threadlock:
+        logic._initialize_data_arrays()
+        logic.signal_data[1] = [5., 6., 7., 8.]
+        logic.signal_data[2] = [1., 2., 3., 4.]
+        logic._signal_version += 1
+
+    run_with_timeout(logic.set_alternative_data_type, 'Delta')
+    assert logic.alternative_data_type == 'Delta'
+    np.testing.assert_array_equal(logic.signal_alt_data, [[0., 1., 2., 3.], [4., 4., 4., 4.]])
+
+    snapshots = list()
+    logic.sigSaveSnapshot.connect(snapshots.append, QtCore.Qt.DirectConnection)
+    filepath = run_with_timeout(logic.save_measurement_data, 'test')
+    assert filepath is not None
+    assert len(snapshots) == 1
+    np.testing.assert_array_equal(snapshots[0]['signal_alt_data'], logic.signal_alt_data)
+    np.testing.assert_array_equal(snapshots[0]['signal_data'], logic.signal_data)
+    logic.sigSaveSnapshot.disconnect(snapshots.append)
+
+
+def test_save_tagged_with_poi_of_caller(logic, tmp_path):
+    snapshots = list()
+    logic.sigSaveSnapshot.connect(snapshots.append, QtCore.Qt.DirectConnection)
+    with logic.savelogic().poi_context('poi 1'):
+        logic.save_measurement_data('poi_test')
+    logic.sigSaveSnapshot.disconnect(snapshots.append)
+    assert snapshots[-1]['poi_name'] == 'poi 1'
+
+    # the saver thread does not see the POI bound to the calling thread, it uses the snapshot
+    saver_thread = threading.Thread(target=logic._saver.save_snapshot, args=(snapshots[-1],))
+    saver_thread.start()
+    saver_thread.join(30)
+    saved_files = [path.name for path in tmp_path.rglob('*poi_test*')]
+    assert saved_files
+    assert all('_poi_1_poi_test_' in name for name in saved_files)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the readout of TimeTaggerFastCounter against a simulated Time Tagger.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import sys
+import types
+import numpy as np
+import pytest
+
+
+class FakeTimeDifferences:
+    """ Simulation of TimeTagger.TimeDifferences. Counts are added with add_sweeps. """
+
+    def __init__(self, tagger, click_channel, start_channel, next_channel, sync_channel,
+                 binwidth, n_bins, n_histograms):
+        self.binwidth = binwidth
+        # like the Time Tagger, the histogram is returned as int32
+        self._data = np.zeros((n_histograms, n_bins), dtype=np.int32)
+        self._sweeps = 0
+        self._capture_duration = 0
+        self.running = False
+
+    def add_sweeps(self, counts, sweeps=1, duration=1e-3):
+        """ Add counts of some sweeps which took duration seconds. """
+        self._data += np.asarray(counts, dtype=np.int32)
+        self._sweeps += sweeps
+        self._capture_duration += int(round(duration * 1e12))
+
+    def getData(self):
+        return self._data.copy()
+
+    def getCounts(self):
+        return self._sweeps
+
+    def getCaptureDuration(self):
+        return self._capture_duration
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def clear(self):
+        self._data[:] = 0
+        self._sweeps = 0
+        self._capture_duration = 0
+
+
+class FakeTagger:
+    def reset(self):
+        pass
+
+
+class FakeCombiner:
+    def __init__(self, tagger, channels):
+        self.channels = channels
+
+    def getChannel(self):
+        return 100
+
+
+fake_timetagger = types.ModuleType('TimeTagger')
+fake_timetagger.CHANNEL_UNUSED = -134217728
+fake_timetagger.createTimeTagger = FakeTagger
+fake_timetagger.Combiner = FakeCombiner
+fake_timetagger.TimeDifferences = FakeTimeDifferences
+
+# the driver imports TimeTagger on import, the tests replace it by the fake in any case
+sys.modules.setdefault('TimeTagger', fake_timetagger)
+from hardware.swabian_instruments import timetagger_fast_counter
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    monkeypatch.setattr(timetagger_fast_counter, 'tt', fake_timetagger)
+    module = timetagger_fast_counter.TimeTaggerFastCounter(
+        manager=None,
+        name='fastcounter',
+        config={'timetagger_channel_apd_0': 0,
+                'timetagger_channel_apd_1': 1,
+                'timetagger_channel_detect': 2,
+                'timetagger_channel_sequence': 3,
+                'timetagger_sum_channels': True})
+    assert module.module_state.activate()
+    module.configure(1e-9, 99e-9, number_of_gates=3)
+    yield module
+    module.stop_measure()
+    module.module_state.deactivate()
+
+
+def test_data_trace_reuses_buffer(counter):
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.ones((3, 100)))
+    data, info = counter.get_data_trace()
+    assert data.dtype == np.int64
+    assert data.shape == (3, 100)
+    assert np.all(data == 1)
+    assert info['elapsed_sweeps'] == 1
+
+    counter.pulsed.add_sweeps(np.full((3, 100), 2))
+    data_2, info = counter.get_data_trace()
+    # the same buffer is filled again
+    assert data_2 is data
+    assert np.all(data == 3)
+    assert info['elapsed_sweeps'] == 2
+
+
+def test_delta_readout(counter):
+    counter.start_measure()
+    first = np.arange(300).reshape((3, 100))
+    counter.pulsed.add_sweeps(first, sweeps=2, duration=0.5)
+    delta, info = counter.get_data_trace_delta()
+    np.testing.assert_array_equal(delta, first)
+
+    second = np.full((3, 100), 7)
+    counter.pulsed.add_sweeps(second, sweeps=3, duration=0.25)
+    delta_2, info = counter.get_data_trace_delta()
+    assert delta_2 is delta
+    np.testing.assert_array_equal(delta, second)
+
+    # no new counts
+    delta, info = counter.get_data_trace_delta()
+    assert not np.any(delta)
+
+    # the full trace is not affected by the delta readout
+    data, info = counter.get_data_trace()
+    np.testing.assert_array_equal(data, first + second)
+
+
+def test_delta_readout_after_restart(counter):
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.full((3, 100), 5), sweeps=4, duration=1.)
+    counter.get_data_trace_delta()
+    counter.stop_measure()
+
+    # the histogram is cleared on start, the delta must not become negative
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.ones((3, 100)), sweeps=1, duration=0.5)
+    delta, info = counter.get_data_trace_delta()
+    assert np.all(delta == 1)
+    assert info['elapsed_sweeps'] == 1
+    assert info['interval_sweeps'] == 1
+    assert info['interval_time'] == pytest.approx(0.5)
+
+
+def test_delta_readout_after_shape_change(counter):
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.full((3, 100), 5))
+    counter.get_data_trace_delta()
+    counter.stop_measure()
+
+    counter.configure(1e-9, 49e-9, number_of_gates=5)
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.full((5, 50), 2))
+    delta, info = counter.get_data_trace_delta()
+    assert delta.shape == (5, 50)
+    assert np.all(delta == 2)
+    data, info = counter.get_data_trace()
+    assert data.shape == (5, 50)
+    assert np.all(data == 2)
+
+
+def test_histogram_shape_differs_from_buffer(counter):
+    # the buffers follow the shape of the histogram if it does not match the configuration
+    counter.start_measure()
+    counter.pulsed._data = np.zeros((2, 10), dtype=np.int32)
+    counter.pulsed.add_sweeps(np.full((2, 10), 3))
+    delta, info = counter.get_data_trace_delta()
+    assert delta.shape == (2, 10)
+    assert np.all(delta == 3)
+
+
+def test_interval_information(counter):
+    counter.start_measure()
+    counter.pulsed.add_sweeps(np.zeros((3, 100)), sweeps=10, duration=2.)
+    delta, info = counter.get_data_trace_delta()
+    assert info['elapsed_sweeps'] == 10
+    assert info['interval_sweeps'] == 10
+    assert info['elapsed_time'] == pytest.approx(2.)
+    assert info['interval_time'] == pytest.approx(2.)
+
+    counter.pulsed.add_sweeps(np.zeros((3, 100)), sweeps=4, duration=0.5)
+    delta, info = counter.get_data_trace_delta()
+    assert info['elapsed_sweeps'] == 14
+    assert info['interval_sweeps'] == 4
+    assert info['elapsed_time'] == pytest.approx(2.5)
+    assert info['interval_time'] == pytest.approx(0.5)
+
+    # get_data_trace does not advance the interval
+    counter.pulsed.add_sweeps(np.zeros((3, 100)), sweeps=1, duration=0.1)
+    data, info = counter.get_data_trace()
+    assert 'interval_sweeps' not in info
+    delta, info = counter.get_data_trace_delta()
+    assert info['interval_sweeps'] == 1
+    assert info['interval_time'] == pytest.approx(0.1)
+
+
+def test_software_elapsed_time(counter, monkeypatch):
+    # TimeTagger versions without getCaptureDuration fall back to the time of the computer
+    monkeypatch.delattr(FakeTimeDifferences, 'getCaptureDuration')
+    now = [100.]
+    monkeypatch.setattr(timetagger_fast_counter.time, 'time', lambda: now[0])
+    counter.start_measure()
+    now[0] = 101.5
+    delta, info = counter.get_data_trace_delta()
+    assert info['elapsed_time'] == pytest.approx(1.5)
+    counter.pause_measure()
+    now[0] = 110.
+    delta, info = counter.get_data_trace_delta()
+    assert info['elapsed_time'] == pytest.approx(1.5)
+    assert info['interval_time'] == pytest.approx(0.)
+    counter.continue_measure()
+    now[0] = 111.
+    delta, info = counter.get_data_trace_delta()
+    assert info['elapsed_time'] == pytest.approx(2.5)
+    assert info['interval_time'] == pytest.approx(1.)